@@ -0,0 +1,85 @@
+import os
+import sys
+import time
+import argparse
+import tempfile
+import numpy as np
+import pandas as pd
+
+# A full rebuild (integrate everything, bulk load every profile) against an
+# incremental run over one day of new transactions and CRM changes, both on
+# the local Snowflake stand-in. The history is spread over --days days and the
+# incremental run is given only the last day's transactions.
+#   python benchmarks/incremental_recompute_benchmark.py --customers 200000 --transactions 2000000
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path[:0] = [os.path.join(BENCHMARK_DIR, '..'), os.path.join(BENCHMARK_DIR, '..', '..')]
+
+from pipeline_common.connection_pool import ConnectionPool
+from pipeline_common.local_snowflake import LocalSnowflakeConnection
+from customer_integration import CustomerIntegrator
+from incremental_recompute import IncrementalRecompute
+from snowflake_loader import SnowflakeBulkLoader, PROFILE_TABLE_DDL
+
+TYPES = ['investment', 'savings', 'loan', 'credit_card', 'mortgage']
+
+def make_history(customers, transactions, days, crm_change_share, seed):
+    rng = np.random.default_rng(seed)
+    crm = pd.DataFrame({
+        'customer_id': np.char.add('C', np.char.zfill(np.arange(customers).astype(str), 8)),
+        'name': np.char.add('Customer ', np.arange(customers).astype(str)),
+        'age': rng.integers(18, 90, customers),
+        'income': rng.lognormal(11, 0.6, customers).round(2),
+        'snapshot_version': 1
+    })
+    dates = pd.Timestamp('2025-01-01') + pd.to_timedelta(np.sort(rng.integers(0, days, transactions)), unit='D')
+    trans = pd.DataFrame({
+        'customer_id': np.char.add('C', np.char.zfill(rng.integers(0, customers, transactions).astype(str), 8)),
+        'amount': rng.lognormal(5, 1.5, transactions).round(2),
+        'type': rng.choice(TYPES, transactions),
+        'date': dates.strftime('%Y-%m-%d')
+    })
+    changed = crm.sample(frac=crm_change_share, random_state=seed).assign(snapshot_version=2)
+    changed['income'] = (changed['income'] * 1.1).round(2)
+    return crm, changed, trans
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--customers', type=int, default=100000)
+    parser.add_argument('--transactions', type=int, default=1000000)
+    parser.add_argument('--days', type=int, default=90)
+    parser.add_argument('--crm-change-share', type=float, default=0.01)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+    crm, changed, trans = make_history(args.customers, args.transactions, args.days, args.crm_change_share, args.seed)
+    last_day = trans['date'].max()
+    history, day = trans[trans['date'] < last_day], trans[trans['date'] == last_day]
+
+    with tempfile.TemporaryDirectory(prefix='recompute-benchmark-') as directory:
+        pool = ConnectionPool(lambda: LocalSnowflakeConnection(os.path.join(directory, 'profiles.db')), max_size=1)
+        recompute = IncrementalRecompute(pool)
+        report = recompute.run(crm, history)
+        print(f"initial build:      {report['seconds']:8.2f} s  ({report['customers_touched']} customers)")
+
+        # What a nightly run used to do: rebuild and reload every profile from the full history
+        start = time.perf_counter()
+        profiles = CustomerIntegrator().integrate(pd.concat([crm, changed]).drop_duplicates('customer_id', keep='last'), trans)
+        with pool.connection() as conn:
+            conn.cursor().execute(PROFILE_TABLE_DDL)
+            SnowflakeBulkLoader(conn).load(profiles)
+        print(f"full rebuild:       {time.perf_counter() - start:8.2f} s  ({len(profiles)} customers)")
+
+        # Rewind to the state before the last day, then apply it incrementally
+        pool.close()
+        os.remove(os.path.join(directory, 'profiles.db'))
+        pool = ConnectionPool(lambda: LocalSnowflakeConnection(os.path.join(directory, 'profiles.db')), max_size=1)
+        recompute = IncrementalRecompute(pool)
+        recompute.run(crm, history)
+        report = recompute.run(changed, day)
+        print(f"incremental (1 day):{report['seconds']:8.2f} s  ({report['customers_touched']} customers touched: "
+              f"{report['customers_touched_by_crm']} by CRM, {report['customers_touched_by_transactions']} by "
+              f"{report['transactions_applied']} transactions)")
+        pool.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+import os
+import sys
+import time
+import argparse
+import shutil
+import tempfile
+import numpy as np
+import pandas as pd
+
+# The old in-memory integration (groupby with a per-group list(set(x)) lambda
+# and a per-row risk apply) against the chunked, vectorized CustomerIntegrator,
+# with a check that both produce the same profiles. --from-files also streams
+# the inputs from parquet files partition by partition, the out-of-core path,
+# without holding the inputs or the result in memory.
+#   python benchmarks/integration_benchmark.py --customers 200000 --transactions 2000000 --from-files
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path[:0] = [os.path.join(BENCHMARK_DIR, '..'), os.path.join(BENCHMARK_DIR, '..', '..')]
+
+from customer_integration import CustomerIntegrator
+
+TYPES = ['investment', 'savings', 'loan', 'credit_card', 'mortgage']
+
+def make_inputs(customers, transactions, seed):
+    rng = np.random.default_rng(seed)
+    ids = np.char.add('C', np.char.zfill(np.arange(customers).astype(str), 8))
+    crm = pd.DataFrame({
+        'customer_id': ids,
+        'name': np.char.add('Customer ', np.arange(customers).astype(str)),
+        'age': rng.integers(18, 90, customers),
+        'income': rng.lognormal(11, 0.6, customers).round(2)
+    })
+    # Skewed activity, plus some transactions for customers missing from the CRM
+    trans = pd.DataFrame({
+        'customer_id': np.char.add('C', np.char.zfill((rng.zipf(1.3, transactions) % int(customers * 1.05)).astype(str), 8)),
+        'amount': rng.lognormal(5, 1.5, transactions).round(2),
+        'type': rng.choice(TYPES, transactions),
+        'date': '2025-07-01'
+    })
+    return crm, trans
+
+def legacy_integrate(crm_data, transactions):
+    crm_df = pd.DataFrame(crm_data).drop_duplicates(subset=['customer_id'])
+    trans_summary = pd.DataFrame(transactions).groupby('customer_id').agg({
+        'amount': ['sum', 'count'],
+        'type': lambda x: list(set(x))
+    }).reset_index()
+    trans_summary.columns = ['customer_id', 'total_spend', 'trans_count', 'trans_types']
+    customer_profile = crm_df.merge(trans_summary, on='customer_id', how='left')
+    customer_profile['risk_score'] = customer_profile['income'].apply(
+        lambda x: 'high' if x > 100000 else 'medium' if x > 50000 else 'low'
+    )
+    return customer_profile
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+def stream_from_files(crm, trans, integrator):
+    directory = tempfile.mkdtemp(prefix='integration-benchmark-')
+    try:
+        crm.to_parquet(os.path.join(directory, 'crm.parquet'), index=False)
+        trans.to_parquet(os.path.join(directory, 'transactions.parquet'), index=False)
+        partitions = integrator.integrate_partitions(os.path.join(directory, 'crm.parquet'),
+                                                     os.path.join(directory, 'transactions.parquet'))
+        return timed(lambda: sum(len(profiles) for profiles in partitions))
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+def describe(run):
+    return (f"({run['chunks']} chunks, {run['spilled_files']} spill files, "
+            f"{run['spilled_bytes'] / 1024 / 1024:.1f} MB spilled)")
+
+def same_profiles(legacy, profiles):
+    types_match = all(
+        (not isinstance(old, list) and not isinstance(new, list)) or sorted(old) == new
+        for old, new in zip(legacy['trans_types'], profiles['trans_types'])
+    )
+    return (list(legacy.columns) == list(profiles.columns)
+            and legacy['customer_id'].equals(profiles['customer_id'])
+            and np.allclose(legacy['total_spend'], profiles['total_spend'], equal_nan=True)
+            and np.allclose(legacy['trans_count'], profiles['trans_count'], equal_nan=True)
+            and (legacy['risk_score'] == profiles['risk_score']).all()
+            and types_match)
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--customers', type=int, default=100000)
+    parser.add_argument('--transactions', type=int, default=1000000)
+    parser.add_argument('--chunk-rows', type=int, default=250000)
+    parser.add_argument('--partitions', type=int, default=16)
+    parser.add_argument('--spill-rows', type=int, default=2000000, help='buffered rows before partials spill to disk')
+    parser.add_argument('--from-files', action='store_true', help='also stream the inputs from parquet files')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+    crm, trans = make_inputs(args.customers, args.transactions, args.seed)
+
+    legacy, elapsed = timed(lambda: legacy_integrate(crm, trans))
+    print(f"groupby + lambda:   {len(trans) / elapsed:12.0f} transactions/s")
+    integrator = CustomerIntegrator(chunk_rows=args.chunk_rows, partitions=args.partitions, spill_rows=args.spill_rows)
+    profiles, elapsed = timed(lambda: integrator.integrate(crm, trans))
+    print(f"chunked vectorized: {len(trans) / elapsed:12.0f} transactions/s  {describe(integrator.last_run)}")
+    print(f"same profiles: {same_profiles(legacy, profiles)}")
+    if args.from_files:
+        integrator = CustomerIntegrator(chunk_rows=args.chunk_rows, partitions=args.partitions, spill_rows=args.spill_rows)
+        rows, elapsed = stream_from_files(crm, trans, integrator)
+        print(f"streamed from files:{len(trans) / elapsed:12.0f} transactions/s  {describe(integrator.last_run)}, {rows} profiles")
+
+if __name__ == "__main__":
+    main()
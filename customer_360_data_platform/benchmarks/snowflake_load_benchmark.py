@@ -0,0 +1,74 @@
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import pandas as pd
+
+# Row-by-row INSERT (the old store_in_snowflake) against the bulk
+# parquet -> PUT -> COPY -> MERGE path, both on the local Snowflake stand-in.
+# The stand-in has no network hop, so the row-by-row figure is a best case; on
+# a real warehouse every INSERT is a round trip.
+#   python benchmarks/snowflake_load_benchmark.py --profiles 200000
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path[:0] = [os.path.join(BENCHMARK_DIR, '..'), os.path.join(BENCHMARK_DIR, '..', '..')]
+
+from pipeline_common.local_snowflake import LocalSnowflakeConnection
+from snowflake_loader import SnowflakeBulkLoader, PROFILE_TABLE_DDL
+
+TYPES = ['investment', 'savings', 'loan', 'credit_card', 'mortgage']
+
+def make_profiles(count, seed):
+    rng = random.Random(seed)
+    return pd.DataFrame({
+        'customer_id': [f"C{i:08d}" for i in range(count)],
+        'name': [f"Customer {i}" for i in range(count)],
+        'age': [rng.randint(18, 90) for _ in range(count)],
+        'income': [round(rng.lognormvariate(11, 0.6), 2) for _ in range(count)],
+        'total_spend': [round(rng.uniform(0, 50000), 2) for _ in range(count)],
+        'trans_count': [rng.randint(1, 400) for _ in range(count)],
+        'trans_types': [rng.sample(TYPES, rng.randint(1, 3)) for _ in range(count)],
+        'risk_score': [rng.choice(['low', 'medium', 'high']) for _ in range(count)]
+    })
+
+def row_by_row(conn, df):
+    cursor = conn.cursor()
+    start = time.perf_counter()
+    for _, row in df.iterrows():
+        cursor.execute(
+            "INSERT INTO customer_profiles VALUES (%s, %s, %s, %s, %s, %s, %s, %s)",
+            (row['customer_id'], row['name'], row['age'], row['income'], row['total_spend'], row['trans_count'], str(row['trans_types']), row['risk_score'])
+        )
+    conn.commit()
+    return time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--profiles', type=int, default=100000)
+    parser.add_argument('--update-share', type=float, default=0.2, help='share of profiles re-loaded as upserts')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+    profiles = make_profiles(args.profiles, args.seed)
+
+    # The row-by-row baseline is slow; time a sample and extrapolate
+    sample = profiles.head(min(len(profiles), 20000))
+    conn = LocalSnowflakeConnection()
+    conn.cursor().execute(PROFILE_TABLE_DDL)
+    elapsed = row_by_row(conn, sample)
+    print(f"row-by-row INSERT: {len(sample) / elapsed:10.0f} rows/s  ({len(sample)} rows, appends duplicates on reload)")
+
+    conn = LocalSnowflakeConnection()
+    conn.cursor().execute(PROFILE_TABLE_DDL)
+    loader = SnowflakeBulkLoader(conn)
+    stats = loader.load(profiles)
+    print(f"bulk load:         {stats['rows_per_second']:10.0f} rows/s  {json.dumps(stats)}")
+    updates = profiles.sample(frac=args.update_share, random_state=args.seed).assign(risk_score='high')
+    stats = loader.load(updates)
+    print(f"bulk upsert:       {stats['rows_per_second']:10.0f} rows/s  {json.dumps(stats)}")
+    rows = conn.cursor().execute("SELECT COUNT(*), COUNT(DISTINCT customer_id) FROM customer_profiles").fetchone()
+    print(f"table rows: {rows[0]}, distinct customers: {rows[1]}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+import os
+import sys
+import time
+import asyncio
+import argparse
+import tempfile
+import numpy as np
+import pandas as pd
+
+# Latency of the spend time-series endpoint's query: a date range read from the
+# precomputed daily/monthly rollups against the same range aggregated on the
+# fly from a raw transactions table (GROUP BY date for one customer), both on
+# the local Snowflake stand-in and both indexed on customer_id only. The
+# rollups are built by an IncrementalRecompute run, as they are in production.
+# The gap grows with transactions per customer per day.
+#   python benchmarks/spend_rollup_benchmark.py --customers 2000 --transactions 4000000
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path[:0] = [os.path.join(BENCHMARK_DIR, '..'), os.path.join(BENCHMARK_DIR, '..', '..')]
+
+from pipeline_common.connection_pool import ConnectionPool
+from pipeline_common.local_snowflake import LocalSnowflakeConnection
+from pipeline_common.metrics import LatencyTracker
+from incremental_recompute import IncrementalRecompute
+from spend_rollups import SpendRollups
+
+TYPES = ['investment', 'savings', 'loan', 'credit_card', 'mortgage']
+
+def make_history(customers, transactions, days, seed):
+    rng = np.random.default_rng(seed)
+    crm = pd.DataFrame({
+        'customer_id': np.char.add('C', np.char.zfill(np.arange(customers).astype(str), 8)),
+        'name': np.char.add('Customer ', np.arange(customers).astype(str)),
+        'age': rng.integers(18, 90, customers),
+        'income': rng.lognormal(11, 0.6, customers).round(2)
+    })
+    dates = pd.Timestamp('2024-01-01') + pd.to_timedelta(rng.integers(0, days, transactions), unit='D')
+    trans = pd.DataFrame({
+        'customer_id': np.char.add('C', np.char.zfill(rng.integers(0, customers, transactions).astype(str), 8)),
+        'amount': rng.lognormal(5, 1.5, transactions).round(2),
+        'type': rng.choice(TYPES, transactions),
+        'date': dates.strftime('%Y-%m-%d')
+    })
+    return crm, trans
+
+def load_raw(conn, trans):
+    cursor = conn.cursor()
+    cursor.execute("CREATE TABLE IF NOT EXISTS transactions (customer_id STRING, amount FLOAT, type STRING, date DATE)")
+    cursor.executemany("INSERT INTO transactions (customer_id, amount, type, date) VALUES (%s, %s, %s, %s)",
+                       list(trans[['customer_id', 'amount', 'type', 'date']].itertuples(index=False, name=None)))
+    cursor.execute("CREATE INDEX IF NOT EXISTS transactions_customer ON transactions (customer_id)")
+    conn.commit()
+    cursor.close()
+
+def scan_series(conn, customer_id, grain, start, end):
+    period = 'date' if grain == 'day' else 'SUBSTR(date, 1, 7)'
+    cursor = conn.cursor()
+    try:
+        cursor.execute(f"SELECT {period}, SUM(amount), COUNT(*) FROM transactions "
+                       f"WHERE customer_id = %s AND date >= %s AND date <= %s GROUP BY {period} ORDER BY {period}",
+                       (customer_id, start, end))
+        return cursor.fetchall()
+    finally:
+        cursor.close()
+
+async def query_rollups(rollups, customers, grain, start, end):
+    for customer_id in customers:
+        await rollups.series(customer_id, grain, start, end)
+
+def report(label, tracker):
+    summary = tracker.summary()
+    print(f"  {label:8s} p50 {summary['p50_ms']:8.3f} ms  p99 {summary['p99_ms']:8.3f} ms")
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--customers', type=int, default=5000)
+    parser.add_argument('--transactions', type=int, default=1000000)
+    parser.add_argument('--days', type=int, default=365)
+    parser.add_argument('--queries', type=int, default=2000)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+    crm, trans = make_history(args.customers, args.transactions, args.days, args.seed)
+    end = trans['date'].max()
+    rng = np.random.default_rng(args.seed + 1)
+    customers = crm['customer_id'].to_numpy()[rng.integers(0, args.customers, args.queries)]
+
+    with tempfile.TemporaryDirectory(prefix='rollup-benchmark-') as directory:
+        pool = ConnectionPool(lambda: LocalSnowflakeConnection(os.path.join(directory, 'profiles.db')), max_size=1)
+        rollups = SpendRollups(pool)
+        start = time.perf_counter()
+        report_run = IncrementalRecompute(pool, rollups=rollups).run(crm, trans)
+        print(f"rollups built in {time.perf_counter() - start:.2f} s "
+              f"({report_run['rollup_days']} customer-days from {len(trans)} transactions)")
+        with pool.connection() as conn:
+            load_raw(conn, trans)
+
+        for grain, days in (('day', 30), ('day', 365), ('month', 365)):
+            first = (pd.Timestamp(end) - pd.Timedelta(days=days - 1)).strftime('%Y-%m-%d')
+            print(f"{grain} grain, last {days} days")
+            rollups.query_latency = LatencyTracker()
+            asyncio.run(query_rollups(rollups, customers, grain, first, end))
+            rollup_latency, scan_latency = LatencyTracker(), LatencyTracker()
+            for customer_id in customers:
+                begin = time.perf_counter()
+                pool.run(rollups.fetch_series, customer_id, grain, *rollups.date_range(grain, first, end))
+                rollup_latency.record(time.perf_counter() - begin)
+                begin = time.perf_counter()
+                pool.run(scan_series, customer_id, grain, first, end)
+                scan_latency.record(time.perf_counter() - begin)
+            report('rollup', rollup_latency)
+            report('raw scan', scan_latency)
+            report('endpoint', rollups.query_latency)
+        pool.close()
+
+if __name__ == "__main__":
+    main()
@@ -1,42 +1,124 @@
 import json
-import boto3
+import os
+import sys
+import time
 import pandas as pd
-from confluent_kafka import Consumer, Producer
-from fastapi import FastAPI
-from snowflake.connector import connect
-import streamlit as st
+from fastapi import FastAPI, Query, HTTPException
 from hashlib import sha256
 import logging
+from contextlib import asynccontextmanager
 from datetime import datetime
-import requests
 import threading
-import uvicorn
-import matplotlib.pyplot as plt
-import numpy as np
-
-# Configure logging for audit trail (GDPR/CCPA compliance)
-logging.basicConfig(filename='audit.log', level=logging.INFO)
-
-# AWS clients
-s3_client = boto3.client('s3')
-sns_client = boto3.client('sns')
-
-# Snowflake connection
-snowflake_conn = connect(
-    user='YOUR_USER',
-    password='YOUR_PASSWORD',
-    account='YOUR_ACCOUNT',
-    warehouse='YOUR_WAREHOUSE',
-    database='CUSTOMER_360',
-    schema='PUBLIC'
-)
+
+# Shared pipeline utilities live at the repository root
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from pipeline_common.kafka_producer import shared_kafka_producer
+from pipeline_common.connection_pool import ConnectionPool
+from pipeline_common.ttl_cache import TTLCache
+from pipeline_common.metrics import LatencyTracker
+from pipeline_common.kafka_consumer import KeyOrderedConsumer, key_worker
+from pipeline_common.clients import aws_client
+from pipeline_common.raw_zone import RawZoneWriter
+from snowflake_loader import SnowflakeBulkLoader, PROFILE_TABLE_DDL
+from profile_updater import ProfileUpdater
+from customer_integration import CustomerIntegrator, iter_frames
+from incremental_recompute import IncrementalRecompute
+from entity_resolution import EntityResolver
+from spend_rollups import SpendRollups
+from stream_ledger import StreamLedger
+
+# Audit trail (GDPR/CCPA compliance), configured by the entry points rather than on import
+AUDIT_LOG_FILE = 'audit.log'
+
+def configure_audit_log():
+    logging.basicConfig(filename=AUDIT_LOG_FILE, level=logging.INFO)
+
+# AWS clients, created on first use and shared across the process
+s3_client = aws_client('s3')
+sns_client = aws_client('sns')
+
+# Snowflake connections are opened on first use and shared through a bounded pool
+SNOWFLAKE_CONFIG = {
+    'user': 'YOUR_USER',
+    'password': 'YOUR_PASSWORD',
+    'account': 'YOUR_ACCOUNT',
+    'warehouse': 'YOUR_WAREHOUSE',
+    'database': 'CUSTOMER_360',
+    'schema': 'PUBLIC'
+}
+SNOWFLAKE_POOL_SIZE = int(os.environ.get('SNOWFLAKE_POOL_SIZE', '8'))
+
+def connect_snowflake():
+    from snowflake.connector import connect
+    return connect(**SNOWFLAKE_CONFIG)
+
+snowflake_pool = ConnectionPool(connect_snowflake, max_size=SNOWFLAKE_POOL_SIZE)
 
 # Kafka configuration
 KAFKA_BOOTSTRAP = 'localhost:9092'
 KAFKA_TOPIC = 'customer_events'
+# Shared producer batching; events are keyed by customer_id so each customer stays ordered
+KAFKA_PRODUCER_CONFIG = {'bootstrap.servers': KAFKA_BOOTSTRAP, 'linger.ms': 20, 'batch.num.messages': 10000}
+# Profile events are aggregated per customer and applied once per window
+PROFILE_UPDATE_MAX_EVENTS = 5000
+PROFILE_UPDATE_MAX_AGE_SECONDS = 1.0
+# A failed window is retried with backoff (1 s doubling to 30 s); after
+# PROFILE_UPDATE_MAX_ATTEMPTS its events go to the dead letter topic
+PROFILE_UPDATE_RETRY_SECONDS = 1.0
+PROFILE_UPDATE_MAX_RETRY_SECONDS = 30.0
+PROFILE_UPDATE_MAX_ATTEMPTS = 5
+KAFKA_DEAD_LETTER_TOPIC = 'customer_events_dead_letter'
+# Consumer worker threads; each customer's events always go to the same worker
+CONSUMER_WORKERS = int(os.environ.get('CONSUMER_WORKERS', '4'))
+
+# Hot profiles are served from memory; entries are patched when event windows are
+# merged and dropped when profiles are bulk loaded (other API processes rely on the TTL)
+PROFILE_CACHE_ENTRIES = 50000
+PROFILE_CACHE_TTL_SECONDS = 60.0
+
+profile_cache = TTLCache(max_entries=PROFILE_CACHE_ENTRIES, ttl_seconds=PROFILE_CACHE_TTL_SECONDS)
+profile_latency = {'hit': LatencyTracker(), 'miss': LatencyTracker()}
+
+def patch_cached_profiles(deltas):
+    for customer_id, (spend, count) in deltas.items():
+        profile_cache.patch(customer_id, lambda profile, spend=spend, count=count: dict(
+            profile,
+            total_spend=(profile['total_spend'] or 0) + spend,
+            trans_count=(profile['trans_count'] or 0) + count
+        ))
+
+# Daily and monthly spend per customer, kept current by the stream windows and
+# recompute runs in the same transactions as the profile totals
+spend_rollups = SpendRollups(snowflake_pool)
+# Stream spend not yet covered by a recompute; each run settles the days up to its
+# transaction watermark, so a transaction both streamed and in the batch source counts once
+stream_ledger = StreamLedger()
+
+# One updater per consumer worker, so workers merge their windows independently
+profile_updaters = [ProfileUpdater(snowflake_pool, on_flush=patch_cached_profiles, rollups=spend_rollups,
+                                   ledger=stream_ledger)
+                    for _ in range(CONSUMER_WORKERS)]
+event_consumer = None
+
+# Integration reads inputs in chunks and hash partitions them on customer_id
+INTEGRATION_CHUNK_ROWS = int(os.environ.get('INTEGRATION_CHUNK_ROWS', '250000'))
+INTEGRATION_PARTITIONS = int(os.environ.get('INTEGRATION_PARTITIONS', '16'))
+# Entity resolution folds records of one person from different CRMs into one
+# profile; a differing value in a conflict column always keeps records apart
+ENTITY_CONFLICT_COLUMNS = ('date_of_birth',)
+entity_resolver = EntityResolver(conflict_columns=ENTITY_CONFLICT_COLUMNS)
+# Incremental runs only recompute customers touched since the stored watermarks
+profile_recompute = IncrementalRecompute(snowflake_pool, chunk_rows=INTEGRATION_CHUNK_ROWS, rollups=spend_rollups,
+                                         ledger=stream_ledger)
+
+# The API server configures the audit log as it starts
+@asynccontextmanager
+async def lifespan(app):
+    configure_audit_log()
+    yield
 
 # FastAPI for exposing customer profiles
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 
 # Mock CRM and transaction data
 mock_crm_data = [
@@ -48,77 +130,129 @@ mock_transactions = [
     {"customer_id": "C002", "amount": 2000, "type": "savings", "date": "2025-07-02"}
 ]
 
-# Ingest data to S3
-def ingest_to_s3(data, bucket='customer-360-raw', key_prefix='raw/'):
-    key = f"{key_prefix}{datetime.now().strftime('%Y%m%d%H%M%S')}.json"
-    s3_client.put_object(Bucket=bucket, Key=key, Body=json.dumps(data))
-    logging.info(f"Ingested data to S3: {key}")
-    return key
-
-# Deduplicate and enrich customer data
-def integrate_customer_data(crm_data, transactions):
-    crm_df = pd.DataFrame(crm_data)
-    trans_df = pd.DataFrame(transactions)
-    # Deduplicate by customer_id
-    crm_df = crm_df.drop_duplicates(subset=['customer_id'])
-    # Enrich with transaction summary
-    trans_summary = trans_df.groupby('customer_id').agg({
-        'amount': ['sum', 'count'],
-        'type': lambda x: list(set(x))
-    }).reset_index()
-    trans_summary.columns = ['customer_id', 'total_spend', 'trans_count', 'trans_types']
-    # Merge data
-    customer_profile = crm_df.merge(trans_summary, on='customer_id', how='left')
-    # Calculate risk score (simple rule-based)
-    customer_profile['risk_score'] = customer_profile['income'].apply(
-        lambda x: 'high' if x > 100000 else 'medium' if x > 50000 else 'low'
-    )
-    return customer_profile
-
-# Store profiles in Snowflake
+# Ingest data to S3 as compressed raw files under <key_prefix>dt=YYYY-MM-DD/,
+# partitioned by partition_field (arrival date if None); returns the object key
+# of the first file written (see ingest_files_to_s3 for all of them)
+def ingest_to_s3(data, bucket='customer-360-raw', key_prefix='raw/', partition_field=None, file_format='ndjson'):
+    keys = ingest_files_to_s3(data, bucket, key_prefix, partition_field, file_format)
+    return keys[0] if keys else None
+
+# As ingest_to_s3, returning every object key, since a batch spanning several
+# partitions or rolled files is written as several objects
+def ingest_files_to_s3(data, bucket='customer-360-raw', key_prefix='raw/', partition_field=None, file_format='ndjson'):
+    writer = RawZoneWriter(s3_client, bucket, key_prefix, prefix=None, file_format=file_format,
+                           partition_field=partition_field)
+    records = writer.write_many(data)
+    keys = writer.close()
+    logging.info(f"Ingested {records} records to S3: {', '.join(keys)}")
+    return keys
+
+# customer_id -> entity customer_id for CRM records that resolve to another record
+def resolve_customer_entities(crm_source):
+    columns = ['customer_id', entity_resolver.name_column, *entity_resolver.attribute_columns, *ENTITY_CONFLICT_COLUMNS]
+    crm = pd.concat([chunk[[column for column in columns if column in chunk]]
+                     for chunk in iter_frames(crm_source, INTEGRATION_CHUNK_ROWS)], ignore_index=True)
+    entities = entity_resolver.resolve(crm.drop_duplicates(subset=['customer_id']))
+    merged = entities[entities['customer_id'] != entities['entity_id']]
+    return pd.Series(merged['entity_id'].to_numpy(), index=merged['customer_id'].to_numpy())
+
+def customer_integrator(crm_source, resolve_entities):
+    id_map = resolve_customer_entities(crm_source) if resolve_entities else None
+    return CustomerIntegrator(chunk_rows=INTEGRATION_CHUNK_ROWS, partitions=INTEGRATION_PARTITIONS, id_map=id_map)
+
+# Deduplicate and enrich customer data. Inputs may be record lists, DataFrames,
+# csv / parquet / JSON lines / JSON array paths or iterables of chunks; see CustomerIntegrator.
+# With resolve_entities the CRM source is read twice, so it must not be a one-shot iterator.
+def integrate_customer_data(crm_data, transactions, resolve_entities=False):
+    return customer_integrator(crm_data, resolve_entities).integrate(crm_data, transactions)
+
+# Integrate inputs larger than memory and bulk load them one partition at a time
+def integrate_and_store(crm_source, transaction_source, resolve_entities=False):
+    integrator = customer_integrator(crm_source, resolve_entities)
+    for profiles in integrator.integrate_partitions(crm_source, transaction_source):
+        store_in_snowflake(profiles)
+    return integrator.last_run
+
+def invalidate_cached_profiles(customer_ids):
+    if len(customer_ids) > PROFILE_CACHE_ENTRIES:
+        profile_cache.clear()
+    else:
+        for customer_id in customer_ids:
+            profile_cache.invalidate(customer_id)
+
+# Recompute only the customers touched by CRM changes or transactions since the
+# last run (the first run, with no watermarks yet, is a full rebuild)
+def recompute_profiles(crm_source, transaction_source, crm_version=None, full=False):
+    report = profile_recompute.run(crm_source, transaction_source, crm_version=crm_version, full=full)
+    invalidate_cached_profiles(report.pop('customer_ids'))
+    return report
+
+# Store profiles in Snowflake (bulk upsert on customer_id: parquet -> PUT -> COPY -> MERGE)
 def store_in_snowflake(df):
-    cursor = snowflake_conn.cursor()
-    cursor.execute("CREATE TABLE IF NOT EXISTS customer_profiles (customer_id STRING, name STRING, age INT, income FLOAT, total_spend FLOAT, trans_count INT, trans_types STRING, risk_score STRING)")
-    for _, row in df.iterrows():
-        cursor.execute(
-            "INSERT INTO customer_profiles VALUES (%s, %s, %s, %s, %s, %s, %s, %s)",
-            (row['customer_id'], row['name'], row['age'], row['income'], row['total_spend'], row['trans_count'], str(row['trans_types']), row['risk_score'])
-        )
-    snowflake_conn.commit()
-    logging.info("Stored customer profiles in Snowflake")
-
-# Kafka producer for real-time events
+    with snowflake_pool.connection() as conn:
+        conn.cursor().execute(PROFILE_TABLE_DDL)
+        stats = SnowflakeBulkLoader(conn).load(df)
+    invalidate_cached_profiles(df['customer_id'])
+    logging.info(f"Stored {stats['rows']} customer profiles in Snowflake ({stats['rows_per_second']} rows/s)")
+    return stats
+
+# Kafka producer for real-time events (one per process, flushed at exit)
 def produce_event(event):
-    producer = Producer({'bootstrap.servers': KAFKA_BOOTSTRAP})
-    producer.produce(KAFKA_TOPIC, json.dumps(event).encode('utf-8'))
-    producer.flush()
+    shared_kafka_producer(KAFKA_PRODUCER_CONFIG).produce(KAFKA_TOPIC, event, key=str(event['customer_id']))
     logging.info(f"Produced event: {event}")
 
-# Kafka consumer for real-time updates
+def produce_events(events):
+    shared_kafka_producer(KAFKA_PRODUCER_CONFIG).produce_many(KAFKA_TOPIC, events, key_field='customer_id')
+    logging.info(f"Produced {len(events)} events")
+
+# Kafka consumer for real-time updates. Events are fanned out to
+# CONSUMER_WORKERS threads by customer_id, so one customer's events are applied
+# in order while different customers are merged in parallel. Offsets are
+# committed manually, only once every earlier event in the partition has been
+# merged into Snowflake.
 def consume_events():
+    from confluent_kafka import Consumer
+    global event_consumer
     consumer = Consumer({
         'bootstrap.servers': KAFKA_BOOTSTRAP,
         'group.id': 'customer_360_group',
-        'auto.offset.reset': 'latest'
+        'auto.offset.reset': 'latest',
+        'enable.auto.commit': False
     })
-    consumer.subscribe([KAFKA_TOPIC])
-    while True:
-        msg = consumer.poll(1.0)
-        if msg is None:
-            continue
-        event = json.loads(msg.value().decode('utf-8'))
-        update_customer_profile(event)
-
-# Update customer profile in real time
+    event_consumer = KeyOrderedConsumer(consumer, [KAFKA_TOPIC], apply_profile_events, workers=CONSUMER_WORKERS,
+                                        max_batch=PROFILE_UPDATE_MAX_EVENTS,
+                                        batch_linger_seconds=PROFILE_UPDATE_MAX_AGE_SECONDS,
+                                        retry_seconds=PROFILE_UPDATE_RETRY_SECONDS,
+                                        max_retry_seconds=PROFILE_UPDATE_MAX_RETRY_SECONDS,
+                                        max_attempts=PROFILE_UPDATE_MAX_ATTEMPTS,
+                                        dead_letter=dead_letter_profile_events)
+    event_consumer.run()
+
+# One worker's batch becomes one window on that worker's updater. A failed
+# window is dropped by the updater, so the consumer's retry re-adds the batch
+# without counting it twice.
+def apply_profile_events(worker, messages):
+    updater = profile_updaters[worker]
+    for msg in messages:
+        try:
+            updater.add(json.loads(msg.value().decode('utf-8')), msg)
+        except (ValueError, KeyError, TypeError) as e:
+            logging.error(f"Skipping malformed event at {msg.topic()}:{msg.partition()}@{msg.offset()}: {e}")
+    updater.flush()
+
+# Events whose window kept failing are parked, unchanged, for replay once the cause is fixed
+def dead_letter_profile_events(worker, messages, error):
+    producer = shared_kafka_producer(KAFKA_PRODUCER_CONFIG)
+    for msg in messages:
+        producer.produce(KAFKA_DEAD_LETTER_TOPIC, msg.value(), key=msg.key())
+    if producer.flush():
+        raise RuntimeError(f"{KAFKA_DEAD_LETTER_TOPIC} did not acknowledge every event")
+    logging.error(f"Sent {len(messages)} profile events to {KAFKA_DEAD_LETTER_TOPIC}: {error}")
+
+# Update customer profile in real time (one event applied as its own window)
 def update_customer_profile(event):
-    cursor = snowflake_conn.cursor()
-    customer_id = event['customer_id']
-    amount = event['amount']
-    cursor.execute(
-        f"UPDATE customer_profiles SET total_spend = total_spend + {amount}, trans_count = trans_count + 1 WHERE customer_id = '{customer_id}'"
-    )
-    snowflake_conn.commit()
-    logging.info(f"Updated profile for customer {customer_id}")
+    profile_updaters[key_worker(str(event['customer_id']).encode('utf-8'), CONSUMER_WORKERS)].apply_events([event])
+    logging.info(f"Updated profile for customer {event['customer_id']}")
 
 # Recommendation engine
 def recommend_service(customer):
@@ -129,23 +263,104 @@ def recommend_service(customer):
     else:
         return "Try our high-yield savings account (2% interest)."
 
-# FastAPI endpoint to get customer profile
+def fetch_profile_row(conn, customer_id):
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT * FROM customer_profiles WHERE customer_id = %s", (customer_id,))
+        return cursor.fetchone()
+    finally:
+        cursor.close()
+
+async def load_profile(customer_id):
+    result = await snowflake_pool.run_async(fetch_profile_row, customer_id)
+    if not result:
+        return None
+    profile = {
+        'customer_id': result[0], 'name': result[1], 'age': result[2], 'income': result[3],
+        'total_spend': result[4], 'trans_count': result[5], 'trans_types': result[6], 'risk_score': result[7]
+    }
+    profile['recommendation'] = recommend_service(profile)
+    return profile
+
+# FastAPI endpoint to get customer profile. Read-through cache: concurrent misses
+# for one customer share a single query, which runs on a pool thread off the event loop.
 @app.get("/api/customer/{customer_id}")
 async def get_customer_profile(customer_id: str):
-    cursor = snowflake_conn.cursor()
-    cursor.execute(f"SELECT * FROM customer_profiles WHERE customer_id = '{customer_id}'")
-    result = cursor.fetchone()
-    if result:
-        profile = {
-            'customer_id': result[0], 'name': result[1], 'age': result[2], 'income': result[3],
-            'total_spend': result[4], 'trans_count': result[5], 'trans_types': result[6], 'risk_score': result[7]
-        }
-        profile['recommendation'] = recommend_service(profile)
+    start = time.perf_counter()
+    profile, hit = await profile_cache.lookup(customer_id, lambda: load_profile(customer_id))
+    profile_latency['hit' if hit else 'miss'].record(time.perf_counter() - start)
+    if profile:
         return profile
     return {"error": "Customer not found"}
 
+# FastAPI endpoint for a customer's spend over time, read from the rollups (no
+# scan of raw transactions). Columnar: parallel dates / spend / trans_count
+# arrays for the periods with activity. start and end are YYYY-MM-DD.
+@app.get("/api/customer/{customer_id}/spend")
+async def get_customer_spend(customer_id: str, grain: str = Query('day', pattern='^(day|month)$'),
+                             start: str = None, end: str = None):
+    try:
+        return await spend_rollups.series(customer_id, grain, start, end)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.get("/api/customers/cache/metrics")
+async def get_profile_cache_metrics():
+    return dict(profile_cache.metrics(), latency={kind: tracker.summary() for kind, tracker in profile_latency.items()})
+
+@app.get("/api/customers/updates/metrics")
+async def get_profile_update_metrics():
+    workers = [updater.metrics() for updater in profile_updaters]
+    totals = {field: sum(worker[field] for worker in workers)
+              for field in ('events', 'flushes', 'failed_flushes', 'pending_events', 'pending_customers')}
+    return dict(totals, per_worker=workers)
+
+@app.get("/api/customers/consumer/metrics")
+async def get_event_consumer_metrics():
+    return event_consumer.metrics() if event_consumer else {'running': False}
+
+@app.get("/api/customers/entities/metrics")
+async def get_entity_resolution_metrics():
+    return entity_resolver.metrics()
+
+@app.get("/api/customers/rollups/metrics")
+async def get_spend_rollup_metrics():
+    return spend_rollups.metrics()
+
+@app.get("/api/customers/recompute/metrics")
+async def get_recompute_metrics():
+    return profile_recompute.metrics()
+
+@app.get("/api/customers/snowflake-pool/metrics")
+async def get_snowflake_pool_metrics():
+    return snowflake_pool.metrics()
+
+@app.get("/api/customers/events/metrics")
+async def get_event_producer_metrics():
+    return shared_kafka_producer(KAFKA_PRODUCER_CONFIG).metrics()
+
+# Risk profile pie chart; there are only three risk scores, so the demo caches one figure per score
+def risk_pie(risk_score):
+    import matplotlib.pyplot as plt
+    risk_labels = ['High Risk', 'Medium Risk', 'Low Risk']
+    risk_sizes = [0, 0, 0]
+    if risk_score == 'high':
+        risk_sizes[0] = 1
+    elif risk_score == 'medium':
+        risk_sizes[1] = 1
+    else:
+        risk_sizes[2] = 1
+    fig, ax = plt.subplots()
+    ax.pie(risk_sizes, labels=risk_labels, autopct='%1.1f%%', startangle=90)
+    ax.axis('equal')
+    return fig
+
 # Streamlit UI for demo with AI analytics enhancements
 def run_streamlit():
+    import requests
+    import streamlit as st
+    configure_audit_log()
+    cached_risk_pie = st.cache_resource(risk_pie)
     st.title("Customer 360 Data Platform with AI Analytics")
     customer_id = st.text_input("Enter Customer ID (e.g., C001)")
     if customer_id:
@@ -160,33 +375,31 @@ def run_streamlit():
             st.write(f"**Risk Score**: {profile['risk_score']}")
             st.write(f"**Recommendation**: {profile['recommendation']}")
 
-            # AI Analytics: Spending trend chart (mock data)
-            days = np.arange(1, 31)
-            spending = np.random.normal(loc=profile['total_spend']/30, scale=50, size=30)
-            st.line_chart(pd.DataFrame({'Daily Spend': spending}, index=days))
+            # AI Analytics: daily spend for the 30 days up to the chosen date, from the rollups
+            end = st.date_input("Spend through", value=datetime.now().date())
+            response = requests.get(f"http://localhost:8000/api/customer/{customer_id}/spend",
+                                    params={'grain': 'day', 'end': end.isoformat()})
+            if response.status_code == 200:
+                series = response.json()
+                days = pd.date_range(series['start'], series['end'], freq='D')
+                spending = pd.Series(series['spend'], index=pd.to_datetime(series['dates']), dtype='float64')
+                st.bar_chart(pd.DataFrame({'Daily Spend': spending.reindex(days, fill_value=0.0)}))
+            else:
+                st.error("Error fetching spend history")
 
             # AI Analytics: Risk profile pie chart
-            risk_labels = ['High Risk', 'Medium Risk', 'Low Risk']
-            risk_sizes = [0, 0, 0]
-            if profile['risk_score'] == 'high':
-                risk_sizes[0] = 1
-            elif profile['risk_score'] == 'medium':
-                risk_sizes[1] = 1
-            else:
-                risk_sizes[2] = 1
-            fig, ax = plt.subplots()
-            ax.pie(risk_sizes, labels=risk_labels, autopct='%1.1f%%', startangle=90)
-            ax.axis('equal')
-            st.pyplot(fig)
+            st.pyplot(cached_risk_pie(profile['risk_score']))
 
         else:
             st.error("Customer not found")
 
 # Main execution
 if __name__ == "__main__":
+    import uvicorn
+    configure_audit_log()
     # Ingest mock data
     ingest_to_s3(mock_crm_data, key_prefix='crm/')
-    ingest_to_s3(mock_transactions, key_prefix='transactions/')
+    ingest_to_s3(mock_transactions, key_prefix='transactions/', partition_field='date')
     # Integrate data
     customer_profiles = integrate_customer_data(mock_crm_data, mock_transactions)
     # Store in Snowflake
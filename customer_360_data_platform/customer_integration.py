@@ -0,0 +1,229 @@
+import os
+import time
+import shutil
+import logging
+import tempfile
+import numpy as np
+import pandas as pd
+
+PARTIAL_COLUMNS = ['customer_id', 'total_spend', 'trans_count', 'type_mask']
+# Type sets are held as one bit per transaction type in a uint64
+MAX_TRANSACTION_TYPES = 64
+RISK_BINS = [-np.inf, 50000, 100000, np.inf]
+RISK_LABELS = ['low', 'medium', 'high']
+
+# Same thresholds as the original rule: > 100000 high, > 50000 medium, anything else (including missing) low
+def risk_scores(income):
+    income = pd.to_numeric(income, errors='coerce')
+    return pd.cut(income, bins=RISK_BINS, labels=RISK_LABELS).fillna('low').astype(str)
+
+# Yield DataFrames of at most chunk_rows from a list of records, a DataFrame,
+# a csv / parquet / json lines (.jsonl, .ndjson) / JSON array (.json) path, or
+# an iterable of DataFrames or record lists
+def iter_frames(source, chunk_rows):
+    if isinstance(source, pd.DataFrame):
+        for start in range(0, len(source), chunk_rows):
+            yield source.iloc[start:start + chunk_rows]
+    elif isinstance(source, (str, os.PathLike)):
+        path = os.fspath(source)
+        name = path[:-3] if path.endswith('.gz') else path
+        if name.endswith('.parquet'):
+            import pyarrow.parquet as pq
+            for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_rows):
+                yield batch.to_pandas()
+        elif name.endswith(('.jsonl', '.ndjson')):
+            with pd.read_json(path, lines=True, chunksize=chunk_rows) as reader:
+                yield from reader
+        elif name.endswith('.json'):
+            # One JSON array of records, as ingest_to_s3 used to write; it can only be parsed whole
+            yield from iter_frames(pd.read_json(path, orient='records'), chunk_rows)
+        else:
+            with pd.read_csv(path, chunksize=chunk_rows) as reader:
+                yield from reader
+    elif isinstance(source, (list, tuple)):
+        for start in range(0, len(source), chunk_rows):
+            yield pd.DataFrame(source[start:start + chunk_rows])
+    else:
+        for item in source:
+            yield from iter_frames(item, chunk_rows)
+
+# Sum spend and counts and OR type masks per customer_id in one vectorized pass
+def combine_partials(customer_ids, spend, counts, masks):
+    inverse, keys = pd.factorize(customer_ids, sort=False)
+    if not len(keys):
+        return pd.DataFrame({column: [] for column in PARTIAL_COLUMNS})
+    order = np.argsort(inverse, kind='stable')
+    grouped = inverse[order]
+    starts = np.flatnonzero(np.r_[True, grouped[1:] != grouped[:-1]])
+    return pd.DataFrame({
+        'customer_id': keys,
+        'total_spend': np.bincount(inverse, weights=spend, minlength=len(keys)),
+        'trans_count': np.bincount(inverse, weights=counts, minlength=len(keys)).astype('int64'),
+        'type_mask': np.bitwise_or.reduceat(masks[order], starts)
+    })
+
+# Out-of-core customer integration. CRM records and transactions are read in
+# chunks; each transaction chunk is reduced to partial (spend, count, type
+# bitmask) aggregates per customer, and both inputs are hash partitioned on
+# customer_id. Partials stay in memory until spill_rows are buffered, then are
+# spilled to parquet files per partition. Each partition is then finalized on
+# its own: partials are merged, CRM rows deduplicated (first occurrence wins),
+# and the two joined, so peak memory is bounded by the largest partition rather
+# than by the inputs. Output columns are those of the original in-memory
+# integration: the CRM columns, total_spend, trans_count, trans_types and
+# risk_score. id_map (customer_id -> canonical customer_id, e.g. from entity
+# resolution) folds records of the same person into one profile.
+class CustomerIntegrator:
+    def __init__(self, chunk_rows=250_000, partitions=16, spill_rows=2_000_000, work_dir=None, id_map=None):
+        self.chunk_rows = chunk_rows
+        self.id_map = id_map
+        self.partitions = partitions
+        self.spill_rows = spill_rows
+        self.work_dir = work_dir
+        self.type_bits = {}
+        self.last_run = None
+
+    def type_masks(self, types):
+        for value in pd.unique(types.dropna()):
+            if value not in self.type_bits:
+                if len(self.type_bits) >= MAX_TRANSACTION_TYPES:
+                    raise ValueError(f"More than {MAX_TRANSACTION_TYPES} distinct transaction types")
+                self.type_bits[value] = len(self.type_bits)
+        bits = types.map(self.type_bits)
+        masks = np.zeros(len(types), dtype='uint64')
+        present = bits.notna().to_numpy()
+        masks[present] = np.left_shift(np.uint64(1), bits[present].to_numpy(dtype='uint64'))
+        return masks
+
+    # Decode each distinct mask once instead of once per customer
+    def decode_types(self, masks):
+        names = sorted(self.type_bits, key=self.type_bits.get)
+        decoded = {int(mask): sorted(name for bit, name in enumerate(names) if int(mask) >> bit & 1)
+                   for mask in pd.unique(masks)}
+        return masks.map(lambda mask: decoded[int(mask)])
+
+    def canonical_ids(self, customer_ids):
+        if self.id_map is None or not len(self.id_map):
+            return customer_ids
+        return customer_ids.map(self.id_map).fillna(customer_ids)
+
+    def partition_of(self, customer_ids):
+        hashes = pd.util.hash_pandas_object(customer_ids, index=False).to_numpy()
+        return hashes % np.uint64(self.partitions)
+
+    def reduce_transactions(self, chunk):
+        amounts = pd.to_numeric(chunk['amount'], errors='coerce')
+        return combine_partials(
+            self.canonical_ids(chunk['customer_id']).to_numpy(),
+            amounts.fillna(0).to_numpy(dtype='float64'),
+            amounts.notna().to_numpy(dtype='float64'),
+            self.type_masks(chunk['type'])
+        )
+
+    # Yield one profile DataFrame per non-empty partition; keep_order adds the
+    # _seq column (CRM input position) so callers can restore input order
+    def integrate_partitions(self, crm_source, transaction_source, keep_order=False):
+        start = time.perf_counter()
+        stats = {'crm_rows': 0, 'transaction_rows': 0, 'chunks': 0, 'partial_rows': 0,
+                 'spilled_files': 0, 'spilled_bytes': 0, 'profiles': 0}
+        buffers = {'crm': [[] for _ in range(self.partitions)], 'trans': [[] for _ in range(self.partitions)]}
+        spills = {'crm': [[] for _ in range(self.partitions)], 'trans': [[] for _ in range(self.partitions)]}
+        directory = None
+        buffered = 0
+
+        def buffer(kind, frame):
+            nonlocal buffered
+            if frame.empty:
+                return
+            for partition, part in frame.groupby(self.partition_of(frame['customer_id']), sort=False):
+                buffers[kind][int(partition)].append(part)
+            buffered += len(frame)
+            if buffered >= self.spill_rows:
+                spill()
+
+        def spill():
+            nonlocal directory, buffered
+            if directory is None:
+                directory = tempfile.mkdtemp(prefix='customer-integration-', dir=self.work_dir)
+            for kind, partitions in buffers.items():
+                for partition, parts in enumerate(partitions):
+                    if not parts:
+                        continue
+                    path = os.path.join(directory, f"{kind}-{partition:04d}-{len(spills[kind][partition]):05d}.parquet")
+                    pd.concat(parts, ignore_index=True).to_parquet(path, engine='pyarrow', index=False)
+                    spills[kind][partition].append(path)
+                    stats['spilled_files'] += 1
+                    stats['spilled_bytes'] += os.path.getsize(path)
+                    parts.clear()
+            buffered = 0
+
+        def collect(kind, partition):
+            parts = [pd.read_parquet(path, engine='pyarrow') for path in spills[kind][partition]]
+            parts.extend(buffers[kind][partition])
+            buffers[kind][partition] = []
+            return pd.concat(parts, ignore_index=True) if parts else None
+
+        try:
+            crm_columns = None
+            sequence = 0
+            for chunk in iter_frames(crm_source, self.chunk_rows):
+                stats['chunks'] += 1
+                stats['crm_rows'] += len(chunk)
+                crm_columns = crm_columns or [column for column in chunk.columns if column != '_seq']
+                # _seq keeps input order so deduplication and output order match a single in-memory pass
+                chunk = chunk.assign(customer_id=self.canonical_ids(chunk['customer_id']),
+                                     _seq=np.arange(sequence, sequence + len(chunk)))
+                sequence += len(chunk)
+                buffer('crm', chunk)
+            for chunk in iter_frames(transaction_source, self.chunk_rows):
+                stats['chunks'] += 1
+                stats['transaction_rows'] += len(chunk)
+                partials = self.reduce_transactions(chunk)
+                stats['partial_rows'] += len(partials)
+                buffer('trans', partials)
+            reduce_seconds = time.perf_counter() - start
+
+            for partition in range(self.partitions):
+                crm = collect('crm', partition)
+                partials = collect('trans', partition)
+                if crm is None:
+                    continue
+                crm = crm.sort_values('_seq', kind='stable').drop_duplicates(subset=['customer_id'])
+                if partials is None:
+                    summary = pd.DataFrame({'customer_id': pd.Series(dtype=crm['customer_id'].dtype),
+                                            'total_spend': pd.Series(dtype='float64'),
+                                            'trans_count': pd.Series(dtype='int64'),
+                                            'trans_types': pd.Series(dtype='object')})
+                else:
+                    summary = combine_partials(
+                        partials['customer_id'].to_numpy(),
+                        partials['total_spend'].to_numpy(dtype='float64'),
+                        partials['trans_count'].to_numpy(dtype='float64'),
+                        partials['type_mask'].to_numpy(dtype='uint64')
+                    )
+                    summary['trans_types'] = self.decode_types(summary.pop('type_mask'))
+                profile = crm.merge(summary, on='customer_id', how='left')
+                profile['risk_score'] = risk_scores(profile['income'] if 'income' in profile else pd.Series(np.nan, index=profile.index))
+                stats['profiles'] += len(profile)
+                yield profile[crm_columns + ['total_spend', 'trans_count', 'trans_types', 'risk_score'] + (['_seq'] if keep_order else [])]
+            stats['reduce_seconds'] = round(reduce_seconds, 3)
+            stats['seconds'] = round(time.perf_counter() - start, 3)
+            stats['rows_per_second'] = round(stats['transaction_rows'] / stats['seconds'], 1) if stats['seconds'] else None
+            self.last_run = stats
+            logging.info(f"Integrated {stats['profiles']} customer profiles from {stats['transaction_rows']} transactions "
+                         f"in {stats['seconds']}s ({stats['spilled_files']} spill files)")
+        finally:
+            if directory:
+                shutil.rmtree(directory, ignore_errors=True)
+
+    # Whole result as one DataFrame in CRM input order; use integrate_partitions
+    # directly to stream partitions when the profiles themselves do not fit in memory
+    def integrate(self, crm_source, transaction_source):
+        parts = list(self.integrate_partitions(crm_source, transaction_source, keep_order=True))
+        if not parts:
+            return pd.DataFrame(columns=['customer_id', 'total_spend', 'trans_count', 'trans_types', 'risk_score'])
+        profile = pd.concat(parts, ignore_index=True).sort_values('_seq', kind='stable')
+        return profile.drop(columns='_seq').reset_index(drop=True)
+
+    def metrics(self):
+        return {'transaction_types': len(self.type_bits), 'last_run': self.last_run}
@@ -0,0 +1,405 @@
+import os
+import re
+import json
+import time
+import logging
+from collections import Counter, deque
+from datetime import datetime, timezone
+import pandas as pd
+from customer_integration import CustomerIntegrator, combine_partials, iter_frames, risk_scores
+from snowflake_loader import SnowflakeBulkLoader, PROFILE_COLUMNS, PROFILE_TABLE_DDL
+from spend_rollups import daily_deltas, merge_deltas
+from profile_updater import DELTA_TABLE_DDL, MERGE_DELTAS_SQL
+
+WATERMARK_TABLE_DDL = (
+    "CREATE TABLE IF NOT EXISTS integration_watermarks (source STRING, watermark STRING, updated_at STRING)"
+)
+# Fingerprints of the transactions applied at the transaction watermark
+WATERMARK_ROWS_TABLE_DDL = (
+    "CREATE TABLE IF NOT EXISTS integration_watermark_rows (source STRING, fingerprint STRING, row_count INT)"
+)
+KEY_TABLE_DDL = "CREATE TEMPORARY TABLE IF NOT EXISTS customer_profile_keys (customer_id STRING)"
+CRM_ATTRIBUTES = ['name', 'age', 'income']
+# Staged total_spend / trans_count are this run's deltas; they are added to the
+# stored totals so stream updates merged in the meantime are not overwritten
+# (the stream's share of the days the run covers is settled separately, see
+# StreamLedger)
+INCREMENTAL_MERGE_SQL = (
+    "MERGE INTO customer_profiles t USING customer_profiles_staging s ON t.customer_id = s.customer_id "
+    "WHEN MATCHED THEN UPDATE SET name = s.name, age = s.age, income = s.income, "
+    "total_spend = COALESCE(t.total_spend + s.total_spend, s.total_spend, t.total_spend), "
+    "trans_count = COALESCE(t.trans_count + s.trans_count, s.trans_count, t.trans_count), "
+    "trans_types = s.trans_types, risk_score = s.risk_score "
+    "WHEN NOT MATCHED THEN INSERT (customer_id, name, age, income, total_spend, trans_count, trans_types, risk_score) "
+    "VALUES (s.customer_id, s.name, s.age, s.income, s.total_spend, s.trans_count, s.trans_types, s.risk_score)"
+)
+
+def version_text(version):
+    version = float(version)
+    return str(int(version)) if version.is_integer() else str(version)
+
+# Content hash per row, independent of column order and dtype
+def row_fingerprints(frame):
+    columns = sorted(frame.columns)
+    return pd.util.hash_pandas_object(frame[columns].astype(str), index=False).astype(str).tolist()
+
+def differs(left, right):
+    return ~((left == right) | (left.isna() & right.isna())).fillna(False)
+
+PARTITION_PATTERN = re.compile(r'(?:^|/)dt=(\d{4}-\d{2}-\d{2})(?:/|$)')
+
+def partition_day(path):
+    match = PARTITION_PATTERN.search(os.fspath(path).replace(os.sep, '/'))
+    return match.group(1) if match else None
+
+def is_path(item):
+    return isinstance(item, (str, os.PathLike))
+
+# Files of a raw zone source that can hold rows from since_day (YYYY-MM-DD) on.
+# A directory is walked in sorted order, and dt=YYYY-MM-DD partitions (or files
+# under them) earlier than since_day are skipped without being opened; a list
+# of paths is filtered the same way. Any other source is returned unchanged.
+def pruned_source(source, since_day, stats, counter):
+    if is_path(source) and os.path.isdir(source):
+        return walk_partitions(os.fspath(source), since_day, stats, counter)
+    if isinstance(source, (list, tuple)) and source and all(is_path(item) for item in source):
+        return keep_partitions(source, since_day, stats, counter)
+    return source
+
+def walk_partitions(directory, since_day, stats, counter):
+    for root, dirs, files in os.walk(directory):
+        if since_day is not None:
+            skipped = [name for name in dirs if (partition_day(name) or since_day) < since_day]
+            stats[counter] += len(skipped)
+            dirs[:] = [name for name in dirs if name not in skipped]
+        dirs.sort()
+        yield from keep_partitions([os.path.join(root, name) for name in sorted(files)], since_day, stats, counter)
+
+def keep_partitions(paths, since_day, stats, counter):
+    for path in paths:
+        day = partition_day(path)
+        if since_day is not None and day is not None and day < since_day:
+            stats[counter] += 1
+            continue
+        yield path
+
+# Incremental Customer 360 recompute. A high-water mark is kept per source in
+# integration_watermarks: the CRM snapshot version and the last transaction
+# timestamp. Each run reads only CRM rows with a newer version (or, when the
+# feed carries no version, diffs every CRM row against the stored profile) and
+# transactions from the watermark on, recomputes just the customers they touch
+# and merges them into customer_profiles. The timestamp may be as coarse as a
+# date, so transactions can still arrive for the watermark itself; the
+# fingerprints of those already applied are kept in integration_watermark_rows
+# and skipped on the next run. The watermarks advance in the same transaction
+# as the MERGE, so a failed run is simply retried. Runs with no stored
+# watermarks are full rebuilds that replace totals instead of adding. With
+# rollups (a spend_rollups.SpendRollups), the applied transactions' per-day
+# spend is merged into the rollups in that same transaction too.
+# Sources that are raw zone directories (or lists of raw files) are pruned by
+# their dt=YYYY-MM-DD partitions: transaction partitions before the watermark
+# day, and CRM partitions before the day of the last run, are not read.
+# The batch transaction source is authoritative for every day up to its
+# watermark. With ledger (a stream_ledger.StreamLedger shared with the stream's
+# ProfileUpdaters), the stream's spend for those days is taken back out of the
+# totals and rollups in the same transaction, so a transaction that was both
+# streamed and found in the batch source is counted once.
+class IncrementalRecompute:
+    def __init__(self, pool, chunk_rows=250_000, crm_version_column='snapshot_version', timestamp_column='date',
+                 history=30, rollups=None, ledger=None):
+        # pool is a pipeline_common.connection_pool.ConnectionPool
+        self.pool = pool
+        self.chunk_rows = chunk_rows
+        self.crm_version_column = crm_version_column
+        self.timestamp_column = timestamp_column
+        self.rollups = rollups
+        self.ledger = ledger
+        self.runs = deque(maxlen=history)
+
+    # {source: (watermark, updated_at)}
+    def read_watermarks(self, conn):
+        cursor = conn.cursor()
+        try:
+            cursor.execute(WATERMARK_TABLE_DDL)
+            cursor.execute(WATERMARK_ROWS_TABLE_DDL)
+            cursor.execute("SELECT source, watermark, updated_at FROM integration_watermarks")
+            return {source: (watermark, updated_at) for source, watermark, updated_at in cursor.fetchall()}
+        finally:
+            cursor.close()
+
+    # Counter of the fingerprints applied at the transaction watermark; None when
+    # none were recorded (watermarks from before they were kept: all rows applied)
+    def read_watermark_rows(self, conn):
+        cursor = conn.cursor()
+        try:
+            cursor.execute("SELECT fingerprint, row_count FROM integration_watermark_rows WHERE source = 'transactions'")
+            rows = cursor.fetchall()
+        finally:
+            cursor.close()
+        return Counter(dict(rows)) if rows else None
+
+    def watermarks(self):
+        return {source: watermark for source, (watermark, _) in self.pool.run(self.read_watermarks).items()}
+
+    # CRM rows newer than the watermark, latest version per customer
+    def read_crm(self, source, watermark, crm_version, stats):
+        # A whole snapshot no newer than the watermark has nothing to apply
+        if crm_version is not None and watermark is not None and float(crm_version) <= float(watermark):
+            return None, watermark
+        parts = []
+        newest = None
+        for chunk in iter_frames(source, self.chunk_rows):
+            stats['crm_rows_scanned'] += len(chunk)
+            if self.crm_version_column in chunk:
+                versions = pd.to_numeric(chunk[self.crm_version_column], errors='coerce')
+                if watermark is not None:
+                    newer = (versions > float(watermark)).to_numpy()
+                    chunk, versions = chunk[newer], versions[newer]
+                if versions.notna().any() and (newest is None or versions.max() > newest):
+                    newest = versions.max()
+            parts.append(chunk.reindex(columns=['customer_id'] + CRM_ATTRIBUTES + [self.crm_version_column]))
+        version = crm_version if crm_version is not None else newest
+        version = watermark if version is None else version_text(version)
+        crm = pd.concat(parts, ignore_index=True) if parts else None
+        if crm is None or crm.empty:
+            return None, version
+        if crm[self.crm_version_column].notna().any():
+            crm = crm.sort_values(self.crm_version_column, kind='stable').drop_duplicates('customer_id', keep='last')
+        else:
+            crm = crm.drop_duplicates('customer_id')
+        return crm.drop(columns=self.crm_version_column).set_index('customer_id'), version
+
+    # Per-customer (spend, count, type mask) deltas for transactions after the
+    # watermark, plus their {(customer_id, day): [spend, count]} when rolling up.
+    # Rows at the watermark are applied unless their fingerprint is in applied
+    # (each fingerprint once per recorded row). Also returns the fingerprints
+    # applied at the new watermark.
+    def read_transactions(self, source, watermark, integrator, stats, applied=None):
+        since = pd.Timestamp(watermark) if watermark is not None else None
+        pending = Counter(applied) if applied is not None else None
+        # Rows at the old watermark that count as applied if it does not move
+        carried = Counter(applied) if applied is not None else Counter()
+        partials = []
+        day_deltas = {}
+        newest = since
+        at_newest = Counter()
+        for chunk in iter_frames(source, self.chunk_rows):
+            stats['transactions_scanned'] += len(chunk)
+            timestamps = pd.to_datetime(chunk[self.timestamp_column], errors='coerce')
+            if since is not None:
+                keep = (timestamps > since).to_numpy(copy=True)
+                boundary = (timestamps == since).to_numpy()
+                if boundary.any():
+                    for position, fingerprint in zip(boundary.nonzero()[0], row_fingerprints(chunk[boundary])):
+                        if pending is None:
+                            carried[fingerprint] += 1
+                        elif pending[fingerprint] > 0:
+                            pending[fingerprint] -= 1
+                        else:
+                            keep[position] = True
+                chunk, timestamps = chunk[keep], timestamps[keep]
+            if chunk.empty:
+                continue
+            stats['transactions_applied'] += len(chunk)
+            if timestamps.notna().any():
+                if newest is None or timestamps.max() > newest:
+                    newest, at_newest = timestamps.max(), Counter()
+                at_newest.update(row_fingerprints(chunk[(timestamps == newest).to_numpy()]))
+            partials.append(integrator.reduce_transactions(chunk))
+            if self.rollups is not None:
+                merge_deltas(day_deltas, daily_deltas(chunk, self.timestamp_column))
+        if since is not None and newest == since:
+            at_newest.update(carried)
+        if not partials:
+            return None, day_deltas, watermark, at_newest
+        partials = pd.concat(partials, ignore_index=True)
+        summary = combine_partials(
+            partials['customer_id'].to_numpy(),
+            partials['total_spend'].to_numpy(dtype='float64'),
+            partials['trans_count'].to_numpy(dtype='float64'),
+            partials['type_mask'].to_numpy(dtype='uint64')
+        )
+        summary['trans_types'] = integrator.decode_types(summary.pop('type_mask'))
+        return (summary.set_index('customer_id'), day_deltas, newest.isoformat() if newest is not None else watermark,
+                at_newest)
+
+    def fetch_profiles(self, conn, customer_ids):
+        cursor = conn.cursor()
+        try:
+            cursor.execute(PROFILE_TABLE_DDL)
+            cursor.execute(KEY_TABLE_DDL)
+            cursor.execute("TRUNCATE TABLE customer_profile_keys")
+            cursor.executemany("INSERT INTO customer_profile_keys (customer_id) VALUES (%s)",
+                               [(customer_id,) for customer_id in customer_ids])
+            cursor.execute(f"SELECT {', '.join('p.' + column for column in PROFILE_COLUMNS)} FROM customer_profiles p "
+                           "JOIN customer_profile_keys k ON p.customer_id = k.customer_id")
+            rows = cursor.fetchall()
+        finally:
+            cursor.close()
+        return pd.DataFrame(rows, columns=PROFILE_COLUMNS).set_index('customer_id')
+
+    # Profiles to stage for the touched customers; totals are deltas unless full
+    def build_profiles(self, crm, deltas, existing, full, stats):
+        touched = pd.Index([], dtype=object)
+        if crm is not None:
+            current = existing.reindex(crm.index)
+            changed = ~crm.index.isin(existing.index)
+            for column in CRM_ATTRIBUTES:
+                changed |= differs(crm[column], current[column]).to_numpy()
+            crm = crm[changed]
+            stats['customers_touched_by_crm'] = len(crm)
+            touched = touched.union(crm.index)
+        if deltas is not None:
+            stats['customers_touched_by_transactions'] = len(deltas)
+            touched = touched.union(deltas.index)
+        profiles = existing.reindex(touched)
+        stats['new_customers'] = int((~touched.isin(existing.index)).sum())
+        if crm is not None:
+            profiles.loc[crm.index, CRM_ATTRIBUTES] = crm[CRM_ATTRIBUTES]
+        delta = (deltas if deltas is not None else pd.DataFrame(columns=['total_spend', 'trans_count', 'trans_types'])).reindex(touched)
+        profiles['total_spend'] = delta['total_spend'].astype('float64')
+        profiles['trans_count'] = delta['trans_count'].astype('float64')
+        if full:
+            profiles['trans_types'] = delta['trans_types']
+        else:
+            profiles['trans_types'] = [
+                sorted(set(json.loads(stored) if isinstance(stored, str) else []) | set(new)) if isinstance(new, list) else stored
+                for stored, new in zip(profiles['trans_types'], delta['trans_types'])
+            ]
+        profiles['risk_score'] = risk_scores(profiles['income'])
+        return profiles.reset_index(names='customer_id')[PROFILE_COLUMNS]
+
+    # Corrections for the stream's spend on the days a run settles, as profile
+    # {customer_id: [spend, count]} and rollup {(customer_id, day): [spend, count]}
+    # deltas. An incremental run takes the settled days back out. A full run has
+    # replaced the totals of the customers it rebuilt and every rollup, so it
+    # takes the settled days out only for the customers it did not rebuild, and
+    # puts back the days it did not settle.
+    def stream_corrections(self, settled, kept, full, rebuilt):
+        profile_deltas, day_deltas = {}, {}
+        for customer_id, day, spend, count, in_profile in settled:
+            if in_profile and not (full and customer_id in rebuilt):
+                merge_deltas(profile_deltas, {customer_id: [-spend, -count]})
+            if not full:
+                merge_deltas(day_deltas, {(customer_id, day): [-spend, -count]})
+        if full:
+            for customer_id, day, spend, count, in_profile in kept:
+                if in_profile and customer_id in rebuilt:
+                    merge_deltas(profile_deltas, {customer_id: [spend, count]})
+                merge_deltas(day_deltas, {(customer_id, day): [spend, count]})
+        return profile_deltas, day_deltas
+
+    def settle_stream(self, cursor, through_day, full, rebuilt, stats):
+        settled, kept = self.ledger.settle(cursor, through_day)
+        stats['stream_days_settled'] = len(settled)
+        profile_deltas, day_deltas = self.stream_corrections(settled, kept, full, rebuilt)
+        if profile_deltas:
+            cursor.execute("DELETE FROM customer_profile_deltas")
+            cursor.executemany(
+                "INSERT INTO customer_profile_deltas (customer_id, spend_delta, count_delta) VALUES (%s, %s, %s)",
+                [(customer_id, spend, count) for customer_id, (spend, count) in profile_deltas.items()]
+            )
+            cursor.execute(MERGE_DELTAS_SQL)
+        if self.rollups is not None:
+            self.rollups.stage(cursor, day_deltas)
+        return set(profile_deltas)
+
+    def run(self, crm_source, transaction_source, crm_version=None, full=False):
+        start = time.perf_counter()
+        started_at = datetime.now(timezone.utc).isoformat()
+        stats = {'crm_rows_scanned': 0, 'transactions_scanned': 0, 'transactions_applied': 0,
+                 'crm_paths_pruned': 0, 'transaction_paths_pruned': 0,
+                 'customers_touched_by_crm': 0, 'customers_touched_by_transactions': 0,
+                 'customers_touched': 0, 'new_customers': 0, 'rollup_days': 0, 'stream_days_settled': 0}
+        stored = self.pool.run(self.read_watermarks)
+        previous = {source: watermark for source, (watermark, _) in stored.items()}
+        full = full or not previous
+        since = {} if full else previous
+        applied = None if full else self.pool.run(self.read_watermark_rows)
+        integrator = CustomerIntegrator(chunk_rows=self.chunk_rows)
+        # Raw CRM files are partitioned by arrival date, so partitions before the
+        # day the last run started were complete when it read them
+        crm_since_day = stored['crm'][1][:10] if 'crm' in since and stored['crm'][1] else None
+        crm_source = pruned_source(crm_source, crm_since_day, stats, 'crm_paths_pruned')
+        crm, crm_watermark = self.read_crm(crm_source, since.get('crm'), crm_version, stats)
+        # A transaction cannot arrive before its date, so whether its files are
+        # partitioned by date or by arrival none before the watermark day is needed
+        transaction_since_day = since['transactions'][:10] if 'transactions' in since else None
+        transaction_source = pruned_source(transaction_source, transaction_since_day, stats, 'transaction_paths_pruned')
+        deltas, day_deltas, transaction_watermark, watermark_rows = self.read_transactions(
+            transaction_source, since.get('transactions'), integrator, stats, applied)
+        stats['rollup_days'] = len(day_deltas)
+        watermarks = {'crm': crm_watermark, 'transactions': transaction_watermark}
+        watermarks = {source: str(value) for source, value in watermarks.items() if value is not None}
+        rebuilt = set()
+        stream_customers = set()
+
+        def advance(cursor):
+            cursor.execute("DELETE FROM integration_watermarks")
+            cursor.executemany("INSERT INTO integration_watermarks (source, watermark, updated_at) VALUES (%s, %s, %s)",
+                               [(source, value, started_at) for source, value in watermarks.items()])
+            cursor.execute("DELETE FROM integration_watermark_rows WHERE source = 'transactions'")
+            cursor.executemany("INSERT INTO integration_watermark_rows (source, fingerprint, row_count) VALUES (%s, %s, %s)",
+                               [('transactions', fingerprint, count) for fingerprint, count in watermark_rows.items()])
+            if self.rollups is not None:
+                self.rollups.stage(cursor, day_deltas, replace=full)
+            if self.ledger is not None and 'transactions' in watermarks:
+                stream_customers.update(self.settle_stream(cursor, watermarks['transactions'][:10], full, rebuilt, stats))
+
+        with self.pool.connection() as conn:
+            cursor = conn.cursor()
+            try:
+                if self.rollups is not None:
+                    self.rollups.prepare(cursor)
+                if self.ledger is not None:
+                    self.ledger.prepare(cursor)
+                    cursor.execute(DELTA_TABLE_DDL)
+            finally:
+                cursor.close()
+            touched_ids = pd.Index([], dtype=object)
+            if crm is not None:
+                touched_ids = touched_ids.union(crm.index)
+            if deltas is not None:
+                touched_ids = touched_ids.union(deltas.index)
+            existing = self.fetch_profiles(conn, touched_ids) if len(touched_ids) else pd.DataFrame(
+                columns=PROFILE_COLUMNS).set_index('customer_id')
+            profiles = self.build_profiles(crm, deltas, existing, full, stats)
+            stats['customers_touched'] = len(profiles)
+            if full:
+                rebuilt.update(profiles['customer_id'])
+            if len(profiles):
+                load = SnowflakeBulkLoader(conn).load(profiles, merge_sql=None if full else INCREMENTAL_MERGE_SQL,
+                                                      before_commit=advance)
+            else:
+                cursor = conn.cursor()
+                try:
+                    cursor.execute("BEGIN")
+                    advance(cursor)
+                    conn.commit()
+                except Exception:
+                    conn.rollback()
+                    raise
+                finally:
+                    cursor.close()
+                load = None
+        stats.update({
+            'mode': 'full' if full else 'incremental',
+            'previous_watermarks': previous,
+            'watermarks': watermarks,
+            'load_seconds': load['seconds'] if load else 0.0,
+            'seconds': round(time.perf_counter() - start, 3),
+            'finished_at': datetime.now(timezone.utc).isoformat()
+        })
+        self.runs.append(stats)
+        logging.info(f"{stats['mode'].capitalize()} recompute touched {stats['customers_touched']} customers "
+                     f"({stats['customers_touched_by_crm']} by CRM, {stats['customers_touched_by_transactions']} by "
+                     f"transactions, {stats['new_customers']} new) in {stats['seconds']}s")
+        return dict(stats, customer_ids=list(set(profiles['customer_id']) | stream_customers))
+
+    def metrics(self):
+        return {
+            'runs': len(self.runs),
+            'last_run': self.runs[-1] if self.runs else None,
+            'customers_touched': [run['customers_touched'] for run in self.runs],
+            'stream_ledger': self.ledger.metrics() if self.ledger is not None else None
+        }
@@ -0,0 +1,171 @@
+import time
+import logging
+import threading
+from pipeline_common.metrics import LatencyTracker
+from spend_rollups import event_day
+
+DELTA_TABLE_DDL = (
+    "CREATE TEMPORARY TABLE IF NOT EXISTS customer_profile_deltas "
+    "(customer_id STRING, spend_delta FLOAT, count_delta INT)"
+)
+MERGE_DELTAS_SQL = (
+    "MERGE INTO customer_profiles t USING customer_profile_deltas s ON t.customer_id = s.customer_id "
+    "WHEN MATCHED THEN UPDATE SET total_spend = COALESCE(t.total_spend, 0) + s.spend_delta, "
+    "trans_count = COALESCE(t.trans_count, 0) + s.count_delta"
+)
+# With create_missing_profiles: a customer with no profile yet gets a row holding
+# only its spend and count (no CRM attributes until the next integration run)
+CREATE_MISSING_CLAUSE = (
+    " WHEN NOT MATCHED THEN INSERT (customer_id, total_spend, trans_count) "
+    "VALUES (s.customer_id, s.spend_delta, s.count_delta)"
+)
+
+# Micro-batched profile updates from the Kafka event stream. Events are folded
+# into per-customer (spend, count) deltas in memory, so a hot customer costs one
+# row per window however many events it sends; each window is applied with one
+# set-based MERGE. The KeyOrderedConsumer decides the window (one worker batch)
+# and commits its offsets once flush() returns; if the MERGE fails the window
+# is dropped and flush() raises, and the consumer retries the batch, so its
+# events are folded in again rather than counted twice. apply_events() applies
+# events at once without touching the buffer, for callers outside the consumer.
+# With rollups (a spend_rollups.SpendRollups), the window's per-day spend is
+# also merged into the daily/monthly rollups in the same transaction. Deltas
+# only update existing profiles: events for customers without one are left out
+# of customer_profiles (the rollups still count them) unless
+# create_missing_profiles is set. With ledger (a stream_ledger.StreamLedger),
+# the window's per-day deltas are recorded there too, so a later batch
+# recompute can take them back out of the days it covers.
+class ProfileUpdater:
+    def __init__(self, pool, on_flush=None, rollups=None, create_missing_profiles=False, ledger=None):
+        # pool is a pipeline_common.connection_pool.ConnectionPool; one checkout per flush
+        self.pool = pool
+        self.on_flush = on_flush
+        self.rollups = rollups
+        self.ledger = ledger
+        self.create_missing_profiles = create_missing_profiles
+        self.merge_sql = MERGE_DELTAS_SQL + (CREATE_MISSING_CLAUSE if create_missing_profiles else '')
+        self.deltas = {}
+        self.day_deltas = {}
+        self.pending_events = 0
+        self.lock = threading.Lock()
+        self.events = 0
+        self.flushes = 0
+        self.failed_flushes = 0
+        self.last_batch = None
+        self.flush_latency = LatencyTracker()
+        self.event_lag_seconds = None
+
+    # message is the confluent_kafka Message the event came from, if any
+    def add(self, event, message=None):
+        with self.lock:
+            self.fold(self.deltas, self.day_deltas, event, message)
+            self.pending_events += 1
+            self.events += 1
+            if message is not None:
+                timestamp_type, timestamp_ms = message.timestamp()
+                if timestamp_type:
+                    self.event_lag_seconds = round(max(time.time() - timestamp_ms / 1000, 0.0), 3)
+
+    def fold(self, deltas, day_deltas, event, message=None):
+        amount = float(event['amount'])
+        delta = deltas.get(event['customer_id'])
+        if delta is None:
+            deltas[event['customer_id']] = [amount, 1]
+        else:
+            delta[0] += amount
+            delta[1] += 1
+        if self.rollups is not None or self.ledger is not None:
+            key = (event['customer_id'], event_day(event, message))
+            day = day_deltas.get(key)
+            if day is None:
+                day_deltas[key] = [amount, 1]
+            else:
+                day[0] += amount
+                day[1] += 1
+
+    # Apply the buffered window; returns the number of events applied
+    def flush(self):
+        with self.lock:
+            if not self.deltas:
+                return 0
+            deltas, self.deltas = self.deltas, {}
+            day_deltas, self.day_deltas = self.day_deltas, {}
+            events, self.pending_events = self.pending_events, 0
+        self.apply_window(deltas, day_deltas, events)
+        return events
+
+    # Apply events as one window of their own, leaving the buffer alone
+    def apply_events(self, events):
+        deltas, day_deltas = {}, {}
+        for event in events:
+            self.fold(deltas, day_deltas, event)
+        with self.lock:
+            self.events += len(events)
+        if deltas:
+            self.apply_window(deltas, day_deltas, len(events))
+        return len(events)
+
+    def apply_window(self, deltas, day_deltas, events):
+        start = time.perf_counter()
+        try:
+            self.pool.run(self.apply, deltas, day_deltas)
+        except Exception:
+            self.failed_flushes += 1
+            raise
+        elapsed = time.perf_counter() - start
+        self.flush_latency.record(elapsed)
+        self.flushes += 1
+        self.last_batch = {'events': events, 'customers': len(deltas), 'flush_ms': round(elapsed * 1000, 3)}
+        logging.info(f"Applied {events} profile events for {len(deltas)} customers in one MERGE")
+        if self.on_flush:
+            self.on_flush(deltas)
+
+    def apply(self, conn, deltas, day_deltas=None):
+        cursor = conn.cursor()
+        try:
+            # The delta table is per session, so it is (re)created on whichever connection is checked out
+            cursor.execute(DELTA_TABLE_DDL)
+            if self.rollups is not None:
+                self.rollups.prepare(cursor)
+            if self.ledger is not None:
+                self.ledger.prepare(cursor)
+            cursor.execute("TRUNCATE TABLE customer_profile_deltas")
+            # The connector autocommits each statement; the MERGE and the rollups must commit together
+            cursor.execute("BEGIN")
+            cursor.executemany(
+                "INSERT INTO customer_profile_deltas (customer_id, spend_delta, count_delta) VALUES (%s, %s, %s)",
+                [(customer_id, spend, count) for customer_id, (spend, count) in deltas.items()]
+            )
+            profiled = self.profiled(cursor, deltas) if self.ledger is not None else None
+            cursor.execute(self.merge_sql)
+            if self.rollups is not None:
+                self.rollups.stage(cursor, day_deltas)
+            if self.ledger is not None:
+                self.ledger.record(cursor, day_deltas, profiled)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cursor.close()
+
+    # Customers in the staged deltas that the MERGE adds to
+    def profiled(self, cursor, deltas):
+        if self.create_missing_profiles:
+            return set(deltas)
+        cursor.execute("SELECT d.customer_id FROM customer_profile_deltas d "
+                       "JOIN customer_profiles p ON p.customer_id = d.customer_id")
+        return {row[0] for row in cursor.fetchall()}
+
+    def metrics(self):
+        return {
+            'events': self.events,
+            'flushes': self.flushes,
+            'failed_flushes': self.failed_flushes,
+            'pending_events': self.pending_events,
+            'pending_customers': len(self.deltas),
+            'avg_events_per_flush': round((self.events - self.pending_events) / self.flushes, 1) if self.flushes else None,
+            'last_batch': self.last_batch,
+            'flush_latency': self.flush_latency.summary(),
+            'event_lag_seconds': self.event_lag_seconds
+        }
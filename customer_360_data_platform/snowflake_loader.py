@@ -0,0 +1,123 @@
+import os
+import json
+import time
+import shutil
+import logging
+import tempfile
+import pandas as pd
+
+PROFILE_COLUMNS = ['customer_id', 'name', 'age', 'income', 'total_spend', 'trans_count', 'trans_types', 'risk_score']
+PROFILE_TABLE_DDL = (
+    "CREATE TABLE IF NOT EXISTS customer_profiles (customer_id STRING, name STRING, age INT, income FLOAT, "
+    "total_spend FLOAT, trans_count INT, trans_types STRING, risk_score STRING)"
+)
+
+# trans_types is stored as a JSON array string (["investment", "savings"]), not Python repr
+def encode_trans_types(value):
+    if isinstance(value, str):
+        return value
+    if value is None or (not hasattr(value, '__iter__') and pd.isna(value)):
+        return None
+    return json.dumps(sorted(value))
+
+def prepare_profiles(df, columns=PROFILE_COLUMNS, key='customer_id'):
+    frame = df.reindex(columns=columns).drop_duplicates(subset=[key], keep='last')
+    frame['trans_types'] = frame['trans_types'].map(encode_trans_types)
+    # Nullable integer columns keep NULLs for customers without transactions
+    for column in ('age', 'trans_count'):
+        frame[column] = pd.to_numeric(frame[column], errors='coerce').astype('Int64')
+    for column in ('income', 'total_spend'):
+        frame[column] = pd.to_numeric(frame[column], errors='coerce').astype('float64')
+    return frame
+
+# Bulk upsert of profile DataFrames into Snowflake. Each load() writes the
+# batch as snappy-compressed parquet files, PUTs them to the table stage of a
+# session-scoped staging table, COPYs them in with one statement and MERGEs
+# the staging table into the target on customer_id, so re-loading a customer
+# updates its row instead of appending a duplicate.
+class SnowflakeBulkLoader:
+    def __init__(self, conn, table='customer_profiles', key='customer_id', columns=PROFILE_COLUMNS,
+                 rows_per_file=250_000, work_dir=None):
+        self.conn = conn
+        self.table = table
+        self.staging_table = f"{table}_staging"
+        self.key = key
+        self.columns = columns
+        self.rows_per_file = rows_per_file
+        self.work_dir = work_dir
+        self.loads = 0
+        self.rows_loaded = 0
+        self.seconds = 0.0
+
+    def write_files(self, frame, directory):
+        paths = []
+        for part, start in enumerate(range(0, len(frame), self.rows_per_file)):
+            path = os.path.join(directory, f"part-{part:05d}.parquet")
+            frame.iloc[start:start + self.rows_per_file].to_parquet(path, engine='pyarrow', compression='snappy', index=False)
+            paths.append(path)
+        return paths
+
+    def merge_sql(self):
+        updates = ', '.join(f"{column} = s.{column}" for column in self.columns if column != self.key)
+        return (
+            f"MERGE INTO {self.table} t USING {self.staging_table} s ON t.{self.key} = s.{self.key} "
+            f"WHEN MATCHED THEN UPDATE SET {updates} "
+            f"WHEN NOT MATCHED THEN INSERT ({', '.join(self.columns)}) "
+            f"VALUES ({', '.join('s.' + column for column in self.columns)})"
+        )
+
+    # Upsert one batch; returns row counts and throughput for the batch. merge_sql
+    # replaces the default upsert; before_commit(cursor) runs in the same
+    # transaction as the MERGE (e.g. to advance a watermark with the data).
+    def load(self, df, merge_sql=None, before_commit=None):
+        start = time.perf_counter()
+        frame = prepare_profiles(df, self.columns, self.key)
+        if frame.empty:
+            return {'rows': 0, 'files': 0, 'bytes': 0, 'inserted': 0, 'updated': 0, 'seconds': 0.0, 'rows_per_second': None}
+        directory = tempfile.mkdtemp(prefix='snowflake-load-', dir=self.work_dir)
+        cursor = self.conn.cursor()
+        try:
+            paths = self.write_files(frame, directory)
+            file_bytes = sum(os.path.getsize(path) for path in paths)
+            cursor.execute(f"CREATE TEMPORARY TABLE IF NOT EXISTS {self.staging_table} LIKE {self.table}")
+            cursor.execute(f"TRUNCATE TABLE {self.staging_table}")
+            cursor.execute(f"PUT 'file://{directory}/*.parquet' @%{self.staging_table} "
+                           f"AUTO_COMPRESS=FALSE OVERWRITE=TRUE PARALLEL=8")
+            cursor.execute(f"COPY INTO {self.staging_table} FROM @%{self.staging_table} "
+                           f"FILE_FORMAT = (TYPE = PARQUET) MATCH_BY_COLUMN_NAME = CASE_INSENSITIVE PURGE = TRUE")
+            if before_commit:
+                cursor.execute("BEGIN")
+            cursor.execute(merge_sql or self.merge_sql())
+            inserted, updated = cursor.fetchone()[:2]
+            if before_commit:
+                before_commit(cursor)
+            self.conn.commit()
+        except Exception:
+            self.conn.rollback()
+            raise
+        finally:
+            cursor.close()
+            shutil.rmtree(directory, ignore_errors=True)
+        seconds = time.perf_counter() - start
+        self.loads += 1
+        self.rows_loaded += len(frame)
+        self.seconds += seconds
+        stats = {
+            'rows': len(frame),
+            'files': len(paths),
+            'bytes': file_bytes,
+            'inserted': inserted,
+            'updated': updated,
+            'seconds': round(seconds, 3),
+            'rows_per_second': round(len(frame) / seconds, 1)
+        }
+        logging.info(f"Bulk loaded {stats['rows']} profiles into {self.table} "
+                     f"({inserted} inserted, {updated} updated, {stats['rows_per_second']} rows/s)")
+        return stats
+
+    def metrics(self):
+        return {
+            'loads': self.loads,
+            'rows_loaded': self.rows_loaded,
+            'rows_per_second': round(self.rows_loaded / self.seconds, 1) if self.seconds else None
+        }
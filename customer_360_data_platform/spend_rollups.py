@@ -0,0 +1,164 @@
+import time
+import logging
+from datetime import date, datetime, timedelta, timezone
+import pandas as pd
+from pipeline_common.metrics import LatencyTracker
+
+DAILY_SPEND_DDL = (
+    "CREATE TABLE IF NOT EXISTS customer_daily_spend "
+    "(customer_id STRING, day DATE, spend FLOAT, trans_count INT)"
+)
+MONTHLY_SPEND_DDL = (
+    "CREATE TABLE IF NOT EXISTS customer_monthly_spend "
+    "(customer_id STRING, month DATE, spend FLOAT, trans_count INT)"
+)
+SPEND_DELTA_TABLE_DDL = (
+    "CREATE TEMPORARY TABLE IF NOT EXISTS customer_spend_deltas "
+    "(customer_id STRING, day DATE, month DATE, spend_delta FLOAT, count_delta INT)"
+)
+MERGE_DAILY_SQL = (
+    "MERGE INTO customer_daily_spend t USING customer_spend_deltas s "
+    "ON t.customer_id = s.customer_id AND t.day = s.day "
+    "WHEN MATCHED THEN UPDATE SET spend = t.spend + s.spend_delta, trans_count = t.trans_count + s.count_delta "
+    "WHEN NOT MATCHED THEN INSERT (customer_id, day, spend, trans_count) "
+    "VALUES (s.customer_id, s.day, s.spend_delta, s.count_delta)"
+)
+MERGE_MONTHLY_SQL = (
+    "MERGE INTO customer_monthly_spend t USING (SELECT customer_id, month, SUM(spend_delta) AS spend_delta, "
+    "SUM(count_delta) AS count_delta FROM customer_spend_deltas GROUP BY customer_id, month) s "
+    "ON t.customer_id = s.customer_id AND t.month = s.month "
+    "WHEN MATCHED THEN UPDATE SET spend = t.spend + s.spend_delta, trans_count = t.trans_count + s.count_delta "
+    "WHEN NOT MATCHED THEN INSERT (customer_id, month, spend, trans_count) "
+    "VALUES (s.customer_id, s.month, s.spend_delta, s.count_delta)"
+)
+GRAINS = {'day': ('customer_daily_spend', 'day'), 'month': ('customer_monthly_spend', 'month')}
+
+# Calendar day (YYYY-MM-DD) of a stream event: its date field, else the Kafka
+# message timestamp, else today (UTC)
+def event_day(event, message=None):
+    value = event.get('date') or event.get('timestamp')
+    if value:
+        return str(value)[:10]
+    if message is not None:
+        timestamp_type, timestamp_ms = message.timestamp()
+        if timestamp_type:
+            return datetime.fromtimestamp(timestamp_ms / 1000, timezone.utc).date().isoformat()
+    return datetime.now(timezone.utc).date().isoformat()
+
+# {(customer_id, day): [spend, count]} for a transactions frame, grouped in one pass
+def daily_deltas(frame, timestamp_column='date'):
+    days = pd.to_datetime(frame[timestamp_column], errors='coerce').dt.strftime('%Y-%m-%d')
+    grouped = (pd.DataFrame({'customer_id': frame['customer_id'].to_numpy(), 'day': days.to_numpy(),
+                             'amount': pd.to_numeric(frame['amount'], errors='coerce').fillna(0.0).to_numpy()})
+               .dropna(subset=['day']).groupby(['customer_id', 'day'], sort=False)['amount'].agg(['sum', 'count']))
+    return {key: [float(spend), int(count)] for key, spend, count in
+            zip(grouped.index, grouped['sum'].to_numpy(), grouped['count'].to_numpy())}
+
+def merge_deltas(target, deltas):
+    for key, (spend, count) in deltas.items():
+        delta = target.get(key)
+        if delta is None:
+            target[key] = [spend, count]
+        else:
+            delta[0] += spend
+            delta[1] += count
+    return target
+
+def as_day(value):
+    return value.isoformat()[:10] if hasattr(value, 'isoformat') else str(value)[:10]
+
+# Per-customer daily and monthly spend, maintained incrementally. Writers
+# (the stream's ProfileUpdater windows and IncrementalRecompute runs) fold
+# their transactions into (customer, day) deltas and call stage() inside their
+# own transaction, so the rollups commit together with the profile totals and
+# the Kafka offsets or watermarks that cover them. prepare() holds the DDL and
+# must run before the writer's first DML statement, since DDL would commit the
+# open transaction in Snowflake. series() reads a date range back as columns.
+class SpendRollups:
+    def __init__(self, pool, default_days=30, default_months=12, max_points=3660):
+        # pool is a pipeline_common.connection_pool.ConnectionPool, used for reads
+        self.pool = pool
+        self.default_days = default_days
+        self.default_months = default_months
+        self.max_points = max_points
+        self.staged_rows = 0
+        self.rebuilds = 0
+        self.query_latency = LatencyTracker()
+
+    def prepare(self, cursor):
+        cursor.execute(DAILY_SPEND_DDL)
+        cursor.execute(MONTHLY_SPEND_DDL)
+        cursor.execute(SPEND_DELTA_TABLE_DDL)
+
+    # Add {(customer_id, day): [spend, count]} to both rollups; replace clears them first (full rebuild)
+    def stage(self, cursor, deltas, replace=False):
+        if replace:
+            cursor.execute("DELETE FROM customer_daily_spend")
+            cursor.execute("DELETE FROM customer_monthly_spend")
+            self.rebuilds += 1
+            logging.info(f"Rebuilding spend rollups from {len(deltas)} customer-days")
+        if not deltas:
+            return
+        cursor.execute("DELETE FROM customer_spend_deltas")
+        cursor.executemany(
+            "INSERT INTO customer_spend_deltas (customer_id, day, month, spend_delta, count_delta) "
+            "VALUES (%s, %s, %s, %s, %s)",
+            [(customer_id, day, day[:8] + '01', spend, count) for (customer_id, day), (spend, count) in deltas.items()]
+        )
+        cursor.execute(MERGE_DAILY_SQL)
+        cursor.execute(MERGE_MONTHLY_SQL)
+        # Negative deltas (stream spend settled by a recompute) can empty a period
+        if any(count < 0 for _, count in deltas.values()):
+            for table in ('customer_daily_spend', 'customer_monthly_spend'):
+                cursor.execute(f"DELETE FROM {table} WHERE trans_count <= 0 "
+                               "AND customer_id IN (SELECT customer_id FROM customer_spend_deltas)")
+        self.staged_rows += len(deltas)
+
+    # Normalized (start, end) for a grain; defaults to the last default_days days / default_months months
+    def date_range(self, grain, start=None, end=None):
+        end = date.fromisoformat(end) if end else datetime.now(timezone.utc).date()
+        if start:
+            start = date.fromisoformat(start)
+        elif grain == 'day':
+            start = end - timedelta(days=self.default_days - 1)
+        else:
+            start = (pd.Timestamp(end) - pd.DateOffset(months=self.default_months - 1)).date()
+        if grain == 'month':
+            start, end = start.replace(day=1), end.replace(day=1)
+        if start > end:
+            raise ValueError(f"start {start} is after end {end}")
+        return start.isoformat(), end.isoformat()
+
+    def fetch_series(self, conn, customer_id, grain, start, end):
+        table, column = GRAINS[grain]
+        cursor = conn.cursor()
+        try:
+            cursor.execute(f"SELECT {column}, spend, trans_count FROM {table} "
+                           f"WHERE customer_id = %s AND {column} >= %s AND {column} <= %s ORDER BY {column} LIMIT %s",
+                           (customer_id, start, end, self.max_points))
+            return cursor.fetchall()
+        finally:
+            cursor.close()
+
+    # Columnar payload: parallel arrays of period start, spend and count, only for periods with spend
+    async def series(self, customer_id, grain='day', start=None, end=None):
+        begin = time.perf_counter()
+        start, end = self.date_range(grain, start, end)
+        rows = await self.pool.run_async(self.fetch_series, customer_id, grain, start, end)
+        self.query_latency.record(time.perf_counter() - begin)
+        return {
+            'customer_id': customer_id,
+            'grain': grain,
+            'start': start,
+            'end': end,
+            'dates': [as_day(row[0]) for row in rows],
+            'spend': [round(float(row[1]), 2) for row in rows],
+            'trans_count': [int(row[2]) for row in rows]
+        }
+
+    def metrics(self):
+        return {
+            'staged_rows': self.staged_rows,
+            'rebuilds': self.rebuilds,
+            'query_latency': self.query_latency.summary()
+        }
@@ -0,0 +1,60 @@
+import logging
+
+# One row per customer, day and stream window; in_profile says whether the
+# window's MERGE found a profile to add the spend to
+STREAM_SPEND_DDL = (
+    "CREATE TABLE IF NOT EXISTS customer_stream_spend "
+    "(customer_id STRING, day STRING, spend FLOAT, trans_count INT, in_profile BOOLEAN)"
+)
+SETTLED_SPEND_SQL = (
+    "SELECT customer_id, day, SUM(spend), SUM(trans_count), in_profile FROM customer_stream_spend "
+    "GROUP BY customer_id, day, in_profile"
+)
+
+# Spend the Kafka stream has added to profile totals and rollups that the batch
+# recompute has not yet accounted for. The same transactions usually reach
+# both the stream and the batch transaction source, so the stream's
+# contribution is provisional: ProfileUpdater windows record their per-day
+# deltas here in the transaction that applies them, and each
+# IncrementalRecompute run settles every day up to its transaction watermark
+# in the transaction that advances it, taking the stream's spend for those
+# days back out so the batch's count is the only one left. Days after the
+# watermark keep the stream's spend until a later run covers them.
+class StreamLedger:
+    def __init__(self):
+        self.recorded_rows = 0
+        self.settled_rows = 0
+
+    # DDL; like SpendRollups.prepare it must run before the writer's first DML statement
+    def prepare(self, cursor):
+        cursor.execute(STREAM_SPEND_DDL)
+
+    # Record a window's {(customer_id, day): [spend, count]}; profiled is the set
+    # of customer_ids whose profile the window's MERGE updated
+    def record(self, cursor, day_deltas, profiled):
+        if not day_deltas:
+            return
+        cursor.executemany(
+            "INSERT INTO customer_stream_spend (customer_id, day, spend, trans_count, in_profile) "
+            "VALUES (%s, %s, %s, %s, %s)",
+            [(customer_id, day, spend, count, customer_id in profiled)
+             for (customer_id, day), (spend, count) in day_deltas.items()]
+        )
+        self.recorded_rows += len(day_deltas)
+
+    # Remove the entries up to through_day (YYYY-MM-DD) and return them with the
+    # ones that stay, each as [(customer_id, day, spend, count, in_profile)]
+    def settle(self, cursor, through_day):
+        cursor.execute(SETTLED_SPEND_SQL)
+        rows = [(customer_id, day, float(spend), int(count), bool(in_profile))
+                for customer_id, day, spend, count, in_profile in cursor.fetchall()]
+        settled = [row for row in rows if row[1] <= through_day]
+        kept = [row for row in rows if row[1] > through_day]
+        if settled:
+            cursor.execute("DELETE FROM customer_stream_spend WHERE day <= %s", (through_day,))
+            self.settled_rows += len(settled)
+            logging.info(f"Settled {len(settled)} stream customer-days through {through_day}")
+        return settled, kept
+
+    def metrics(self):
+        return {'recorded_rows': self.recorded_rows, 'settled_rows': self.settled_rows}
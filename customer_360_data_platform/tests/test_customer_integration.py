@@ -0,0 +1,22 @@
+import gzip
+import json
+from customer_integration import iter_frames
+
+RECORDS = [{'customer_id': 'C001', 'amount': 5000}, {'customer_id': 'C002', 'amount': 2000},
+           {'customer_id': 'C003', 'amount': 700}]
+
+def read(path):
+    return [frame.to_dict('records') for frame in iter_frames(str(path), 2)]
+
+def test_json_files_are_read_as_one_array(tmp_path):
+    path = tmp_path / 'transactions.json'
+    path.write_text(json.dumps(RECORDS))
+    assert read(path) == [RECORDS[:2], RECORDS[2:]]
+
+def test_jsonl_and_ndjson_files_are_read_as_lines(tmp_path):
+    lines = '\n'.join(json.dumps(record) for record in RECORDS) + '\n'
+    (tmp_path / 'transactions.jsonl').write_text(lines)
+    with gzip.open(tmp_path / 'transactions.ndjson.gz', 'wt') as f:
+        f.write(lines)
+    assert read(tmp_path / 'transactions.jsonl') == [RECORDS[:2], RECORDS[2:]]
+    assert read(tmp_path / 'transactions.ndjson.gz') == [RECORDS[:2], RECORDS[2:]]
@@ -0,0 +1,72 @@
+import numpy as np
+import pandas as pd
+import pytest
+from entity_resolution import EntityResolver, UnionFind, normalize_names
+
+def records(*rows):
+    return pd.DataFrame(rows, columns=['customer_id', 'name', 'email'])
+
+def entity_ids(entities):
+    return dict(zip(entities['customer_id'], entities['entity_id']))
+
+def test_names_normalize_across_order_case_accents_and_punctuation():
+    names = normalize_names(pd.Series(['Doe, Jane', 'jane DOE', 'Jané  Doe.', None]))
+    assert names.tolist() == ['doe jane', 'doe jane', 'doe jane', '']
+
+def test_variants_of_one_customer_resolve_to_the_first_record():
+    frame = records(
+        ('C001', 'Jane Doe', 'jane@example.com'),
+        ('C002', 'Bob Stone', 'bob@example.com'),
+        ('C003', 'DOE, Jane', 'JANE@example.com'),
+        ('C004', 'Jané Doe', 'jane@example.com'),
+        ('C005', 'Alice Wong', None)
+    )
+    resolver = EntityResolver()
+    entities = resolver.resolve(frame)
+    assert entities['customer_id'].tolist() == ['C001', 'C002', 'C003', 'C004', 'C005']
+    assert entity_ids(entities) == {'C001': 'C001', 'C002': 'C002', 'C003': 'C001', 'C004': 'C001', 'C005': 'C005'}
+    assert entities['cluster_size'].tolist() == [3, 1, 3, 3, 1]
+    run = resolver.metrics()['last_run']
+    assert (run['records'], run['entities'], run['merged_records'], run['largest_cluster']) == (5, 3, 2, 3)
+
+def test_a_conflict_column_vetoes_a_match():
+    frame = pd.DataFrame({
+        'customer_id': ['C001', 'C002', 'C003'],
+        'name': ['Jane Doe', 'Jane Doe', 'Jane Doe'],
+        'email': ['jane@example.com'] * 3,
+        'tax_id': ['111', '222', None]
+    })
+    entities = EntityResolver(conflict_columns=('tax_id',)).resolve(frame)
+    # C003 has no tax_id, so it matches both and bridges them into one entity
+    assert set(entities['entity_id']) == {'C001'}
+    entities = EntityResolver(conflict_columns=('tax_id',)).resolve(frame.iloc[:2])
+    assert entity_ids(entities) == {'C001': 'C001', 'C002': 'C002'}
+
+def test_window_bounds_candidates_for_a_common_name():
+    frame = records(*[(f"C{i:03d}", 'John Smith', None) for i in range(90)])
+    resolver = EntityResolver(window=2)
+    entities = resolver.resolve(frame)
+    run = resolver.metrics()['last_run']
+    # Neighbour pairs still chain every record into one entity without all 4005 pairs
+    assert run['candidate_pairs'] <= 2 * len(frame)
+    assert set(entities['entity_id']) == {'C000'} and run['largest_cluster'] == 90
+
+def test_stop_tokens_keep_a_ubiquitous_name_out_of_blocking():
+    frame = records(*[(f"C{i:03d}", 'John Smith', None) for i in range(200)])
+    resolver = EntityResolver()
+    resolver.resolve(frame)
+    assert resolver.metrics()['last_run']['candidate_pairs'] == 0
+
+def test_records_without_tokens_are_never_matched():
+    entities = EntityResolver().resolve(records(('C001', None, None), ('C002', '', None), ('C003', '...', None)))
+    assert entity_ids(entities) == {'C001': 'C001', 'C002': 'C002', 'C003': 'C003'}
+
+def test_union_find_roots_are_the_smallest_index():
+    clusters = UnionFind(8)
+    clusters.union_many([6, 5, 4, 1], [7, 6, 5, 2])
+    assert clusters.roots().tolist() == [0, 1, 1, 3, 4, 4, 4, 4]
+    assert np.array_equal(UnionFind(3).roots(), [0, 1, 2])
+
+def test_bands_must_divide_num_perm():
+    with pytest.raises(ValueError):
+        EntityResolver(num_perm=64, bands=10)
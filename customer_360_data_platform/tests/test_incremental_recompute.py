@@ -0,0 +1,124 @@
+import pandas as pd
+from pipeline_common.connection_pool import ConnectionPool
+from pipeline_common.local_snowflake import LocalSnowflakeConnection
+from incremental_recompute import IncrementalRecompute
+from profile_updater import ProfileUpdater
+from spend_rollups import SpendRollups
+from stream_ledger import StreamLedger
+
+CRM = pd.DataFrame({'customer_id': ['C001', 'C002'], 'name': ['Ann', 'Bob'], 'age': [30, 40],
+                    'income': [50000.0, 90000.0], 'snapshot_version': [1, 1]})
+
+def transactions(*rows):
+    return pd.DataFrame(rows, columns=['customer_id', 'amount', 'type', 'date'])
+
+def totals(pool):
+    def read(conn):
+        cursor = conn.cursor()
+        try:
+            cursor.execute("SELECT customer_id, total_spend, trans_count FROM customer_profiles ORDER BY customer_id")
+            return cursor.fetchall()
+        finally:
+            cursor.close()
+    return pool.run(read)
+
+def daily(pool):
+    def read(conn):
+        cursor = conn.cursor()
+        try:
+            cursor.execute("SELECT customer_id, day, spend, trans_count FROM customer_daily_spend ORDER BY customer_id, day")
+            return cursor.fetchall()
+        finally:
+            cursor.close()
+    return pool.run(read)
+
+def stream_setup():
+    pool = ConnectionPool(lambda: LocalSnowflakeConnection(), max_size=1)
+    rollups, ledger = SpendRollups(pool), StreamLedger()
+    return pool, IncrementalRecompute(pool, rollups=rollups, ledger=ledger), ProfileUpdater(pool, rollups=rollups,
+                                                                                           ledger=ledger)
+
+def test_same_day_rows_arriving_after_a_run_are_applied_once():
+    pool = ConnectionPool(lambda: LocalSnowflakeConnection(), max_size=1)
+    recompute = IncrementalRecompute(pool)
+    history = transactions(('C001', 10.0, 'savings', '2025-07-06'), ('C001', 20.0, 'savings', '2025-07-07'))
+    recompute.run(CRM, history)
+    assert totals(pool) == [('C001', 30.0, 2), ('C002', None, None)]
+    # A row for the watermark day lands after the run; the source is re-read in full
+    late = pd.concat([history, transactions(('C002', 5.0, 'loan', '2025-07-07'))], ignore_index=True)
+    report = recompute.run(CRM, late)
+    assert report['transactions_applied'] == 1
+    assert totals(pool) == [('C001', 30.0, 2), ('C002', 5.0, 1)]
+    # Re-reading the same source applies nothing
+    assert recompute.run(CRM, late)['transactions_applied'] == 0
+    # A delta feed holding only the new rows, one of them again on the watermark day
+    recompute.run(CRM, transactions(('C002', 7.0, 'loan', '2025-07-07'), ('C001', 1.0, 'savings', '2025-07-08')))
+    assert totals(pool) == [('C001', 31.0, 3), ('C002', 12.0, 2)]
+    pool.close()
+
+def test_streamed_transactions_in_the_batch_source_are_counted_once():
+    pool, recompute, updater = stream_setup()
+    recompute.run(CRM, transactions(('C001', 10.0, 'savings', '2025-07-06')))
+    # Streamed as they happen; the 07-07 one later reaches the batch source too
+    updater.apply_events([{'customer_id': 'C001', 'amount': 20.0, 'date': '2025-07-07'},
+                          {'customer_id': 'C001', 'amount': 4.0, 'date': '2025-07-08'}])
+    assert totals(pool) == [('C001', 34.0, 3), ('C002', None, None)]
+    report = recompute.run(CRM, transactions(('C001', 20.0, 'savings', '2025-07-07')))
+    assert report['stream_days_settled'] == 1
+    # The batch now owns 07-07; the stream keeps 07-08 until a run covers it
+    assert totals(pool) == [('C001', 34.0, 3), ('C002', None, None)]
+    assert daily(pool) == [('C001', '2025-07-06', 10.0, 1), ('C001', '2025-07-07', 20.0, 1),
+                           ('C001', '2025-07-08', 4.0, 1)]
+    # Up to its watermark the batch source is authoritative, even for a streamed row it never received
+    recompute.run(CRM, transactions(('C002', 3.0, 'loan', '2025-07-08')))
+    assert totals(pool) == [('C001', 30.0, 2), ('C002', 3.0, 1)]
+    assert daily(pool) == [('C001', '2025-07-06', 10.0, 1), ('C001', '2025-07-07', 20.0, 1),
+                           ('C002', '2025-07-08', 3.0, 1)]
+    pool.close()
+
+def test_full_rebuild_keeps_stream_days_after_its_watermark():
+    pool, recompute, updater = stream_setup()
+    recompute.run(CRM, transactions(('C001', 10.0, 'savings', '2025-07-06')))
+    updater.apply_events([{'customer_id': 'C001', 'amount': 5.0, 'date': '2025-07-06'},
+                          {'customer_id': 'C001', 'amount': 4.0, 'date': '2025-07-08'}])
+    history = transactions(('C001', 10.0, 'savings', '2025-07-06'), ('C001', 5.0, 'savings', '2025-07-06'))
+    recompute.run(CRM, history, full=True)
+    assert totals(pool) == [('C001', 19.0, 3), ('C002', None, None)]
+    assert daily(pool) == [('C001', '2025-07-06', 15.0, 2), ('C001', '2025-07-08', 4.0, 1)]
+    pool.close()
+
+def write_partition(root, day, name, frame):
+    directory = root / f"dt={day}"
+    directory.mkdir(parents=True, exist_ok=True)
+    frame.to_csv(directory / name, index=False)
+
+def test_partitions_before_the_watermarks_are_not_read(tmp_path):
+    pool = ConnectionPool(lambda: LocalSnowflakeConnection(), max_size=1)
+    recompute = IncrementalRecompute(pool)
+    crm_root, transaction_root = tmp_path / 'crm', tmp_path / 'transactions'
+    write_partition(crm_root, '2025-07-01', 'part-0.csv', CRM)
+    write_partition(transaction_root, '2025-07-06', 'part-0.csv', transactions(('C001', 10.0, 'savings', '2025-07-06')))
+    write_partition(transaction_root, '2025-07-07', 'part-0.csv', transactions(('C001', 20.0, 'savings', '2025-07-07')))
+    recompute.run(crm_root, transaction_root)
+    assert totals(pool) == [('C001', 30.0, 2), ('C002', None, None)]
+    # Files that would fail to parse, in partitions the watermarks have passed
+    (crm_root / 'dt=2025-07-01' / 'part-1.parquet').write_bytes(b'not parquet')
+    (transaction_root / 'dt=2025-07-06' / 'part-1.parquet').write_bytes(b'not parquet')
+    write_partition(transaction_root, '2025-07-07', 'part-1.csv', transactions(('C002', 5.0, 'loan', '2025-07-07')))
+    report = recompute.run(crm_root, transaction_root)
+    assert (report['crm_paths_pruned'], report['transaction_paths_pruned']) == (1, 1)
+    assert report['transactions_scanned'] == 2
+    assert totals(pool) == [('C001', 30.0, 2), ('C002', 5.0, 1)]
+    # A list of raw files is pruned the same way
+    files = sorted(str(path) for path in transaction_root.rglob('*.*'))
+    assert recompute.run(crm_root, files)['transaction_paths_pruned'] == 2
+    pool.close()
+
+def test_stream_spend_for_customers_without_a_profile_is_not_taken_out_of_one():
+    pool, recompute, updater = stream_setup()
+    recompute.run(CRM, transactions(('C001', 10.0, 'savings', '2025-07-06')))
+    updater.apply_events([{'customer_id': 'C003', 'amount': 7.0, 'date': '2025-07-07'}])
+    recompute.run(CRM, transactions(('C003', 7.0, 'loan', '2025-07-07')))
+    assert totals(pool) == [('C001', 10.0, 1), ('C002', None, None), ('C003', 7.0, 1)]
+    assert daily(pool)[-1] == ('C003', '2025-07-07', 7.0, 1)
+    pool.close()
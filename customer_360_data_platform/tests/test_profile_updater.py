@@ -0,0 +1,65 @@
+import pytest
+from pipeline_common.connection_pool import ConnectionPool
+from pipeline_common.local_snowflake import LocalSnowflakeConnection
+from profile_updater import ProfileUpdater
+from snowflake_loader import PROFILE_TABLE_DDL
+from spend_rollups import SpendRollups
+
+def make_pool():
+    conn = LocalSnowflakeConnection()
+    cursor = conn.cursor()
+    cursor.execute(PROFILE_TABLE_DDL)
+    cursor.execute("INSERT INTO customer_profiles (customer_id, total_spend, trans_count) VALUES ('C001', 10.0, 1)")
+    conn.commit()
+    return conn, ConnectionPool(lambda: conn, max_size=1)
+
+def query(conn, sql):
+    cursor = conn.cursor()
+    try:
+        cursor.execute(sql)
+        return cursor.fetchall()
+    finally:
+        cursor.close()
+
+def test_failed_rollup_staging_rolls_back_the_merge():
+    conn, pool = make_pool()
+    rollups = SpendRollups(pool)
+    updater = ProfileUpdater(pool, rollups=rollups)
+    stage = rollups.stage
+    def fail_once(*args, **kwargs):
+        rollups.stage = stage
+        raise RuntimeError("snowflake down")
+    rollups.stage = fail_once
+    updater.add({'customer_id': 'C001', 'amount': 5.0, 'date': '2025-07-07'})
+    with pytest.raises(RuntimeError):
+        updater.flush()
+    assert query(conn, "SELECT total_spend, trans_count FROM customer_profiles") == [(10.0, 1)]
+    # The failed window is dropped; the consumer's retry adds the batch again
+    assert updater.flush() == 0
+    updater.add({'customer_id': 'C001', 'amount': 5.0, 'date': '2025-07-07'})
+    updater.flush()
+    assert query(conn, "SELECT total_spend, trans_count FROM customer_profiles") == [(15.0, 2)]
+    assert query(conn, "SELECT spend, trans_count FROM customer_daily_spend") == [(5.0, 1)]
+    pool.close()
+
+def test_unknown_customers_get_a_profile_only_when_asked():
+    for create_missing, expected in ((False, [('C001', 15.0, 2)]),
+                                     (True, [('C001', 15.0, 2), ('C404', 7.0, 1)])):
+        conn, pool = make_pool()
+        updater = ProfileUpdater(pool, create_missing_profiles=create_missing)
+        updater.add({'customer_id': 'C001', 'amount': 5.0})
+        updater.add({'customer_id': 'C404', 'amount': 7.0})
+        updater.flush()
+        assert query(conn, "SELECT customer_id, total_spend, trans_count FROM customer_profiles "
+                           "ORDER BY customer_id") == expected
+        pool.close()
+
+def test_apply_events_leaves_the_buffered_window_alone():
+    conn, pool = make_pool()
+    updater = ProfileUpdater(pool)
+    updater.add({'customer_id': 'C001', 'amount': 5.0})
+    assert updater.apply_events([{'customer_id': 'C001', 'amount': 2.0}]) == 1
+    assert query(conn, "SELECT total_spend, trans_count FROM customer_profiles") == [(12.0, 2)]
+    assert updater.flush() == 1
+    assert query(conn, "SELECT total_spend, trans_count FROM customer_profiles") == [(17.0, 3)]
+    pool.close()
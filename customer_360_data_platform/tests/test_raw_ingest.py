@@ -0,0 +1,16 @@
+from pipeline_common.local_aws import LocalS3
+from pipeline_common.raw_zone import read_records
+
+RECORDS = [{"customer_id": "C001", "amount": 5000, "date": "2025-07-01"},
+           {"customer_id": "C002", "amount": 2000, "date": "2025-07-02"}]
+
+def test_ingest_to_s3_returns_one_key_and_ingest_files_to_s3_all(monkeypatch):
+    monkeypatch.setenv('AWS_DEFAULT_REGION', 'us-east-1')
+    import customer_360_pipeline as pipeline
+    s3 = LocalS3()
+    monkeypatch.setattr(pipeline, 's3_client', s3)
+    key = pipeline.ingest_to_s3(RECORDS, key_prefix='transactions/', partition_field='date')
+    assert isinstance(key, str) and key.startswith('transactions/dt=2025-07-01/')
+    keys = pipeline.ingest_files_to_s3(RECORDS, key_prefix='transactions/', partition_field='date')
+    assert [k.split('/')[1] for k in keys] == ['dt=2025-07-01', 'dt=2025-07-02']
+    assert [read_records(s3, 'customer-360-raw', k) for k in keys] == [RECORDS[:1], RECORDS[1:]]
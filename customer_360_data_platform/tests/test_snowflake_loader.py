@@ -0,0 +1,76 @@
+import json
+import pandas as pd
+import pytest
+from pipeline_common.local_snowflake import LocalSnowflakeConnection
+from snowflake_loader import SnowflakeBulkLoader, PROFILE_TABLE_DDL, encode_trans_types
+
+def connection():
+    conn = LocalSnowflakeConnection()
+    conn.cursor().execute(PROFILE_TABLE_DDL)
+    return conn
+
+def profiles(*rows):
+    return pd.DataFrame(rows, columns=['customer_id', 'name', 'total_spend', 'trans_count', 'trans_types'])
+
+def rows(conn):
+    cursor = conn.cursor()
+    cursor.execute("SELECT customer_id, name, age, total_spend, trans_count, trans_types "
+                   "FROM customer_profiles ORDER BY customer_id")
+    return cursor.fetchall()
+
+def test_reloading_a_customer_updates_its_row_instead_of_appending(tmp_path):
+    conn = connection()
+    loader = SnowflakeBulkLoader(conn, rows_per_file=1, work_dir=str(tmp_path))
+    first = loader.load(profiles(('C001', 'Ann', 10.0, 1, {'savings'}), ('C002', 'Bob', 20.0, 2, None)))
+    assert (first['rows'], first['files'], first['inserted'], first['updated']) == (2, 2, 2, 0)
+    second = loader.load(profiles(('C001', 'Ann', 15.0, 2, {'savings', 'investment'}), ('C003', 'Cy', 5.0, 1, [])))
+    assert (second['inserted'], second['updated']) == (1, 1)
+    assert rows(conn) == [
+        ('C001', 'Ann', None, 15.0, 2, '["investment", "savings"]'),
+        ('C002', 'Bob', None, 20.0, 2, None),
+        ('C003', 'Cy', None, 5.0, 1, '[]')
+    ]
+    assert loader.metrics()['loads'] == 2 and loader.metrics()['rows_loaded'] == 4
+    # Staging files are removed after each load
+    assert list(tmp_path.iterdir()) == []
+
+def test_duplicate_keys_in_one_batch_keep_the_last_row():
+    conn = connection()
+    SnowflakeBulkLoader(conn).load(profiles(('C001', 'Old', 1.0, 1, None), ('C001', 'New', 2.0, 2, None)))
+    assert [(customer_id, name) for customer_id, name, *_ in rows(conn)] == [('C001', 'New')]
+
+def test_trans_types_are_stored_as_json_arrays():
+    assert json.loads(encode_trans_types({'savings', 'investment'})) == ['investment', 'savings']
+    assert encode_trans_types('["loan"]') == '["loan"]'
+    assert encode_trans_types(None) is None and encode_trans_types(float('nan')) is None
+
+def test_before_commit_runs_in_the_merge_transaction():
+    conn = connection()
+    conn.cursor().execute("CREATE TABLE watermarks (source STRING, watermark STRING)")
+    conn.commit()
+    loader = SnowflakeBulkLoader(conn)
+
+    def advance(cursor):
+        cursor.execute("INSERT INTO watermarks VALUES (%s, %s)", ('transactions', '2024-01-01'))
+
+    loader.load(profiles(('C001', 'Ann', 10.0, 1, None)), before_commit=advance)
+    cursor = conn.cursor()
+    cursor.execute("SELECT COUNT(*) FROM watermarks")
+    assert cursor.fetchone() == (1,)
+
+    def fail(cursor):
+        advance(cursor)
+        raise RuntimeError("watermark write failed")
+
+    with pytest.raises(RuntimeError):
+        loader.load(profiles(('C001', 'Ann', 99.0, 9, None), ('C002', 'Bob', 1.0, 1, None)), before_commit=fail)
+    # Neither the MERGE nor the watermark survive the failed commit
+    assert [(customer_id, spend) for customer_id, _, _, spend, *_ in rows(conn)] == [('C001', 10.0)]
+    cursor.execute("SELECT COUNT(*) FROM watermarks")
+    assert cursor.fetchone() == (1,)
+    assert loader.metrics()['loads'] == 1
+
+def test_empty_frame_is_a_no_op():
+    conn = connection()
+    stats = SnowflakeBulkLoader(conn).load(profiles())
+    assert stats['rows'] == 0 and conn.statement_count == 1
@@ -0,0 +1,122 @@
+import json
+import time
+import queue
+import logging
+import threading
+from collections import OrderedDict
+from pipeline_common.metrics import LatencyTracker
+
+SNS_PUBLISH_BATCH_LIMIT = 10
+# Keeps a coalesced message well under the 256 KB SNS limit during a burst
+MAX_TRANSACTIONS_PER_MESSAGE = 20
+
+# Background fraud alert publisher. submit() never blocks: alerts go onto a bounded
+# queue and a worker thread gathers them for coalesce_window_seconds, folds alerts
+# for the same customer_id into one message and sends them with SNS publish_batch.
+# When the queue is full submit() returns False so the caller sees the backpressure.
+class AlertDispatcher:
+    def __init__(self, sns_client, topic_arn, max_queue=10000, coalesce_window_seconds=1.0):
+        self.sns_client = sns_client
+        self.topic_arn = topic_arn
+        self.coalesce_window_seconds = coalesce_window_seconds
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.flush_requested = threading.Event()
+        self.thread = None
+        self.start_lock = threading.Lock()
+        self.publish_latency = LatencyTracker()
+        self.submitted = 0
+        self.rejected = 0
+        self.coalesced = 0
+        self.messages_published = 0
+        self.publish_failures = 0
+
+    def start(self):
+        with self.start_lock:
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = threading.Thread(target=self.run, name='fraud-alert-dispatcher', daemon=True)
+                self.thread.start()
+
+    def submit(self, transaction):
+        self.start()
+        try:
+            self.queue.put_nowait(transaction)
+        except queue.Full:
+            self.rejected += 1
+            logging.warning(f"Alert queue full, alert not queued for customer: {transaction.get('customer_id')}")
+            return False
+        self.submitted += 1
+        return True
+
+    def queue_depth(self):
+        return self.queue.qsize()
+
+    # Publish everything queued so far without waiting out the coalescing window
+    def drain(self, timeout_seconds=5.0):
+        deadline = time.monotonic() + timeout_seconds
+        self.flush_requested.set()
+        while self.queue.unfinished_tasks and time.monotonic() < deadline:
+            time.sleep(0.01)
+        return self.queue.unfinished_tasks == 0
+
+    def run(self):
+        while True:
+            alerts = [self.queue.get()]
+            deadline = time.monotonic() + self.coalesce_window_seconds
+            while not self.flush_requested.is_set():
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    alerts.append(self.queue.get(timeout=min(remaining, 0.05)))
+                except queue.Empty:
+                    continue
+            while True:
+                try:
+                    alerts.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                self.publish(alerts)
+            except Exception as e:
+                self.publish_failures += len(alerts)
+                logging.error(f"Failed to publish {len(alerts)} fraud alerts: {e}")
+            finally:
+                for _ in alerts:
+                    self.queue.task_done()
+                if not self.queue.unfinished_tasks:
+                    self.flush_requested.clear()
+
+    def publish(self, alerts):
+        by_customer = OrderedDict()
+        for transaction in alerts:
+            by_customer.setdefault(transaction.get('customer_id'), []).append(transaction)
+        self.coalesced += len(alerts) - len(by_customer)
+        entries = [{'Id': str(i), 'Message': format_alert(customer_id, transactions)}
+                   for i, (customer_id, transactions) in enumerate(by_customer.items())]
+        for offset in range(0, len(entries), SNS_PUBLISH_BATCH_LIMIT):
+            batch = entries[offset:offset + SNS_PUBLISH_BATCH_LIMIT]
+            start = time.perf_counter()
+            response = self.sns_client.publish_batch(TopicArn=self.topic_arn, PublishBatchRequestEntries=batch)
+            self.publish_latency.record(time.perf_counter() - start)
+            failed = response.get('Failed', [])
+            self.messages_published += len(batch) - len(failed)
+            self.publish_failures += len(failed)
+            for failure in failed:
+                logging.error(f"Fraud alert {failure.get('Id')} not published: {failure.get('Message')}")
+
+    def metrics(self):
+        return {
+            'queue_depth': self.queue_depth(),
+            'submitted': self.submitted,
+            'rejected': self.rejected,
+            'coalesced': self.coalesced,
+            'messages_published': self.messages_published,
+            'publish_failures': self.publish_failures,
+            'publish_latency': self.publish_latency.summary()
+        }
+
+def format_alert(customer_id, transactions):
+    if len(transactions) == 1:
+        return f"Fraud detected: {json.dumps(transactions[0], default=str)}"
+    return (f"Fraud detected: {len(transactions)} transactions for customer {customer_id}: "
+            f"{json.dumps(transactions[-MAX_TRANSACTIONS_PER_MESSAGE:], default=str)}")
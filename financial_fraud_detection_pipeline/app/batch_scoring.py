@@ -0,0 +1,101 @@
+import io
+import json
+import time
+import logging
+
+# Batch limits for one invoke_endpoint call (SageMaker real-time payloads are capped at 6 MB)
+SCORING_BATCH_MAX_RECORDS = 1000
+SCORING_BATCH_MAX_BYTES = 5 * 1024 * 1024
+SCORING_FEATURES = ['amount']
+
+# A record without a feature value is scored as 0, as the per-record Lambda
+# scored a transaction with no amount, instead of failing its whole batch
+def feature_value(transaction, feature):
+    value = transaction.get(feature)
+    return 0 if value is None else value
+
+# Split a batch of transactions into index groups bounded by record count and payload size
+def build_scoring_batches(transactions, max_records=SCORING_BATCH_MAX_RECORDS,
+                          max_bytes=SCORING_BATCH_MAX_BYTES, features=SCORING_FEATURES):
+    overhead = len(encode_scoring_payload([], features))
+    batch, batch_bytes = [], overhead
+    for index, transaction in enumerate(transactions):
+        # Each value costs its JSON text plus a separating comma
+        row_bytes = sum(len(json.dumps(feature_value(transaction, feature))) + 1 for feature in features)
+        if batch and (len(batch) >= max_records or batch_bytes + row_bytes > max_bytes):
+            yield batch
+            batch, batch_bytes = [], overhead
+        batch.append(index)
+        batch_bytes += row_bytes
+    if batch:
+        yield batch
+
+# Columnar request body: one array per feature, rows in transaction order
+def encode_scoring_payload(transactions, features=SCORING_FEATURES):
+    return json.dumps(
+        {feature: [feature_value(transaction, feature) for transaction in transactions] for feature in features},
+        separators=(',', ':')
+    )
+
+# Score all transactions with one endpoint call per batch; predictions keep input order
+def score_transactions(transactions, sagemaker_runtime, endpoint_name,
+                       max_records=SCORING_BATCH_MAX_RECORDS, max_bytes=SCORING_BATCH_MAX_BYTES,
+                       features=SCORING_FEATURES):
+    predictions = [None] * len(transactions)
+    for indices in build_scoring_batches(transactions, max_records, max_bytes, features):
+        batch = [transactions[i] for i in indices]
+        response = sagemaker_runtime.invoke_endpoint(
+            EndpointName=endpoint_name,
+            ContentType='application/json',
+            Accept='application/json',
+            Body=encode_scoring_payload(batch, features)
+        )
+        batch_predictions = json.loads(response['Body'].read().decode())['predictions']
+        if len(batch_predictions) != len(indices):
+            raise ValueError(f"Endpoint returned {len(batch_predictions)} predictions for {len(indices)} transactions")
+        for i, prediction in zip(indices, batch_predictions):
+            predictions[i] = prediction
+        logging.info(f"Scored batch of {len(indices)} transactions")
+    return predictions
+
+# Local stand-in for the sagemaker-runtime client, running the endpoint's own
+# inference handlers in-process so batching can be exercised offline
+class LocalSageMakerRuntime:
+    def __init__(self, model=None, latency_seconds=0.0):
+        import train_isolation_forest
+        self.handlers = train_isolation_forest
+        if model is None:
+            import numpy as np
+            from sklearn.ensemble import IsolationForest
+            X_train = np.array([[500], [200], [15000], [1000], [300], [7000], [50], [12000]])
+            model = IsolationForest(contamination=0.1, random_state=42).fit(X_train)
+        self.model = model
+        self.latency_seconds = latency_seconds
+        self.invocations = 0
+
+    def invoke_endpoint(self, EndpointName, Body, ContentType='application/json', Accept='application/json'):
+        # Simulated network round-trip per call
+        if self.latency_seconds:
+            time.sleep(self.latency_seconds)
+        self.invocations += 1
+        input_data = self.handlers.input_fn(Body, ContentType)
+        prediction = self.handlers.predict_fn(input_data, self.model)
+        body = self.handlers.output_fn(prediction, Accept)
+        return {'Body': io.BytesIO(body.encode('utf-8')), 'ContentType': Accept}
+
+# Compare per-transaction calls against batched calls on the local stand-in
+if __name__ == "__main__":
+    import random
+    transactions = [{'customer_id': f"C{i % 100:03d}", 'amount': round(random.lognormvariate(6, 1.5), 2)}
+                    for i in range(5000)]
+    runtime = LocalSageMakerRuntime(latency_seconds=0.002)
+    start = time.perf_counter()
+    for transaction in transactions:
+        runtime.invoke_endpoint(EndpointName='local', Body=json.dumps({'amount': transaction['amount']}))
+    per_call = time.perf_counter() - start
+    runtime.invocations = 0
+    start = time.perf_counter()
+    score_transactions(transactions, runtime, 'local')
+    batched = time.perf_counter() - start
+    print(f"Per-transaction: {len(transactions) / per_call:.0f} txn/s")
+    print(f"Batched: {len(transactions) / batched:.0f} txn/s in {runtime.invocations} calls")
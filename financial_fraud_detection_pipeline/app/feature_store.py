@@ -0,0 +1,180 @@
+import os
+import math
+import pickle
+import logging
+import threading
+from array import array
+from datetime import datetime
+from collections import OrderedDict
+
+# Columns produced by CustomerFeatureStore.update(), in model input order
+FEATURE_COLUMNS = [
+    'amount', 'txn_count', 'amount_mean', 'amount_std', 'amount_zscore',
+    'seconds_since_last', 'merchant_is_new'
+]
+
+def to_epoch_seconds(timestamp):
+    if isinstance(timestamp, (int, float)):
+        return float(timestamp)
+    if hasattr(timestamp, 'timestamp'):
+        return timestamp.timestamp()
+    return datetime.fromisoformat(str(timestamp).replace('Z', '+00:00')).timestamp()
+
+# Rolling state for one customer: the last `window` amounts in a fixed-size ring
+# with running sum / sum of squares, plus a small ring of recently seen merchants
+class CustomerState:
+    __slots__ = ('amounts', 'head', 'count', 'total', 'total_sq', 'last_seen', 'merchants', 'merchant_head')
+
+    def __init__(self, window, merchant_window):
+        self.amounts = array('d', bytes(8 * window))
+        self.head = 0
+        self.count = 0
+        self.total = 0.0
+        self.total_sq = 0.0
+        self.last_seen = None
+        self.merchants = [None] * merchant_window
+        self.merchant_head = 0
+
+    def push(self, amount, seen_at, merchant):
+        evicted = self.amounts[self.head] if self.count == len(self.amounts) else 0.0
+        self.amounts[self.head] = amount
+        self.head = (self.head + 1) % len(self.amounts)
+        self.count = min(self.count + 1, len(self.amounts))
+        if self.head == 0:
+            # Once per lap of the ring, recompute the sums exactly so float drift cannot build up
+            self.total = sum(self.amounts[:self.count])
+            self.total_sq = sum(a * a for a in self.amounts[:self.count])
+        else:
+            self.total += amount - evicted
+            self.total_sq += amount * amount - evicted * evicted
+        self.last_seen = seen_at if self.last_seen is None else max(self.last_seen, seen_at)
+        if merchant not in self.merchants:
+            self.merchants[self.merchant_head] = merchant
+            self.merchant_head = (self.merchant_head + 1) % len(self.merchants)
+
+    def copy(self):
+        state = CustomerState.__new__(CustomerState)
+        for slot in self.__slots__:
+            setattr(state, slot, getattr(self, slot))
+        state.amounts = array('d', self.amounts)
+        state.merchants = list(self.merchants)
+        return state
+
+# In-memory per-customer feature store fed by the Kinesis path. update() is O(1)
+# per event; the least recently active customers are evicted past max_customers.
+# A batch that may be redelivered is scored with peek_many(), which leaves the
+# store untouched, and folded in with fold_many() only once it is stored, so a
+# retried batch is not counted twice.
+class CustomerFeatureStore:
+    def __init__(self, max_customers=1_000_000, window=50, merchant_window=8):
+        self.max_customers = max_customers
+        self.window = window
+        self.merchant_window = merchant_window
+        self.customers = OrderedDict()
+        self.lock = threading.Lock()
+        self.evictions = 0
+
+    # Features for this transaction from the customer's history so far, then fold it in
+    def update(self, transaction):
+        amount, seen_at, merchant = self.observation(transaction)
+        with self.lock:
+            state = self.state_for(transaction['customer_id'])
+            features = self.features(state, amount, seen_at, merchant)
+            state.push(amount, seen_at, merchant)
+        return features
+
+    def update_many(self, transactions):
+        return [self.update(transaction) for transaction in transactions]
+
+    # What update_many() would return, computed on copies of the customers'
+    # states; the store itself is not changed
+    def peek_many(self, transactions):
+        scratch, rows = {}, []
+        with self.lock:
+            for transaction in transactions:
+                amount, seen_at, merchant = self.observation(transaction)
+                customer_id = transaction['customer_id']
+                state = scratch.get(customer_id)
+                if state is None:
+                    stored = self.customers.get(customer_id)
+                    state = stored.copy() if stored is not None else CustomerState(self.window, self.merchant_window)
+                    scratch[customer_id] = state
+                rows.append(self.features(state, amount, seen_at, merchant))
+                state.push(amount, seen_at, merchant)
+        return rows
+
+    # Fold transactions into the history without computing their features
+    def fold_many(self, transactions):
+        observations = [(transaction['customer_id'], self.observation(transaction)) for transaction in transactions]
+        with self.lock:
+            for customer_id, (amount, seen_at, merchant) in observations:
+                self.state_for(customer_id).push(amount, seen_at, merchant)
+
+    def observation(self, transaction):
+        return float(transaction['amount']), to_epoch_seconds(transaction['timestamp']), transaction.get('merchant')
+
+    # Called with the lock held
+    def state_for(self, customer_id):
+        state = self.customers.get(customer_id)
+        if state is None:
+            state = CustomerState(self.window, self.merchant_window)
+            self.customers[customer_id] = state
+            if len(self.customers) > self.max_customers:
+                self.customers.popitem(last=False)
+                self.evictions += 1
+        else:
+            self.customers.move_to_end(customer_id)
+        return state
+
+    def features(self, state, amount, seen_at, merchant):
+        count = state.count
+        mean = state.total / count if count else amount
+        variance = max(state.total_sq / count - mean * mean, 0.0) if count else 0.0
+        std = math.sqrt(variance)
+        return [
+            amount,
+            float(count),
+            mean,
+            std,
+            (amount - mean) / std if std > 0 else 0.0,
+            max(seen_at - state.last_seen, 0.0) if state.last_seen is not None else -1.0,
+            0.0 if count and merchant in state.merchants else 1.0
+        ]
+
+    def __len__(self):
+        return len(self.customers)
+
+    # Write the store to disk atomically so a restarted consumer can resume warm.
+    # States are copied chunk_size customers at a time, so scoring threads only
+    # wait for one chunk; pickling and the write happen outside the lock.
+    def snapshot(self, path, chunk_size=10000):
+        with self.lock:
+            customer_ids = list(self.customers)
+        customers = []
+        for start in range(0, len(customer_ids), chunk_size):
+            with self.lock:
+                for customer_id in customer_ids[start:start + chunk_size]:
+                    state = self.customers.get(customer_id)
+                    if state is not None:
+                        state = state.copy()
+                        customers.append((customer_id, [getattr(state, slot) for slot in CustomerState.__slots__]))
+        data = pickle.dumps({'window': self.window, 'merchant_window': self.merchant_window, 'customers': customers},
+                            protocol=pickle.HIGHEST_PROTOCOL)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        logging.info(f"Snapshot {len(customers)} customer feature states to {path}")
+
+    @classmethod
+    def restore(cls, path, max_customers=1_000_000):
+        with open(path, 'rb') as f:
+            data = pickle.load(f)
+        store = cls(max_customers=max_customers, window=data['window'], merchant_window=data['merchant_window'])
+        for customer_id, values in data['customers'][-max_customers:]:
+            state = CustomerState.__new__(CustomerState)
+            for slot, value in zip(CustomerState.__slots__, values):
+                setattr(state, slot, value)
+            store.customers[customer_id] = state
+        logging.info(f"Restored {len(store.customers)} customer feature states from {path}")
+        return store
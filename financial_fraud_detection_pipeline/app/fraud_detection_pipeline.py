@@ -1,24 +1,44 @@
 import json
-import boto3
+import os
+import base64
+import sys
+import time
 import pandas as pd
-from datetime import datetime
+from datetime import datetime, timezone
 import numpy as np
-from sklearn.ensemble import IsolationForest
 import logging
-from fastapi import FastAPI
-import streamlit as st
-import requests
-import uvicorn
+import threading
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Query, HTTPException
 
-# Configure logging for audit trail (GDPR/CCPA compliance)
-logging.basicConfig(filename='fraud_audit.log', level=logging.INFO)
+# Shared pipeline utilities live at the repository root
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+from pipeline_common.metrics import LatencyTracker
+from pipeline_common.kinesis_producer import shared_producer, split_records
+from pipeline_common.redshift_executor import RedshiftStatementExecutor
+from pipeline_common.ttl_cache import TTLCache
+from pipeline_common.dedup import DuplicateFilter
+from pipeline_common.clients import aws_client
+from pipeline_common.raw_zone import object_key
+from batch_scoring import score_transactions
+from local_scorer import InProcessScorer
+from redshift_sink import RedshiftSink
+from alert_dispatcher import AlertDispatcher
+from feature_store import CustomerFeatureStore, FEATURE_COLUMNS
+from rule_engine import RuleEngine, AMBIGUOUS
 
-# AWS clients
-kinesis_client = boto3.client('kinesis')
-s3_client = boto3.client('s3')
-sns_client = boto3.client('sns')
-sagemaker_runtime = boto3.client('sagemaker-runtime')
-redshift_data = boto3.client('redshift-data')
+# Audit trail (GDPR/CCPA compliance), configured by the entry points rather than on import
+AUDIT_LOG_FILE = 'fraud_audit.log'
+
+def configure_audit_log():
+    logging.basicConfig(filename=AUDIT_LOG_FILE, level=logging.INFO)
+
+# AWS clients, created on first use and shared across the process
+kinesis_client = aws_client('kinesis')
+s3_client = aws_client('s3')
+sns_client = aws_client('sns')
+sagemaker_runtime = aws_client('sagemaker-runtime')
+redshift_data = aws_client('redshift-data')
 
 # Configuration
 KINESIS_STREAM = 'transaction-stream'
@@ -29,9 +49,77 @@ SAGEMAKER_ENDPOINT = 'fraud-detection-endpoint'
 REDSHIFT_CLUSTER = 'fraud-detection-cluster'
 REDSHIFT_DB = 'fraud_db'
 REDSHIFT_USER = 'admin'
+SCORING_BATCH_MAX_RECORDS = 1000
+SCORING_BATCH_MAX_BYTES = 5 * 1024 * 1024
+# 'endpoint' calls SageMaker; 'in_process' scores with the joblib model inside this process
+SCORING_MODE = os.environ.get('FRAUD_SCORING_MODE', 'endpoint')
+MODEL_URI = os.environ.get('FRAUD_MODEL_URI', f"s3://{S3_BUCKET_PROCESSED}/models/isolation_forest")
+MODEL_REFRESH_SECONDS = 60
+# Scored transactions are buffered and written in bulk ('insert' or 'copy')
+REDSHIFT_SINK_MODE = os.environ.get('REDSHIFT_SINK_MODE', 'insert')
+REDSHIFT_SINK_MAX_ROWS = 500
+REDSHIFT_SINK_MAX_AGE_SECONDS = 5.0
+REDSHIFT_COPY_ROLE_ARN = os.environ.get('REDSHIFT_COPY_ROLE_ARN', 'arn:aws:iam::YOUR_ACCOUNT:role/redshift-copy')
+# Fraud alerts are published off the scoring path, coalesced per customer
+ALERT_QUEUE_SIZE = 10000
+ALERT_COALESCE_WINDOW_SECONDS = 1.0
+ALERT_DRAIN_TIMEOUT_SECONDS = 5.0
+# Fraud feed pages are cached briefly and dropped whenever flagged rows are stored
+FRAUD_FEED_CACHE_TTL_SECONDS = 5.0
+FRAUD_FEED_CACHE_ENTRIES = 256
+# Per-customer rolling features computed in-process from the stream
+MODEL_FEATURES = os.environ.get('FRAUD_MODEL_FEATURES', 'amount').split(',')
+FEATURE_STORE_MAX_CUSTOMERS = 1_000_000
+FEATURE_STORE_SNAPSHOT_PATH = os.environ.get('FEATURE_STORE_SNAPSHOT_PATH', '/tmp/fraud_feature_store.pkl')
+FEATURE_STORE_SNAPSHOT_SECONDS = 300
+# Replayed Kinesis records are dropped if seen within the window
+DEDUP_WINDOW_SECONDS = 3600
+DEDUP_CAPACITY_PER_GENERATION = 1_000_000
+# Rule pre-filter: only transactions no rule decides are sent to the model
+FRAUD_RULES_PATH = os.environ.get('FRAUD_RULES_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fraud_rules.json'))
+
+# Scoring latency per call, kept per mode so the two paths can be compared
+scoring_latency = {'endpoint': LatencyTracker(), 'in_process': LatencyTracker()}
+local_scorer = None
+
+statement_executor = RedshiftStatementExecutor(redshift_data, REDSHIFT_CLUSTER, REDSHIFT_DB, REDSHIFT_USER)
+fraud_feed_cache = TTLCache(max_entries=FRAUD_FEED_CACHE_ENTRIES, ttl_seconds=FRAUD_FEED_CACHE_TTL_SECONDS)
+
+redshift_sink = RedshiftSink(
+    redshift_data, REDSHIFT_CLUSTER, REDSHIFT_DB, REDSHIFT_USER,
+    mode=REDSHIFT_SINK_MODE, max_rows=REDSHIFT_SINK_MAX_ROWS, max_age_seconds=REDSHIFT_SINK_MAX_AGE_SECONDS,
+    s3_client=s3_client, staging_bucket=S3_BUCKET_PROCESSED, iam_role=REDSHIFT_COPY_ROLE_ARN,
+    on_flush=lambda rows: invalidate_fraud_feed(rows)
+)
+
+alert_dispatcher = AlertDispatcher(
+    sns_client, SNS_TOPIC_ARN, max_queue=ALERT_QUEUE_SIZE, coalesce_window_seconds=ALERT_COALESCE_WINDOW_SECONDS
+)
+
+# Created by get_feature_store() on first use
+feature_store = None
+last_feature_snapshot = None
+feature_snapshot_thread = None
+
+# Separate filters per stage: a record that passed preprocessing must still reach detection
+preprocess_dedup = DuplicateFilter(DEDUP_WINDOW_SECONDS, capacity_per_generation=DEDUP_CAPACITY_PER_GENERATION)
+detect_dedup = DuplicateFilter(DEDUP_WINDOW_SECONDS, capacity_per_generation=DEDUP_CAPACITY_PER_GENERATION)
+
+# Rules are compiled once per container; without a rules file every row is scored
+records_per_call = SCORING_BATCH_MAX_RECORDS if SCORING_MODE == 'endpoint' else None
+if os.path.exists(FRAUD_RULES_PATH):
+    rule_engine = RuleEngine.from_file(FRAUD_RULES_PATH, records_per_call=records_per_call)
+else:
+    rule_engine = RuleEngine(records_per_call=records_per_call)
+
+# The API server configures the audit log as it starts
+@asynccontextmanager
+async def lifespan(app):
+    configure_audit_log()
+    yield
 
 # FastAPI for demo API
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 
 # Mock transaction data
 mock_transactions = [
@@ -40,124 +128,300 @@ mock_transactions = [
     {"customer_id": "C001", "amount": 200, "timestamp": "2025-07-07T17:02:00Z", "merchant": "Grocery"}
 ]
 
-# Ingest transactions to Kinesis
+# Ingest transactions to Kinesis (batched put_records through the shared producer)
 def ingest_to_kinesis(transactions):
-    for transaction in transactions:
-        kinesis_client.put_record(
-            StreamName=KINESIS_STREAM,
-            Data=json.dumps(transaction),
-            PartitionKey=transaction['customer_id']
-        )
-        logging.info(f"Ingested transaction: {transaction['customer_id']}")
+    producer = shared_producer(kinesis_client, KINESIS_STREAM)
+    producer.put_many(transactions)
+    producer.flush()
+    logging.info(f"Ingested {len(transactions)} transactions")
     print("Transactions sent to Kinesis")
 
 # Lambda handler for preprocessing (simulate locally)
 def preprocess_lambda(event):
-    transactions = [json.loads(record['kinesis']['data']) for record in event['Records']]
+    configure_audit_log()
+    transactions = [t for record in event['Records'] for t in split_records(record['kinesis']['data'])]
+    # Fingerprints are only remembered once the batch is in S3, so a retry after a failed put is not dropped
+    transactions, keys = preprocess_dedup.check(transactions)
+    if not transactions:
+        return []
     df = pd.DataFrame(transactions)
     # Clean and normalize
     df['amount'] = df['amount'].astype(float)
     df['timestamp'] = pd.to_datetime(df['timestamp'])
-    # Store raw data in S3
-    s3_key = f"transactions/{datetime.now().strftime('%Y%m%d%H%M%S')}.json"
+    # Store raw data in S3 under a collision-free key: two batches in the same
+    # second must not overwrite each other once their fingerprints are committed
+    s3_key = object_key('transactions', None, f"{datetime.now(timezone.utc):%Y-%m-%d}", '.json')
     s3_client.put_object(
         Bucket=S3_BUCKET_RAW,
         Key=s3_key,
         Body=df.to_json(orient='records')
     )
+    preprocess_dedup.commit(keys)
     return df.to_dict(orient='records')
 
 # Train and deploy SageMaker model (run in SageMaker notebook)
 def train_sagemaker_model():
+    from sklearn.ensemble import IsolationForest
     # Sample training data
     X_train = np.array([[500], [200], [15000], [1000]])  # Amounts
     model = IsolationForest(contamination=0.1, random_state=42)
     model.fit(X_train)
-    # Save model to S3 (simplified; use SageMaker for production)
+    # Save model to S3 as a new version (simplified; use SageMaker for production)
     import joblib
     joblib.dump(model, '/tmp/model.joblib')
-    s3_client.upload_file('/tmp/model.joblib', S3_BUCKET_PROCESSED, 'models/isolation_forest.joblib')
+    version = datetime.utcnow().strftime('%Y%m%d%H%M%S')
+    s3_client.upload_file('/tmp/model.joblib', S3_BUCKET_PROCESSED, f"models/isolation_forest/{version}/model.joblib")
     print("Model trained and saved")
 
+# In-process scorer, created once per container and refreshed as new versions land
+def get_local_scorer():
+    global local_scorer
+    if local_scorer is None:
+        local_scorer = InProcessScorer(MODEL_URI, s3_client=s3_client, refresh_interval_seconds=MODEL_REFRESH_SECONDS)
+        local_scorer.load()
+    return local_scorer
+
+# Feature store, loaded on first use. It resumes from the last snapshot so a
+# restarted container starts with warm features.
+def get_feature_store():
+    global feature_store, last_feature_snapshot
+    if feature_store is None:
+        if os.path.exists(FEATURE_STORE_SNAPSHOT_PATH):
+            feature_store = CustomerFeatureStore.restore(FEATURE_STORE_SNAPSHOT_PATH,
+                                                         max_customers=FEATURE_STORE_MAX_CUSTOMERS)
+        else:
+            feature_store = CustomerFeatureStore(max_customers=FEATURE_STORE_MAX_CUSTOMERS)
+        last_feature_snapshot = time.monotonic()
+    return feature_store
+
+# Build feature rows for a batch from the in-memory feature store (no network hop).
+# The store is not changed here; detect_fraud_lambda folds the batch in once it is stored.
+def build_feature_rows(transactions):
+    return [dict(zip(FEATURE_COLUMNS, features)) for features in get_feature_store().peek_many(transactions)]
+
+# Snapshot the feature store every FEATURE_STORE_SNAPSHOT_SECONDS on a background
+# thread, off the scoring path. The file is replaced atomically, so a snapshot
+# cut short when Lambda freezes the container leaves the previous one in place.
+def snapshot_feature_store_if_due():
+    global last_feature_snapshot, feature_snapshot_thread
+    if time.monotonic() - last_feature_snapshot < FEATURE_STORE_SNAPSHOT_SECONDS:
+        return
+    if feature_snapshot_thread is not None and feature_snapshot_thread.is_alive():
+        return
+    last_feature_snapshot = time.monotonic()
+    feature_snapshot_thread = threading.Thread(target=snapshot_feature_store, args=(get_feature_store(),),
+                                               name='feature-store-snapshot', daemon=True)
+    feature_snapshot_thread.start()
+
+def snapshot_feature_store(store):
+    try:
+        store.snapshot(FEATURE_STORE_SNAPSHOT_PATH)
+    except Exception as e:
+        logging.error(f"Feature store snapshot failed: {e}")
+
+# Score a batch with the configured scoring mode
+def score_batch(transactions):
+    start = time.perf_counter()
+    rows = build_feature_rows(transactions)
+    frame = pd.DataFrame.from_records(rows, columns=FEATURE_COLUMNS)
+    frame['customer_id'] = [transaction['customer_id'] for transaction in transactions]
+    frame['merchant'] = [transaction.get('merchant') for transaction in transactions]
+    decisions = rule_engine.evaluate(frame)
+    ambiguous = np.flatnonzero(decisions == AMBIGUOUS)
+    predictions = decisions.astype(int).tolist()
+    if len(ambiguous):
+        model_rows = [rows[i] for i in ambiguous]
+        if SCORING_MODE == 'in_process':
+            scorer = get_local_scorer()
+            scorer.refresh()
+            model_predictions = scorer.score_transactions(model_rows, features=MODEL_FEATURES)
+        else:
+            # One SageMaker call per payload-sized chunk
+            model_predictions = score_transactions(
+                model_rows, sagemaker_runtime, SAGEMAKER_ENDPOINT,
+                max_records=SCORING_BATCH_MAX_RECORDS, max_bytes=SCORING_BATCH_MAX_BYTES,
+                features=MODEL_FEATURES
+            )
+        for i, prediction in zip(ambiguous, model_predictions):
+            predictions[i] = prediction
+    scoring_latency[SCORING_MODE].record(time.perf_counter() - start)
+    return predictions
+
 # Lambda handler for anomaly detection (simulate locally)
 def detect_fraud_lambda(transactions):
+    configure_audit_log()
+    transactions, keys = detect_dedup.check(transactions)
+    if not transactions:
+        return []
+    predictions = score_batch(transactions)
+    stored = 0
+    try:
+        for transaction, prediction in zip(transactions, predictions):
+            transaction['fraud_flag'] = bool(prediction == -1)  # Anomaly detected
+            # Store in Redshift
+            stored += 1
+            store_in_redshift(transaction)
+        redshift_sink.flush()
+    except Exception:
+        # The batch will be redelivered. Rows still buffered are dropped so the retry
+        # does not store them twice; only rows that reached Redshift are committed.
+        unwritten = redshift_sink.discard(transactions[:stored])
+        written = [i for i in range(stored) if i not in unwritten]
+        commit_detected([transactions[i] for i in written], [keys[i] for i in written])
+        alert_dispatcher.drain(ALERT_DRAIN_TIMEOUT_SECONDS)
+        raise
+    commit_detected(transactions, keys)
+    snapshot_feature_store_if_due()
+    # Lambda freezes the container after returning, so publish queued alerts first
+    alert_dispatcher.drain(ALERT_DRAIN_TIMEOUT_SECONDS)
+    return transactions
+
+# Transactions that reached Redshift are remembered as seen, folded into the
+# customer features and alerted on. A batch that failed does all three when it
+# is redelivered, so its features and alerts are not counted twice.
+def commit_detected(transactions, keys):
+    detect_dedup.commit(keys)
+    get_feature_store().fold_many(transactions)
     for transaction in transactions:
-        # Call SageMaker endpoint
-        payload = json.dumps({'amount': transaction['amount']})
-        response = sagemaker_runtime.invoke_endpoint(
-            EndpointName=SAGEMAKER_ENDPOINT,
-            ContentType='application/json',
-            Body=payload
-        )
-        prediction = json.loads(response['Body'].read().decode())['prediction']
-        if prediction == -1:  # Anomaly detected
-            transaction['fraud_flag'] = True
-            sns_client.publish(
-                TopicArn=SNS_TOPIC_ARN,
-                Message=f"Fraud detected: {json.dumps(transaction)}"
-            )
+        if transaction['fraud_flag']:
+            alert_dispatcher.submit(transaction)
             logging.info(f"Fraud detected for transaction: {transaction['customer_id']}")
-        else:
-            transaction['fraud_flag'] = False
-        # Store in Redshift
-        store_in_redshift(transaction)
-    return transactions
 
-# Store in Redshift
+# Store in Redshift (buffered; flushed in bulk on size or age)
 def store_in_redshift(transaction):
-    query = f"""
-    INSERT INTO transactions (customer_id, amount, timestamp, merchant, fraud_flag)
-    VALUES ('{transaction['customer_id']}', {transaction['amount']}, '{transaction['timestamp']}',
-            '{transaction['merchant']}', {transaction['fraud_flag']})
-    """
-    redshift_data.execute_statement(
-        ClusterIdentifier=REDSHIFT_CLUSTER,
-        Database=REDSHIFT_DB,
-        DbUser=REDSHIFT_USER,
-        Sql=query
-    )
-    logging.info(f"Stored transaction in Redshift: {transaction['customer_id']}")
+    redshift_sink.add(transaction)
+
+# Drop cached fraud feed pages once newly flagged transactions reach Redshift.
+# Only this process's cache is cleared; other API workers rely on the short TTL.
+def invalidate_fraud_feed(rows):
+    flag_index = redshift_sink.columns.index('fraud_flag')
+    if any(row[flag_index] for row in rows):
+        fraud_feed_cache.clear()
+
+# Keyset cursor: the sort key of the last row on a page. Timestamps are not
+# unique, so customer, amount and merchant break ties and no row is skipped.
+FEED_KEY_COLUMNS = ('timestamp', 'customer_id', 'amount', "COALESCE(merchant, '')")
+
+def encode_cursor(transaction):
+    key = json.dumps([str(transaction['timestamp']), transaction['customer_id'], transaction['amount'],
+                      transaction.get('merchant') or ''])
+    return base64.urlsafe_b64encode(key.encode('utf-8')).decode('ascii')
+
+def decode_cursor(cursor):
+    try:
+        key = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if not isinstance(key, list) or len(key) != len(FEED_KEY_COLUMNS):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return key
 
-# FastAPI endpoint for demo
+# Rows whose sort key is before (<) or after (>) the :key_<i> parameters
+def keyset_condition(op):
+    terms = []
+    for i, column in enumerate(FEED_KEY_COLUMNS):
+        equal = [f"{previous} = :key_{j}" for j, previous in enumerate(FEED_KEY_COLUMNS[:i])]
+        terms.append('(' + ' AND '.join(equal + [f"{column} {op} :key_{i}"]) + ')')
+    return '(' + ' OR '.join(terms) + ')'
+
+# FastAPI endpoint for demo: flagged transactions in keyset pages. Without since
+# the feed is newest first; pass next_cursor back as cursor for the next (older)
+# page. Polling passes since (the latest_cursor of its last response) and gets
+# the transactions stored after it, oldest first; while next_cursor is set there
+# are more, so poll again with the new latest_cursor.
 @app.get("/api/fraud/transactions")
-async def get_fraud_transactions():
-    query = """
+async def get_fraud_transactions(limit: int = Query(100, ge=1, le=1000), cursor: str = None, since: str = None):
+    cache_key = (limit, cursor, since)
+    page = fraud_feed_cache.get(cache_key)
+    if page is not None:
+        return page
+    conditions, parameters = ["fraud_flag = true"], {}
+    order = 'ASC' if since else 'DESC'
+    after = cursor or since
+    if after:
+        parameters.update((f"key_{i}", value) for i, value in enumerate(decode_cursor(after)))
+        conditions.append(keyset_condition('>' if since else '<'))
+    query = f"""
     SELECT customer_id, amount, timestamp, merchant, fraud_flag
     FROM transactions
-    WHERE fraud_flag = true
+    WHERE {' AND '.join(conditions)}
+    ORDER BY {', '.join(f"{column} {order}" for column in FEED_KEY_COLUMNS)}
+    LIMIT {limit + 1}
     """
-    response = redshift_data.execute_statement(
-        ClusterIdentifier=REDSHIFT_CLUSTER,
-        Database=REDSHIFT_DB,
-        DbUser=REDSHIFT_USER,
-        Sql=query
-    )
-    # Wait for query completion (simplified)
-    result = redshift_data.get_statement_result(Id=response['Id'])
-    transactions = [
-        {
-            'customer_id': record[0]['stringValue'],
-            'amount': record[1]['doubleValue'],
-            'timestamp': record[2]['stringValue'],
-            'merchant': record[3]['stringValue'],
-            'fraud_flag': record[4]['booleanValue']
-        } for record in result['Records']
-    ]
-    return transactions
+    rows = await statement_executor.fetch_rows(query, parameters)
+    transactions = rows[:limit]
+    if since:
+        latest = encode_cursor(transactions[-1]) if transactions else after
+    else:
+        latest = encode_cursor(transactions[0]) if transactions else None
+    page = {
+        'transactions': transactions,
+        'next_cursor': encode_cursor(transactions[-1]) if len(rows) > limit else None,
+        'latest_cursor': latest
+    }
+    fraud_feed_cache.put(cache_key, page)
+    return page
+
+# FastAPI endpoint exposing scoring latency for both scoring modes
+@app.get("/api/fraud/scoring/metrics")
+async def get_scoring_metrics():
+    return {
+        'mode': SCORING_MODE,
+        'endpoint': scoring_latency['endpoint'].summary(),
+        'in_process': scoring_latency['in_process'].summary(),
+        'in_process_model': local_scorer.metrics() if local_scorer else None
+    }
+
+# FastAPI endpoint exposing Redshift sink flush sizes and latency
+@app.get("/api/fraud/sink/metrics")
+async def get_sink_metrics():
+    return redshift_sink.metrics()
+
+# FastAPI endpoint exposing alert queue depth and publish latency
+@app.get("/api/fraud/alerts/metrics")
+async def get_alert_metrics():
+    return alert_dispatcher.metrics()
+
+@app.get("/api/fraud/dedup/metrics")
+async def get_dedup_metrics():
+    return {'preprocess': preprocess_dedup.metrics(), 'detect': detect_dedup.metrics()}
+
+@app.get("/api/fraud/rules/metrics")
+async def get_rule_metrics():
+    return rule_engine.metrics()
 
 # Streamlit UI for demo
 def run_streamlit():
+    import requests
+    import streamlit as st
+    configure_audit_log()
     st.title("Real-Time Financial Fraud Detection")
     st.write("Live Fraud Alerts")
     if st.button("Simulate Transactions"):
         ingest_to_kinesis(mock_transactions)
         st.write("Transactions sent to pipeline")
-    # Fetch and display flagged transactions
-    response = requests.get("http://localhost:8000/api/fraud/transactions")
+    # Fetch flagged transactions incrementally: only rows newer than the last poll,
+    # paging until caught up so a burst larger than one page is not skipped
+    if 'fraud_transactions' not in st.session_state:
+        st.session_state.fraud_transactions = []
+        st.session_state.fraud_latest = None
+    while True:
+        params = {'limit': 500}
+        if st.session_state.fraud_latest:
+            params['since'] = st.session_state.fraud_latest
+        response = requests.get("http://localhost:8000/api/fraud/transactions", params=params)
+        if response.status_code != 200:
+            break
+        page = response.json()
+        # The first poll comes back newest first, later ones oldest first
+        fresh = page['transactions'][::-1] if 'since' in params else page['transactions']
+        st.session_state.fraud_transactions = fresh + st.session_state.fraud_transactions
+        st.session_state.fraud_latest = page['latest_cursor']
+        if 'since' not in params or not page['next_cursor']:
+            break
     if response.status_code == 200:
-        fraud_transactions = response.json()
         st.write("**Flagged Transactions**")
-        df = pd.DataFrame(fraud_transactions)
+        df = pd.DataFrame(st.session_state.fraud_transactions)
         st.dataframe(df)
         # Simple chart
         if not df.empty:
@@ -167,6 +431,8 @@ def run_streamlit():
 
 # Main execution (for demo)
 if __name__ == "__main__":
+    import uvicorn
+    configure_audit_log()
     # Simulate model training (run in SageMaker for production)
     train_sagemaker_model()
     # Ingest mock data
@@ -0,0 +1,114 @@
+import os
+import time
+import logging
+import threading
+import numpy as np
+from pipeline_common.metrics import LatencyTracker
+
+# Model directory layout shared by local paths and S3 prefixes:
+#   <model_uri>/<version>/model.joblib
+# Versions sort in release order (integers or zero-padded timestamps).
+MODEL_FILENAME = 'model.joblib'
+
+def version_sort_key(version):
+    return (0, int(version), '') if version.isdigit() else (1, 0, version)
+
+# In-process IsolationForest scorer: loads the joblib artifact once per container
+# and hot-swaps to newer versions while batches already being scored keep their model
+class InProcessScorer:
+    def __init__(self, model_uri, s3_client=None, cache_dir='/tmp/fraud-models', refresh_interval_seconds=60):
+        self.model_uri = model_uri.rstrip('/')
+        self.s3_client = s3_client
+        self.cache_dir = cache_dir
+        self.refresh_interval_seconds = refresh_interval_seconds
+        self.active = None  # (version, model), replaced as a whole on swap
+        self.swap_lock = threading.Lock()
+        self.last_refresh = 0.0
+        self.cold_start_seconds = None
+        self.swaps = 0
+        self.rows_scored = 0
+        self.batch_latency = LatencyTracker()
+
+    def list_versions(self):
+        if self.model_uri.startswith('s3://'):
+            bucket, _, prefix = self.model_uri[len('s3://'):].partition('/')
+            paginator = self.s3_client.get_paginator('list_objects_v2')
+            versions = []
+            for page in paginator.paginate(Bucket=bucket, Prefix=f"{prefix}/", Delimiter='/'):
+                versions.extend(p['Prefix'][len(prefix) + 1:].rstrip('/') for p in page.get('CommonPrefixes', []))
+        else:
+            versions = [v for v in os.listdir(self.model_uri)
+                        if os.path.isfile(os.path.join(self.model_uri, v, MODEL_FILENAME))]
+        return sorted(versions, key=version_sort_key)
+
+    def fetch_artifact(self, version):
+        if not self.model_uri.startswith('s3://'):
+            return os.path.join(self.model_uri, version, MODEL_FILENAME)
+        bucket, _, prefix = self.model_uri[len('s3://'):].partition('/')
+        local_path = os.path.join(self.cache_dir, version, MODEL_FILENAME)
+        if not os.path.exists(local_path):
+            os.makedirs(os.path.dirname(local_path), exist_ok=True)
+            # Download beside the final path and rename so readers never see a partial file
+            self.s3_client.download_file(bucket, f"{prefix}/{version}/{MODEL_FILENAME}", local_path + '.part')
+            os.replace(local_path + '.part', local_path)
+        return local_path
+
+    # Load a version (latest by default) and swap it in atomically
+    def load(self, version=None):
+        start = time.perf_counter()
+        if version is None:
+            versions = self.list_versions()
+            if not versions:
+                raise FileNotFoundError(f"No model versions found under {self.model_uri}")
+            version = versions[-1]
+        import joblib
+        model = joblib.load(self.fetch_artifact(version))
+        self.last_refresh = time.monotonic()
+        with self.swap_lock:
+            first_load = self.active is None
+            self.active = (version, model)
+            if first_load:
+                self.cold_start_seconds = time.perf_counter() - start
+            else:
+                self.swaps += 1
+        logging.info(f"Loaded fraud model version {version} in {time.perf_counter() - start:.3f}s")
+        return version
+
+    # Swap to a newer version if one has been published since the last check
+    def refresh(self, force=False):
+        now = time.monotonic()
+        if not force and now - self.last_refresh < self.refresh_interval_seconds:
+            return False
+        self.last_refresh = now
+        versions = self.list_versions()
+        if versions and (self.active is None or version_sort_key(versions[-1]) > version_sort_key(self.active[0])):
+            self.load(versions[-1])
+            return True
+        return False
+
+    # Score a feature matrix; IsolationForest flags rows with negative decision scores
+    def score(self, X):
+        if self.active is None:
+            self.load()
+        version, model = self.active
+        start = time.perf_counter()
+        scores = model.decision_function(np.asarray(X, dtype=float))
+        self.batch_latency.record(time.perf_counter() - start)
+        self.rows_scored += len(scores)
+        return np.where(scores < 0, -1, 1), version
+
+    def score_transactions(self, transactions, features=('amount',)):
+        if not transactions:
+            return []
+        X = np.array([[transaction[feature] for feature in features] for transaction in transactions], dtype=float)
+        predictions, _ = self.score(X.reshape(len(transactions), len(features)))
+        return predictions.tolist()
+
+    def metrics(self):
+        return {
+            'model_version': self.active[0] if self.active else None,
+            'cold_start_seconds': self.cold_start_seconds,
+            'swaps': self.swaps,
+            'rows_scored': self.rows_scored,
+            'batch_latency': self.batch_latency.summary()
+        }
@@ -0,0 +1,182 @@
+import io
+import csv
+import gzip
+import time
+import uuid
+import logging
+import threading
+from pipeline_common.metrics import LatencyTracker
+
+TRANSACTION_COLUMNS = ('customer_id', 'amount', 'timestamp', 'merchant', 'fraud_flag')
+
+# Poll the Data API until a submitted statement finishes
+def wait_for_statement(redshift_data, statement_id, timeout_seconds=60):
+    delay = 0.05
+    deadline = time.monotonic() + timeout_seconds
+    while True:
+        description = redshift_data.describe_statement(Id=statement_id)
+        status = description['Status']
+        if status == 'FINISHED':
+            return description
+        if status in ('FAILED', 'ABORTED'):
+            raise RuntimeError(f"Redshift statement {statement_id} {status}: {description.get('Error')}")
+        if time.monotonic() > deadline:
+            raise TimeoutError(f"Redshift statement {statement_id} still {status} after {timeout_seconds}s")
+        time.sleep(delay)
+        delay = min(delay * 2, 1.0)
+
+def to_parameter_value(value):
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    return str(value)
+
+# NULL in the staged CSV for COPY. An empty field would load into a VARCHAR as
+# '' rather than NULL, so NULL gets a marker of its own and empty strings stay
+# empty strings, as in INSERT mode
+COPY_NULL = '\\N'
+
+# Data API parameter; NULL has to be sent as isNull rather than a value
+def to_parameter(name, value):
+    if value is None:
+        return {'name': name, 'isNull': True}
+    return {'name': name, 'value': to_parameter_value(value)}
+
+# Buffered sink for scored transactions. Rows accumulate until the buffer reaches
+# max_rows or its oldest row is max_age_seconds old, then go out either as
+# parameterized multi-row INSERTs ('insert') or as a gzipped CSV staged in S3
+# and loaded with one COPY ('copy').
+class RedshiftSink:
+    def __init__(self, redshift_data, cluster, database, db_user, table='transactions',
+                 columns=TRANSACTION_COLUMNS, mode='insert', max_rows=500, max_age_seconds=5.0,
+                 rows_per_statement=100, s3_client=None, staging_bucket=None,
+                 staging_prefix='staging/transactions/', iam_role=None, wait=True, on_flush=None):
+        self.redshift_data = redshift_data
+        self.statement_args = {'ClusterIdentifier': cluster, 'Database': database, 'DbUser': db_user}
+        self.table = table
+        self.columns = columns
+        self.mode = mode
+        self.max_rows = max_rows
+        self.max_age_seconds = max_age_seconds
+        self.rows_per_statement = rows_per_statement
+        self.s3_client = s3_client
+        self.staging_bucket = staging_bucket
+        self.staging_prefix = staging_prefix
+        self.iam_role = iam_role
+        self.wait = wait
+        self.on_flush = on_flush
+        self.buffer = []
+        self.oldest = None
+        self.lock = threading.Lock()
+        self.flush_latency = LatencyTracker()
+        self.rows_flushed = 0
+        self.last_flush = None
+
+    def add(self, transaction):
+        with self.lock:
+            if not self.buffer:
+                self.oldest = time.monotonic()
+            self.buffer.append(tuple(transaction.get(column) for column in self.columns))
+        self.flush_if_due()
+
+    def add_many(self, transactions):
+        for transaction in transactions:
+            self.add(transaction)
+
+    # Remove these transactions' rows from the buffer (each at most once) and
+    # return the indexes of those that were still buffered, i.e. not yet written.
+    # For callers that will redeliver a failed batch and must not buffer it twice.
+    def discard(self, transactions):
+        wanted = {}
+        for index, transaction in enumerate(transactions):
+            wanted.setdefault(tuple(transaction.get(column) for column in self.columns), []).append(index)
+        removed = set()
+        with self.lock:
+            kept = []
+            for row in self.buffer:
+                indexes = wanted.get(row)
+                if indexes:
+                    removed.add(indexes.pop(0))
+                else:
+                    kept.append(row)
+            self.buffer = kept
+            if not kept:
+                self.oldest = None
+        return removed
+
+    def flush_if_due(self):
+        with self.lock:
+            due = self.buffer and (len(self.buffer) >= self.max_rows
+                                   or time.monotonic() - self.oldest >= self.max_age_seconds)
+        if due:
+            self.flush()
+
+    def flush(self):
+        with self.lock:
+            rows, self.buffer = self.buffer, []
+            self.oldest = None
+        if not rows:
+            return 0
+        start = time.perf_counter()
+        # Each INSERT commits on its own, so count what is already in the table
+        written = 0
+        try:
+            if self.mode == 'copy':
+                self.copy_rows(rows)
+            else:
+                for i in range(0, len(rows), self.rows_per_statement):
+                    self.insert_rows(rows[i:i + self.rows_per_statement])
+                    written = min(i + self.rows_per_statement, len(rows))
+        except Exception:
+            # Put the unwritten rows back ahead of anything buffered since, so a retry keeps arrival order
+            with self.lock:
+                self.buffer = rows[written:] + self.buffer
+                self.oldest = time.monotonic()
+            if written:
+                self.rows_flushed += written
+                if self.on_flush:
+                    self.on_flush(rows[:written])
+            raise
+        elapsed = time.perf_counter() - start
+        self.flush_latency.record(elapsed)
+        self.rows_flushed += len(rows)
+        self.last_flush = {'rows': len(rows), 'latency_ms': round(elapsed * 1000, 3), 'mode': self.mode}
+        logging.info(f"Flushed {len(rows)} transactions to Redshift via {self.mode} in {elapsed * 1000:.1f} ms")
+        if self.on_flush:
+            self.on_flush(rows)
+        return len(rows)
+
+    def insert_rows(self, rows):
+        placeholders, parameters = [], []
+        for i, row in enumerate(rows):
+            placeholders.append('(' + ', '.join(f":{column}_{i}" for column in self.columns) + ')')
+            parameters.extend(to_parameter(f"{column}_{i}", value) for column, value in zip(self.columns, row))
+        sql = f"INSERT INTO {self.table} ({', '.join(self.columns)}) VALUES {', '.join(placeholders)}"
+        self.execute(sql, parameters)
+
+    def copy_rows(self, rows):
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerows([to_parameter_value(value) if value is not None else COPY_NULL for value in row] for row in rows)
+        key = f"{self.staging_prefix}{uuid.uuid4().hex}.csv.gz"
+        self.s3_client.put_object(Bucket=self.staging_bucket, Key=key,
+                                  Body=gzip.compress(buffer.getvalue().encode('utf-8')))
+        sql = (f"COPY {self.table} ({', '.join(self.columns)}) FROM 's3://{self.staging_bucket}/{key}' "
+               f"IAM_ROLE '{self.iam_role}' FORMAT AS CSV GZIP TIMEFORMAT 'auto' NULL AS '{COPY_NULL}'")
+        self.execute(sql)
+
+    def execute(self, sql, parameters=None):
+        kwargs = dict(self.statement_args, Sql=sql)
+        if parameters:
+            kwargs['Parameters'] = parameters
+        response = self.redshift_data.execute_statement(**kwargs)
+        if self.wait:
+            wait_for_statement(self.redshift_data, response['Id'])
+        return response['Id']
+
+    def metrics(self):
+        return {
+            'buffered_rows': len(self.buffer),
+            'rows_flushed': self.rows_flushed,
+            'last_flush': self.last_flush,
+            'flush_latency': self.flush_latency.summary()
+        }
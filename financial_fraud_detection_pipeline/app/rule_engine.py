@@ -0,0 +1,150 @@
+import json
+import math
+import operator
+import threading
+import numpy as np
+import pandas as pd
+
+# Rule decisions; DENY and SAFE match the model's -1 / 1 predictions
+DENY = -1
+AMBIGUOUS = 0
+SAFE = 1
+
+# Condition keys are <column>_<op>, e.g. amount_lt, merchant_in, txn_count_gte
+COMPARISONS = {'gt': operator.gt, 'gte': operator.ge, 'lt': operator.lt, 'lte': operator.le, 'eq': operator.eq}
+SUFFIXES = sorted(['in', 'not_in'] + list(COMPARISONS), key=len, reverse=True)
+
+def parse_condition(key, value):
+    for suffix in SUFFIXES:
+        if key.endswith('_' + suffix):
+            column = key[:-len(suffix) - 1]
+            if suffix in ('in', 'not_in'):
+                return column, suffix, frozenset(value)
+            return column, suffix, value
+    raise ValueError(f"Unknown rule condition {key!r}")
+
+# One named rule: all of its conditions must hold (AND)
+class Rule:
+    def __init__(self, name, conditions):
+        self.name = name
+        self.conditions = [parse_condition(key, value) for key, value in conditions.items()]
+        if not self.conditions:
+            raise ValueError(f"Rule {name!r} has no conditions")
+
+    def columns(self):
+        return {column for column, _, _ in self.conditions}
+
+    def mask(self, frame):
+        mask = np.ones(len(frame), dtype=bool)
+        for column, op, value in self.conditions:
+            if op == 'in':
+                mask &= frame[column].isin(value).to_numpy()
+            elif op == 'not_in':
+                mask &= ~frame[column].isin(value).to_numpy()
+            else:
+                # NaN compares False, so rows missing the value never match
+                mask &= COMPARISONS[op](frame[column].to_numpy(dtype=float), value)
+        return mask
+
+# Vectorized pre-filter in front of the model. Rules are loaded and compiled
+# once; each batch is then a handful of NumPy mask operations:
+#   deny rules and per-customer limits flag a row without scoring it,
+#   allow rules mark a row safe without scoring it (deny wins over allow),
+#   every other row is ambiguous and goes to the model.
+#
+# Rules file:
+#   {"deny": [{"name": "hard_limit", "amount_gte": 25000}],
+#    "allow": [{"name": "small_grocery", "amount_lt": 50, "merchant_in": ["Grocery"], "txn_count_gte": 10}],
+#    "customer_limits": {"default": null, "customers": {"C001": 10000}}}
+class RuleEngine:
+    def __init__(self, deny=(), allow=(), customer_limits=None, default_limit=None, records_per_call=None):
+        self.deny_rules = [Rule(rule['name'], {k: v for k, v in rule.items() if k != 'name'}) for rule in deny]
+        self.allow_rules = [Rule(rule['name'], {k: v for k, v in rule.items() if k != 'name'}) for rule in allow]
+        self.customer_limits = pd.Series(customer_limits or {}, dtype=float)
+        self.default_limit = default_limit
+        # Records per model call, used to count the calls saved (None: one call per batch)
+        self.records_per_call = records_per_call
+        self.lock = threading.Lock()
+        self.rows = 0
+        self.skipped = 0
+        self.denied = 0
+        self.model_calls_saved = 0
+        self.rule_hits = {rule.name: 0 for rule in self.deny_rules + self.allow_rules}
+        self.rule_hits['customer_limit'] = 0
+        self.last_batch = None
+
+    @classmethod
+    def from_file(cls, path, records_per_call=None):
+        with open(path) as f:
+            config = json.load(f)
+        limits = config.get('customer_limits', {})
+        return cls(config.get('deny', []), config.get('allow', []), limits.get('customers'),
+                   limits.get('default'), records_per_call)
+
+    def columns(self):
+        columns = {column for rule in self.deny_rules + self.allow_rules for column in rule.columns()}
+        if len(self.customer_limits) or self.default_limit is not None:
+            columns |= {'customer_id', 'amount'}
+        return columns
+
+    def model_calls(self, rows):
+        if not rows:
+            return 0
+        return math.ceil(rows / self.records_per_call) if self.records_per_call else 1
+
+    # Returns one decision per row (DENY, AMBIGUOUS or SAFE)
+    def evaluate(self, frame):
+        n = len(frame)
+        hits = {}
+        denied = np.zeros(n, dtype=bool)
+        for rule in self.deny_rules:
+            mask = rule.mask(frame)
+            hits[rule.name] = int(mask.sum())
+            denied |= mask
+        if len(self.customer_limits) or self.default_limit is not None:
+            limits = frame['customer_id'].map(self.customer_limits).to_numpy(dtype=float)
+            if self.default_limit is not None:
+                limits = np.where(np.isnan(limits), self.default_limit, limits)
+            mask = frame['amount'].to_numpy(dtype=float) > limits
+            hits['customer_limit'] = int(mask.sum())
+            denied |= mask
+        safe = np.zeros(n, dtype=bool)
+        for rule in self.allow_rules:
+            mask = rule.mask(frame) & ~denied
+            hits[rule.name] = int(mask.sum())
+            safe |= mask
+        decisions = np.full(n, AMBIGUOUS, dtype=np.int8)
+        decisions[safe] = SAFE
+        decisions[denied] = DENY
+
+        ambiguous = n - int(denied.sum()) - int(safe.sum())
+        batch = {
+            'rows': n,
+            'denied': int(denied.sum()),
+            'safe': int(safe.sum()),
+            'ambiguous': ambiguous,
+            'skip_rate': round((n - ambiguous) / n, 4) if n else None,
+            'model_calls_saved': self.model_calls(n) - self.model_calls(ambiguous)
+        }
+        with self.lock:
+            self.rows += n
+            self.skipped += n - ambiguous
+            self.denied += batch['denied']
+            self.model_calls_saved += batch['model_calls_saved']
+            for name, count in hits.items():
+                self.rule_hits[name] += count
+            self.last_batch = batch
+        return decisions
+
+    def metrics(self):
+        return {
+            'rules': {'deny': len(self.deny_rules), 'allow': len(self.allow_rules),
+                      'customer_limits': len(self.customer_limits)},
+            'rows': self.rows,
+            'skipped': self.skipped,
+            'denied': self.denied,
+            'skip_rate': round(self.skipped / self.rows, 4) if self.rows else None,
+            'model_calls_saved': self.model_calls_saved,
+            'rule_hits': dict(self.rule_hits),
+            'last_batch': self.last_batch
+        }
@@ -10,18 +10,24 @@ role = os.environ.get('SAGEMAKER_ROLE_ARN')  # Set this environment variable wit
 # Script to train Isolation Forest model
 script_path = 'train_isolation_forest.py'
 
+# Partitioned historical transactions (csv/jsonl/parquet) mounted as the 'train' channel
+training_data_uri = os.environ.get('FRAUD_TRAINING_DATA_URI')
+
 # Define SKLearn estimator
 sklearn_estimator = SKLearn(
     entry_point=script_path,
     role=role,
-    instance_type='ml.m5.large',
-    framework_version='0.23-1',
+    instance_type=os.environ.get('FRAUD_TRAINING_INSTANCE_TYPE', 'ml.m5.large'),
+    framework_version='1.2-1',
     sagemaker_session=sagemaker_session,
-    base_job_name='fraud-isolation-forest'
+    base_job_name='fraud-isolation-forest',
+    # FastFile streams the channel from S3 instead of copying it to disk first
+    input_mode='FastFile',
+    hyperparameters={'n-estimators': 200, 'max-samples': 256, 'stratify-column': 'merchant'}
 )
 
 # Launch training job
-sklearn_estimator.fit()
+sklearn_estimator.fit({'train': training_data_uri} if training_data_uri else None)
 
 # Deploy model endpoint
 predictor = sklearn_estimator.deploy(
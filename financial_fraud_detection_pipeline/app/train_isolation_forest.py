@@ -1,20 +1,277 @@
+import os
+import sys
+import json
+import gzip
+import time
+import argparse
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
 import numpy as np
+import pandas as pd
 import joblib
 from sklearn.ensemble import IsolationForest
-import os
 
-def main():
-    # Example training data - replace with real transaction features
-    X_train = np.array([[500], [200], [15000], [1000], [300], [7000], [50], [12000]])
+# Trains the fraud IsolationForest on historical transaction files without
+# loading them into memory. Files (csv, jsonl, json arrays or parquet, optionally
+# gzipped, in any partition layout) are streamed in chunks by one worker process
+# per file; each worker keeps a bottom-k random-key sample per stratum, so the
+# per-file samples merge into an exact uniform sample per stratum. The merged
+# training pool holds n_estimators * max_samples rows allocated across strata,
+# which gives every tree's max_samples draw a stratified subsample, and the
+# forest is fit with n_jobs=-1.
+#
+#   Local:     python train_isolation_forest.py --data-dir history/ --model-dir models/
+#              writes models/<version>/model.joblib and metrics.json
+#   SageMaker: reads the 'train' channel and writes model.joblib and metrics.json
+#              to SM_MODEL_DIR, where model_fn loads it
+
+# Used when no training data is provided (the original demo behaviour)
+EXAMPLE_AMOUNTS = [[500], [200], [15000], [1000], [300], [7000], [50], [12000]]
+DATA_EXTENSIONS = ('.csv', '.jsonl', '.ndjson', '.json', '.parquet')
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser()
+    # SageMaker passes hyperparameters as --name value
+    parser.add_argument('--data-dir', default=os.environ.get('SM_CHANNEL_TRAIN'))
+    parser.add_argument('--model-dir', default=os.environ.get('SM_MODEL_DIR', 'models'))
+    parser.add_argument('--features', default=os.environ.get('FRAUD_MODEL_FEATURES', 'amount'))
+    parser.add_argument('--stratify-column', default='merchant')
+    parser.add_argument('--n-estimators', type=int, default=100)
+    parser.add_argument('--max-samples', type=int, default=256)
+    parser.add_argument('--contamination', default='0.1')
+    parser.add_argument('--chunk-rows', type=int, default=200000)
+    parser.add_argument('--n-jobs', type=int, default=-1)
+    parser.add_argument('--random-state', type=int, default=42)
+    parser.add_argument('--publish-uri', help='also copy the version to <uri>/<version>/ (local path or s3://)')
+    args, _ = parser.parse_known_args(argv)
+    args.features = [feature.strip() for feature in args.features.split(',') if feature.strip()]
+    args.contamination = args.contamination if args.contamination == 'auto' else float(args.contamination)
+    args.workers = os.cpu_count() if args.n_jobs < 0 else args.n_jobs
+    return args
+
+def find_data_files(data_dir):
+    if not data_dir or not os.path.isdir(data_dir):
+        return []
+    paths = []
+    for root, dirs, files in os.walk(data_dir):
+        dirs[:] = [d for d in dirs if not d.startswith(('.', '_'))]
+        for name in files:
+            base = name[:-3] if name.endswith('.gz') else name
+            if not name.startswith(('.', '_')) and base.endswith(DATA_EXTENSIONS):
+                paths.append(os.path.join(root, name))
+    # Largest first so one big file does not start last and hold up the pool
+    return sorted(paths, key=os.path.getsize, reverse=True)
+
+# Yield DataFrame chunks of at most chunk_rows rows (whole-file JSON arrays are one chunk)
+def iter_chunks(path, columns, chunk_rows):
+    base = path[:-3] if path.endswith('.gz') else path
+    if base.endswith('.csv'):
+        yield from pd.read_csv(path, usecols=lambda column: column in columns, chunksize=chunk_rows)
+    elif base.endswith(('.jsonl', '.ndjson')):
+        yield from pd.read_json(path, lines=True, chunksize=chunk_rows)
+    elif base.endswith('.json'):
+        # preprocess_lambda writes each batch as a single JSON array
+        with (gzip.open(path, 'rt') if path.endswith('.gz') else open(path)) as f:
+            data = json.load(f)
+        yield pd.DataFrame(data if isinstance(data, list) else [data])
+    else:
+        import pyarrow.parquet as pq
+        parquet_file = pq.ParquetFile(path)
+        present = [column for column in columns if column in parquet_file.schema_arrow.names]
+        for batch in parquet_file.iter_batches(batch_size=chunk_rows, columns=present):
+            yield batch.to_pandas()
+
+# Keep the k rows with the smallest random keys in each stratum
+def keep_smallest(frame, k):
+    return frame.sort_values('_key', kind='stable').groupby('_stratum', sort=False).head(k)
+
+# Worker: stream one file, returning its row counts, feature stats and per-stratum sample
+def sample_file(path, features, stratify_column, sample_size, chunk_rows, seed):
+    rng = np.random.default_rng(seed)
+    counts = Counter()
+    stats = {feature: [0, 0.0, 0.0, np.inf, -np.inf] for feature in features}
+    sample = None
+    rows_read = 0
+    for chunk in iter_chunks(path, set(features) | {stratify_column}, chunk_rows):
+        rows_read += len(chunk)
+        missing = [feature for feature in features if feature not in chunk.columns]
+        if missing:
+            raise ValueError(f"{path} has no column(s) {missing}")
+        frame = chunk[features].apply(pd.to_numeric, errors='coerce').dropna()
+        if frame.empty:
+            continue
+        frame['_stratum'] = (chunk.loc[frame.index, stratify_column].fillna('unknown').astype(str)
+                             if stratify_column in chunk.columns else 'all')
+        frame['_key'] = rng.random(len(frame))
+        counts.update(frame['_stratum'].value_counts().to_dict())
+        for feature in features:
+            values = frame[feature].to_numpy()
+            stat = stats[feature]
+            stat[0] += len(values)
+            stat[1] += float(values.sum())
+            stat[2] += float(np.square(values).sum())
+            stat[3] = min(stat[3], float(values.min()))
+            stat[4] = max(stat[4], float(values.max()))
+        sample = keep_smallest(frame if sample is None else pd.concat([sample, frame]), sample_size)
+    return {'path': path, 'rows_read': rows_read, 'counts': counts, 'stats': stats, 'sample': sample}
+
+# Per-stratum row quotas for the training pool: proportional to stratum size,
+# but every stratum gets at least one tree's worth of rows so rare merchants
+# are not lost from most trees
+def allocate(counts, pool_size, min_rows):
+    total = sum(counts.values())
+    return {stratum: min(count, max(min_rows, int(round(pool_size * count / total))))
+            for stratum, count in counts.items()}
+
+def merge_stats(results, features):
+    merged = {}
+    for feature in features:
+        n = sum(result['stats'][feature][0] for result in results)
+        if not n:
+            continue
+        total = sum(result['stats'][feature][1] for result in results)
+        total_sq = sum(result['stats'][feature][2] for result in results)
+        mean = total / n
+        merged[feature] = {
+            'mean': round(mean, 4),
+            'std': round(float(np.sqrt(max(total_sq / n - mean * mean, 0.0))), 4),
+            'min': min(result['stats'][feature][3] for result in results),
+            'max': max(result['stats'][feature][4] for result in results)
+        }
+    return merged
+
+def build_training_pool(args, paths):
+    pool_size = args.n_estimators * args.max_samples
+    with ProcessPoolExecutor(max_workers=max(1, min(args.workers, len(paths)))) as executor:
+        futures = [executor.submit(sample_file, path, args.features, args.stratify_column, pool_size,
+                                   args.chunk_rows, args.random_state + i) for i, path in enumerate(paths)]
+        results = [future.result() for future in futures]
+    counts = sum((result['counts'] for result in results), Counter())
+    samples = [result['sample'] for result in results if result['sample'] is not None]
+    if not samples:
+        raise ValueError(f"No usable rows for features {args.features} in {len(paths)} file(s)")
+    merged = keep_smallest(pd.concat(samples), pool_size)
+    quotas = allocate(counts, pool_size, args.max_samples)
+    ranks = merged.groupby('_stratum', sort=False).cumcount()
+    pool = merged[ranks.to_numpy() < merged['_stratum'].map(quotas).to_numpy()]
+    # Shuffle so strata are interleaved before IsolationForest draws its subsamples
+    pool = pool.sample(frac=1.0, random_state=args.random_state)
+    return pool, {
+        'files': len(paths),
+        'rows_read': sum(result['rows_read'] for result in results),
+        'rows_usable': sum(counts.values()),
+        'strata': dict(counts.most_common()),
+        'feature_stats': merge_stats(results, args.features)
+    }
+
+def train(args):
+    started = time.perf_counter()
+    paths = find_data_files(args.data_dir)
+    if paths:
+        pool, data_metrics = build_training_pool(args, paths)
+    elif args.features == ['amount']:
+        print(f"No training files under {args.data_dir!r}; training on the example amounts")
+        pool = pd.DataFrame(EXAMPLE_AMOUNTS, columns=['amount']).assign(_stratum='all')
+        data_metrics = {'files': 0, 'rows_read': len(pool), 'rows_usable': len(pool), 'strata': {'all': len(pool)}}
+    else:
+        raise ValueError(f"No training files under {args.data_dir!r}")
+    read_seconds = time.perf_counter() - started
+
+    model = IsolationForest(n_estimators=args.n_estimators, max_samples=min(args.max_samples, len(pool)),
+                            contamination=args.contamination, n_jobs=args.n_jobs, random_state=args.random_state)
+    fit_started = time.perf_counter()
+    # Fit on a plain array (scoring passes arrays) and record the column order on the model
+    X = pool[args.features].to_numpy(dtype=float)
+    model.fit(X)
+    model.fraud_features = list(args.features)
+    fit_seconds = time.perf_counter() - fit_started
+
+    flagged = model.predict(X) == -1
+    scores = model.decision_function(X)
+    metrics = dict(data_metrics, **{
+        'features': args.features,
+        'n_estimators': args.n_estimators,
+        'max_samples': int(model.max_samples_),
+        'contamination': args.contamination,
+        'training_pool_rows': len(pool),
+        'pool_strata': pool['_stratum'].value_counts().to_dict(),
+        'pool_anomaly_rate': round(float(flagged.mean()), 4),
+        'anomaly_rate_by_stratum': {stratum: round(float(rate), 4) for stratum, rate
+                                    in pd.Series(flagged).groupby(pool['_stratum'].to_numpy()).mean().items()},
+        'decision_score_quantiles': {str(q): round(float(np.quantile(scores, q)), 4) for q in (0.01, 0.05, 0.5)},
+        'offset': round(float(model.offset_), 4),
+        'workers': args.workers,
+        'read_seconds': round(read_seconds, 3),
+        'fit_seconds': round(fit_seconds, 3),
+        'rows_per_second': round(data_metrics['rows_read'] / read_seconds, 1) if read_seconds else None,
+        'trained_at': datetime.now(timezone.utc).isoformat()
+    })
+    return model, metrics
+
+# metrics.json goes first and the model is renamed into place last: a version
+# only becomes visible to InProcessScorer once model.joblib exists
+def write_artifacts(model, metrics, output_dir):
+    os.makedirs(output_dir, exist_ok=True)
+    with open(os.path.join(output_dir, 'metrics.json'), 'w') as f:
+        json.dump(metrics, f, indent=2, default=str)
+    joblib.dump(model, os.path.join(output_dir, 'model.joblib.part'))
+    os.replace(os.path.join(output_dir, 'model.joblib.part'), os.path.join(output_dir, 'model.joblib'))
+
+def publish(version_dir, publish_uri, version):
+    if publish_uri.startswith('s3://'):
+        import boto3
+        bucket, _, prefix = publish_uri[len('s3://'):].partition('/')
+        s3_client = boto3.client('s3')
+        for name in ('metrics.json', 'model.joblib'):
+            s3_client.upload_file(os.path.join(version_dir, name), bucket, f"{prefix.rstrip('/')}/{version}/{name}")
+    else:
+        import shutil
+        target = os.path.join(publish_uri, version)
+        os.makedirs(target, exist_ok=True)
+        for name in ('metrics.json', 'model.joblib'):
+            shutil.copyfile(os.path.join(version_dir, name), os.path.join(target, name + '.part'))
+            os.replace(os.path.join(target, name + '.part'), os.path.join(target, name))
+
+def main(argv=None):
+    args = parse_args(argv)
+    model, metrics = train(args)
+    version = datetime.now(timezone.utc).strftime('%Y%m%d%H%M%S')
+    metrics['version'] = version
+    # SageMaker packages SM_MODEL_DIR itself and model_fn loads from its root
+    output_dir = args.model_dir if 'SM_MODEL_DIR' in os.environ else os.path.join(args.model_dir, version)
+    write_artifacts(model, metrics, output_dir)
+    if args.publish_uri:
+        publish(output_dir, args.publish_uri, version)
+    print(json.dumps({key: metrics[key] for key in ('version', 'files', 'rows_read', 'training_pool_rows',
+                                                    'pool_anomaly_rate', 'read_seconds', 'fit_seconds')}))
+    return output_dir
+
+# SageMaker inference handlers: load the model saved by main()
+def model_fn(model_dir):
+    return joblib.load(os.path.join(model_dir, 'model.joblib'))
+
+# Accept both the legacy single-transaction payload {"amount": 500}
+# and the columnar batch payload {"amount": [500, 200, ...]}
+def input_fn(request_body, content_type='application/json'):
+    if content_type != 'application/json':
+        raise ValueError(f"Unsupported content type: {content_type}")
+    payload = json.loads(request_body)
+    return {column: np.atleast_1d(np.asarray(values, dtype=float)) for column, values in payload.items()}
 
-    # Train Isolation Forest model
-    model = IsolationForest(contamination=0.1, random_state=42)
-    model.fit(X_train)
+# Stack the columns the model was trained on, in training order
+def predict_fn(input_data, model):
+    columns = list(getattr(model, 'fraud_features', getattr(model, 'feature_names_in_', ['amount'])))
+    X = np.column_stack([input_data[column] for column in columns])
+    return model.predict(X)
 
-    # Save the model to /opt/ml/model for SageMaker
-    model_dir = os.environ.get('SM_MODEL_DIR', '/opt/ml/model')
-    os.makedirs(model_dir, exist_ok=True)
-    joblib.dump(model, os.path.join(model_dir, 'model.joblib'))
+# One prediction per input row; single-row responses keep the legacy 'prediction' key
+def output_fn(prediction, accept='application/json'):
+    predictions = [int(p) for p in prediction]
+    body = {'predictions': predictions}
+    if len(predictions) == 1:
+        body['prediction'] = predictions[0]
+    return json.dumps(body)
 
 if __name__ == "__main__":
-    main()
+    main(sys.argv[1:])
@@ -0,0 +1,210 @@
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import resource
+import tempfile
+import subprocess
+import tracemalloc
+from datetime import datetime, timedelta, timezone
+
+# Offline end-to-end benchmark of ingest_to_kinesis -> preprocess_lambda ->
+# detect_fraud_lambda -> store_in_redshift against local stand-ins for Kinesis,
+# S3, SageMaker, SNS and Redshift. Results are written as JSON so runs from
+# different commits can be compared:
+#   python benchmarks/pipeline_benchmark.py --transactions 50000 --output before.json
+#   python benchmarks/pipeline_benchmark.py --transactions 50000 --compare before.json
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+APP_DIR = os.path.join(BENCHMARK_DIR, '..', 'app')
+REPO_ROOT = os.path.join(BENCHMARK_DIR, '..', '..')
+sys.path[:0] = [APP_DIR, REPO_ROOT]
+
+from pipeline_common.metrics import LatencyTracker
+from pipeline_common.local_aws import LocalKinesis, LocalS3, LocalSNS, LocalRedshiftData
+from pipeline_common import kinesis_producer, clients
+
+MERCHANTS = ['Retail', 'Online', 'Grocery', 'Travel', 'Fuel', 'Electronics', 'Dining', 'Pharmacy']
+
+# Synthetic transactions: customer activity follows a Zipf-like skew and a
+# fraud_rate share of transactions are large, unusual-merchant outliers
+def generate_transactions(count, customers, fraud_rate, skew, seed):
+    rng = random.Random(seed)
+    weights = [1.0 / (rank + 1) ** skew for rank in range(customers)]
+    customer_ids = rng.choices([f"C{i:07d}" for i in range(customers)], weights=weights, k=count)
+    start = datetime(2025, 7, 7, tzinfo=timezone.utc)
+    transactions = []
+    for i, customer_id in enumerate(customer_ids):
+        fraud = rng.random() < fraud_rate
+        transactions.append({
+            'customer_id': customer_id,
+            'amount': round(rng.uniform(8000, 50000) if fraud else rng.lognormvariate(4.5, 1.0), 2),
+            'timestamp': (start + timedelta(milliseconds=50 * i)).strftime('%Y-%m-%dT%H:%M:%S.%fZ'),
+            'merchant': 'Electronics' if fraud else rng.choice(MERCHANTS)
+        })
+    return transactions
+
+# Point every client and long-lived helper in the pipeline module at the stand-ins
+def install_stand_ins(pipeline, latency_seconds, scoring_mode, model_dir):
+    from batch_scoring import LocalSageMakerRuntime
+    import joblib
+    s3 = LocalS3()
+    stand_ins = {
+        'kinesis': LocalKinesis(latency_seconds=latency_seconds),
+        's3': s3,
+        'sns': LocalSNS(latency_seconds=latency_seconds),
+        'sagemaker': LocalSageMakerRuntime(latency_seconds=latency_seconds),
+        'redshift': LocalRedshiftData(s3=s3)
+    }
+    stand_ins['redshift'].execute_statement(Sql=(
+        "CREATE TABLE transactions (customer_id VARCHAR, amount DOUBLE PRECISION, "
+        "timestamp TIMESTAMP, merchant VARCHAR, fraud_flag BOOLEAN)"
+    ))
+    # The pipeline's clients are lazy proxies, so registering the stand-ins reaches every holder
+    clients.register('kinesis', stand_ins['kinesis'])
+    clients.register('s3', s3)
+    clients.register('sns', stand_ins['sns'])
+    clients.register('sagemaker-runtime', stand_ins['sagemaker'])
+    clients.register('redshift-data', stand_ins['redshift'])
+    kinesis_producer.producers.clear()
+    # In-process scoring loads the same model the local endpoint serves
+    os.makedirs(os.path.join(model_dir, '1'), exist_ok=True)
+    joblib.dump(stand_ins['sagemaker'].model, os.path.join(model_dir, '1', 'model.joblib'))
+    pipeline.SCORING_MODE = scoring_mode
+    pipeline.MODEL_URI = model_dir
+    return stand_ins
+
+# Wrap a module or instance attribute so every call is timed into tracker
+def time_calls(owner, name, tracker):
+    original = getattr(owner, name)
+
+    def timed(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return original(*args, **kwargs)
+        finally:
+            tracker.record(time.perf_counter() - start)
+    setattr(owner, name, timed)
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=BENCHMARK_DIR,
+                                       stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def run(args):
+    os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+    work_dir = tempfile.mkdtemp(prefix='fraud-bench-')
+    os.environ['FEATURE_STORE_SNAPSHOT_PATH'] = os.path.join(work_dir, 'features.pkl')
+    import fraud_detection_pipeline as pipeline
+
+    stand_ins = install_stand_ins(pipeline, args.latency_ms / 1000, args.scoring_mode, os.path.join(work_dir, 'models'))
+    stages = {name: LatencyTracker(window=100000) for name in ('ingest', 'preprocess', 'detect', 'score', 'store')}
+    time_calls(pipeline, 'score_batch', stages['score'])
+    time_calls(pipeline.redshift_sink, 'flush', stages['store'])
+
+    transactions = generate_transactions(args.transactions, args.customers, args.fraud_rate, args.skew, args.seed)
+    if args.trace_memory:
+        tracemalloc.start()
+    flagged = 0
+    replay_rng = random.Random(args.seed)
+    previous = []
+    start = time.perf_counter()
+    for offset in range(0, len(transactions), args.batch_size):
+        batch = transactions[offset:offset + args.batch_size]
+        # Simulate Kinesis retries by re-sending part of the previous batch
+        replayed = [transaction for transaction in previous if replay_rng.random() < args.replay_rate]
+        previous = batch
+        batch = batch + replayed
+        with stages['ingest'].time():
+            pipeline.ingest_to_kinesis(batch)
+        event = stand_ins['kinesis'].as_lambda_event()
+        stand_ins['kinesis'].records.clear()
+        with stages['preprocess'].time():
+            processed = pipeline.preprocess_lambda(event)
+        with stages['detect'].time():
+            scored = pipeline.detect_fraud_lambda(processed)
+        flagged += sum(1 for transaction in scored if transaction['fraud_flag'])
+    elapsed = time.perf_counter() - start
+    traced_peak = tracemalloc.get_traced_memory()[1] if args.trace_memory else None
+    if args.trace_memory:
+        tracemalloc.stop()
+
+    return {
+        'benchmark': 'fraud_pipeline',
+        'commit': git_commit(),
+        'created_at': datetime.now(timezone.utc).isoformat(),
+        'params': {key: value for key, value in vars(args).items() if key not in ('output', 'compare')},
+        'transactions_per_second': round(len(transactions) / elapsed, 1),
+        'elapsed_seconds': round(elapsed, 3),
+        'stages': {name: tracker.summary() for name, tracker in stages.items()},
+        'peak_memory_mb': {
+            'max_rss': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+            'python_heap': round(traced_peak / 1024 / 1024, 1) if traced_peak is not None else None
+        },
+        'flagged_transactions': flagged,
+        'alert_messages': len(stand_ins['sns'].messages),
+        'dedup': {'preprocess': pipeline.preprocess_dedup.metrics(), 'detect': pipeline.detect_dedup.metrics()},
+        'rule_prefilter': {key: value for key, value in pipeline.rule_engine.metrics().items() if key != 'last_batch'},
+        'stand_in_calls': {
+            'kinesis': stand_ins['kinesis'].calls,
+            'sagemaker': stand_ins['sagemaker'].invocations,
+            'sns': stand_ins['sns'].calls,
+            'redshift': stand_ins['redshift'].statement_count
+        }
+    }
+
+def print_results(results, baseline=None):
+    def change(current, previous, higher_is_better):
+        if previous in (None, 0) or current is None:
+            return ''
+        delta = (current - previous) / previous * 100
+        better = delta > 0 if higher_is_better else delta < 0
+        return f"  ({delta:+.1f}% {'better' if better else 'worse'} than {baseline.get('commit')})"
+    print(f"Throughput: {results['transactions_per_second']} txn/s"
+          + (change(results['transactions_per_second'], baseline['transactions_per_second'], True) if baseline else ''))
+    for name, summary in results['stages'].items():
+        previous = baseline['stages'].get(name, {}).get('p99_ms') if baseline else None
+        print(f"  {name:<11} p50 {summary['p50_ms']} ms  p99 {summary['p99_ms']} ms"
+              + (change(summary['p99_ms'], previous, False) if baseline else ''))
+    print(f"Peak memory: {results['peak_memory_mb']}")
+    print(f"Flagged: {results['flagged_transactions']}  alert messages: {results['alert_messages']}")
+    dedup = results.get('dedup')
+    if dedup:
+        print(f"Duplicates dropped: preprocess {dedup['preprocess']['duplicates']} "
+              f"(rate {dedup['preprocess']['duplicate_rate']}), detect {dedup['detect']['duplicates']}")
+    rules = results.get('rule_prefilter')
+    if rules:
+        print(f"Rule pre-filter: skip rate {rules['skip_rate']}, {rules['model_calls_saved']} model calls saved")
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--transactions', type=int, default=20000)
+    parser.add_argument('--batch-size', type=int, default=500, help='records per simulated Kinesis batch')
+    parser.add_argument('--customers', type=int, default=5000)
+    parser.add_argument('--fraud-rate', type=float, default=0.01)
+    parser.add_argument('--skew', type=float, default=1.1, help='Zipf exponent of customer activity')
+    parser.add_argument('--latency-ms', type=float, default=0.0, help='simulated round-trip per AWS call')
+    parser.add_argument('--scoring-mode', choices=['endpoint', 'in_process'], default='endpoint')
+    parser.add_argument('--replay-rate', type=float, default=0.0, help='share of each batch re-sent with the next one')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--trace-memory', action='store_true', help='also report peak Python heap (slower)')
+    parser.add_argument('--output', help='write results JSON here')
+    parser.add_argument('--compare', help='results JSON from an earlier run to compare against')
+    args = parser.parse_args()
+
+    results = run(args)
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    print_results(results, baseline)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
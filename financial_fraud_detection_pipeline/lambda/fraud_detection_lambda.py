@@ -1,7 +1,19 @@
+import os
+import sys
 import json
 import boto3
 import logging
 
+# Shared modules sit beside this handler in the deployment zip (built with
+# pipeline_common/lambda_package.py); in a checkout they are found in app/ and
+# at the repository root
+LAMBDA_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.extend([os.path.join(LAMBDA_DIR, '..', 'app'), os.path.join(LAMBDA_DIR, '..', '..')])
+from pipeline_common.dedup import DuplicateFilter
+from batch_scoring import score_transactions
+from alert_dispatcher import AlertDispatcher
+from redshift_sink import RedshiftSink
+
 sns_client = boto3.client('sns')
 sagemaker_runtime = boto3.client('sagemaker-runtime')
 redshift_data = boto3.client('redshift-data')
@@ -11,51 +23,49 @@ SAGEMAKER_ENDPOINT = 'fraud-detection-endpoint'  # Update accordingly
 REDSHIFT_CLUSTER = 'fraud-detection-cluster'
 REDSHIFT_DB = 'fraud_db'
 REDSHIFT_USER = 'admin'
+# One invoke_endpoint call per batch, bounded by rows and payload bytes (endpoint limit is 6 MB)
+SCORING_BATCH_MAX_RECORDS = int(os.environ.get('SCORING_BATCH_MAX_RECORDS', '1000'))
+SCORING_BATCH_MAX_BYTES = int(os.environ.get('SCORING_BATCH_MAX_BYTES', str(5 * 1024 * 1024)))
+REDSHIFT_ROWS_PER_STATEMENT = int(os.environ.get('REDSHIFT_ROWS_PER_STATEMENT', '100'))
+# Redelivered transactions are dropped if seen within the window (per warm container)
+DEDUP_WINDOW_SECONDS = 3600
 
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
+# Each invocation's batch is flushed before the handler returns, so the sink
+# never flushes on its own
+redshift_sink = RedshiftSink(redshift_data, REDSHIFT_CLUSTER, REDSHIFT_DB, REDSHIFT_USER,
+                             max_rows=float('inf'), max_age_seconds=float('inf'),
+                             rows_per_statement=REDSHIFT_ROWS_PER_STATEMENT)
+# Alerts are published in the invocation (publish), not by the background worker
+alert_dispatcher = AlertDispatcher(sns_client, SNS_TOPIC_ARN)
+detect_dedup = DuplicateFilter(DEDUP_WINDOW_SECONDS)
+
 def handler(event, context):
-    transactions = event.get('transactions', [])
-    for transaction in transactions:
-        amount = transaction.get('amount')
-        payload = json.dumps({'amount': amount})
-        response = sagemaker_runtime.invoke_endpoint(
-            EndpointName=SAGEMAKER_ENDPOINT,
-            ContentType='application/json',
-            Body=payload
-        )
-        result = json.loads(response['Body'].read().decode())
-        prediction = result.get('prediction')
-        if prediction == -1:
-            transaction['fraud_flag'] = True
-            message = f"Fraud detected: {json.dumps(transaction)}"
-            sns_client.publish(
-                TopicArn=SNS_TOPIC_ARN,
-                Message=message
-            )
+    transactions, keys = detect_dedup.check(event.get('transactions', []))
+    predictions = score_transactions(transactions, sagemaker_runtime, SAGEMAKER_ENDPOINT,
+                                     max_records=SCORING_BATCH_MAX_RECORDS, max_bytes=SCORING_BATCH_MAX_BYTES)
+    alerts = []
+    for transaction, prediction in zip(transactions, predictions):
+        transaction['fraud_flag'] = prediction == -1
+        if transaction['fraud_flag']:
+            alerts.append(transaction)
             logger.info(f"Fraud detected for transaction: {transaction.get('customer_id')}")
-        else:
-            transaction['fraud_flag'] = False
 
-        # Store in Redshift
-        store_in_redshift(transaction)
+    # Store in Redshift; only transactions that reach it count as seen
+    redshift_sink.add_many(transactions)
+    try:
+        redshift_sink.flush()
+    except Exception:
+        unwritten = redshift_sink.discard(transactions)
+        detect_dedup.commit([key for i, key in enumerate(keys) if i not in unwritten])
+        raise
+    detect_dedup.commit(keys)
+    if alerts:
+        alert_dispatcher.publish(alerts)
 
     return {
         'statusCode': 200,
         'body': json.dumps({'message': 'Fraud detection complete', 'transactions_processed': len(transactions)})
     }
-
-def store_in_redshift(transaction):
-    query = f"""
-    INSERT INTO transactions (customer_id, amount, timestamp, merchant, fraud_flag)
-    VALUES ('{transaction.get('customer_id')}', {transaction.get('amount')}, '{transaction.get('timestamp')}',
-            '{transaction.get('merchant')}', {str(transaction.get('fraud_flag')).lower()})
-    """
-    redshift_data.execute_statement(
-        ClusterIdentifier=REDSHIFT_CLUSTER,
-        Database=REDSHIFT_DB,
-        DbUser=REDSHIFT_USER,
-        Sql=query
-    )
-    logger.info(f"Stored transaction in Redshift: {transaction.get('customer_id')}")
@@ -1,7 +1,17 @@
+import os
+import sys
 import json
 import boto3
+import base64
 import pandas as pd
-from datetime import datetime
+from datetime import datetime, timezone
+
+# pipeline_common sits beside this handler in the deployment zip (built with
+# pipeline_common/lambda_package.py); in a checkout it is at the repository root
+LAMBDA_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(LAMBDA_DIR, '..', '..'))
+from pipeline_common.kinesis_producer import split_records
+from pipeline_common.raw_zone import object_key
 
 s3_client = boto3.client('s3')
 S3_BUCKET_RAW = 'fraud-detection-raw-bucket'  # Update with your bucket name or use environment variable
@@ -13,8 +23,8 @@ def handler(event, context):
         payload = record['kinesis']['data']
         # Kinesis data is base64 encoded, decode it
         decoded_payload = base64.b64decode(payload)
-        transaction = json.loads(decoded_payload)
-        transactions.append(transaction)
+        # A record may carry several newline-delimited transactions when the producer aggregates
+        transactions.extend(split_records(decoded_payload))
 
     df = pd.DataFrame(transactions)
     # Clean and normalize
@@ -22,7 +32,8 @@ def handler(event, context):
     df['timestamp'] = pd.to_datetime(df['timestamp'])
 
     # Store raw data in S3
-    s3_key = f"transactions/{datetime.utcnow().strftime('%Y%m%d%H%M%S')}.json"
+    # Keys carry a UUID, so batches stored in the same second do not overwrite each other
+    s3_key = object_key('transactions', None, f"{datetime.now(timezone.utc):%Y-%m-%d}", '.json')
     s3_client.put_object(
         Bucket=S3_BUCKET_RAW,
         Key=s3_key,
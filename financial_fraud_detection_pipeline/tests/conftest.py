@@ -0,0 +1,32 @@
+import os
+import sys
+import pytest
+
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path[:0] = [os.path.join(TESTS_DIR, '..', 'lambda'), os.path.join(TESTS_DIR, '..', 'app'),
+                os.path.join(TESTS_DIR, '..', '..')]
+
+from pipeline_common import clients
+from pipeline_common.local_aws import LocalS3, LocalRedshiftData
+
+# fraud_detection_pipeline against local S3 and Redshift stand-ins, with fresh
+# dedup filters and every transaction scored as legitimate
+@pytest.fixture
+def pipeline(tmp_path, monkeypatch):
+    monkeypatch.setenv('AWS_DEFAULT_REGION', 'us-east-1')
+    monkeypatch.setenv('FEATURE_STORE_SNAPSHOT_PATH', str(tmp_path / 'features.pkl'))
+    monkeypatch.chdir(tmp_path)
+    s3 = LocalS3()
+    redshift = LocalRedshiftData(s3=s3)
+    redshift.execute_statement(Sql="CREATE TABLE transactions (customer_id VARCHAR, amount DOUBLE PRECISION, "
+                                   "timestamp TIMESTAMP, merchant VARCHAR, fraud_flag BOOLEAN)")
+    clients.register('s3', s3)
+    clients.register('redshift-data', redshift)
+    import fraud_detection_pipeline as pipeline
+    monkeypatch.setattr(pipeline, 'preprocess_dedup', pipeline.DuplicateFilter())
+    monkeypatch.setattr(pipeline, 'detect_dedup', pipeline.DuplicateFilter())
+    monkeypatch.setattr(pipeline, 'score_batch', lambda transactions: [1] * len(transactions))
+    pipeline.redshift_sink.buffer = []
+    pipeline.fraud_feed_cache.clear()
+    yield pipeline, s3, redshift
+    clients.reset('s3', 'redshift-data')
@@ -0,0 +1,59 @@
+import time
+import threading
+from pipeline_common.local_aws import LocalSNS
+from alert_dispatcher import AlertDispatcher
+
+def alert(customer_id, amount):
+    return {'customer_id': customer_id, 'amount': amount}
+
+def test_drain_publishes_one_message_per_customer_without_waiting_the_window():
+    sns = LocalSNS()
+    dispatcher = AlertDispatcher(sns, 'topic', coalesce_window_seconds=60.0)
+    for customer_id, amount in (('C001', 1), ('C002', 2), ('C001', 3)):
+        assert dispatcher.submit(alert(customer_id, amount))
+    start = time.monotonic()
+    assert dispatcher.drain(timeout_seconds=5.0)
+    assert time.monotonic() - start < 5.0
+    messages = sorted(message for _, message in sns.messages)
+    assert len(messages) == 2 and dispatcher.coalesced == 1
+    assert messages[0].startswith('Fraud detected: 2 transactions for customer C001')
+    assert dispatcher.metrics()['messages_published'] == 2
+
+def test_more_customers_than_a_batch_holds_are_split_across_calls():
+    sns = LocalSNS()
+    dispatcher = AlertDispatcher(sns, 'topic', coalesce_window_seconds=60.0)
+    for i in range(25):
+        dispatcher.submit(alert(f"C{i:03d}", i))
+    assert dispatcher.drain()
+    assert (len(sns.messages), sns.calls) == (25, 3)
+
+# SNS client whose first publish_batch blocks until released, so the queue fills behind it
+class BlockedSNS(LocalSNS):
+    def __init__(self):
+        super().__init__()
+        self.release = threading.Event()
+
+    def publish_batch(self, TopicArn, PublishBatchRequestEntries, **kwargs):
+        self.release.wait(5.0)
+        return super().publish_batch(TopicArn, PublishBatchRequestEntries, **kwargs)
+
+def test_full_queue_rejects_without_blocking_and_failures_are_counted():
+    sns = BlockedSNS()
+    dispatcher = AlertDispatcher(sns, 'topic', max_queue=2, coalesce_window_seconds=0.0)
+    dispatcher.submit(alert('C001', 1))
+    # Wait for the worker to take the first alert and block in publish_batch
+    while dispatcher.queue_depth():
+        time.sleep(0.01)
+    assert dispatcher.submit(alert('C002', 2)) and dispatcher.submit(alert('C003', 3))
+    assert not dispatcher.submit(alert('C004', 4))
+    assert dispatcher.rejected == 1
+    sns.release.set()
+    assert dispatcher.drain()
+    assert len(sns.messages) == 3
+    # A publish that raises is counted, and the worker keeps going
+    def fail(**kwargs):
+        raise RuntimeError("sns down")
+    sns.publish_batch = fail
+    dispatcher.submit(alert('C005', 5))
+    assert dispatcher.drain()
+    assert dispatcher.publish_failures == 1
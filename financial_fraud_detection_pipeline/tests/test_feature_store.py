@@ -0,0 +1,22 @@
+from feature_store import CustomerFeatureStore
+
+TRANSACTIONS = [{'customer_id': 'C001', 'amount': amount, 'timestamp': f"2025-07-07T17:0{i}:00Z", 'merchant': merchant}
+                for i, (amount, merchant) in enumerate([(100.0, 'Retail'), (200.0, 'Online'), (5000.0, 'Retail')])]
+
+def test_peek_matches_update_without_changing_the_store():
+    store, reference = CustomerFeatureStore(), CustomerFeatureStore()
+    store.fold_many(TRANSACTIONS[:1])
+    reference.update_many(TRANSACTIONS[:1])
+    assert store.peek_many(TRANSACTIONS[1:]) == reference.update_many(TRANSACTIONS[1:])
+    assert store.customers['C001'].count == 1
+    store.fold_many(TRANSACTIONS[1:])
+    assert store.peek_many(TRANSACTIONS) == reference.peek_many(TRANSACTIONS)
+
+def test_snapshot_round_trip(tmp_path):
+    store = CustomerFeatureStore()
+    store.update_many(TRANSACTIONS + [dict(TRANSACTIONS[0], customer_id=f"C{i}") for i in range(25)])
+    path = str(tmp_path / 'features.pkl')
+    store.snapshot(path, chunk_size=7)
+    restored = CustomerFeatureStore.restore(path)
+    assert list(restored.customers) == list(store.customers)
+    assert restored.peek_many(TRANSACTIONS) == store.peek_many(TRANSACTIONS)
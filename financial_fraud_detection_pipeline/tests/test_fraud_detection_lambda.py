@@ -0,0 +1,65 @@
+import io
+import json
+import pytest
+from pipeline_common.local_aws import LocalSNS, LocalRedshiftData
+from test_retries import Flaky
+
+TRANSACTIONS = [{"transaction_id": "T1", "customer_id": "C001", "amount": 120.0,
+                 "timestamp": "2025-07-07T17:00:00Z", "merchant": "Retail"},
+                {"transaction_id": "T2", "customer_id": "C002", "amount": 15000.0,
+                 "timestamp": "2025-07-07T17:01:00Z", "merchant": "Online"}]
+
+# Flags every transaction over 10000 as fraud
+class ThresholdRuntime:
+    def invoke_endpoint(self, EndpointName, Body, **kwargs):
+        amounts = json.loads(Body)['amount']
+        body = json.dumps({'predictions': [-1 if amount > 10000 else 1 for amount in amounts]})
+        return {'Body': io.BytesIO(body.encode('utf-8'))}
+
+# fraud_detection_lambda with its sink, alerts and dedup on local stand-ins
+@pytest.fixture
+def detection(monkeypatch):
+    monkeypatch.setenv('AWS_DEFAULT_REGION', 'us-east-1')
+    import fraud_detection_lambda as detection
+    redshift = LocalRedshiftData()
+    redshift.execute_statement(Sql="CREATE TABLE transactions (customer_id VARCHAR, amount DOUBLE PRECISION, "
+                                   "timestamp TIMESTAMP, merchant VARCHAR, fraud_flag BOOLEAN)")
+    sns = LocalSNS()
+    monkeypatch.setattr(detection, 'sagemaker_runtime', ThresholdRuntime())
+    monkeypatch.setattr(detection, 'redshift_sink', detection.RedshiftSink(
+        redshift, 'cluster', 'db', 'user', max_rows=float('inf'), max_age_seconds=float('inf')))
+    monkeypatch.setattr(detection, 'alert_dispatcher', detection.AlertDispatcher(sns, 'topic'))
+    monkeypatch.setattr(detection, 'detect_dedup', detection.DuplicateFilter())
+    return detection, redshift, sns
+
+def stored_rows(redshift):
+    return redshift.conn.execute("SELECT customer_id, fraud_flag FROM transactions ORDER BY customer_id").fetchall()
+
+def test_handler_stores_alerts_and_drops_replays(detection):
+    detection, redshift, sns = detection
+    response = detection.handler({'transactions': [dict(t) for t in TRANSACTIONS]}, None)
+    assert json.loads(response['body'])['transactions_processed'] == 2
+    assert stored_rows(redshift) == [('C001', False), ('C002', True)]
+    assert len(sns.messages) == 1 and 'C002' in sns.messages[0][1]
+    # A redelivered event is a duplicate: nothing stored or alerted twice
+    response = detection.handler({'transactions': [dict(t) for t in TRANSACTIONS]}, None)
+    assert json.loads(response['body'])['transactions_processed'] == 0
+    assert len(stored_rows(redshift)) == 2
+    assert len(sns.messages) == 1
+
+def test_handler_retry_after_failed_store_is_stored_once(detection, monkeypatch):
+    detection, redshift, _ = detection
+    monkeypatch.setattr(redshift, 'execute_statement', Flaky(redshift.execute_statement))
+    with pytest.raises(RuntimeError):
+        detection.handler({'transactions': [dict(t) for t in TRANSACTIONS]}, None)
+    assert detection.redshift_sink.buffer == []
+    detection.handler({'transactions': [dict(t) for t in TRANSACTIONS]}, None)
+    assert stored_rows(redshift) == [('C001', False), ('C002', True)]
+
+def test_transaction_without_an_amount_is_scored_as_zero(detection):
+    detection, redshift, sns = detection
+    incomplete = {"transaction_id": "T3", "customer_id": "C003", "timestamp": "2025-07-07T17:02:00Z",
+                  "merchant": "Retail"}
+    detection.handler({'transactions': [dict(t) for t in TRANSACTIONS] + [incomplete]}, None)
+    assert stored_rows(redshift) == [('C001', False), ('C002', True), ('C003', False)]
+    assert len(sns.messages) == 1
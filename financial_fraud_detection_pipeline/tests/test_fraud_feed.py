@@ -0,0 +1,39 @@
+import asyncio
+
+def store_flagged(redshift, rows):
+    redshift.conn.executemany("INSERT INTO transactions VALUES (?, ?, ?, ?, 1)", rows)
+    redshift.conn.commit()
+
+def poll(pipeline, since, limit):
+    fetched = []
+    while True:
+        page = asyncio.run(pipeline.get_fraud_transactions(limit=limit, cursor=None, since=since))
+        fetched += page['transactions']
+        since = page['latest_cursor']
+        if not page['next_cursor']:
+            return fetched, since
+
+def test_polling_catches_up_on_bursts_sharing_a_timestamp(pipeline):
+    pipeline, _, redshift = pipeline
+    store_flagged(redshift, [('C000', 1.0, '2025-07-07 17:00:00', 'Retail')])
+    first = asyncio.run(pipeline.get_fraud_transactions(limit=5, cursor=None, since=None))
+    assert first['next_cursor'] is None
+    # Twelve new rows, all in the watermark's second, then a later one
+    burst = [(f"C{i:03d}", float(i), '2025-07-07 17:00:00', 'Retail') for i in range(1, 13)]
+    store_flagged(redshift, burst + [('C999', 9.0, '2025-07-07 17:00:01', None)])
+    pipeline.fraud_feed_cache.clear()
+    fetched, latest = poll(pipeline, first['latest_cursor'], limit=5)
+    assert [t['customer_id'] for t in fetched] == [f"C{i:03d}" for i in range(1, 13)] + ['C999']
+    assert poll(pipeline, latest, limit=5)[0] == []
+
+def test_cursor_pages_newest_first_without_gaps(pipeline):
+    pipeline, _, redshift = pipeline
+    store_flagged(redshift, [('C001', float(i), '2025-07-07 17:00:00', 'Retail') for i in range(7)])
+    seen, cursor = [], None
+    while True:
+        page = asyncio.run(pipeline.get_fraud_transactions(limit=3, cursor=cursor, since=None))
+        seen += [t['amount'] for t in page['transactions']]
+        cursor = page['next_cursor']
+        if cursor is None:
+            break
+    assert seen == [6.0, 5.0, 4.0, 3.0, 2.0, 1.0, 0.0]
@@ -0,0 +1,54 @@
+import io
+import joblib
+import numpy as np
+from pipeline_common.local_aws import LocalS3
+from local_scorer import InProcessScorer, MODEL_FILENAME
+
+# Stand-in model: every row gets the same decision score
+class ConstantModel:
+    def __init__(self, score):
+        self.score = score
+
+    def decision_function(self, X):
+        return np.full(len(X), self.score)
+
+def publish(root, version, score):
+    directory = root / version
+    directory.mkdir(parents=True)
+    joblib.dump(ConstantModel(score), directory / MODEL_FILENAME)
+
+def test_loads_the_latest_version_and_swaps_on_refresh(tmp_path):
+    publish(tmp_path, '9', 1.0)
+    scorer = InProcessScorer(str(tmp_path), refresh_interval_seconds=3600)
+    assert scorer.score_transactions([{'amount': 10.0}]) == [1]
+    # Versions sort numerically, so 10 is newer than 9
+    publish(tmp_path, '10', -1.0)
+    assert not scorer.refresh()
+    assert scorer.refresh(force=True)
+    assert scorer.score_transactions([{'amount': 10.0}]) == [-1]
+    assert scorer.metrics()['model_version'] == '10' and scorer.swaps == 1
+    assert not scorer.refresh(force=True)
+
+def test_batch_in_flight_keeps_its_model_across_a_swap(tmp_path):
+    publish(tmp_path, '1', 1.0)
+    scorer = InProcessScorer(str(tmp_path))
+    scorer.load()
+    version, model = scorer.active
+    publish(tmp_path, '2', -1.0)
+    scorer.load('2')
+    # The reference a batch took before the swap still scores with version 1
+    assert (version, model.decision_function([[1.0]]).tolist()) == ('1', [1.0])
+    predictions, version = scorer.score([[1.0], [2.0]])
+    assert (predictions.tolist(), version) == ([-1, -1], '2')
+
+def test_s3_versions_are_downloaded_once_into_the_cache(tmp_path):
+    s3 = LocalS3()
+    for version, score in (('20250701', 1.0), ('20250702', -1.0)):
+        body = io.BytesIO()
+        joblib.dump(ConstantModel(score), body)
+        s3.put_object(Bucket='models', Key=f"fraud/{version}/{MODEL_FILENAME}", Body=body.getvalue())
+    scorer = InProcessScorer('s3://models/fraud', s3_client=s3, cache_dir=str(tmp_path))
+    assert scorer.load() == '20250702'
+    assert (tmp_path / '20250702' / MODEL_FILENAME).exists()
+    assert not (tmp_path / '20250702' / (MODEL_FILENAME + '.part')).exists()
+    assert scorer.score_transactions([{'amount': 5.0}]) == [-1]
@@ -0,0 +1,31 @@
+import json
+import base64
+import pytest
+from pipeline_common.local_aws import LocalS3
+
+@pytest.fixture
+def preprocess(monkeypatch):
+    monkeypatch.setenv('AWS_DEFAULT_REGION', 'us-east-1')
+    import preprocess_lambda
+    s3 = LocalS3()
+    monkeypatch.setattr(preprocess_lambda, 's3_client', s3)
+    return preprocess_lambda, s3
+
+def kinesis_event(*payloads):
+    return {'Records': [{'kinesis': {'data': base64.b64encode(payload.encode('utf-8')).decode('ascii')}}
+                        for payload in payloads]}
+
+def test_aggregated_records_are_split_and_batches_kept_apart(preprocess):
+    preprocess, s3 = preprocess
+    first = {"customer_id": "C001", "amount": 120.0, "timestamp": "2025-07-07T17:00:00Z"}
+    second = {"customer_id": "C002", "amount": 15000, "timestamp": "2025-07-07T17:01:00Z"}
+    # One aggregated record holding two transactions, then a plain one
+    event = kinesis_event(json.dumps(first) + '\n' + json.dumps(second) + '\n', json.dumps(first))
+    for _ in range(2):
+        response = preprocess.handler(event, None)
+        assert json.loads(response['body'])['records_processed'] == 3
+    # Two batches in the same second land under two keys
+    keys = sorted(key for _, key in s3.objects)
+    assert len(keys) == 2 and all(key.startswith('transactions/dt=') for key in keys)
+    assert [row['customer_id'] for row in json.loads(s3.objects[('fraud-detection-raw-bucket', keys[0])])] == \
+        ['C001', 'C002', 'C001']
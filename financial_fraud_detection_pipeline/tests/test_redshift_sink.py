@@ -0,0 +1,61 @@
+import os
+import sys
+import pytest
+
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path[:0] = [os.path.join(TESTS_DIR, '..', 'app'), os.path.join(TESTS_DIR, '..', '..')]
+
+from pipeline_common.local_aws import LocalRedshiftData, LocalS3
+from redshift_sink import RedshiftSink
+
+def make_sink(redshift, **kwargs):
+    redshift.execute_statement(Sql="CREATE TABLE transactions (customer_id VARCHAR, amount DOUBLE PRECISION, "
+                                   "timestamp TIMESTAMP, merchant VARCHAR, fraud_flag BOOLEAN)")
+    return RedshiftSink(redshift, 'cluster', 'db', 'user', max_rows=1000, max_age_seconds=3600, **kwargs)
+
+def transaction(i):
+    return {'customer_id': f"C{i:03d}", 'amount': float(i), 'timestamp': '2025-07-07 17:00:00',
+            'merchant': 'Retail', 'fraud_flag': False}
+
+def stored_ids(redshift):
+    return [row[0] for row in redshift.conn.execute("SELECT customer_id FROM transactions ORDER BY customer_id")]
+
+def test_failed_chunk_rebuffers_only_unwritten_rows():
+    redshift = LocalRedshiftData()
+    flushed = []
+    sink = make_sink(redshift, rows_per_statement=2, on_flush=flushed.extend)
+    sink.add_many(transaction(i) for i in range(5))
+    execute, calls = redshift.execute_statement, []
+    def fail_second_chunk(**kwargs):
+        calls.append(kwargs)
+        if len(calls) == 2:
+            raise RuntimeError("redshift down")
+        return execute(**kwargs)
+    redshift.execute_statement = fail_second_chunk
+    with pytest.raises(RuntimeError):
+        sink.flush()
+    assert stored_ids(redshift) == ['C000', 'C001']
+    assert [row[0] for row in sink.buffer] == ['C002', 'C003', 'C004']
+    assert sink.flush() == 3
+    assert stored_ids(redshift) == ['C000', 'C001', 'C002', 'C003', 'C004']
+    assert sink.rows_flushed == 5
+    assert [row[0] for row in flushed] == ['C000', 'C001', 'C002', 'C003', 'C004']
+
+def test_none_is_sent_as_null():
+    redshift = LocalRedshiftData()
+    sink = make_sink(redshift)
+    sink.add(dict(transaction(1), merchant=None))
+    sink.flush()
+    assert redshift.conn.execute("SELECT merchant FROM transactions").fetchall() == [(None,)]
+
+def test_copy_mode_stores_nulls_and_empty_strings_like_insert_mode():
+    stored = {}
+    for mode in ('insert', 'copy'):
+        s3 = LocalS3()
+        redshift = LocalRedshiftData(s3=s3)
+        sink = make_sink(redshift, mode=mode, s3_client=s3, staging_bucket='staging', iam_role='role')
+        sink.add(dict(transaction(1), merchant=None))
+        sink.add(dict(transaction(2), merchant=''))
+        sink.flush()
+        stored[mode] = redshift.conn.execute("SELECT customer_id, merchant FROM transactions ORDER BY customer_id").fetchall()
+    assert stored['copy'] == stored['insert'] == [('C001', None), ('C002', '')]
@@ -0,0 +1,75 @@
+import json
+import pytest
+
+TRANSACTION = {"transaction_id": "T1", "customer_id": "C001", "amount": 120.0,
+               "timestamp": "2025-07-07T17:00:00Z", "merchant": "Retail"}
+
+# Fails the next `failures` calls of one method, then behaves normally
+class Flaky:
+    def __init__(self, method, failures=1):
+        self.method = method
+        self.failures = failures
+
+    def __call__(self, *args, **kwargs):
+        if self.failures:
+            self.failures -= 1
+            raise RuntimeError("service down")
+        return self.method(*args, **kwargs)
+
+def stored_rows(redshift):
+    return redshift.conn.execute("SELECT customer_id, amount FROM transactions").fetchall()
+
+def test_detect_retry_after_failed_flush_is_stored_once(pipeline, monkeypatch):
+    pipeline, _, redshift = pipeline
+    monkeypatch.setattr(redshift, 'execute_statement', Flaky(redshift.execute_statement))
+    with pytest.raises(RuntimeError):
+        pipeline.detect_fraud_lambda([dict(TRANSACTION)])
+    assert pipeline.redshift_sink.buffer == []
+    assert [t['customer_id'] for t in pipeline.detect_fraud_lambda([dict(TRANSACTION)])] == ['C001']
+    assert stored_rows(redshift) == [('C001', 120.0)]
+    # Once stored, a replay is a duplicate
+    assert pipeline.detect_fraud_lambda([dict(TRANSACTION)]) == []
+    assert stored_rows(redshift) == [('C001', 120.0)]
+
+def test_preprocess_retry_after_failed_put_is_processed(pipeline, monkeypatch):
+    pipeline, s3, _ = pipeline
+    event = {'Records': [{'kinesis': {'partitionKey': 'C001', 'data': json.dumps(TRANSACTION)}}]}
+    monkeypatch.setattr(s3, 'put_object', Flaky(s3.put_object))
+    with pytest.raises(RuntimeError):
+        pipeline.preprocess_lambda(event)
+    assert [t['customer_id'] for t in pipeline.preprocess_lambda(event)] == ['C001']
+    assert pipeline.preprocess_lambda(event) == []
+
+def test_preprocess_batches_in_the_same_second_are_both_kept(pipeline):
+    pipeline, s3, _ = pipeline
+    for transaction_id in ('T1', 'T2'):
+        transaction = dict(TRANSACTION, transaction_id=transaction_id)
+        pipeline.preprocess_lambda({'Records': [{'kinesis': {'partitionKey': 'C001', 'data': json.dumps(transaction)}}]})
+    keys = [key for bucket, key in s3.objects if bucket == pipeline.S3_BUCKET_RAW]
+    assert len(keys) == 2 and all(key.startswith('transactions/dt=') for key in keys)
+
+# Records submitted alerts instead of publishing them
+class Alerts:
+    def __init__(self):
+        self.submitted = []
+
+    def submit(self, transaction):
+        self.submitted.append(transaction['customer_id'])
+        return True
+
+    def drain(self, timeout_seconds=None):
+        return True
+
+def test_detect_retry_counts_features_and_alerts_once(pipeline, monkeypatch):
+    pipeline, _, redshift = pipeline
+    alerts = Alerts()
+    monkeypatch.setattr(pipeline, 'alert_dispatcher', alerts)
+    monkeypatch.setattr(pipeline, 'feature_store', pipeline.CustomerFeatureStore())
+    monkeypatch.setattr(pipeline, 'score_batch', lambda transactions: [-1] * len(transactions))
+    monkeypatch.setattr(redshift, 'execute_statement', Flaky(redshift.execute_statement))
+    with pytest.raises(RuntimeError):
+        pipeline.detect_fraud_lambda([dict(TRANSACTION)])
+    assert alerts.submitted == [] and len(pipeline.feature_store) == 0
+    pipeline.detect_fraud_lambda([dict(TRANSACTION)])
+    assert alerts.submitted == ['C001']
+    assert pipeline.feature_store.customers['C001'].count == 1
@@ -0,0 +1,75 @@
+import json
+import numpy as np
+import pandas as pd
+import pytest
+from rule_engine import RuleEngine, DENY, AMBIGUOUS, SAFE, parse_condition
+
+def frame(rows):
+    return pd.DataFrame(rows, columns=['customer_id', 'amount', 'merchant', 'txn_count'])
+
+def test_deny_wins_over_allow_and_the_rest_is_ambiguous():
+    engine = RuleEngine(
+        deny=[{'name': 'hard_limit', 'amount_gte': 1000}, {'name': 'bad_merchant', 'merchant_in': ['Gift Cards']}],
+        allow=[{'name': 'small_grocery', 'amount_lt': 50, 'merchant_in': ['Grocery'], 'txn_count_gte': 5}]
+    )
+    decisions = engine.evaluate(frame([
+        ('C001', 20.0, 'Grocery', 10),     # safe
+        ('C002', 20.0, 'Gift Cards', 10),  # denied by merchant
+        ('C003', 5000.0, 'Grocery', 10),   # denied by amount
+        ('C004', 20.0, 'Grocery', 1),      # allow rule needs all conditions
+        ('C005', 20.0, 'Grocery', None)    # missing feature never matches
+    ]))
+    assert decisions.tolist() == [SAFE, DENY, DENY, AMBIGUOUS, AMBIGUOUS]
+    metrics = engine.metrics()
+    assert metrics['rule_hits'] == {'hard_limit': 1, 'bad_merchant': 1, 'small_grocery': 1, 'customer_limit': 0}
+    assert (metrics['rows'], metrics['skipped'], metrics['denied']) == (5, 3, 2)
+    assert metrics['last_batch']['ambiguous'] == 2 and metrics['skip_rate'] == 0.6
+
+def test_allow_hits_exclude_rows_a_deny_rule_already_flagged():
+    engine = RuleEngine(deny=[{'name': 'hard_limit', 'amount_gte': 100}],
+                        allow=[{'name': 'any_grocery', 'merchant_in': ['Grocery']}])
+    decisions = engine.evaluate(frame([('C001', 500.0, 'Grocery', 1), ('C002', 5.0, 'Grocery', 1)]))
+    assert decisions.tolist() == [DENY, SAFE]
+    assert engine.metrics()['rule_hits']['any_grocery'] == 1
+
+def test_customer_limits_fall_back_to_the_default_limit():
+    engine = RuleEngine(customer_limits={'C001': 100}, default_limit=1000)
+    decisions = engine.evaluate(frame([
+        ('C001', 150.0, 'Fuel', 1),
+        ('C002', 150.0, 'Fuel', 1),
+        ('C002', 1500.0, 'Fuel', 1)
+    ]))
+    assert decisions.tolist() == [DENY, AMBIGUOUS, DENY]
+    assert engine.metrics()['rule_hits']['customer_limit'] == 2
+    assert engine.columns() == {'customer_id', 'amount'}
+
+def test_model_calls_saved_counts_whole_calls_skipped():
+    engine = RuleEngine(allow=[{'name': 'small', 'amount_lt': 10}], records_per_call=2)
+    engine.evaluate(frame([('C001', 1.0, 'Fuel', 1)] * 3 + [('C002', 50.0, 'Fuel', 1)]))
+    # 4 rows would take 2 calls; the 1 ambiguous row takes 1
+    assert engine.metrics()['model_calls_saved'] == 1
+    engine = RuleEngine(allow=[{'name': 'small', 'amount_lt': 10}])
+    engine.evaluate(frame([('C001', 1.0, 'Fuel', 1)] * 3))
+    assert engine.metrics()['model_calls_saved'] == 1
+
+def test_empty_batch_and_unknown_condition():
+    engine = RuleEngine(deny=[{'name': 'hard_limit', 'amount_gte': 1000}])
+    assert engine.evaluate(frame([])).tolist() == []
+    assert engine.metrics()['skip_rate'] is None
+    assert parse_condition('merchant_not_in', ['A']) == ('merchant', 'not_in', frozenset(['A']))
+    with pytest.raises(ValueError):
+        parse_condition('amount_between', [1, 2])
+    with pytest.raises(ValueError):
+        RuleEngine(deny=[{'name': 'empty'}])
+
+def test_from_file_reads_rules_and_customer_limits(tmp_path):
+    path = tmp_path / 'rules.json'
+    path.write_text(json.dumps({
+        'deny': [{'name': 'hard_limit', 'amount_gte': 25000}],
+        'allow': [],
+        'customer_limits': {'default': None, 'customers': {'C001': 10}}
+    }))
+    engine = RuleEngine.from_file(str(path), records_per_call=100)
+    decisions = engine.evaluate(frame([('C001', 20.0, 'Fuel', 1), ('C002', 30000.0, 'Fuel', 1)]))
+    assert np.array_equal(decisions, [DENY, DENY])
+    assert engine.metrics()['rules'] == {'deny': 1, 'allow': 0, 'customer_limits': 1}
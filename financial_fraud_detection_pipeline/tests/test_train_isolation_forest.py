@@ -0,0 +1,48 @@
+import gzip
+import json
+import joblib
+import pandas as pd
+import train_isolation_forest as training
+
+def write_history(root):
+    partition = root / 'dt=2025-07-01'
+    partition.mkdir(parents=True)
+    rows = [{'amount': float(i), 'merchant': 'Retail' if i % 10 else 'Jewelry'} for i in range(300)]
+    pd.DataFrame(rows[:100]).to_csv(partition / 'part-0.csv', index=False)
+    with gzip.open(partition / 'part-1.jsonl.gz', 'wt') as f:
+        f.write(''.join(json.dumps(row) + '\n' for row in rows[100:200]))
+    (partition / 'part-2.json').write_text(json.dumps(rows[200:]))
+    (partition / '_SUCCESS').write_text('')
+    (root / '.staging').mkdir()
+    (root / '.staging' / 'part-3.csv').write_text('amount\n1\n')
+    return rows
+
+def test_data_files_skip_hidden_and_marker_files(tmp_path):
+    write_history(tmp_path)
+    assert sorted(p.rsplit('/', 1)[1] for p in training.find_data_files(str(tmp_path))) == \
+        ['part-0.csv', 'part-1.jsonl.gz', 'part-2.json']
+
+def test_file_sample_is_bounded_per_stratum_and_stats_cover_every_row(tmp_path):
+    write_history(tmp_path)
+    result = training.sample_file(str(tmp_path / 'dt=2025-07-01' / 'part-0.csv'), ['amount'], 'merchant',
+                                  sample_size=5, chunk_rows=7, seed=1)
+    assert result['rows_read'] == 100 and result['counts'] == {'Retail': 90, 'Jewelry': 10}
+    assert result['sample']['_stratum'].value_counts().to_dict() == {'Retail': 5, 'Jewelry': 5}
+    assert result['stats']['amount'][:2] == [100, float(sum(range(100)))]
+
+def test_rare_strata_get_at_least_one_tree_of_rows():
+    assert training.allocate({'Retail': 9900, 'Jewelry': 100}, pool_size=1000, min_rows=256) == \
+        {'Retail': 990, 'Jewelry': 100}
+    assert training.allocate({'Retail': 9000, 'Jewelry': 1000}, pool_size=1000, min_rows=256)['Jewelry'] == 256
+
+def test_main_trains_on_every_file_and_writes_a_loadable_version(tmp_path):
+    write_history(tmp_path / 'history')
+    output_dir = training.main(['--data-dir', str(tmp_path / 'history'), '--model-dir', str(tmp_path / 'models'),
+                                '--n-estimators', '10', '--max-samples', '32', '--n-jobs', '2'])
+    metrics = json.loads(open(f"{output_dir}/metrics.json").read())
+    assert (metrics['files'], metrics['rows_read'], metrics['training_pool_rows']) == (3, 300, 300)
+    assert metrics['strata'] == {'Retail': 270, 'Jewelry': 30}
+    model = joblib.load(f"{output_dir}/model.joblib")
+    # The endpoint handlers accept the legacy single-row payload
+    body = json.loads(training.output_fn(training.predict_fn(training.input_fn('{"amount": 150}'), model)))
+    assert body['prediction'] == body['predictions'][0] in (-1, 1)
@@ -0,0 +1 @@
+# Utilities shared by the pipeline projects in this repository
@@ -0,0 +1,99 @@
+import os
+import sys
+import json
+import argparse
+import tempfile
+import statistics
+import subprocess
+
+# Cold import time of each pipeline module, measured in a fresh interpreter per
+# run (so nothing is already cached in sys.modules), along with the heavy
+# packages and log files the import pulls in. --baseline REV measures the same
+# modules in a `git archive` export of an earlier revision for comparison.
+#   python -m pipeline_common.benchmarks.import_time_benchmark --runs 5 --baseline HEAD~1
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+MODULES = [
+    ('customer_360_data_platform', 'customer_360_pipeline'),
+    ('unified_financial_data_lake/app', 'financial_data_lake'),
+    ('financial_fraud_detection_pipeline/app', 'fraud_detection_pipeline'),
+    ('regulatory_reporting_pipeline/app', 'regulatory_pipeline')
+]
+HEAVY = ['boto3', 'streamlit', 'matplotlib', 'sklearn', 'snowflake.connector', 'confluent_kafka', 'joblib',
+         'requests', 'uvicorn', 'pyspark', 'awsglue', 'great_expectations']
+
+CHILD = """
+import os, sys, json, time
+root, app_dir, module, heavy = sys.argv[1], sys.argv[2], sys.argv[3], sys.argv[4].split(',')
+sys.path[:0] = [app_dir, root]
+start = time.perf_counter()
+try:
+    __import__(module)
+    error = None
+except Exception as e:
+    error = f"{type(e).__name__}: {e}"
+seconds = time.perf_counter() - start
+loaded = [name for name in heavy if name in sys.modules]
+first_client = None
+if error is None:
+    try:
+        from pipeline_common import clients
+        start = time.perf_counter()
+        clients.get_client('s3')
+        first_client = time.perf_counter() - start
+    except (ImportError, KeyError):
+        pass
+print(json.dumps({
+    'seconds': seconds,
+    'error': error,
+    'heavy': loaded,
+    'log_files': sorted(name for name in os.listdir('.') if name.endswith('.log')),
+    'first_client_seconds': first_client
+}))
+"""
+
+def measure(root, app_dir, module, runs):
+    results = []
+    for _ in range(runs):
+        with tempfile.TemporaryDirectory(prefix='import-bench-') as work_dir:
+            env = dict(os.environ, AWS_DEFAULT_REGION=os.environ.get('AWS_DEFAULT_REGION', 'us-east-1'),
+                       FEATURE_STORE_SNAPSHOT_PATH=os.path.join(work_dir, 'features.pkl'))
+            output = subprocess.run([sys.executable, '-c', CHILD, root, os.path.join(root, app_dir), module,
+                                     ','.join(HEAVY)], cwd=work_dir, env=env, capture_output=True, text=True)
+            lines = output.stdout.strip().splitlines()
+            if not lines:
+                return {'seconds': None, 'error': output.stderr.strip().splitlines()[-1], 'heavy': [], 'log_files': []}
+            results.append(json.loads(lines[-1]))
+    result = results[-1]
+    result['seconds'] = statistics.median(run['seconds'] for run in results)
+    return result
+
+def export_revision(revision, directory):
+    archive = subprocess.run(['git', 'archive', revision], cwd=REPO_ROOT, capture_output=True, check=True).stdout
+    subprocess.run(['tar', '-x', '-C', directory], input=archive, check=True)
+
+def report(label, result):
+    if result['error']:
+        print(f"  {label:9s} import fails: {result['error']}")
+        return
+    first_client = result.get('first_client_seconds')
+    print(f"  {label:9s} {result['seconds'] * 1000:8.1f} ms  heavy: {', '.join(result['heavy']) or '-'}; "
+          f"log files: {', '.join(result['log_files']) or '-'}"
+          + (f"; first s3 client {first_client * 1000:.1f} ms" if first_client is not None else ""))
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--runs', type=int, default=3, help='fresh interpreters per module (median reported)')
+    parser.add_argument('--baseline', help='git revision to compare against')
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory(prefix='import-bench-baseline-') as baseline_root:
+        if args.baseline:
+            export_revision(args.baseline, baseline_root)
+        for app_dir, module in MODULES:
+            print(module)
+            if args.baseline:
+                report('baseline', measure(baseline_root, app_dir, module, args.runs))
+            report('current', measure(REPO_ROOT, app_dir, module, args.runs))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+import json
+import time
+import random
+import argparse
+import threading
+from pipeline_common.local_kafka import LocalKafkaBroker, LocalKafkaConsumer, LocalTopicPartition
+from pipeline_common.kafka_consumer import KeyOrderedConsumer
+
+# Throughput of the key-ordered consumer runtime as workers are added, on a
+# local broker stand-in. Each message costs --work-ms in the handler (standing
+# in for a Snowflake round trip), so one worker is the old single-threaded
+# consumer. Every run checks that each customer's events were handled in
+# order, and that the committed offsets reach the end of every partition.
+# --rebalance starts a second consumer in the group half way through.
+#   python -m pipeline_common.benchmarks.kafka_consumer_benchmark --events 20000 --workers 1 2 4 8 16
+
+TOPIC = 'customer_events'
+
+def fill_topic(broker, events, customers):
+    sequence = {}
+    batch = []
+    for _ in range(events):
+        customer_id = f"C{random.randrange(customers):06d}"
+        sequence[customer_id] = sequence.get(customer_id, 0) + 1
+        key = customer_id.encode('utf-8')
+        value = json.dumps({'customer_id': customer_id, 'seq': sequence[customer_id], 'amount': 10.0}).encode('utf-8')
+        batch.append((TOPIC, broker.partition_for(key), key, value))
+    broker.append(batch)
+
+class OrderCheck:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.last = {}
+        self.handled = 0
+        self.out_of_order = 0
+        self.duplicates = 0
+
+    def handler(self, work_seconds):
+        def handle(worker, messages):
+            time.sleep(work_seconds * len(messages))
+            with self.lock:
+                for message in messages:
+                    event = json.loads(message.value())
+                    last = self.last.get(event['customer_id'], 0)
+                    if event['seq'] <= last:
+                        self.duplicates += 1
+                    elif event['seq'] != last + 1:
+                        self.out_of_order += 1
+                    self.last[event['customer_id']] = max(last, event['seq'])
+                    self.handled += 1
+        return handle
+
+def run(broker, events, workers, args, group):
+    check = OrderCheck()
+    runtimes = []
+
+    def consumer():
+        runtime = KeyOrderedConsumer(
+            LocalKafkaConsumer({'group.id': group, 'auto.offset.reset': 'earliest'}, broker), [TOPIC],
+            check.handler(args.work_ms / 1000), workers=workers, max_batch=args.max_batch, max_queued=args.max_queued,
+            topic_partition=LocalTopicPartition)
+        runtimes.append(runtime)
+        threading.Thread(target=runtime.run, daemon=True).start()
+        return runtime
+
+    start = time.perf_counter()
+    consumer()
+    rebalanced = not args.rebalance
+    # Duplicates (redelivery after a rebalance) don't count towards the events seen
+    while sum(check.last.values()) < events:
+        if not rebalanced and check.handled >= events // 2:
+            consumer()
+            rebalanced = True
+        time.sleep(0.01)
+    elapsed = time.perf_counter() - start
+    for runtime in runtimes:
+        runtime.stop()
+    while any(not runtime.consumer.closed for runtime in runtimes):
+        time.sleep(0.01)
+    committed = sum(broker.committed(group, TOPIC, partition) or 0 for partition in range(broker.partition_count))
+    return {
+        'elapsed': elapsed,
+        'check': check,
+        'committed_to_end': committed == events,
+        'pauses': sum(runtime.pauses for runtime in runtimes),
+        'rebalances': sum(runtime.rebalances for runtime in runtimes)
+    }
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--events', type=int, default=20000)
+    parser.add_argument('--customers', type=int, default=5000)
+    parser.add_argument('--partitions', type=int, default=12)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8, 16])
+    parser.add_argument('--work-ms', type=float, default=1.0, help='handler time per message')
+    parser.add_argument('--max-batch', type=int, default=50)
+    parser.add_argument('--max-queued', type=int, default=2000, help='worker queue depth that pauses fetching')
+    parser.add_argument('--rebalance', action='store_true', help='add a second consumer half way through')
+    args = parser.parse_args()
+
+    baseline = None
+    for workers in args.workers:
+        broker = LocalKafkaBroker(partitions=args.partitions, round_trip_seconds=0, connect_seconds=0)
+        fill_topic(broker, args.events, args.customers)
+        result = run(broker, args.events, workers, args, group=f"bench-{workers}")
+        rate = args.events / result['elapsed']
+        baseline = baseline or rate / workers
+        check = result['check']
+        print(f"{workers:3d} workers: {rate:9.0f} events/s  (x{rate / baseline:5.2f}, out of order {check.out_of_order}, "
+              f"duplicates {check.duplicates}, committed to end {result['committed_to_end']}, "
+              f"pauses {result['pauses']}, rebalances {result['rebalances']})")
+
+if __name__ == "__main__":
+    main()
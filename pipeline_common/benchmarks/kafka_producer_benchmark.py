@@ -0,0 +1,58 @@
+import json
+import time
+import random
+import argparse
+from pipeline_common.local_kafka import LocalKafkaBroker, LocalKafkaProducer
+from pipeline_common.kafka_producer import PooledKafkaProducer
+
+# Throughput of the old produce_event path (new Producer + flush per event)
+# against the shared PooledKafkaProducer on a local broker stand-in. Run from
+# the repository root:
+#   python -m pipeline_common.benchmarks.kafka_producer_benchmark --events 20000
+
+def make_events(count, customers):
+    return [{'customer_id': f"C{random.randrange(customers):06d}", 'amount': round(random.lognormvariate(5, 1.5), 2),
+             'type': random.choice(['investment', 'savings', 'loan']), 'date': '2025-07-07'}
+            for _ in range(count)]
+
+def per_call(events, broker, topic):
+    start = time.perf_counter()
+    for event in events:
+        producer = LocalKafkaProducer({}, broker)
+        producer.produce(topic, json.dumps(event).encode('utf-8'))
+        producer.flush()
+        producer.close()
+    return time.perf_counter() - start
+
+def pooled(events, broker, topic, linger_ms):
+    start = time.perf_counter()
+    producer = PooledKafkaProducer({'bootstrap.servers': 'local', 'linger.ms': linger_ms},
+                                   producer_factory=lambda config: LocalKafkaProducer(config, broker))
+    producer.produce_many(topic, events)
+    producer.close()
+    return time.perf_counter() - start, producer
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--events', type=int, default=20000)
+    parser.add_argument('--customers', type=int, default=1000)
+    parser.add_argument('--round-trip-ms', type=float, default=2.0, help='simulated broker round trip per request')
+    parser.add_argument('--connect-ms', type=float, default=20.0, help='simulated client bootstrap per new producer')
+    parser.add_argument('--linger-ms', type=float, default=20.0)
+    args = parser.parse_args()
+    events = make_events(args.events, args.customers)
+
+    # The per-call baseline is slow; time a sample and extrapolate
+    sample = events[:min(len(events), 200)]
+    broker = LocalKafkaBroker(round_trip_seconds=args.round_trip_ms / 1000, connect_seconds=args.connect_ms / 1000)
+    elapsed = per_call(sample, broker, 'bench')
+    print(f"producer per call: {len(sample) / elapsed:10.0f} events/s  ({broker.requests} requests for {len(sample)} events)")
+    broker = LocalKafkaBroker(round_trip_seconds=args.round_trip_ms / 1000, connect_seconds=args.connect_ms / 1000)
+    elapsed, producer = pooled(events, broker, 'bench', args.linger_ms)
+    metrics = producer.metrics()
+    print(f"pooled producer:   {len(events) / elapsed:10.0f} events/s  ({broker.requests} requests, "
+          f"{metrics['delivered']} delivered, {metrics['failed']} failed, "
+          f"delivery p99 {metrics['delivery_latency']['p99_ms']} ms)")
+
+if __name__ == "__main__":
+    main()
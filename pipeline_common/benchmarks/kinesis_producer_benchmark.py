@@ -0,0 +1,53 @@
+import json
+import time
+import random
+import argparse
+from pipeline_common.local_aws import LocalKinesis
+from pipeline_common.kinesis_producer import KinesisProducer
+
+# Throughput of the old put_record loop against KinesisProducer on a local stream.
+# Run from the repository root:
+#   python -m pipeline_common.benchmarks.kinesis_producer_benchmark --records 20000
+
+def make_records(count, customers):
+    return [{'customer_id': f"C{random.randrange(customers):06d}", 'amount': round(random.lognormvariate(5, 1.5), 2),
+             'timestamp': '2025-07-07T17:00:00Z', 'merchant': random.choice(['Retail', 'Online', 'Grocery'])}
+            for _ in range(count)]
+
+def per_record(records, latency, throttle_rate):
+    kinesis = LocalKinesis(latency_seconds=latency, throttle_rate=throttle_rate, seed=1)
+    start = time.perf_counter()
+    for record in records:
+        kinesis.put_record(StreamName='bench', Data=json.dumps(record), PartitionKey=record['customer_id'])
+    return time.perf_counter() - start, kinesis
+
+def batched(records, latency, throttle_rate, aggregate):
+    kinesis = LocalKinesis(latency_seconds=latency, throttle_rate=throttle_rate, seed=1)
+    producer = KinesisProducer(kinesis, 'bench', aggregate=aggregate)
+    start = time.perf_counter()
+    producer.put_many(records)
+    producer.close()
+    return time.perf_counter() - start, kinesis, producer
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--records', type=int, default=20000)
+    parser.add_argument('--customers', type=int, default=1000)
+    parser.add_argument('--latency-ms', type=float, default=2.0, help='simulated round-trip per API call')
+    parser.add_argument('--throttle-rate', type=float, default=0.01, help='share of entries failed per request')
+    args = parser.parse_args()
+    records = make_records(args.records, args.customers)
+    latency = args.latency_ms / 1000
+
+    # The per-record baseline is slow at realistic latency; time a sample and extrapolate
+    sample = records[:min(len(records), 2000)]
+    elapsed, kinesis = per_record(sample, latency, 0.0)
+    print(f"put_record loop:        {len(sample) / elapsed:10.0f} records/s  ({kinesis.calls} calls for {len(sample)} records)")
+    for aggregate in (False, True):
+        elapsed, kinesis, producer = batched(records, latency, args.throttle_rate, aggregate)
+        label = 'producer (aggregated)' if aggregate else 'producer'
+        print(f"{label + ':':<23} {len(records) / elapsed:10.0f} records/s  ({kinesis.calls} calls, "
+              f"{producer.retried_records} retried, {producer.failed_records} failed)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+import json
+import time
+import random
+import argparse
+import tracemalloc
+from datetime import datetime
+from pipeline_common.local_aws import LocalS3
+from pipeline_common.raw_zone import RawZoneWriter, read_records
+
+# The old raw-zone write (one json.dumps of the whole batch, one put_object
+# under a per-second key) against RawZoneWriter on a local S3: throughput,
+# peak Python memory, stored bytes and objects, and how many of two batches
+# written in the same second survive. Records are generated on the fly, so
+# the writer never sees the whole batch at once.
+# Run from the repository root:
+#   python -m pipeline_common.benchmarks.raw_zone_benchmark --records 500000
+
+MERCHANTS = ['Retail', 'Online', 'Grocery', 'Travel', 'Fuel']
+
+def make_records(count, customers, days, seed):
+    rng = random.Random(seed)
+    for i in range(count):
+        yield {'transaction_id': f"T{i:010d}", 'customer_id': f"C{rng.randrange(customers):06d}",
+               'amount': round(rng.lognormvariate(5, 1.5), 2), 'merchant': rng.choice(MERCHANTS),
+               'date': f"2025-07-{1 + rng.randrange(days):02d}"}
+
+def single_object(s3, records):
+    data = list(records)
+    key = f"raw/transactions/{datetime.now().strftime('%Y%m%d%H%M%S')}.json"
+    s3.put_object(Bucket='bench', Key=key, Body=json.dumps(data))
+    return [key]
+
+def raw_zone(s3, records, file_format, max_file_bytes):
+    writer = RawZoneWriter(s3, 'bench', 'transactions', file_format=file_format, partition_field='date',
+                           max_file_bytes=max_file_bytes)
+    writer.write_many(records)
+    return writer.close()
+
+# Throughput is timed on its own run, since tracing allocations slows everything down
+def measure(label, write, args):
+    tracemalloc.start()
+    write(LocalS3(), make_records(args.records, args.customers, args.days, args.seed))
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    s3 = LocalS3()
+    start = time.perf_counter()
+    keys = write(s3, make_records(args.records, args.customers, args.days, args.seed))
+    elapsed = time.perf_counter() - start
+    stored = sum(len(body) for body in s3.objects.values())
+    print(f"{label:<16} {args.records / elapsed:10.0f} records/s  peak {peak / 2 ** 20:7.1f} MiB  "
+          f"stored {stored / 2 ** 20:7.1f} MiB in {len(keys)} objects ({s3.part_calls} multipart parts)")
+    return s3, keys
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--records', type=int, default=500000)
+    parser.add_argument('--customers', type=int, default=10000)
+    parser.add_argument('--days', type=int, default=3, help='partition dates the records are spread over')
+    parser.add_argument('--max-file-mb', type=float, default=16)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+    max_file_bytes = int(args.max_file_mb * 2 ** 20)
+
+    measure('json array', single_object, args)
+    measure('ndjson.gz', lambda s3, records: raw_zone(s3, records, 'ndjson', max_file_bytes), args)
+    s3, keys = measure('parquet', lambda s3, records: raw_zone(s3, records, 'parquet', max_file_bytes), args)
+    assert sum(len(read_records(s3, 'bench', key)) for key in keys) == args.records
+
+    # Two small batches landing in the same second
+    for label, write in (('json array', single_object),
+                         ('ndjson.gz', lambda s3, records: raw_zone(s3, records, 'ndjson', max_file_bytes))):
+        s3 = LocalS3()
+        keys = write(s3, make_records(100, args.customers, 1, 1)) + write(s3, make_records(100, args.customers, 1, 2))
+        print(f"{label:<16} same-second batches: {len(set(keys))} of {len(keys)} objects kept")
+
+if __name__ == "__main__":
+    main()
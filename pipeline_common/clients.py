@@ -0,0 +1,61 @@
+import threading
+
+# Process-wide registry of lazily created clients. A module declares the
+# clients it uses with lazy_client(name, factory) (or aws_client(service)),
+# which costs nothing at import time: the factory runs on the first attribute
+# access, and every later access, from any module in the process, reuses that
+# one client. register() installs an instance under a name, before or after
+# first use, which is how benchmarks and tests swap in local stand-ins without
+# patching each module that holds a client.
+
+factories = {}
+clients = {}
+clients_lock = threading.Lock()
+
+def get_client(name):
+    client = clients.get(name)
+    if client is None:
+        with clients_lock:
+            client = clients.get(name)
+            if client is None:
+                client = clients[name] = factories[name]()
+    return client
+
+def register(name, client):
+    with clients_lock:
+        clients[name] = client
+
+# Forget created clients (all by default) so the next use creates them again
+def reset(*names):
+    with clients_lock:
+        for name in names or list(clients):
+            clients.pop(name, None)
+
+def created():
+    with clients_lock:
+        return sorted(clients)
+
+# Stands in for the client in module globals and constructor arguments;
+# attribute access is forwarded to the registered client
+class LazyClient:
+    def __init__(self, name):
+        self.client_name = name
+
+    def __getattr__(self, attribute):
+        return getattr(get_client(self.client_name), attribute)
+
+    def __repr__(self):
+        state = 'created' if self.client_name in clients else 'not created'
+        return f"LazyClient({self.client_name!r}, {state})"
+
+# The first factory declared for a name wins, so modules sharing a client agree on it
+def lazy_client(name, factory):
+    with clients_lock:
+        factories.setdefault(name, factory)
+    return LazyClient(name)
+
+def aws_client(service):
+    def create():
+        import boto3
+        return boto3.client(service)
+    return lazy_client(service, create)
@@ -0,0 +1,188 @@
+import time
+import asyncio
+import logging
+import functools
+import threading
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from pipeline_common.metrics import LatencyTracker
+
+# Queueing shorter than this is thread hand-off, not waiting for a connection
+QUEUE_WAIT_THRESHOLD_SECONDS = 0.001
+
+# Bounded pool of DB-API connections (Snowflake or any connector with
+# cursor()/commit()/rollback()/close()). Connections are opened lazily by
+# factory, checked out per request and returned afterwards; a connection idle
+# for longer than health_check_seconds is probed with SELECT 1 before reuse and
+# replaced if the probe fails or the connection reports itself closed. Blocking
+# work can be run on the pool's own thread pool with run_async() so async
+# handlers never block the event loop. Wait time and utilization metrics are
+# kept to size the pool under load.
+class ConnectionPool:
+    def __init__(self, factory, max_size=8, checkout_timeout_seconds=30.0, health_check_seconds=60.0):
+        self.factory = factory
+        self.max_size = max_size
+        self.checkout_timeout_seconds = checkout_timeout_seconds
+        self.health_check_seconds = health_check_seconds
+        self.idle = []
+        self.size = 0
+        self.in_use = 0
+        self.condition = threading.Condition()
+        self.executor = ThreadPoolExecutor(max_workers=max_size, thread_name_prefix='db-pool')
+        self.wait_latency = LatencyTracker()
+        self.checkouts = 0
+        self.waits = 0
+        self.timeouts = 0
+        self.created = 0
+        self.discarded = 0
+        self.health_check_failures = 0
+        self.peak_in_use = 0
+        self.busy_seconds = 0.0
+        self.started = time.monotonic()
+
+    def healthy(self, conn, idle_since):
+        is_closed = getattr(conn, 'is_closed', None)
+        if is_closed and is_closed():
+            return False
+        if time.monotonic() - idle_since < self.health_check_seconds:
+            return True
+        try:
+            cursor = conn.cursor()
+            try:
+                cursor.execute("SELECT 1")
+                cursor.fetchone()
+            finally:
+                cursor.close()
+            return True
+        except Exception as e:
+            logging.warning(f"Discarding pooled connection that failed its health check: {e}")
+            return False
+
+    def discard(self, conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+        with self.condition:
+            self.size -= 1
+            self.discarded += 1
+            self.condition.notify()
+
+    # queued_at: when the request was queued for a pool thread, so executor queueing counts as waiting
+    def acquire(self, queued_at=None):
+        start = queued_at or time.perf_counter()
+        deadline = time.monotonic() + self.checkout_timeout_seconds
+        waited = queued_at is not None and time.perf_counter() - queued_at > QUEUE_WAIT_THRESHOLD_SECONDS
+        while True:
+            with self.condition:
+                while not self.idle and self.size >= self.max_size:
+                    waited = True
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self.timeouts += 1
+                        raise TimeoutError(f"No pooled connection free after {self.checkout_timeout_seconds}s "
+                                           f"({self.max_size} in use)")
+                    self.condition.wait(remaining)
+                if self.idle:
+                    conn, idle_since = self.idle.pop()
+                else:
+                    conn, idle_since = None, None
+                    self.size += 1
+                self.in_use += 1
+                self.peak_in_use = max(self.peak_in_use, self.in_use)
+            if conn is None:
+                try:
+                    conn = self.factory()
+                except Exception:
+                    with self.condition:
+                        self.size -= 1
+                        self.in_use -= 1
+                        self.condition.notify()
+                    raise
+                with self.condition:
+                    self.created += 1
+                break
+            if self.healthy(conn, idle_since):
+                break
+            with self.condition:
+                self.in_use -= 1
+                self.health_check_failures += 1
+            self.discard(conn)
+        self.wait_latency.record(time.perf_counter() - start)
+        with self.condition:
+            self.checkouts += 1
+            self.waits += waited
+        return conn
+
+    def release(self, conn, broken=False, checked_out_at=None):
+        with self.condition:
+            self.in_use -= 1
+            if checked_out_at is not None:
+                self.busy_seconds += time.monotonic() - checked_out_at
+            if not broken:
+                self.idle.append((conn, time.monotonic()))
+                self.condition.notify()
+                return
+        self.discard(conn)
+
+    # with pool.connection() as conn: ... (rolled back on error, returned to the pool either way)
+    @contextmanager
+    def connection(self, queued_at=None):
+        conn = self.acquire(queued_at)
+        checked_out_at = time.monotonic()
+        broken = False
+        try:
+            yield conn
+        except Exception:
+            try:
+                conn.rollback()
+            except Exception:
+                broken = True
+            raise
+        finally:
+            self.release(conn, broken, checked_out_at)
+
+    # Run fn(conn, *args) with a checked-out connection
+    def run(self, fn, *args, **kwargs):
+        with self.connection() as conn:
+            return fn(conn, *args, **kwargs)
+
+    def run_queued(self, queued_at, fn, *args, **kwargs):
+        with self.connection(queued_at) as conn:
+            return fn(conn, *args, **kwargs)
+
+    # Same as run(), on the pool's worker threads so the event loop stays free
+    async def run_async(self, fn, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        call = functools.partial(self.run_queued, time.perf_counter(), fn, *args, **kwargs)
+        return await loop.run_in_executor(self.executor, call)
+
+    def close(self):
+        with self.condition:
+            idle, self.idle = self.idle, []
+            self.size -= len(idle)
+        for conn, _ in idle:
+            try:
+                conn.close()
+            except Exception:
+                pass
+        self.executor.shutdown(wait=False)
+
+    def metrics(self):
+        elapsed = time.monotonic() - self.started
+        with self.condition:
+            return {
+                'max_size': self.max_size,
+                'size': self.size,
+                'in_use': self.in_use,
+                'idle': len(self.idle),
+                'peak_in_use': self.peak_in_use,
+                'utilization': round(self.busy_seconds / (elapsed * self.max_size), 4) if elapsed else None,
+                'checkouts': self.checkouts,
+                'waits': self.waits,
+                'timeouts': self.timeouts,
+                'wait_latency': self.wait_latency.summary(),
+                'created': self.created,
+                'discarded': self.discarded,
+                'health_check_failures': self.health_check_failures
+            }
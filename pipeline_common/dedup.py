@@ -0,0 +1,152 @@
+import math
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+
+# Fields that identify a transaction when it carries no transaction_id
+FINGERPRINT_FIELDS = ('customer_id', 'amount', 'timestamp', 'merchant')
+
+# 16-byte sha256 prefix of the transaction id, or of its identifying fields
+def fingerprint(transaction, fields=FINGERPRINT_FIELDS):
+    if transaction.get('transaction_id') is not None:
+        text = f"id|{transaction['transaction_id']}"
+    else:
+        text = '|'.join(str(transaction.get(field)) for field in fields)
+    return hashlib.sha256(text.encode()).digest()[:16]
+
+# Fixed-size Bloom filter over fingerprints; the k bit positions come from
+# double hashing the two 64-bit halves of the (already uniform) fingerprint
+class BloomFilter:
+    def __init__(self, capacity, false_positive_rate):
+        self.size = max(64, int(-capacity * math.log(false_positive_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+        self.created = time.monotonic()
+
+    def positions(self, key):
+        h1 = int.from_bytes(key[:8], 'little')
+        h2 = int.from_bytes(key[8:16], 'little') | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hashes)]
+
+    def add(self, positions):
+        for position in positions:
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def contains(self, positions):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in positions)
+
+# Idempotency check for replayed records with flat memory. Keys are remembered
+# for at least window_seconds in a ring of Bloom filter generations (the
+# newest takes inserts, the oldest is dropped every window / (generations - 1)
+# seconds or when the newest fills up), plus an exact LRU set of the most
+# recent keys. A key found in the exact set is a certain duplicate; a key only
+# the Bloom filters have seen is a probable duplicate, wrong with probability
+# false_positive_rate, and is dropped too unless trust_bloom is False.
+class DuplicateFilter:
+    def __init__(self, window_seconds=3600, generations=3, capacity_per_generation=1_000_000,
+                 false_positive_rate=1e-6, exact_recent=100_000, trust_bloom=True):
+        self.window_seconds = window_seconds
+        self.rotate_seconds = window_seconds / (generations - 1)
+        self.generation_count = generations
+        self.capacity_per_generation = capacity_per_generation
+        self.false_positive_rate = false_positive_rate
+        self.exact_recent = exact_recent
+        self.trust_bloom = trust_bloom
+        self.generations = [self.new_generation()]
+        self.recent = OrderedDict()
+        self.lock = threading.Lock()
+        self.checked = 0
+        self.duplicates = 0
+        self.probable_duplicates = 0
+        self.rotations = 0
+        self.early_rotations = 0
+
+    def new_generation(self):
+        return BloomFilter(self.capacity_per_generation, self.false_positive_rate)
+
+    def rotate(self, now):
+        newest = self.generations[-1]
+        full = newest.count >= self.capacity_per_generation
+        if full or now - newest.created >= self.rotate_seconds:
+            self.generations.append(self.new_generation())
+            if len(self.generations) > self.generation_count:
+                self.generations.pop(0)
+            self.rotations += 1
+            self.early_rotations += full
+
+    # True if key was seen within the window (counted in the metrics); does not remember it
+    def contains(self, key):
+        with self.lock:
+            self.checked += 1
+            self.rotate(time.monotonic())
+            if key in self.recent:
+                self.recent.move_to_end(key)
+                self.duplicates += 1
+                return True
+            positions = self.generations[-1].positions(key)
+            if any(generation.contains(positions) for generation in self.generations):
+                self.probable_duplicates += 1
+                if self.trust_bloom:
+                    self.duplicates += 1
+                    return True
+            return False
+
+    # Remember keys as seen; call once the records they stand for are durably stored
+    def commit(self, keys):
+        with self.lock:
+            self.rotate(time.monotonic())
+            for key in keys:
+                if key in self.recent:
+                    continue
+                self.generations[-1].add(self.generations[-1].positions(key))
+                self.recent[key] = None
+                if len(self.recent) > self.exact_recent:
+                    self.recent.popitem(last=False)
+
+    # True if key was seen within the window; otherwise remembers it and returns False
+    def seen(self, key):
+        if self.contains(key):
+            return True
+        self.commit([key])
+        return False
+
+    # (transactions not seen before, their keys), in order, with duplicates within
+    # the batch dropped too. Nothing is remembered: commit(keys) after the batch is
+    # stored, so a batch whose write fails is not mistaken for a replay on retry.
+    def check(self, transactions, key=fingerprint):
+        fresh, keys, batch = [], [], set()
+        for transaction in transactions:
+            transaction_key = key(transaction)
+            if transaction_key in batch:
+                with self.lock:
+                    self.checked += 1
+                    self.duplicates += 1
+                continue
+            if self.contains(transaction_key):
+                continue
+            batch.add(transaction_key)
+            fresh.append(transaction)
+            keys.append(transaction_key)
+        return fresh, keys
+
+    # Transactions not seen before, remembered immediately (for callers with nothing to fail after)
+    def filter(self, transactions, key=fingerprint):
+        fresh, keys = self.check(transactions, key)
+        self.commit(keys)
+        return fresh
+
+    def metrics(self):
+        return {
+            'checked': self.checked,
+            'duplicates': self.duplicates,
+            'probable_duplicates': self.probable_duplicates,
+            'duplicate_rate': round(self.duplicates / self.checked, 6) if self.checked else None,
+            'generations': len(self.generations),
+            'rotations': self.rotations,
+            'early_rotations': self.early_rotations,
+            'exact_keys': len(self.recent),
+            'bloom_bytes': sum(len(generation.bits) for generation in self.generations)
+        }
@@ -0,0 +1,314 @@
+import time
+import zlib
+import queue
+import logging
+import threading
+from collections import deque
+from pipeline_common.metrics import LatencyTracker
+
+def kafka_topic_partition(topic, partition, offset=-1001):
+    from confluent_kafka import TopicPartition
+    return TopicPartition(topic, partition, offset)
+
+# Route by message key so every key is handled by one worker, in order;
+# keyless messages stay with their partition
+def message_key(message):
+    key = message.key()
+    if key is None:
+        return f"{message.topic()}:{message.partition()}".encode('utf-8')
+    return key if isinstance(key, bytes) else str(key).encode('utf-8')
+
+def key_worker(key, workers):
+    return zlib.crc32(key) % workers
+
+# Offsets handed to workers for one partition. The commit point only moves past
+# an offset once it and every offset before it in the partition is done, so a
+# slow worker holds back the commit instead of letting a later one skip it.
+class PartitionOffsets:
+    def __init__(self):
+        self.pending = deque()
+        self.done = set()
+        self.commit_point = None
+        self.committed = None
+
+    def dispatched(self, offset):
+        self.pending.append(offset)
+
+    def completed(self, offset):
+        self.done.add(offset)
+        while self.pending and self.pending[0] in self.done:
+            self.done.discard(self.pending[0])
+            self.commit_point = self.pending.popleft() + 1
+
+    def outstanding(self):
+        return len(self.pending)
+
+# Kafka consumer runtime that fans messages out to a pool of worker threads.
+# Messages are routed by a hash of their key, so one customer's events are
+# processed by one worker in offset order while different customers run in
+# parallel. Each worker takes whatever is queued for it (up to max_batch,
+# waiting up to batch_linger_seconds to fill) and calls handler(worker, messages);
+# the offsets are marked done only when the handler returns, and the poll
+# thread commits, per partition, the highest offset below which everything is
+# done. When any worker queue reaches max_queued the assigned partitions are
+# paused, and resumed once every queue is back under half of that. On a
+# rebalance the revoked partitions' outstanding messages are drained (up to
+# revoke_timeout_seconds) and committed before the partitions are given up.
+# A handler that raises is retried with capped exponential backoff (retry_seconds
+# doubling up to max_retry_seconds), so it should be retry-safe. After
+# max_attempts the batch is handed to dead_letter(worker, messages, error), or
+# logged and skipped without one, and its offsets are released so one poison
+# batch cannot stall its worker and every key routed to it.
+class KeyOrderedConsumer:
+    def __init__(self, consumer, topics, handler, workers=4, max_batch=500, batch_linger_seconds=0.0, max_queued=5000,
+                 commit_interval_seconds=1.0, poll_batch=1000, poll_timeout_seconds=0.1, revoke_timeout_seconds=30.0,
+                 retry_seconds=1.0, max_retry_seconds=30.0, max_attempts=5, dead_letter=None, key_fn=message_key,
+                 topic_partition=kafka_topic_partition):
+        self.consumer = consumer
+        self.topics = topics
+        self.handler = handler
+        self.workers = workers
+        self.max_batch = max_batch
+        self.batch_linger_seconds = batch_linger_seconds
+        self.max_queued = max_queued
+        self.commit_interval_seconds = commit_interval_seconds
+        self.poll_batch = poll_batch
+        self.poll_timeout_seconds = poll_timeout_seconds
+        self.revoke_timeout_seconds = revoke_timeout_seconds
+        self.retry_seconds = retry_seconds
+        self.max_retry_seconds = max_retry_seconds
+        self.max_attempts = max_attempts
+        self.dead_letter = dead_letter
+        self.key_fn = key_fn
+        self.topic_partition = topic_partition
+        self.queues = [queue.Queue() for _ in range(workers)]
+        self.offsets = {}
+        self.lock = threading.Condition()
+        self.stopping = threading.Event()
+        self.threads = []
+        self.paused = False
+        self.pauses = 0
+        self.paused_seconds = 0.0
+        self.paused_at = None
+        self.last_commit = time.monotonic()
+        self.commits = 0
+        self.rebalances = 0
+        self.handler_errors = 0
+        self.dead_lettered = 0
+        self.consumed = 0
+        self.processed = [0] * workers
+        self.batches = [0] * workers
+        self.batch_latency = LatencyTracker()
+        self.partition_lag = {}
+        self.started = None
+
+    def worker_for(self, key):
+        return key_worker(key, self.workers)
+
+    def worker_loop(self, worker):
+        work = self.queues[worker]
+        while True:
+            try:
+                first = work.get(timeout=0.1)
+            except queue.Empty:
+                if self.stopping.is_set():
+                    return
+                continue
+            batch = [first]
+            deadline = time.monotonic() + self.batch_linger_seconds
+            while len(batch) < self.max_batch:
+                try:
+                    remaining = deadline - time.monotonic()
+                    batch.append(work.get(timeout=remaining) if remaining > 0 else work.get_nowait())
+                except queue.Empty:
+                    break
+            self.process(worker, batch)
+
+    def process(self, worker, batch):
+        for attempt in range(1, self.max_attempts + 1):
+            start = time.perf_counter()
+            try:
+                self.handler(worker, batch)
+                self.batch_latency.record(time.perf_counter() - start)
+                break
+            except Exception as e:
+                with self.lock:
+                    self.handler_errors += 1
+                if attempt == self.max_attempts:
+                    self.give_up(worker, batch, e)
+                    break
+                logging.error(f"Consumer worker {worker} failed on {len(batch)} messages "
+                              f"(attempt {attempt}/{self.max_attempts}), retrying: {e}")
+                time.sleep(min(self.retry_seconds * 2 ** (attempt - 1), self.max_retry_seconds))
+        with self.lock:
+            for message in batch:
+                tracker = self.offsets.get((message.topic(), message.partition()))
+                # None when the partition was revoked while the batch ran; its new owner re-reads it
+                if tracker is not None:
+                    tracker.completed(message.offset())
+            self.processed[worker] += len(batch)
+            self.batches[worker] += 1
+            self.lock.notify_all()
+
+    # A batch that failed every attempt goes to the dead letter handler; its
+    # offsets are then treated as done either way
+    def give_up(self, worker, batch, error):
+        first, last = batch[0], batch[-1]
+        logging.error(f"Consumer worker {worker} gave up on {len(batch)} messages after {self.max_attempts} attempts "
+                      f"({first.topic()}:{first.partition()}@{first.offset()} .. "
+                      f"{last.topic()}:{last.partition()}@{last.offset()}): {error}")
+        if self.dead_letter is not None:
+            try:
+                self.dead_letter(worker, batch, error)
+            except Exception as e:
+                logging.error(f"Dead letter handler failed for {len(batch)} messages, skipping them: {e}")
+        with self.lock:
+            self.dead_lettered += len(batch)
+
+    def on_assign(self, consumer, partitions):
+        with self.lock:
+            self.rebalances += 1
+            for tp in partitions:
+                self.offsets[(tp.topic, tp.partition)] = PartitionOffsets()
+        if self.paused:
+            consumer.pause(partitions)
+        logging.info(f"Assigned {len(partitions)} partitions")
+
+    def on_revoke(self, consumer, partitions):
+        keys = [(tp.topic, tp.partition) for tp in partitions]
+        deadline = time.monotonic() + self.revoke_timeout_seconds
+        with self.lock:
+            while any(self.offsets[key].outstanding() for key in keys if key in self.offsets):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    logging.warning("Revoke timed out with messages in flight; they will be redelivered")
+                    break
+                self.lock.wait(remaining)
+        self.commit(keys)
+        with self.lock:
+            for key in keys:
+                self.offsets.pop(key, None)
+        logging.info(f"Revoked {len(partitions)} partitions")
+
+    # Synchronously commit the done prefix of each partition (all assigned partitions by default)
+    def commit(self, keys=None):
+        with self.lock:
+            keys = list(self.offsets) if keys is None else keys
+            ready = [(key, self.offsets[key]) for key in keys if key in self.offsets]
+            ready = [(key, tracker, tracker.commit_point) for key, tracker in ready
+                     if tracker.commit_point is not None and tracker.commit_point != tracker.committed]
+        self.last_commit = time.monotonic()
+        if not ready:
+            return
+        self.consumer.commit(offsets=[self.topic_partition(topic, partition, offset)
+                                      for (topic, partition), _, offset in ready], asynchronous=False)
+        with self.lock:
+            for key, tracker, offset in ready:
+                tracker.committed = offset
+            self.commits += 1
+        for (topic, partition), _, offset in ready:
+            try:
+                _, high = self.consumer.get_watermark_offsets(self.topic_partition(topic, partition), cached=True)
+                self.partition_lag[(topic, partition)] = max(high - offset, 0)
+            except Exception:
+                pass
+
+    # Pause fetching while any worker is backed up; resume once all have drained to half
+    def apply_backpressure(self):
+        depth = max(work.qsize() for work in self.queues)
+        if not self.paused and depth >= self.max_queued:
+            self.consumer.pause(self.consumer.assignment())
+            self.paused = True
+            self.pauses += 1
+            self.paused_at = time.monotonic()
+        elif self.paused and depth <= self.max_queued // 2:
+            self.consumer.resume(self.consumer.assignment())
+            self.paused = False
+            self.paused_seconds += time.monotonic() - self.paused_at
+
+    def dispatch(self, messages):
+        with self.lock:
+            for message in messages:
+                tracker = self.offsets.get((message.topic(), message.partition()))
+                if tracker is not None:
+                    tracker.dispatched(message.offset())
+        for message in messages:
+            self.queues[self.worker_for(self.key_fn(message))].put(message)
+        self.consumed += len(messages)
+
+    def start(self):
+        self.started = time.monotonic()
+        self.consumer.subscribe(self.topics, on_assign=self.on_assign, on_revoke=self.on_revoke)
+        self.threads = [threading.Thread(target=self.worker_loop, args=(worker,), name=f"consumer-worker-{worker}",
+                                         daemon=True) for worker in range(self.workers)]
+        for thread in self.threads:
+            thread.start()
+
+    # One poll cycle: fetch, fan out, adjust backpressure, commit on interval
+    def poll_once(self):
+        messages = self.consumer.consume(num_messages=self.poll_batch, timeout=self.poll_timeout_seconds)
+        valid = []
+        for message in messages:
+            if message.error():
+                logging.error(f"Kafka error: {message.error()}")
+                continue
+            valid.append(message)
+        if valid:
+            self.dispatch(valid)
+        self.apply_backpressure()
+        if time.monotonic() - self.last_commit >= self.commit_interval_seconds:
+            self.commit()
+        return len(valid)
+
+    def run(self):
+        self.start()
+        try:
+            while not self.stopping.is_set():
+                self.poll_once()
+        finally:
+            self.shutdown()
+
+    # Wait until everything fetched so far has been processed and committed
+    def drain(self, timeout=None):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self.lock:
+            while any(tracker.outstanding() for tracker in self.offsets.values()):
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    break
+                self.lock.wait(remaining)
+        self.commit()
+
+    def stop(self):
+        self.stopping.set()
+
+    def shutdown(self):
+        self.stopping.set()
+        self.drain(self.revoke_timeout_seconds)
+        for thread in self.threads:
+            thread.join(timeout=1.0)
+        self.consumer.close()
+
+    def metrics(self):
+        elapsed = time.monotonic() - self.started if self.started else 0.0
+        with self.lock:
+            processed = sum(self.processed)
+            return {
+                'workers': self.workers,
+                'consumed': self.consumed,
+                'processed': processed,
+                'messages_per_second': round(processed / elapsed, 1) if elapsed else None,
+                'per_worker': [{'processed': count, 'batches': batches, 'queued': work.qsize()}
+                               for count, batches, work in zip(self.processed, self.batches, self.queues)],
+                'batch_latency': self.batch_latency.summary(),
+                'paused': self.paused,
+                'pauses': self.pauses,
+                'paused_seconds': round(self.paused_seconds, 3),
+                'commits': self.commits,
+                'rebalances': self.rebalances,
+                'handler_errors': self.handler_errors,
+                'dead_lettered': self.dead_lettered,
+                'outstanding': {f"{topic}:{partition}": tracker.outstanding()
+                                for (topic, partition), tracker in self.offsets.items()},
+                'partition_lag': {f"{topic}:{partition}": lag for (topic, partition), lag in self.partition_lag.items()}
+            }
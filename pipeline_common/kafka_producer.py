@@ -0,0 +1,136 @@
+import json
+import time
+import atexit
+import logging
+import threading
+from pipeline_common.metrics import LatencyTracker
+
+# Batching defaults for the shared producer: wait up to linger.ms to fill
+# batches, compress them, and let idempotence keep per-partition order across
+# retries. Any key can be overridden per producer.
+DEFAULT_PRODUCER_CONFIG = {
+    'linger.ms': 20,
+    'batch.num.messages': 10000,
+    'batch.size': 1024 * 1024,
+    'compression.type': 'lz4',
+    'acks': 'all',
+    'enable.idempotence': True,
+    'queue.buffering.max.messages': 200000
+}
+
+def kafka_producer_factory(config):
+    from confluent_kafka import Producer
+    return Producer(config)
+
+# Long-lived Kafka producer. produce() only enqueues into the client's buffer;
+# a background thread polls the client so delivery callbacks (success or
+# failure, with end-to-end delivery latency) are served without the caller
+# ever blocking on a round trip. A full local queue is handled by polling
+# until there is room instead of failing the event.
+class PooledKafkaProducer:
+    def __init__(self, config, producer_factory=kafka_producer_factory, poll_interval_seconds=0.1,
+                 queue_full_timeout_seconds=30.0):
+        self.config = dict(DEFAULT_PRODUCER_CONFIG, **config)
+        self.producer = producer_factory(self.config)
+        self.poll_interval_seconds = poll_interval_seconds
+        self.queue_full_timeout_seconds = queue_full_timeout_seconds
+        self.lock = threading.Lock()
+        self.closed = threading.Event()
+        self.produced = 0
+        self.delivered = 0
+        self.failed = 0
+        self.queue_full_waits = 0
+        self.last_error = None
+        self.delivery_latency = LatencyTracker()
+        self.poller = threading.Thread(target=self.poll_loop, daemon=True)
+        self.poller.start()
+
+    def poll_loop(self):
+        while not self.closed.is_set():
+            self.producer.poll(self.poll_interval_seconds)
+
+    def delivery_callback(self, enqueued, on_delivery):
+        def delivered(err, msg):
+            with self.lock:
+                if err is None:
+                    self.delivered += 1
+                else:
+                    self.failed += 1
+                    self.last_error = str(err)
+            if err is None:
+                self.delivery_latency.record(time.monotonic() - enqueued)
+            else:
+                logging.error(f"Kafka delivery to {msg.topic()} failed: {err}")
+            if on_delivery:
+                on_delivery(err, msg)
+        return delivered
+
+    def produce(self, topic, value, key=None, on_delivery=None):
+        if not isinstance(value, (bytes, str)):
+            value = json.dumps(value, default=str)
+        callback = self.delivery_callback(time.monotonic(), on_delivery)
+        deadline = time.monotonic() + self.queue_full_timeout_seconds
+        while True:
+            try:
+                self.producer.produce(topic, value=value, key=key, on_delivery=callback)
+                break
+            except BufferError:
+                # Local queue is full: serve callbacks to make room, then retry
+                with self.lock:
+                    self.queue_full_waits += 1
+                if time.monotonic() > deadline:
+                    raise
+                self.producer.poll(0.05)
+        with self.lock:
+            self.produced += 1
+
+    # Enqueue many events, keyed by key_field so each key stays on one partition in order
+    def produce_many(self, topic, events, key_field='customer_id'):
+        for event in events:
+            key = event.get(key_field) if key_field else None
+            self.produce(topic, event, key=None if key is None else str(key))
+
+    def flush(self, timeout=None):
+        remaining = self.producer.flush() if timeout is None else self.producer.flush(timeout)
+        if remaining:
+            logging.warning(f"Kafka producer flush left {remaining} messages undelivered")
+        return remaining
+
+    def close(self, timeout=30.0):
+        if self.closed.is_set():
+            return 0
+        remaining = self.flush(timeout)
+        self.closed.set()
+        self.poller.join(timeout=self.poll_interval_seconds * 2)
+        return remaining
+
+    def metrics(self):
+        with self.lock:
+            return {
+                'produced': self.produced,
+                'delivered': self.delivered,
+                'failed': self.failed,
+                'in_flight': self.produced - self.delivered - self.failed,
+                'queue_full_waits': self.queue_full_waits,
+                'last_error': self.last_error,
+                'delivery_latency': self.delivery_latency.summary()
+            }
+
+# One producer per cluster per process, flushed at interpreter exit
+producers = {}
+producers_lock = threading.Lock()
+
+def shared_kafka_producer(config, **options):
+    key = config['bootstrap.servers']
+    with producers_lock:
+        if key not in producers:
+            producers[key] = PooledKafkaProducer(config, **options)
+        return producers[key]
+
+@atexit.register
+def close_producers():
+    for key, producer in list(producers.items()):
+        try:
+            producer.close()
+        except Exception as e:
+            logging.error(f"Kafka producer for {key} failed to flush at exit: {e}")
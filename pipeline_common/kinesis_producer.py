@@ -0,0 +1,202 @@
+import json
+import time
+import atexit
+import random
+import logging
+import threading
+
+# Kinesis PutRecords limits
+MAX_RECORDS_PER_REQUEST = 500
+MAX_BYTES_PER_REQUEST = 5 * 1024 * 1024
+MAX_BYTES_PER_RECORD = 1024 * 1024
+
+# Buffered Kinesis producer. Records are sent with put_records in requests that
+# respect the 500-record / 5 MB limits, on size or after linger_seconds. Entries
+# that fail inside a partially successful request are retried alone with
+# exponential backoff; those still failing after max_retries stay buffered and
+# flush() raises. With aggregate=True, small records sharing a partition key
+# are packed into one newline-delimited Kinesis record (see split_records()).
+class KinesisProducer:
+    def __init__(self, kinesis_client, stream_name, linger_seconds=0.1, max_retries=5,
+                 base_backoff_seconds=0.05, aggregate=False, aggregate_max_bytes=50 * 1024):
+        self.kinesis_client = kinesis_client
+        self.stream_name = stream_name
+        self.linger_seconds = linger_seconds
+        self.max_retries = max_retries
+        self.base_backoff_seconds = base_backoff_seconds
+        self.aggregate = aggregate
+        self.aggregate_max_bytes = aggregate_max_bytes
+        self.buffer = []
+        self.buffer_bytes = 0
+        self.oldest = None
+        self.lock = threading.Lock()
+        self.send_lock = threading.Lock()
+        self.closed = threading.Event()
+        self.linger_thread = None
+        self.records_sent = 0
+        self.requests_sent = 0
+        self.retried_records = 0
+        self.failed_records = 0
+
+    def put(self, record, partition_key):
+        data = record if isinstance(record, bytes) else json.dumps(record, default=str).encode('utf-8')
+        size = len(data) + len(partition_key.encode('utf-8'))
+        if size > MAX_BYTES_PER_RECORD:
+            raise ValueError(f"Record for partition key {partition_key} is {size} bytes, over the 1 MB Kinesis limit")
+        self.start_linger()
+        with self.lock:
+            if not self.buffer:
+                self.oldest = time.monotonic()
+            self.buffer.append((partition_key, data))
+            self.buffer_bytes += size
+            # Aggregated records pack many into one entry, so only bytes bound the buffer then
+            full = self.buffer_bytes >= MAX_BYTES_PER_REQUEST or (
+                not self.aggregate and len(self.buffer) >= MAX_RECORDS_PER_REQUEST)
+        if full:
+            self.flush()
+
+    def put_many(self, records, partition_key_field='customer_id'):
+        for record in records:
+            self.put(record, str(record[partition_key_field]))
+
+    def start_linger(self):
+        if self.linger_thread is None:
+            with self.lock:
+                if self.linger_thread is None:
+                    self.linger_thread = threading.Thread(target=self.linger, name=f"kinesis-linger-{self.stream_name}", daemon=True)
+                    self.linger_thread.start()
+
+    def linger(self):
+        while not self.closed.wait(self.linger_seconds / 2):
+            with self.lock:
+                due = self.buffer and time.monotonic() - self.oldest >= self.linger_seconds
+            if due:
+                try:
+                    self.flush()
+                except Exception as e:
+                    logging.error(f"Kinesis linger flush to {self.stream_name} failed: {e}")
+
+    # Send everything buffered. Entries that could not be delivered go back to the
+    # front of the buffer and the flush raises, so nothing is dropped silently.
+    # Flushes run one at a time: one that finds the buffer already taken by the
+    # linger thread waits for that send to finish before returning.
+    def flush(self):
+        with self.send_lock:
+            with self.lock:
+                pending, self.buffer, self.buffer_bytes, self.oldest = self.buffer, [], 0, None
+            if not pending:
+                return 0
+            entries = self.aggregate_entries(pending) if self.aggregate else pending
+            unsent, error = [], None
+            for request in build_requests(entries):
+                failed, request_error = self.send(request)
+                unsent.extend(failed)
+                error = error or request_error
+            # Requeued while still holding send_lock, so a waiting flush sees these entries
+            if unsent:
+                self.requeue(unsent)
+        if unsent:
+            raise RuntimeError(f"{len(unsent)} records for {self.stream_name} not delivered after "
+                               f"{self.max_retries} retries, kept in the buffer: {error}")
+        logging.info(f"Sent {len(pending)} records to Kinesis stream {self.stream_name}")
+        return len(pending)
+
+    # Put undelivered entries back ahead of anything buffered since, keeping order
+    def requeue(self, entries):
+        size = sum(len(data) + len(partition_key.encode('utf-8')) for partition_key, data in entries)
+        with self.lock:
+            self.buffer = entries + self.buffer
+            self.buffer_bytes += size
+            self.oldest = time.monotonic()
+
+    def aggregate_entries(self, pending):
+        entries, open_entries = [], {}
+        for partition_key, data in pending:
+            current = open_entries.get(partition_key)
+            if current is not None and len(entries[current][1]) + 1 + len(data) <= self.aggregate_max_bytes:
+                entries[current] = (partition_key, entries[current][1] + b'\n' + data)
+            else:
+                open_entries[partition_key] = len(entries)
+                entries.append((partition_key, data))
+        return entries
+
+    # Send one request, retrying failed entries alone with backoff. A put_records
+    # call that raises (throttling, network) is retried as a failure of every
+    # entry in it. Returns (entries still failed after max_retries, last error).
+    def send(self, request):
+        attempt = 0
+        while True:
+            try:
+                response = self.kinesis_client.put_records(
+                    StreamName=self.stream_name,
+                    Records=[{'Data': data, 'PartitionKey': partition_key} for partition_key, data in request]
+                )
+            except Exception as e:
+                failed, error = request, e
+            else:
+                self.requests_sent += 1
+                results = response['Records']
+                failed = [entry for entry, result in zip(request, results) if 'ErrorCode' in result]
+                error = next((result['ErrorCode'] for result in results if 'ErrorCode' in result), None)
+                self.records_sent += len(request) - len(failed)
+            if not failed:
+                return [], None
+            attempt += 1
+            if attempt > self.max_retries:
+                self.failed_records += len(failed)
+                logging.error(f"{len(failed)} records for {self.stream_name} failed after {self.max_retries} retries: {error}")
+                return failed, error
+            self.retried_records += len(failed)
+            # Full jitter keeps throttled producers from retrying in lockstep
+            time.sleep(random.uniform(0, self.base_backoff_seconds * 2 ** (attempt - 1)))
+            request = failed
+
+    def close(self):
+        self.closed.set()
+        self.flush()
+
+    def metrics(self):
+        return {
+            'buffered_records': len(self.buffer),
+            'records_sent': self.records_sent,
+            'requests_sent': self.requests_sent,
+            'retried_records': self.retried_records,
+            'failed_records': self.failed_records
+        }
+
+# Group entries into put_records requests under the count and size limits
+def build_requests(entries):
+    request, request_bytes = [], 0
+    for partition_key, data in entries:
+        size = len(data) + len(partition_key.encode('utf-8'))
+        if request and (len(request) >= MAX_RECORDS_PER_REQUEST or request_bytes + size > MAX_BYTES_PER_REQUEST):
+            yield request
+            request, request_bytes = [], 0
+        request.append((partition_key, data))
+        request_bytes += size
+    if request:
+        yield request
+
+# Decode a Kinesis record payload that may hold several aggregated JSON records
+def split_records(data):
+    if isinstance(data, bytes):
+        data = data.decode('utf-8')
+    return [json.loads(line) for line in data.splitlines() if line.strip()]
+
+# One producer per stream per process, flushed at interpreter exit
+producers = {}
+producers_lock = threading.Lock()
+
+def shared_producer(kinesis_client, stream_name, **options):
+    with producers_lock:
+        if stream_name not in producers:
+            producers[stream_name] = KinesisProducer(kinesis_client, stream_name, **options)
+        return producers[stream_name]
+
+@atexit.register
+def close_producers():
+    for producer in list(producers.values()):
+        try:
+            producer.close()
+        except Exception as e:
+            logging.error(f"Kinesis producer for {producer.stream_name} failed to flush at exit: {e}")
@@ -0,0 +1,41 @@
+import os
+import zipfile
+import argparse
+
+# Builds a Lambda deployment zip: the handler at the zip root, the
+# pipeline_common package beside it, and any app modules the handler imports,
+# so Lambda code reuses the shared modules instead of carrying copies of them.
+# Third-party dependencies (pandas, scikit-learn, ...) come from a layer.
+# Run from the repository root:
+#   python -m pipeline_common.lambda_package regulatory_reporting_pipeline/lambda/report_generation_lambda.py \
+#       regulatory_reporting_pipeline/infra/lambda/report_generation_lambda.zip \
+#       --module regulatory_reporting_pipeline/app/xbrl_report.py
+
+PACKAGE_DIR = os.path.dirname(os.path.abspath(__file__))
+# Offline tooling and tests that have no place in a deployment
+EXCLUDED_DIRS = {'__pycache__', 'benchmarks', 'tests'}
+
+def build(handler, output, modules=()):
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with zipfile.ZipFile(output, 'w', zipfile.ZIP_DEFLATED) as archive:
+        for path in (handler, *modules):
+            archive.write(path, os.path.basename(path))
+        for root, dirs, files in os.walk(PACKAGE_DIR):
+            dirs[:] = sorted(d for d in dirs if d not in EXCLUDED_DIRS)
+            for name in sorted(files):
+                if name.endswith('.py'):
+                    path = os.path.join(root, name)
+                    archive.write(path, os.path.join('pipeline_common', os.path.relpath(path, PACKAGE_DIR)))
+    return output
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('handler', help='Lambda handler module (.py)')
+    parser.add_argument('output', help='zip file to write')
+    parser.add_argument('--module', action='append', default=[], help='extra module placed beside the handler')
+    args = parser.parse_args()
+    build(args.handler, args.output, args.module)
+    print(f"Wrote {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,312 @@
+import io
+import re
+import csv
+import gzip
+import uuid
+import time
+import random
+import sqlite3
+import threading
+
+# Local stand-ins for the AWS clients used by the pipelines. They implement the
+# subset of the boto3 call signatures the pipelines rely on so stages can be
+# exercised and benchmarked offline.
+
+# S3 rejects multipart parts below 5 MiB, except the last
+MIN_PART_BYTES = 5 * 1024 * 1024
+
+# In-memory S3 with the object and multipart upload calls used by the pipelines.
+# Completed multipart objects are only visible once complete_multipart_upload
+# succeeds; part sizes are checked as S3 checks them (min_part_bytes).
+class LocalS3:
+    def __init__(self, min_part_bytes=MIN_PART_BYTES):
+        self.objects = {}
+        self.uploads = {}
+        self.min_part_bytes = min_part_bytes
+        self.put_calls = 0
+        self.part_calls = 0
+        self.lock = threading.Lock()
+
+    def put_object(self, Bucket, Key, Body, **kwargs):
+        if isinstance(Body, str):
+            Body = Body.encode('utf-8')
+        elif not isinstance(Body, (bytes, bytearray)):
+            Body = Body.read()
+        with self.lock:
+            self.put_calls += 1
+            self.objects[(Bucket, Key)] = bytes(Body)
+        return {'ETag': uuid.uuid4().hex}
+
+    def create_multipart_upload(self, Bucket, Key, **kwargs):
+        upload_id = uuid.uuid4().hex
+        with self.lock:
+            self.uploads[upload_id] = {'Bucket': Bucket, 'Key': Key, 'parts': {}}
+        return {'Bucket': Bucket, 'Key': Key, 'UploadId': upload_id}
+
+    def upload_part(self, Bucket, Key, UploadId, PartNumber, Body, **kwargs):
+        if not isinstance(Body, (bytes, bytearray)):
+            Body = Body.read()
+        if not 1 <= PartNumber <= 10000:
+            raise ValueError(f"InvalidArgument: part number {PartNumber} is outside 1-10000")
+        etag = uuid.uuid4().hex
+        with self.lock:
+            if UploadId not in self.uploads:
+                raise KeyError(f"NoSuchUpload: {UploadId}")
+            self.part_calls += 1
+            self.uploads[UploadId]['parts'][PartNumber] = (etag, bytes(Body))
+        return {'ETag': etag}
+
+    def complete_multipart_upload(self, Bucket, Key, UploadId, MultipartUpload, **kwargs):
+        with self.lock:
+            if UploadId not in self.uploads:
+                raise KeyError(f"NoSuchUpload: {UploadId}")
+            stored = self.uploads[UploadId]['parts']
+            parts = MultipartUpload['Parts']
+            numbers = [part['PartNumber'] for part in parts]
+            if not parts or numbers != sorted(set(numbers)):
+                raise ValueError("InvalidPartOrder: parts must be listed once each in ascending order")
+            for index, part in enumerate(parts):
+                if part['PartNumber'] not in stored or stored[part['PartNumber']][0] != part['ETag']:
+                    raise ValueError(f"InvalidPart: part {part['PartNumber']} was not uploaded")
+                if index < len(parts) - 1 and len(stored[part['PartNumber']][1]) < self.min_part_bytes:
+                    raise ValueError(f"EntityTooSmall: part {part['PartNumber']} is under {self.min_part_bytes} bytes")
+            self.objects[(Bucket, Key)] = b''.join(stored[number][1] for number in numbers)
+            del self.uploads[UploadId]
+        return {'Bucket': Bucket, 'Key': Key, 'ETag': f"{uuid.uuid4().hex}-{len(parts)}"}
+
+    def abort_multipart_upload(self, Bucket, Key, UploadId, **kwargs):
+        with self.lock:
+            self.uploads.pop(UploadId, None)
+        return {}
+
+    def list_multipart_uploads(self, Bucket, Prefix='', **kwargs):
+        with self.lock:
+            uploads = [{'Key': upload['Key'], 'UploadId': upload_id} for upload_id, upload in self.uploads.items()
+                       if upload['Bucket'] == Bucket and upload['Key'].startswith(Prefix)]
+        return {'Bucket': Bucket, 'Uploads': uploads}
+
+    def get_object(self, Bucket, Key, **kwargs):
+        with self.lock:
+            if (Bucket, Key) not in self.objects:
+                raise KeyError(f"NoSuchKey: s3://{Bucket}/{Key}")
+            body = self.objects[(Bucket, Key)]
+        return {'Body': io.BytesIO(body), 'ContentLength': len(body)}
+
+    def upload_file(self, Filename, Bucket, Key, **kwargs):
+        with open(Filename, 'rb') as f:
+            self.put_object(Bucket=Bucket, Key=Key, Body=f.read())
+
+    def upload_fileobj(self, Fileobj, Bucket, Key, **kwargs):
+        self.put_object(Bucket=Bucket, Key=Key, Body=Fileobj.read())
+
+    def download_file(self, Bucket, Key, Filename, **kwargs):
+        with open(Filename, 'wb') as f:
+            f.write(self.get_object(Bucket=Bucket, Key=Key)['Body'].read())
+
+    def list_objects_v2(self, Bucket, Prefix='', Delimiter=None, **kwargs):
+        with self.lock:
+            keys = sorted(key for bucket, key in self.objects if bucket == Bucket and key.startswith(Prefix))
+        contents, prefixes = [], []
+        for key in keys:
+            rest = key[len(Prefix):]
+            if Delimiter and Delimiter in rest:
+                common = Prefix + rest.split(Delimiter, 1)[0] + Delimiter
+                if common not in prefixes:
+                    prefixes.append(common)
+            else:
+                contents.append({'Key': key, 'Size': len(self.objects[(Bucket, key)])})
+        return {'Contents': contents, 'CommonPrefixes': [{'Prefix': p} for p in prefixes], 'KeyCount': len(contents)}
+
+    def get_paginator(self, operation_name):
+        return LocalPaginator(getattr(self, operation_name))
+
+class LocalPaginator:
+    def __init__(self, method):
+        self.method = method
+
+    def paginate(self, **kwargs):
+        yield self.method(**kwargs)
+
+# Kinesis stream that keeps records in memory. latency_seconds is charged per
+# API call and throttle_rate fails that share of put_records entries, to
+# exercise partial-failure retries.
+class LocalKinesis:
+    def __init__(self, latency_seconds=0.0, throttle_rate=0.0, seed=None):
+        self.latency_seconds = latency_seconds
+        self.throttle_rate = throttle_rate
+        self.random = random.Random(seed)
+        self.records = []
+        self.calls = 0
+        self.lock = threading.Lock()
+
+    def put_record(self, StreamName, Data, PartitionKey, **kwargs):
+        return self.put_records(StreamName, [{'Data': Data, 'PartitionKey': PartitionKey}])['Records'][0]
+
+    def put_records(self, StreamName, Records, **kwargs):
+        if len(Records) > 500:
+            raise ValueError("Records exceeds the 500 record PutRecords limit")
+        if self.latency_seconds:
+            time.sleep(self.latency_seconds)
+        results = []
+        with self.lock:
+            self.calls += 1
+            for record in Records:
+                if self.throttle_rate and self.random.random() < self.throttle_rate:
+                    results.append({'ErrorCode': 'ProvisionedThroughputExceededException',
+                                    'ErrorMessage': 'Rate exceeded for shard'})
+                    continue
+                data = record['Data'].encode('utf-8') if isinstance(record['Data'], str) else record['Data']
+                self.records.append((StreamName, record['PartitionKey'], data))
+                results.append({'SequenceNumber': str(len(self.records)), 'ShardId': 'shardId-000000000000'})
+        failed = sum(1 for result in results if 'ErrorCode' in result)
+        return {'FailedRecordCount': failed, 'Records': results}
+
+    # Records as a Kinesis-triggered Lambda event would deliver them (data left undecoded)
+    def as_lambda_event(self, stream_name=None):
+        with self.lock:
+            records = [r for r in self.records if stream_name is None or r[0] == stream_name]
+        return {'Records': [{'kinesis': {'partitionKey': key, 'data': data.decode('utf-8')}} for _, key, data in records]}
+
+# SNS topic that records published messages, with an optional per-call delay
+class LocalSNS:
+    def __init__(self, latency_seconds=0.0):
+        self.latency_seconds = latency_seconds
+        self.messages = []
+        self.calls = 0
+        self.lock = threading.Lock()
+
+    def publish(self, TopicArn, Message, **kwargs):
+        return self.publish_batch(TopicArn, [{'Id': '0', 'Message': Message}])['Successful'][0]
+
+    def publish_batch(self, TopicArn, PublishBatchRequestEntries, **kwargs):
+        if len(PublishBatchRequestEntries) > 10:
+            raise ValueError("TooManyEntriesInBatchRequest")
+        if self.latency_seconds:
+            time.sleep(self.latency_seconds)
+        with self.lock:
+            self.calls += 1
+            successful = []
+            for entry in PublishBatchRequestEntries:
+                message_id = str(uuid.uuid4())
+                self.messages.append((TopicArn, entry['Message']))
+                successful.append({'Id': entry['Id'], 'MessageId': message_id})
+        return {'Successful': successful, 'Failed': []}
+
+# Declared BOOLEAN columns come back as bools and TIMESTAMP columns stay as the
+# text that was stored, matching what the Data API returns for them
+sqlite3.register_converter('BOOLEAN', lambda value: value not in (b'0', b'false', b''))
+sqlite3.register_converter('TIMESTAMP', lambda value: value.decode('utf-8'))
+
+# Redshift Data API backed by SQLite. Statements run synchronously; named
+# parameters (:name) map directly onto SQLite's. COPY from s3:// reads CSV
+# (optionally GZIP) objects from a LocalS3. execution_seconds keeps each
+# statement reported as STARTED for that long, as the Data API's queueing and
+# compilation would, so callers exercise their polling.
+class LocalRedshiftData:
+    COPY_PATTERN = re.compile(
+        r"^\s*COPY\s+(\w+)\s*(?:\(([^)]*)\))?\s+FROM\s+'s3://([^/]+)/([^']+)'(.*)$",
+        re.IGNORECASE | re.DOTALL
+    )
+
+    def __init__(self, database=':memory:', s3=None, page_size=1000, execution_seconds=0.0):
+        self.conn = sqlite3.connect(database, check_same_thread=False, detect_types=sqlite3.PARSE_DECLTYPES)
+        self.s3 = s3
+        self.page_size = page_size
+        self.execution_seconds = execution_seconds
+        self.statements = {}
+        self.lock = threading.Lock()
+        self.statement_count = 0
+
+    def execute_statement(self, Sql, Parameters=None, **kwargs):
+        statement_id = str(uuid.uuid4())
+        params = {p['name']: None if p.get('isNull') else self.parse_value(p['value']) for p in Parameters or []}
+        statement = {'Id': statement_id, 'QueryString': Sql, 'Status': 'FINISHED', 'HasResultSet': False,
+                     'finishes_at': time.monotonic() + self.execution_seconds}
+        with self.lock:
+            self.statement_count += 1
+            try:
+                copy = self.COPY_PATTERN.match(Sql)
+                if copy:
+                    statement['ResultRows'] = self.run_copy(*copy.groups())
+                else:
+                    cursor = self.conn.execute(Sql, params)
+                    if cursor.description:
+                        statement['HasResultSet'] = True
+                        statement['columns'] = [d[0] for d in cursor.description]
+                        statement['rows'] = cursor.fetchall()
+                        statement['ResultRows'] = len(statement['rows'])
+                    else:
+                        statement['ResultRows'] = cursor.rowcount
+                self.conn.commit()
+            except (sqlite3.Error, KeyError) as e:
+                self.conn.rollback()
+                statement['Status'] = 'FAILED'
+                statement['Error'] = str(e)
+            self.statements[statement_id] = statement
+        return {'Id': statement_id}
+
+    def batch_execute_statement(self, Sqls, **kwargs):
+        ids = [self.execute_statement(Sql=sql)['Id'] for sql in Sqls]
+        return {'Id': ids[-1] if ids else None}
+
+    def describe_statement(self, Id):
+        statement = self.statements[Id]
+        description = {key: value for key, value in statement.items() if key not in ('columns', 'rows', 'finishes_at')}
+        if time.monotonic() < statement['finishes_at']:
+            description['Status'] = 'STARTED'
+        return description
+
+    def get_statement_result(self, Id, NextToken=None):
+        statement = self.statements[Id]
+        if not statement['HasResultSet']:
+            raise ValueError(f"Statement {Id} has no result set")
+        start = int(NextToken or 0)
+        rows = statement['rows'][start:start + self.page_size]
+        result = {
+            'ColumnMetadata': [{'name': name, 'label': name} for name in statement['columns']],
+            'Records': [[self.to_field(value) for value in row] for row in rows],
+            'TotalNumRows': len(statement['rows'])
+        }
+        if start + self.page_size < len(statement['rows']):
+            result['NextToken'] = str(start + self.page_size)
+        return result
+
+    # Fields matching NULL AS '<marker>' load as NULL; empty fields do too with
+    # EMPTYASNULL and otherwise stay empty strings, as they do in a VARCHAR
+    def run_copy(self, table, columns, bucket, key, options):
+        body = self.s3.get_object(Bucket=bucket, Key=key)['Body'].read()
+        if 'GZIP' in options.upper():
+            body = gzip.decompress(body)
+        marker = re.search(r"\bNULL\s+AS\s+'([^']*)'", options, re.IGNORECASE)
+        nulls = {marker.group(1)} if marker else set()
+        if re.search(r'\bEMPTYASNULL\b', options, re.IGNORECASE):
+            nulls.add('')
+        rows = [[None if value in nulls else self.parse_value(value) for value in row]
+                for row in csv.reader(io.StringIO(body.decode('utf-8')))]
+        if not rows:
+            return 0
+        column_sql = f" ({columns})" if columns else ''
+        placeholders = ', '.join('?' for _ in rows[0])
+        self.conn.executemany(f"INSERT INTO {table}{column_sql} VALUES ({placeholders})", rows)
+        return len(rows)
+
+    # Data API parameter values arrive as strings; booleans are the one cast SQLite will not do
+    @staticmethod
+    def parse_value(value):
+        if isinstance(value, str) and value.lower() in ('true', 'false'):
+            return value.lower() == 'true'
+        return value
+
+    @staticmethod
+    def to_field(value):
+        if value is None:
+            return {'isNull': True}
+        if isinstance(value, bool):
+            return {'booleanValue': value}
+        if isinstance(value, int):
+            return {'longValue': value}
+        if isinstance(value, float):
+            return {'doubleValue': value}
+        if isinstance(value, bytes):
+            return {'blobValue': value}
+        return {'stringValue': str(value)}
@@ -0,0 +1,348 @@
+import time
+import zlib
+import itertools
+import threading
+from collections import deque
+
+# Local stand-ins for a Kafka cluster and the confluent_kafka Producer and
+# Consumer. The broker keeps partitioned in-memory logs; the producer mirrors
+# librdkafka's shape: produce() only enqueues, a background sender ships
+# batches after linger.ms (or batch.num.messages) at a cost of
+# round_trip_seconds per batch, and poll()/flush() serve delivery callbacks.
+# Creating a producer costs connect_seconds, like the bootstrap/metadata
+# handshake of a real client. Consumers join a group on the broker; partitions
+# are spread over the members with an eager rebalance: every member revokes
+# what it holds, and only once all have done so are the new assignments handed
+# out. The callbacks run inside the next consume()/poll() call, as in
+# librdkafka.
+
+class LocalKafkaError:
+    def __init__(self, reason):
+        self.reason = reason
+
+    def str(self):
+        return self.reason
+
+    def __str__(self):
+        return self.reason
+
+class LocalKafkaMessage:
+    def __init__(self, topic, partition, offset, key, value, timestamp_ms, error=None):
+        self._topic = topic
+        self._partition = partition
+        self._offset = offset
+        self._key = key
+        self._value = value
+        self._timestamp_ms = timestamp_ms
+        self._error = error
+
+    def topic(self):
+        return self._topic
+
+    def partition(self):
+        return self._partition
+
+    def offset(self):
+        return self._offset
+
+    def key(self):
+        return self._key
+
+    def value(self):
+        return self._value
+
+    def timestamp(self):
+        # (TIMESTAMP_CREATE_TIME, ms)
+        return 1, self._timestamp_ms
+
+    def error(self):
+        return self._error
+
+class LocalKafkaBroker:
+    def __init__(self, partitions=8, round_trip_seconds=0.002, connect_seconds=0.02):
+        self.partition_count = partitions
+        self.round_trip_seconds = round_trip_seconds
+        self.connect_seconds = connect_seconds
+        self.topics = {}
+        self.lock = threading.Lock()
+        self.round_robin = itertools.count()
+        self.requests = 0
+        self.consumer_groups = {}
+
+    def partitions(self, topic):
+        with self.lock:
+            if topic not in self.topics:
+                self.topics[topic] = [[] for _ in range(self.partition_count)]
+            return self.topics[topic]
+
+    # Default partitioner: hash of the key, round robin for keyless messages
+    def partition_for(self, key):
+        if key is None:
+            return next(self.round_robin) % self.partition_count
+        return zlib.crc32(key) % self.partition_count
+
+    # Append one produce request worth of messages; returns the stored messages
+    def append(self, batch):
+        time.sleep(self.round_trip_seconds)
+        stored = []
+        with self.lock:
+            self.requests += 1
+            for topic, partition, key, value in batch:
+                log = self.topics.setdefault(topic, [[] for _ in range(self.partition_count)])[partition]
+                message = LocalKafkaMessage(topic, partition, len(log), key, value, int(time.time() * 1000))
+                log.append(message)
+                stored.append(message)
+        return stored
+
+    def high_watermark(self, topic, partition):
+        return len(self.partitions(topic)[partition])
+
+    def read(self, topic, partition, offset, limit):
+        with self.lock:
+            return self.topics.get(topic, [[]] * self.partition_count)[partition][offset:offset + limit]
+
+    # Group membership: every join or leave reassigns all partitions round robin
+    def join_group(self, group_id, consumer):
+        with self.lock:
+            group = self.consumer_groups.setdefault(group_id, {'members': [], 'committed': {}, 'generation': 0})
+            group['members'].append(consumer)
+        self.rebalance(group_id)
+
+    def leave_group(self, group_id, consumer):
+        with self.lock:
+            group = self.consumer_groups.get(group_id)
+            if group is None or consumer not in group['members']:
+                return
+            group['members'].remove(consumer)
+        self.rebalance(group_id)
+
+    def rebalance(self, group_id):
+        with self.lock:
+            group = self.consumer_groups[group_id]
+            group['generation'] += 1
+            members = group['members']
+            topics = sorted({topic for member in members for topic in member.topics})
+            assignments = {id(member): [] for member in members}
+            slots = [(topic, partition) for topic in topics for partition in range(self.partition_count)]
+            for index, (topic, partition) in enumerate(slots):
+                subscribed = [member for member in members if topic in member.topics]
+                if subscribed:
+                    assignments[id(subscribed[index % len(subscribed)])].append((topic, partition))
+            group['assignments'] = assignments
+            group['revoking'] = {id(member) for member in members if member.assigned}
+
+    def generation(self, group_id):
+        with self.lock:
+            return self.consumer_groups[group_id]['generation']
+
+    def revoked(self, group_id, consumer):
+        with self.lock:
+            self.consumer_groups[group_id]['revoking'].discard(id(consumer))
+
+    # (partitions, generation), or (None, generation) while members are still revoking
+    def assignment(self, group_id, consumer):
+        with self.lock:
+            group = self.consumer_groups[group_id]
+            if group['revoking']:
+                return None, group['generation']
+            return group['assignments'].get(id(consumer), []), group['generation']
+
+    def commit(self, group_id, offsets):
+        with self.lock:
+            self.consumer_groups[group_id]['committed'].update(offsets)
+
+    def committed(self, group_id, topic, partition):
+        with self.lock:
+            return self.consumer_groups.get(group_id, {'committed': {}})['committed'].get((topic, partition))
+
+class LocalKafkaProducer:
+    def __init__(self, config, broker):
+        self.broker = broker
+        self.linger_seconds = float(config.get('linger.ms', 5)) / 1000
+        self.batch_messages = int(config.get('batch.num.messages', 10000))
+        self.max_queue = int(config.get('queue.buffering.max.messages', 100000))
+        time.sleep(broker.connect_seconds)
+        self.queue = deque()
+        self.in_flight = 0
+        self.reports = deque()
+        self.lock = threading.Condition()
+        self.closed = False
+        self.sender = threading.Thread(target=self.send_loop, daemon=True)
+        self.sender.start()
+
+    def produce(self, topic, value=None, key=None, on_delivery=None, callback=None, partition=None):
+        if isinstance(key, str):
+            key = key.encode('utf-8')
+        if isinstance(value, str):
+            value = value.encode('utf-8')
+        with self.lock:
+            if len(self.queue) + self.in_flight >= self.max_queue:
+                raise BufferError("Local: Queue full")
+            if partition is None:
+                partition = self.broker.partition_for(key)
+            self.queue.append((topic, partition, key, value, on_delivery or callback))
+            self.lock.notify()
+
+    def send_loop(self):
+        while True:
+            with self.lock:
+                while not self.queue and not self.closed:
+                    self.lock.wait()
+                if self.closed and not self.queue:
+                    return
+            # Give the batch linger.ms to fill unless it is already full
+            deadline = time.monotonic() + self.linger_seconds
+            while time.monotonic() < deadline and len(self.queue) < self.batch_messages and not self.closed:
+                time.sleep(min(0.001, self.linger_seconds))
+            with self.lock:
+                batch = [self.queue.popleft() for _ in range(min(len(self.queue), self.batch_messages))]
+                self.in_flight += len(batch)
+            stored = self.broker.append([(topic, partition, key, value) for topic, partition, key, value, _ in batch])
+            with self.lock:
+                self.reports.extend((entry[4], message) for entry, message in zip(batch, stored))
+                self.in_flight -= len(batch)
+                self.lock.notify_all()
+
+    # Serve delivery callbacks; returns the number served
+    def poll(self, timeout=0):
+        deadline = time.monotonic() + (timeout or 0)
+        with self.lock:
+            while not self.reports and timeout and time.monotonic() < deadline:
+                self.lock.wait(max(deadline - time.monotonic(), 0))
+            reports, self.reports = self.reports, deque()
+        for callback, message in reports:
+            if callback:
+                callback(None, message)
+        return len(reports)
+
+    # Wait for every queued message to be delivered; returns the number still queued
+    def flush(self, timeout=None):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self.lock:
+            while self.queue or self.in_flight:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    break
+                self.lock.wait(remaining)
+        self.poll(0)
+        return len(self)
+
+    def __len__(self):
+        with self.lock:
+            return len(self.queue) + self.in_flight + len(self.reports)
+
+    def close(self):
+        with self.lock:
+            self.closed = True
+            self.lock.notify_all()
+
+class LocalTopicPartition:
+    def __init__(self, topic, partition, offset=-1001):
+        self.topic = topic
+        self.partition = partition
+        self.offset = offset
+
+    def __repr__(self):
+        return f"TopicPartition({self.topic}, {self.partition}, {self.offset})"
+
+class LocalKafkaConsumer:
+    def __init__(self, config, broker):
+        self.broker = broker
+        self.group_id = config['group.id']
+        self.reset = config.get('auto.offset.reset', 'latest')
+        self.topics = []
+        self.on_assign = None
+        self.on_revoke = None
+        self.assigned = []
+        self.paused = set()
+        self.positions = {}
+        self.generation = 0
+        self.next_partition = 0
+        self.closed = False
+
+    def subscribe(self, topics, on_assign=None, on_revoke=None):
+        self.topics = list(topics)
+        self.on_assign = on_assign
+        self.on_revoke = on_revoke
+        self.broker.join_group(self.group_id, self)
+
+    def revoke(self):
+        if self.assigned and self.on_revoke:
+            self.on_revoke(self, [LocalTopicPartition(topic, partition) for topic, partition in self.assigned])
+        self.assigned = []
+        self.broker.revoked(self.group_id, self)
+
+    def serve_rebalance(self):
+        if self.broker.generation(self.group_id) == self.generation:
+            return
+        if self.assigned:
+            self.revoke()
+        assignment, generation = self.broker.assignment(self.group_id, self)
+        if assignment is None:
+            return
+        self.generation = generation
+        self.assigned = assignment
+        self.paused &= set(assignment)
+        self.positions = {}
+        for topic, partition in assignment:
+            committed = self.broker.committed(self.group_id, topic, partition)
+            if committed is None:
+                committed = 0 if self.reset == 'earliest' else self.broker.high_watermark(topic, partition)
+            self.positions[(topic, partition)] = committed
+        if self.on_assign:
+            self.on_assign(self, [LocalTopicPartition(topic, partition, self.positions[(topic, partition)])
+                                  for topic, partition in assignment])
+
+    # Up to num_messages from the assigned, unpaused partitions, taken round robin
+    def consume(self, num_messages=1, timeout=-1):
+        deadline = time.monotonic() + (timeout if timeout and timeout > 0 else 0)
+        while True:
+            self.serve_rebalance()
+            messages = []
+            active = [key for key in self.assigned if key not in self.paused]
+            for step in range(len(active)):
+                if len(messages) >= num_messages:
+                    break
+                key = active[(self.next_partition + step) % len(active)]
+                batch = self.broker.read(key[0], key[1], self.positions[key], num_messages - len(messages))
+                self.positions[key] += len(batch)
+                messages.extend(batch)
+            if active:
+                self.next_partition = (self.next_partition + 1) % len(active)
+            if messages or time.monotonic() >= deadline:
+                return messages
+            time.sleep(min(0.005, max(deadline - time.monotonic(), 0)))
+
+    def poll(self, timeout=None):
+        messages = self.consume(1, timeout)
+        return messages[0] if messages else None
+
+    def assignment(self):
+        return [LocalTopicPartition(topic, partition) for topic, partition in self.assigned]
+
+    def pause(self, partitions):
+        self.paused |= {(tp.topic, tp.partition) for tp in partitions}
+
+    def resume(self, partitions):
+        self.paused -= {(tp.topic, tp.partition) for tp in partitions}
+
+    def commit(self, message=None, offsets=None, asynchronous=True):
+        if offsets is None and message is not None:
+            offsets = [LocalTopicPartition(message.topic(), message.partition(), message.offset() + 1)]
+        self.broker.commit(self.group_id, {(tp.topic, tp.partition): tp.offset for tp in offsets or []})
+        return offsets
+
+    def committed(self, partitions, timeout=None):
+        return [LocalTopicPartition(tp.topic, tp.partition,
+                                    self.broker.committed(self.group_id, tp.topic, tp.partition) or -1001)
+                for tp in partitions]
+
+    def get_watermark_offsets(self, partition, timeout=None, cached=False):
+        return 0, self.broker.high_watermark(partition.topic, partition.partition)
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        self.revoke()
+        self.broker.leave_group(self.group_id, self)
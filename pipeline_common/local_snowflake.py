@@ -0,0 +1,196 @@
+import os
+import re
+import glob
+import sqlite3
+import threading
+
+# SQLite-backed stand-in for a snowflake.connector connection. It covers the
+# statements the pipelines issue: plain SQL with %s parameters, plus the
+# Snowflake-only bulk path
+#   PUT 'file://...' @%table            (files are held in an in-memory stage)
+#   COPY INTO table FROM @%table ...    (parquet, matched by column name)
+#   MERGE INTO target t USING source s ON ... WHEN MATCHED THEN UPDATE SET ...
+#       [WHEN NOT MATCHED THEN INSERT (...) VALUES (...)]
+#   CREATE TEMPORARY TABLE x LIKE y, TRUNCATE TABLE x
+#   BEGIN [TRANSACTION]                 (SQLite already holds writes until commit())
+class LocalSnowflakeConnection:
+    def __init__(self, database=':memory:'):
+        self.conn = sqlite3.connect(database, check_same_thread=False)
+        self.stages = {}
+        self.lock = threading.RLock()
+        self.closed = False
+        self.statement_count = 0
+
+    def cursor(self):
+        if self.closed:
+            raise RuntimeError("Connection is closed")
+        return LocalSnowflakeCursor(self)
+
+    def commit(self):
+        with self.lock:
+            self.conn.commit()
+
+    def rollback(self):
+        with self.lock:
+            self.conn.rollback()
+
+    def close(self):
+        self.closed = True
+
+    def is_closed(self):
+        return self.closed
+
+class LocalSnowflakeCursor:
+    PUT_PATTERN = re.compile(r"^\s*PUT\s+'?file://([^'\s]+)'?\s+@%?(\w+)", re.IGNORECASE)
+    COPY_PATTERN = re.compile(r"^\s*COPY\s+INTO\s+(\w+)\s+FROM\s+@%?(\w+)(.*)$", re.IGNORECASE | re.DOTALL)
+    LIKE_PATTERN = re.compile(
+        r"^\s*CREATE\s+(?:TEMPORARY\s+|TEMP\s+)?TABLE\s+(?:IF\s+NOT\s+EXISTS\s+)?(\w+)\s+LIKE\s+(\w+)\s*$", re.IGNORECASE)
+    BEGIN_PATTERN = re.compile(r"^\s*BEGIN(?:\s+(?:TRANSACTION|WORK))?\s*;?\s*$", re.IGNORECASE)
+    TRUNCATE_PATTERN = re.compile(r"^\s*TRUNCATE\s+(?:TABLE\s+)?(?:IF\s+EXISTS\s+)?(\w+)\s*$", re.IGNORECASE)
+    MERGE_PATTERN = re.compile(
+        r"^\s*MERGE\s+INTO\s+(?P<target>\w+)\s+(?:AS\s+)?(?P<t>\w+)\s+"
+        r"USING\s+(?P<source>\(.*\)|\w+)\s+(?:AS\s+)?(?P<s>\w+)\s+ON\s+(?P<on>.+?)\s+"
+        r"WHEN\s+MATCHED\s+THEN\s+UPDATE\s+SET\s+(?P<set>.+?)"
+        r"(?:\s+WHEN\s+NOT\s+MATCHED\s+THEN\s+INSERT\s*\((?P<columns>[^)]*)\)\s*VALUES\s*\((?P<values>.*)\))?\s*$",
+        re.IGNORECASE | re.DOTALL
+    )
+    # Snowflake column types SQLite does not know
+    TYPE_REPLACEMENTS = [(re.compile(r'\b(VARIANT|ARRAY|OBJECT)\b', re.IGNORECASE), 'TEXT'),
+                         (re.compile(r'\bSTRING\b', re.IGNORECASE), 'TEXT')]
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.description = None
+        self.rowcount = -1
+        self.rows = []
+
+    def execute(self, sql, params=None):
+        connection = self.connection
+        with connection.lock:
+            connection.statement_count += 1
+            self.rows, self.description = [], None
+            for pattern, handler in ((self.PUT_PATTERN, self.run_put), (self.COPY_PATTERN, self.run_copy),
+                                     (self.LIKE_PATTERN, self.run_like), (self.TRUNCATE_PATTERN, self.run_truncate),
+                                     (self.MERGE_PATTERN, self.run_merge), (self.BEGIN_PATTERN, self.run_begin)):
+                match = pattern.match(sql)
+                if match:
+                    handler(match, params)
+                    return self
+            cursor = connection.conn.execute(self.translate(sql), self.translate_params(params))
+            self.set_result(cursor)
+        return self
+
+    def executemany(self, sql, seq_of_params):
+        with self.connection.lock:
+            self.connection.statement_count += 1
+            cursor = self.connection.conn.executemany(self.translate(sql), [self.translate_params(p) for p in seq_of_params])
+            self.rowcount = cursor.rowcount
+        return self
+
+    def translate(self, sql):
+        for pattern, replacement in self.TYPE_REPLACEMENTS:
+            sql = pattern.sub(replacement, sql)
+        return re.sub(r'%\((\w+)\)s', r':\1', sql).replace('%s', '?')
+
+    def translate_params(self, params):
+        if params is None:
+            return ()
+        if isinstance(params, dict):
+            return params
+        return tuple(params)
+
+    def set_result(self, cursor):
+        if cursor.description:
+            self.description = cursor.description
+            self.rows = cursor.fetchall()
+            self.rowcount = len(self.rows)
+        else:
+            self.rowcount = cursor.rowcount
+
+    def run_put(self, match, params):
+        pattern, stage = match.groups()
+        paths = sorted(glob.glob(pattern))
+        files = self.connection.stages.setdefault(stage.lower(), {})
+        for path in paths:
+            with open(path, 'rb') as f:
+                files[os.path.basename(path)] = f.read()
+        self.rows = [(os.path.basename(path), os.path.basename(path), os.path.getsize(path), os.path.getsize(path),
+                      'NONE', 'NONE', 'UPLOADED', '') for path in paths]
+        self.description = [(name,) for name in ('source', 'target', 'source_size', 'target_size',
+                                                 'source_compression', 'target_compression', 'status', 'message')]
+        self.rowcount = len(self.rows)
+
+    # Parquet files in the stage are loaded by column name; PURGE removes them
+    def run_copy(self, match, params):
+        import io
+        import pyarrow.parquet as pq
+        table, stage, options = match.groups()
+        files = self.connection.stages.get(stage.lower(), {})
+        columns = [row[1] for row in self.connection.conn.execute(f"PRAGMA table_info({table})")]
+        by_name = {column.lower(): column for column in columns}
+        loaded = 0
+        self.rows = []
+        for name, data in sorted(files.items()):
+            arrow_table = pq.read_table(io.BytesIO(data))
+            names = [by_name[column.lower()] for column in arrow_table.column_names if column.lower() in by_name]
+            source = [column for column in arrow_table.column_names if column.lower() in by_name]
+            values = list(zip(*(arrow_table.column(column).to_pylist() for column in source)))
+            self.connection.conn.executemany(
+                f"INSERT INTO {table} ({', '.join(names)}) VALUES ({', '.join('?' * len(names))})", values)
+            loaded += len(values)
+            self.rows.append((f"{stage}/{name}", 'LOADED', len(values), len(values), 1, 0))
+        if re.search(r'\bPURGE\s*=\s*TRUE\b', options, re.IGNORECASE):
+            files.clear()
+        self.description = [(name,) for name in ('file', 'status', 'rows_parsed', 'rows_loaded', 'error_limit', 'errors_seen')]
+        self.rowcount = loaded
+
+    def run_like(self, match, params):
+        table, template = match.groups()
+        self.connection.conn.execute(f"CREATE TABLE IF NOT EXISTS {table} AS SELECT * FROM {template} WHERE 0")
+        self.rowcount = 0
+
+    def run_begin(self, match, params):
+        self.rowcount = 0
+
+    def run_truncate(self, match, params):
+        self.connection.conn.execute(f"DELETE FROM {match.group(1)}")
+        self.rowcount = 0
+
+    # MERGE becomes UPDATE ... FROM for matched keys, then (with a NOT MATCHED clause) INSERT ... WHERE NOT EXISTS.
+    # SQLite has no hash join, so equality keys are indexed to keep this near linear.
+    def run_merge(self, match, params):
+        parts = match.groupdict()
+        for alias, column in re.findall(r'\b(\w+)\.(\w+)\s*=', parts['on']) + re.findall(r'=\s*(\w+)\.(\w+)', parts['on']):
+            table = {parts['t']: parts['target'], parts['s']: parts['source']}.get(alias)
+            if table and not table.startswith('('):
+                self.connection.conn.execute(f"CREATE INDEX IF NOT EXISTS {table}_{column}_idx ON {table} ({column})")
+        source = f"{parts['source']} AS {parts['s']}"
+        params = self.translate_params(params)
+        updated = self.connection.conn.execute(
+            self.translate(f"UPDATE {parts['target']} AS {parts['t']} SET {parts['set']} FROM {source} WHERE {parts['on']}"),
+            params).rowcount
+        if parts['columns'] is None:
+            self.rows = [(updated,)]
+            self.description = [('number of rows updated',)]
+            self.rowcount = updated
+            return
+        inserted = self.connection.conn.execute(self.translate(
+            f"INSERT INTO {parts['target']} ({parts['columns']}) SELECT {parts['values']} FROM {source} "
+            f"WHERE NOT EXISTS (SELECT 1 FROM {parts['target']} AS {parts['t']} WHERE {parts['on']})"), params).rowcount
+        self.rows = [(inserted, updated)]
+        self.description = [('number of rows inserted',), ('number of rows updated',)]
+        self.rowcount = inserted + updated
+
+    def fetchone(self):
+        return self.rows.pop(0) if self.rows else None
+
+    def fetchmany(self, size=1000):
+        rows, self.rows = self.rows[:size], self.rows[size:]
+        return rows
+
+    def fetchall(self):
+        rows, self.rows = self.rows, []
+        return rows
+
+    def close(self):
+        self.rows = []
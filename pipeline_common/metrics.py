@@ -0,0 +1,41 @@
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+# Rolling latency samples with percentile summaries for pipeline stages
+class LatencyTracker:
+    def __init__(self, window=1024):
+        self.samples = deque(maxlen=window)
+        self.count = 0
+        self.lock = threading.Lock()
+
+    def record(self, seconds):
+        with self.lock:
+            self.samples.append(seconds)
+            self.count += 1
+
+    @contextmanager
+    def time(self):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(time.perf_counter() - start)
+
+    def summary(self):
+        with self.lock:
+            samples = sorted(self.samples)
+        if not samples:
+            return {'count': self.count, 'p50_ms': None, 'p99_ms': None, 'max_ms': None}
+        return {
+            'count': self.count,
+            'p50_ms': round(percentile(samples, 0.50) * 1000, 3),
+            'p99_ms': round(percentile(samples, 0.99) * 1000, 3),
+            'max_ms': round(samples[-1] * 1000, 3)
+        }
+
+# Nearest-rank percentile of an already sorted sample list
+def percentile(sorted_samples, q):
+    index = min(len(sorted_samples) - 1, int(round(q * (len(sorted_samples) - 1))))
+    return sorted_samples[index]
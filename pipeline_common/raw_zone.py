@@ -0,0 +1,307 @@
+import io
+import json
+import gzip
+import time
+import uuid
+import logging
+import threading
+from datetime import datetime, timezone
+
+# S3 multipart limits: every part but the last must be at least 5 MiB, at most 10,000 parts
+MIN_PART_BYTES = 5 * 1024 * 1024
+MAX_PARTS = 10000
+EXTENSIONS = {'ndjson': '.ndjson.gz', 'parquet': '.parquet'}
+LINE_BLOCK_BYTES = 256 * 1024
+# json.dumps builds a new encoder per call when given options; one shared encoder avoids that
+encode_record = json.JSONEncoder(default=str).encode
+
+# Collision-free object key under a source/date partition. The UTC timestamp
+# keeps keys listing in write order; the random suffix keeps two writers (or
+# two batches in the same second) from overwriting each other.
+#   <prefix>/<source>/dt=YYYY-MM-DD/YYYYMMDDTHHMMSSZ-<uuid>.ndjson.gz
+def object_key(prefix, source, day, extension):
+    name = f"{datetime.now(timezone.utc):%Y%m%dT%H%M%SZ}-{uuid.uuid4().hex}{extension}"
+    return '/'.join(part.strip('/') for part in (prefix, source, f"dt={day}", name) if part)
+
+# File-like upload of one S3 object. Bytes are buffered until part_bytes and
+# sent as multipart parts, so memory stays at about one part however large the
+# object grows; an object that never fills a part goes up with one put_object.
+class ObjectUpload:
+    def __init__(self, s3_client, bucket, key, part_bytes):
+        self.s3_client = s3_client
+        self.bucket = bucket
+        self.key = key
+        self.part_bytes = part_bytes
+        self.buffer = bytearray()
+        self.parts = []
+        self.upload_id = None
+        self.size = 0
+        self.closed = False
+        self.aborted = False
+
+    def write(self, data):
+        self.buffer += data
+        self.size += len(data)
+        if len(self.buffer) >= self.part_bytes:
+            self.send_part()
+        return len(data)
+
+    def tell(self):
+        return self.size
+
+    def flush(self):
+        pass
+
+    def send_part(self):
+        if self.upload_id is None:
+            self.upload_id = self.s3_client.create_multipart_upload(Bucket=self.bucket, Key=self.key)['UploadId']
+        if len(self.parts) >= MAX_PARTS:
+            raise ValueError(f"s3://{self.bucket}/{self.key} would exceed {MAX_PARTS} parts; lower max_file_bytes")
+        number = len(self.parts) + 1
+        response = self.s3_client.upload_part(Bucket=self.bucket, Key=self.key, UploadId=self.upload_id,
+                                              PartNumber=number, Body=bytes(self.buffer))
+        self.parts.append({'ETag': response['ETag'], 'PartNumber': number})
+        self.buffer = bytearray()
+
+    # Publish the object; it is not visible under its key before this returns.
+    # A multipart upload that fails to complete is aborted before the error is raised.
+    def complete(self):
+        if self.upload_id is None:
+            self.s3_client.put_object(Bucket=self.bucket, Key=self.key, Body=bytes(self.buffer))
+        else:
+            try:
+                if self.buffer:
+                    self.send_part()
+                self.s3_client.complete_multipart_upload(Bucket=self.bucket, Key=self.key, UploadId=self.upload_id,
+                                                         MultipartUpload={'Parts': self.parts})
+            except Exception:
+                self.abort()
+                raise
+        self.buffer = bytearray()
+
+    # Drop a failed upload so its parts are not left billed in the bucket
+    def abort(self):
+        self.buffer = bytearray()
+        if self.upload_id is not None and not self.aborted:
+            self.aborted = True
+            try:
+                self.s3_client.abort_multipart_upload(Bucket=self.bucket, Key=self.key, UploadId=self.upload_id)
+            except Exception as e:
+                logging.error(f"Aborting multipart upload of s3://{self.bucket}/{self.key} failed: {e}")
+
+    def close(self):
+        self.closed = True
+
+# One open raw file: its upload and the encoder writing into it
+class RawFile:
+    def __init__(self, upload, file_format, compresslevel, row_group_rows):
+        self.upload = upload
+        self.file_format = file_format
+        self.row_group_rows = row_group_rows
+        self.opened = time.monotonic()
+        self.records = 0
+        self.rows = []
+        self.lines = []
+        self.line_bytes = 0
+        self.parquet_writer = None
+        self.gzip = gzip.GzipFile(fileobj=upload, mode='wb', compresslevel=compresslevel) if file_format == 'ndjson' else None
+
+    def write(self, record):
+        if self.gzip is not None:
+            # Lines are compressed in blocks; one small zlib call per record costs more than the encoding
+            line = encode_record(record).encode('utf-8')
+            self.lines.append(line)
+            self.line_bytes += len(line) + 1
+            if self.line_bytes >= LINE_BLOCK_BYTES:
+                self.write_lines()
+        else:
+            self.rows.append(record)
+            if len(self.rows) >= self.row_group_rows:
+                self.write_row_group()
+        self.records += 1
+
+    def write_lines(self):
+        self.lines.append(b'')
+        self.gzip.write(b'\n'.join(self.lines))
+        self.lines = []
+        self.line_bytes = 0
+
+    def write_row_group(self):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        if self.parquet_writer is None:
+            # The first row group fixes the schema; later ones are cast to it
+            table = pa.Table.from_pylist(self.rows)
+            self.parquet_writer = pq.ParquetWriter(self.upload, table.schema, compression='snappy')
+        else:
+            table = pa.Table.from_pylist(self.rows, schema=self.parquet_writer.schema)
+        self.parquet_writer.write_table(table)
+        self.rows = []
+
+    # Compressed bytes produced so far (what the object will weigh)
+    def size(self):
+        return self.upload.size
+
+    def finish(self):
+        if self.gzip is not None:
+            if self.lines:
+                self.write_lines()
+            self.gzip.close()
+        else:
+            if self.rows:
+                self.write_row_group()
+            self.parquet_writer.close()
+        self.upload.complete()
+
+# Streams records into the raw zone as date/source-partitioned, compressed
+# files: gzip NDJSON by default, or snappy parquet (needs pyarrow). Records are
+# serialized and compressed as they are written, so a batch is never held as
+# one JSON document. Each partition has one open file, rolled into a new
+# object once it reaches max_file_bytes compressed or has been open for
+# max_file_age_seconds; objects that outgrow one part go up as multipart
+# uploads. A file is only visible in S3 once it is complete. If an upload
+# fails, that file is aborted and the error is raised; records already in
+# completed files stay written, so a retried batch is at-least-once.
+#   writer = RawZoneWriter(s3_client, 'bucket', 'crm')
+#   writer.write_many(records)
+#   keys = writer.close()
+class RawZoneWriter:
+    def __init__(self, s3_client, bucket, source, prefix='raw', file_format='ndjson', partition_field=None,
+                 max_file_bytes=128 * 1024 * 1024, max_file_age_seconds=300, part_bytes=8 * 1024 * 1024,
+                 row_group_rows=50000, compresslevel=6):
+        if file_format not in EXTENSIONS:
+            raise ValueError(f"Unsupported raw file format {file_format!r}; use one of {sorted(EXTENSIONS)}")
+        if part_bytes < MIN_PART_BYTES:
+            raise ValueError(f"part_bytes must be at least {MIN_PART_BYTES} (the S3 minimum part size)")
+        self.s3_client = s3_client
+        self.bucket = bucket
+        self.source = source
+        self.prefix = prefix
+        self.file_format = file_format
+        # Record field holding the partition date (YYYY-MM-DD...); None partitions by UTC arrival date
+        self.partition_field = partition_field
+        self.max_file_bytes = max_file_bytes
+        self.max_file_age_seconds = max_file_age_seconds
+        self.part_bytes = part_bytes
+        self.row_group_rows = row_group_rows
+        self.compresslevel = compresslevel
+        self.files = {}
+        self.completed = []
+        self.lock = threading.Lock()
+        self.closed = threading.Event()
+        self.roll_thread = None
+        self.records_written = 0
+        self.files_written = 0
+        self.bytes_written = 0
+        self.multipart_files = 0
+        self.failed_files = 0
+
+    def partition(self, record):
+        value = record.get(self.partition_field) if self.partition_field else None
+        return str(value)[:10] if value else datetime.now(timezone.utc).date().isoformat()
+
+    def write(self, record):
+        self.start_roller()
+        day = self.partition(record)
+        with self.lock:
+            raw_file = self.files.get(day)
+            if raw_file is None:
+                key = object_key(self.prefix, self.source, day, EXTENSIONS[self.file_format])
+                upload = ObjectUpload(self.s3_client, self.bucket, key, self.part_bytes)
+                raw_file = self.files[day] = RawFile(upload, self.file_format, self.compresslevel, self.row_group_rows)
+            try:
+                raw_file.write(record)
+            except Exception:
+                self.discard(day)
+                raise
+            self.records_written += 1
+            if raw_file.size() >= self.max_file_bytes:
+                self.roll(day)
+
+    # records may be any iterable (a generator keeps huge sources out of memory)
+    def write_many(self, records):
+        count = 0
+        for record in records:
+            self.write(record)
+            count += 1
+        return count
+
+    # Complete one partition's file; the caller holds self.lock
+    def roll(self, day):
+        raw_file = self.files.pop(day)
+        try:
+            raw_file.finish()
+        except Exception:
+            raw_file.upload.abort()
+            self.failed_files += 1
+            raise
+        self.files_written += 1
+        self.bytes_written += raw_file.upload.size
+        self.multipart_files += raw_file.upload.upload_id is not None
+        self.completed.append(raw_file.upload.key)
+        logging.info(f"Wrote {raw_file.records} {self.source} records to s3://{self.bucket}/{raw_file.upload.key} "
+                     f"({raw_file.upload.size} bytes)")
+
+    def discard(self, day):
+        self.files.pop(day).upload.abort()
+        self.failed_files += 1
+
+    # Roll files that have been open longer than max_file_age_seconds
+    def roll_expired(self):
+        with self.lock:
+            now = time.monotonic()
+            for day in [day for day, raw_file in self.files.items()
+                        if now - raw_file.opened >= self.max_file_age_seconds]:
+                self.roll(day)
+
+    def start_roller(self):
+        if self.roll_thread is None and self.max_file_age_seconds:
+            with self.lock:
+                if self.roll_thread is None:
+                    self.roll_thread = threading.Thread(target=self.roll_periodically, name=f"raw-zone-{self.source}", daemon=True)
+                    self.roll_thread.start()
+
+    def roll_periodically(self):
+        while not self.closed.wait(self.max_file_age_seconds / 2):
+            try:
+                self.roll_expired()
+            except Exception as e:
+                logging.error(f"Rolling raw {self.source} files failed: {e}")
+
+    # Complete every open file; returns the keys completed since the last flush.
+    # Every file is attempted even if one fails, so no upload is left open; the
+    # first error is then raised and the completed keys stay for the next flush.
+    def flush(self):
+        error = None
+        with self.lock:
+            for day in list(self.files):
+                try:
+                    self.roll(day)
+                except Exception as e:
+                    error = error or e
+            if error is not None:
+                raise error
+            completed, self.completed = self.completed, []
+        return completed
+
+    def close(self):
+        self.closed.set()
+        return self.flush()
+
+    def metrics(self):
+        return {
+            'records_written': self.records_written,
+            'files_written': self.files_written,
+            'bytes_written': self.bytes_written,
+            'multipart_files': self.multipart_files,
+            'failed_files': self.failed_files,
+            'open_files': len(self.files)
+        }
+
+# Records of one raw-zone object, decoded by its extension
+def read_records(s3_client, bucket, key):
+    body = s3_client.get_object(Bucket=bucket, Key=key)['Body'].read()
+    if key.endswith('.parquet'):
+        import pyarrow.parquet as pq
+        return pq.read_table(io.BytesIO(body)).to_pylist()
+    return [json.loads(line) for line in gzip.decompress(body).splitlines() if line.strip()]
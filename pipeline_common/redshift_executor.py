@@ -0,0 +1,141 @@
+import asyncio
+import functools
+import weakref
+import numpy as np
+
+# Asyncio front end for the Redshift Data API. Blocking boto3 calls run in a
+# thread pool so the event loop keeps serving requests; statements are polled
+# with describe_statement using a growing delay; at most max_concurrent
+# statements run at once; results are streamed page by page via NextToken so
+# callers never hold the whole result set.
+class RedshiftStatementExecutor:
+    def __init__(self, redshift_data, cluster, database, db_user, max_concurrent=8,
+                 poll_initial_seconds=0.05, poll_max_seconds=2.0, poll_multiplier=1.5,
+                 timeout_seconds=300, thread_pool=None):
+        self.redshift_data = redshift_data
+        self.statement_args = {'ClusterIdentifier': cluster, 'Database': database, 'DbUser': db_user}
+        self.max_concurrent = max_concurrent
+        self.poll_initial_seconds = poll_initial_seconds
+        self.poll_max_seconds = poll_max_seconds
+        self.poll_multiplier = poll_multiplier
+        self.timeout_seconds = timeout_seconds
+        self.thread_pool = thread_pool
+        # One semaphore per event loop (Lambda handlers may call asyncio.run repeatedly)
+        self.semaphores = weakref.WeakKeyDictionary()
+        self.running = 0
+
+    async def call(self, method, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.thread_pool, functools.partial(method, **kwargs))
+
+    def semaphore(self):
+        loop = asyncio.get_running_loop()
+        if loop not in self.semaphores:
+            self.semaphores[loop] = asyncio.Semaphore(self.max_concurrent)
+        return self.semaphores[loop]
+
+    # Submit a statement and wait for it to finish; returns its final description
+    async def execute(self, sql, parameters=None):
+        kwargs = dict(self.statement_args, Sql=sql)
+        if parameters:
+            kwargs['Parameters'] = [{'name': name, 'value': str(value)} for name, value in parameters.items()]
+        async with self.semaphore():
+            self.running += 1
+            try:
+                response = await self.call(self.redshift_data.execute_statement, **kwargs)
+                return await self.wait(response['Id'])
+            finally:
+                self.running -= 1
+
+    async def wait(self, statement_id):
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.timeout_seconds
+        delay = self.poll_initial_seconds
+        while True:
+            description = await self.call(self.redshift_data.describe_statement, Id=statement_id)
+            status = description['Status']
+            if status == 'FINISHED':
+                return description
+            if status in ('FAILED', 'ABORTED'):
+                raise RuntimeError(f"Redshift statement {statement_id} {status}: {description.get('Error')}")
+            if loop.time() + delay > deadline:
+                raise TimeoutError(f"Redshift statement {statement_id} still {status} after {self.timeout_seconds}s")
+            await asyncio.sleep(delay)
+            delay = min(delay * self.poll_multiplier, self.poll_max_seconds)
+
+    # Yield (column_names, records) for each result page
+    async def stream_pages(self, sql, parameters=None):
+        description = await self.execute(sql, parameters)
+        if not description.get('HasResultSet'):
+            return
+        next_token = None
+        while True:
+            kwargs = {'Id': description['Id']}
+            if next_token:
+                kwargs['NextToken'] = next_token
+            page = await self.call(self.redshift_data.get_statement_result, **kwargs)
+            columns = [column['name'] for column in page['ColumnMetadata']]
+            yield columns, page['Records']
+            next_token = page.get('NextToken')
+            if not next_token:
+                break
+
+    # Yield one dict per row
+    async def stream_rows(self, sql, parameters=None):
+        async for columns, records in self.stream_pages(sql, parameters):
+            for record in records:
+                yield dict(zip(columns, (decode_field(field) for field in record)))
+
+    # Yield one {column: numpy array} dict per result page
+    async def stream_columns(self, sql, parameters=None):
+        async for columns, records in self.stream_pages(sql, parameters):
+            yield decode_columns(columns, records)
+
+    async def fetch_rows(self, sql, parameters=None):
+        return [row async for row in self.stream_rows(sql, parameters)]
+
+    async def fetch_one(self, sql, parameters=None):
+        rows = self.stream_rows(sql, parameters)
+        try:
+            async for row in rows:
+                return row
+            return None
+        finally:
+            await rows.aclose()
+
+FIELD_TYPES = ('stringValue', 'longValue', 'doubleValue', 'booleanValue', 'blobValue')
+
+def decode_field(field):
+    if field.get('isNull'):
+        return None
+    for key in FIELD_TYPES:
+        if key in field:
+            return field[key]
+    return None
+
+# Turn a page of typed field dicts into one array per column. Numeric columns get
+# numeric dtypes (NULL longs become NaN floats); everything else stays object.
+def decode_columns(columns, records):
+    decoded = {}
+    for i, name in enumerate(columns):
+        fields = [record[i] for record in records]
+        kinds = {key for field in fields for key in FIELD_TYPES if key in field}
+        has_nulls = any(field.get('isNull') for field in fields)
+        values = [decode_field(field) for field in fields]
+        if kinds == {'doubleValue'} or (kinds == {'longValue'} and has_nulls) or kinds == {'doubleValue', 'longValue'}:
+            decoded[name] = np.array([np.nan if v is None else v for v in values], dtype=np.float64)
+        elif kinds == {'longValue'}:
+            decoded[name] = np.array(values, dtype=np.int64)
+        elif kinds == {'booleanValue'} and not has_nulls:
+            decoded[name] = np.array(values, dtype=bool)
+        else:
+            decoded[name] = np.array(values, dtype=object)
+    return decoded
+
+# Run a coroutine from synchronous code such as a Lambda handler
+def run_sync(coroutine):
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coroutine)
+    raise RuntimeError("run_sync() called from a running event loop; await the coroutine instead")
@@ -0,0 +1,83 @@
+import threading
+import pytest
+from pipeline_common import clients
+from pipeline_common.local_aws import LocalS3, LocalSNS
+from pipeline_common.benchmarks.import_time_benchmark import measure, MODULES, REPO_ROOT
+
+@pytest.fixture(autouse=True)
+def registry(monkeypatch):
+    monkeypatch.setattr(clients, 'factories', {})
+    monkeypatch.setattr(clients, 'clients', {})
+
+# Factory that counts how often it runs
+class Factory:
+    def __init__(self, make):
+        self.make = make
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        return self.make()
+
+def test_client_is_created_on_first_use_and_shared():
+    factory = Factory(LocalSNS)
+    first = clients.lazy_client('sns', factory)
+    second = clients.lazy_client('sns', Factory(LocalSNS))
+    assert factory.calls == 0 and clients.created() == [] and 'not created' in repr(first)
+    first.publish(TopicArn='topic', Message='hello')
+    assert factory.calls == 1 and clients.created() == ['sns'] and 'not created' not in repr(first)
+    # The first factory declared wins, so both proxies reach the same client
+    assert second.messages == [('topic', 'hello')]
+
+def test_concurrent_first_use_creates_one_client():
+    factory = Factory(LocalS3)
+    s3 = clients.lazy_client('s3', factory)
+    barrier = threading.Barrier(8)
+
+    def use():
+        barrier.wait()
+        s3.put_object(Bucket='bucket', Key=threading.current_thread().name, Body=b'x')
+
+    threads = [threading.Thread(target=use) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert factory.calls == 1 and len(clients.get_client('s3').objects) == 8
+
+def test_register_swaps_in_a_stand_in_before_or_after_first_use():
+    sns = clients.aws_client('sns')
+    local = LocalSNS()
+    clients.register('sns', local)
+    sns.publish(TopicArn='topic', Message='one')
+    assert local.messages == [('topic', 'one')]
+    replacement = LocalSNS()
+    clients.register('sns', replacement)
+    sns.publish(TopicArn='topic', Message='two')
+    assert replacement.messages == [('topic', 'two')] and len(local.messages) == 1
+
+def test_reset_forgets_created_clients():
+    factory = Factory(LocalS3)
+    s3 = clients.lazy_client('s3', factory)
+    clients.register('sns', LocalSNS())
+    s3.list_objects_v2(Bucket='bucket')
+    clients.reset('s3')
+    assert clients.created() == ['sns']
+    s3.list_objects_v2(Bucket='bucket')
+    assert factory.calls == 2
+    clients.reset()
+    assert clients.created() == []
+
+def test_unknown_client_raises_key_error():
+    with pytest.raises(KeyError):
+        clients.get_client('kinesis')
+
+def test_pipeline_imports_create_no_clients_and_load_no_heavy_packages():
+    # boto3 among the heavy packages would mean a client was created at import time
+    for app_dir, module in MODULES:
+        result = measure(REPO_ROOT, app_dir, module, 1)
+        if result['error'] and 'ModuleNotFoundError' in result['error']:
+            continue
+        assert result['error'] is None, f"{module}: {result['error']}"
+        assert result['heavy'] == [], f"{module} imported {result['heavy']}"
+        assert result['log_files'] == [], f"{module} created {result['log_files']}"
@@ -0,0 +1,114 @@
+import time
+import asyncio
+import threading
+import pytest
+from pipeline_common.connection_pool import ConnectionPool
+from pipeline_common.local_snowflake import LocalSnowflakeConnection
+
+# Factory that counts the connections it opens
+class Factory:
+    def __init__(self):
+        self.connections = []
+
+    def __call__(self):
+        conn = LocalSnowflakeConnection()
+        self.connections.append(conn)
+        return conn
+
+def test_connections_are_opened_lazily_and_reused():
+    factory = Factory()
+    pool = ConnectionPool(factory, max_size=4)
+    assert factory.connections == []
+    first = pool.run(lambda conn: conn)
+    second = pool.run(lambda conn: conn)
+    assert first is second and len(factory.connections) == 1
+    metrics = pool.metrics()
+    assert (metrics['checkouts'], metrics['created'], metrics['in_use'], metrics['idle']) == (2, 1, 0, 1)
+    pool.close()
+
+def test_checkout_waits_for_a_free_connection_and_times_out():
+    pool = ConnectionPool(Factory(), max_size=1, checkout_timeout_seconds=0.05)
+    with pool.connection():
+        with pytest.raises(TimeoutError):
+            pool.acquire()
+    assert pool.metrics()['timeouts'] == 1
+
+    pool.checkout_timeout_seconds = 5.0
+    held = pool.acquire()
+    threading.Timer(0.05, pool.release, args=(held,)).start()
+    start = time.monotonic()
+    assert pool.acquire() is held
+    assert time.monotonic() - start >= 0.04
+    metrics = pool.metrics()
+    assert metrics['waits'] == 1 and metrics['size'] == 1 and metrics['peak_in_use'] == 1
+    pool.close()
+
+def test_error_rolls_back_and_returns_the_connection():
+    pool = ConnectionPool(Factory(), max_size=1)
+    pool.run(lambda conn: conn.cursor().execute("CREATE TABLE t (x INT)"))
+
+    def insert_then_fail(conn):
+        conn.cursor().execute("INSERT INTO t VALUES (1)")
+        raise ValueError("handler failed")
+
+    with pytest.raises(ValueError):
+        pool.run(insert_then_fail)
+    assert pool.run(lambda conn: conn.cursor().execute("SELECT COUNT(*) FROM t").fetchone()) == (0,)
+    assert pool.metrics()['created'] == 1
+    pool.close()
+
+def test_closed_or_unhealthy_connections_are_replaced():
+    factory = Factory()
+    pool = ConnectionPool(factory, max_size=2, health_check_seconds=0.0)
+    conn = pool.run(lambda conn: conn)
+    conn.close()
+    assert pool.run(lambda conn: conn) is not conn
+    assert len(factory.connections) == 2
+
+    # An open connection whose probe fails is discarded as well
+    probed = factory.connections[-1]
+    probed.cursor = lambda: (_ for _ in ()).throw(RuntimeError("connection reset"))
+    replacement = pool.run(lambda conn: conn)
+    assert replacement is not probed and replacement is factory.connections[-1]
+    metrics = pool.metrics()
+    assert metrics['health_check_failures'] == 2 and metrics['discarded'] == 2 and metrics['size'] == 1
+    pool.close()
+
+def test_failed_factory_frees_its_slot():
+    calls = []
+
+    def factory():
+        calls.append(1)
+        if len(calls) == 1:
+            raise ConnectionError("warehouse suspended")
+        return LocalSnowflakeConnection()
+
+    pool = ConnectionPool(factory, max_size=1, checkout_timeout_seconds=0.05)
+    with pytest.raises(ConnectionError):
+        pool.acquire()
+    assert pool.run(lambda conn: 1) == 1
+    assert pool.metrics()['size'] == 1
+    pool.close()
+
+def test_run_async_keeps_the_event_loop_free():
+    pool = ConnectionPool(Factory(), max_size=2)
+
+    def slow(conn, value):
+        time.sleep(0.05)
+        return value
+
+    async def main():
+        ticks = []
+
+        async def ticker():
+            for _ in range(5):
+                ticks.append(time.monotonic())
+                await asyncio.sleep(0.01)
+
+        results = await asyncio.gather(pool.run_async(slow, 1), pool.run_async(slow, 2), ticker())
+        return results[:2], ticks
+
+    results, ticks = asyncio.run(main())
+    assert results == [1, 2] and len(ticks) == 5
+    assert pool.metrics()['peak_in_use'] == 2
+    pool.close()
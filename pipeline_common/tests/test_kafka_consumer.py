@@ -0,0 +1,95 @@
+import time
+import threading
+from pipeline_common import kafka_consumer
+from pipeline_common.kafka_consumer import KeyOrderedConsumer, PartitionOffsets
+from pipeline_common.local_kafka import LocalKafkaBroker, LocalKafkaConsumer, LocalKafkaMessage, LocalTopicPartition
+
+TOPIC = 'events'
+
+def make_broker(keys, partitions=2):
+    broker = LocalKafkaBroker(partitions=partitions, round_trip_seconds=0, connect_seconds=0)
+    broker.append([(TOPIC, broker.partition_for(key), key, key) for key in keys])
+    return broker
+
+def runtime_for(broker, handler, **options):
+    consumer = LocalKafkaConsumer({'group.id': 'group', 'auto.offset.reset': 'earliest'}, broker)
+    return KeyOrderedConsumer(consumer, [TOPIC], handler, topic_partition=LocalTopicPartition,
+                              poll_timeout_seconds=0.01, **options)
+
+def committed(broker):
+    return [broker.committed('group', TOPIC, partition) for partition in range(broker.partition_count)]
+
+def run_until(runtime, done, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not done() and time.monotonic() < deadline:
+        runtime.poll_once()
+    runtime.drain(timeout)
+
+def test_commit_point_waits_for_earlier_offsets():
+    offsets = PartitionOffsets()
+    for offset in range(3):
+        offsets.dispatched(offset)
+    offsets.completed(2)
+    offsets.completed(1)
+    assert offsets.commit_point is None and offsets.outstanding() == 3
+    offsets.completed(0)
+    assert offsets.commit_point == 3 and offsets.outstanding() == 0
+
+def test_failed_batches_back_off_exponentially_up_to_the_cap(monkeypatch):
+    delays = []
+    monkeypatch.setattr(kafka_consumer.time, 'sleep', delays.append)
+    calls = []
+    def handler(worker, batch):
+        calls.append(len(batch))
+        if len(calls) < 5:
+            raise RuntimeError("snowflake down")
+    runtime = KeyOrderedConsumer(None, [TOPIC], handler, retry_seconds=1.0, max_retry_seconds=4.0, max_attempts=5)
+    runtime.process(0, [LocalKafkaMessage(TOPIC, 0, 0, b'C1', b'{}', 0)])
+    assert delays == [1.0, 2.0, 4.0, 4.0]
+    assert runtime.metrics()['handler_errors'] == 4 and runtime.dead_lettered == 0
+
+def test_poison_batch_is_dead_lettered_and_the_rest_is_committed():
+    keys = [f"C{i}".encode('utf-8') for i in range(20)]
+    broker = make_broker(keys)
+    handled, dead = [], []
+    def handler(worker, batch):
+        if any(message.key() == b'C7' for message in batch):
+            raise ValueError("poison")
+        handled.extend(message.key() for message in batch)
+    runtime = runtime_for(broker, handler, workers=2, max_batch=1, retry_seconds=0, max_attempts=3,
+                          dead_letter=lambda worker, batch, error: dead.extend(message.key() for message in batch))
+    runtime.start()
+    run_until(runtime, lambda: len(handled) + len(dead) == len(keys))
+    runtime.shutdown()
+    assert dead == [b'C7']
+    assert sorted(handled) == sorted(key for key in keys if key != b'C7')
+    assert runtime.metrics()['dead_lettered'] == 1 and runtime.metrics()['handler_errors'] == 3
+    assert committed(broker) == [len(broker.partitions(TOPIC)[p]) for p in range(broker.partition_count)]
+
+def test_rebalance_hands_over_partitions_without_losing_messages():
+    keys = [f"C{i}".encode('utf-8') for i in range(200)]
+    broker = make_broker(keys, partitions=4)
+    handled = []
+    lock = threading.Lock()
+    def handler(worker, batch):
+        time.sleep(0.001)
+        with lock:
+            handled.extend(message.key() for message in batch)
+    first = runtime_for(broker, handler, workers=2, max_batch=10)
+    first.start()
+    while len(handled) < 50:
+        first.poll_once()
+    second = runtime_for(broker, handler, workers=2, max_batch=10)
+    second.start()
+    deadline = time.monotonic() + 10
+    while len(set(handled)) < len(keys) and time.monotonic() < deadline:
+        first.poll_once()
+        second.poll_once()
+    first.drain(5)
+    second.drain(5)
+    first.shutdown()
+    second.shutdown()
+    # Redelivery after the handover is allowed; loss is not
+    assert set(handled) == set(keys)
+    assert first.rebalances >= 2 and second.rebalances >= 1
+    assert committed(broker) == [len(broker.partitions(TOPIC)[p]) for p in range(broker.partition_count)]
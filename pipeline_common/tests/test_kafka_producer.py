@@ -0,0 +1,107 @@
+import json
+import time
+import pytest
+from pipeline_common import kafka_producer
+from pipeline_common.kafka_producer import PooledKafkaProducer, shared_kafka_producer
+from pipeline_common.local_kafka import LocalKafkaBroker, LocalKafkaProducer, LocalKafkaError
+
+TOPIC = 'customer_events'
+
+def make_producer(broker, factory=LocalKafkaProducer, **config):
+    return PooledKafkaProducer(dict({'bootstrap.servers': 'local', 'linger.ms': 1}, **config),
+                               producer_factory=lambda config: factory(config, broker),
+                               poll_interval_seconds=0.01, queue_full_timeout_seconds=1.0)
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.005)
+    return condition()
+
+def test_defaults_are_merged_under_the_caller_config():
+    producer = make_producer(LocalKafkaBroker(round_trip_seconds=0, connect_seconds=0), **{'acks': '1'})
+    assert producer.config['acks'] == '1' and producer.config['compression.type'] == 'lz4'
+    producer.close()
+
+def test_background_poller_serves_callbacks_without_a_flush():
+    broker = LocalKafkaBroker(round_trip_seconds=0, connect_seconds=0)
+    producer = make_producer(broker)
+    delivered = []
+    producer.produce(TOPIC, {'customer_id': 'C001', 'amount': 5}, key='C001',
+                     on_delivery=lambda err, msg: delivered.append((err, msg.value())))
+    assert wait_for(lambda: delivered)
+    assert delivered[0][0] is None and json.loads(delivered[0][1]) == {'customer_id': 'C001', 'amount': 5}
+    metrics = producer.metrics()
+    assert (metrics['produced'], metrics['delivered'], metrics['in_flight']) == (1, 1, 0)
+    assert metrics['delivery_latency']['count'] == 1
+    producer.close()
+
+def test_produce_many_keeps_each_customer_on_one_partition_in_order():
+    broker = LocalKafkaBroker(partitions=4, round_trip_seconds=0, connect_seconds=0)
+    producer = make_producer(broker)
+    events = [{'customer_id': f"C{i % 3}", 'seq': i} for i in range(30)]
+    producer.produce_many(TOPIC, events)
+    assert producer.close() == 0
+    by_customer = {}
+    for log in broker.topics[TOPIC]:
+        for message in log:
+            event = json.loads(message.value())
+            by_customer.setdefault(event['customer_id'], []).append((message.partition(), event['seq']))
+    for customer_id, entries in by_customer.items():
+        assert len({partition for partition, _ in entries}) == 1
+        assert [seq for _, seq in entries] == [i for i in range(30) if f"C{i % 3}" == customer_id]
+    assert producer.metrics()['delivered'] == 30
+
+def test_full_queue_waits_for_room_instead_of_failing():
+    broker = LocalKafkaBroker(round_trip_seconds=0.01, connect_seconds=0)
+    producer = make_producer(broker, **{'queue.buffering.max.messages': 2, 'batch.num.messages': 2})
+    for i in range(6):
+        producer.produce(TOPIC, {'seq': i})
+    producer.flush(5.0)
+    metrics = producer.metrics()
+    assert metrics['delivered'] == 6 and metrics['queue_full_waits'] > 0
+    producer.close()
+
+# Producer whose sender never drains, so the local queue stays full
+class StuckProducer(LocalKafkaProducer):
+    def send_loop(self):
+        pass
+
+def test_full_queue_raises_after_the_timeout():
+    producer = make_producer(LocalKafkaBroker(connect_seconds=0), factory=StuckProducer,
+                             **{'queue.buffering.max.messages': 1})
+    producer.produce(TOPIC, 'first')
+    with pytest.raises(BufferError):
+        producer.produce(TOPIC, 'second')
+    assert producer.metrics()['produced'] == 1
+    producer.closed.set()
+
+# Producer that reports every delivery as failed
+class FailingProducer(LocalKafkaProducer):
+    def poll(self, timeout=0):
+        with self.lock:
+            reports, self.reports = self.reports, type(self.reports)()
+        for callback, message in reports:
+            callback(LocalKafkaError('Broker: Not enough in-sync replicas'), message)
+        return len(reports)
+
+def test_failed_deliveries_are_counted_and_reported():
+    producer = make_producer(LocalKafkaBroker(round_trip_seconds=0, connect_seconds=0), factory=FailingProducer)
+    errors = []
+    producer.produce(TOPIC, 'event', on_delivery=lambda err, msg: errors.append(str(err)))
+    assert wait_for(lambda: errors)
+    metrics = producer.metrics()
+    assert (metrics['delivered'], metrics['failed']) == (0, 1)
+    assert metrics['last_error'] == 'Broker: Not enough in-sync replicas'
+    producer.close()
+
+def test_one_shared_producer_per_cluster(monkeypatch):
+    monkeypatch.setattr(kafka_producer, 'producers', {})
+    broker = LocalKafkaBroker(round_trip_seconds=0, connect_seconds=0)
+    options = {'producer_factory': lambda config: LocalKafkaProducer(config, broker), 'poll_interval_seconds': 0.01}
+    first = shared_kafka_producer({'bootstrap.servers': 'a:9092'}, **options)
+    assert shared_kafka_producer({'bootstrap.servers': 'a:9092'}, **options) is first
+    other = shared_kafka_producer({'bootstrap.servers': 'b:9092'}, **options)
+    assert other is not first
+    kafka_producer.close_producers()
+    assert first.closed.is_set() and other.closed.is_set()
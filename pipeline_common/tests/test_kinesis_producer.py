@@ -0,0 +1,92 @@
+import threading
+import pytest
+from pipeline_common.kinesis_producer import KinesisProducer, split_records
+from pipeline_common.local_aws import LocalKinesis
+
+def delivered(kinesis):
+    return [record for _, _, data in kinesis.records for record in split_records(data)]
+
+def producer_for(kinesis, **options):
+    options.setdefault('base_backoff_seconds', 0)
+    return KinesisProducer(kinesis, 'stream', linger_seconds=60, **options)
+
+# Fails every put_records entry whose partition key is in `keys`
+class RejectKeys(LocalKinesis):
+    def __init__(self, keys):
+        super().__init__()
+        self.keys = set(keys)
+
+    def put_records(self, StreamName, Records, **kwargs):
+        accepted = [record for record in Records if record['PartitionKey'] not in self.keys]
+        results = iter(super().put_records(StreamName, accepted)['Records'])
+        return {'Records': [{'ErrorCode': 'ProvisionedThroughputExceededException'}
+                            if record['PartitionKey'] in self.keys else next(results) for record in Records]}
+
+def test_partial_failures_are_retried_alone():
+    kinesis = LocalKinesis(throttle_rate=0.3, seed=7)
+    producer = producer_for(kinesis, max_retries=20)
+    producer.put_many([{'customer_id': f"C{i}", 'n': i} for i in range(200)])
+    assert producer.flush() == 200
+    assert sorted(record['n'] for record in delivered(kinesis)) == list(range(200))
+    assert producer.retried_records > 0 and producer.failed_records == 0
+
+def test_entries_failing_after_retries_stay_buffered_and_flush_raises():
+    kinesis = RejectKeys({'C2'})
+    producer = producer_for(kinesis, max_retries=2)
+    producer.put_many([{'customer_id': f"C{i}", 'n': i} for i in range(4)])
+    with pytest.raises(RuntimeError):
+        producer.flush()
+    assert [record['n'] for record in delivered(kinesis)] == [0, 1, 3]
+    assert producer.metrics()['buffered_records'] == 1
+    kinesis.keys.clear()
+    assert producer.flush() == 1
+    assert [record['n'] for record in delivered(kinesis)] == [0, 1, 3, 2]
+
+def test_put_records_exception_keeps_the_batch():
+    kinesis = LocalKinesis()
+    calls = {'n': 0}
+    put_records = kinesis.put_records
+    def failing(**kwargs):
+        calls['n'] += 1
+        raise ConnectionError("network down")
+    kinesis.put_records = failing
+    producer = producer_for(kinesis, max_retries=1)
+    producer.put_many([{'customer_id': 'C1', 'n': i} for i in range(3)])
+    with pytest.raises(RuntimeError):
+        producer.flush()
+    assert calls['n'] == 2 and producer.metrics()['buffered_records'] == 3
+    kinesis.put_records = put_records
+    assert producer.flush() == 3
+    assert [record['n'] for record in delivered(kinesis)] == [0, 1, 2]
+
+def test_flush_waits_for_a_send_in_progress():
+    kinesis = LocalKinesis()
+    started, release = threading.Event(), threading.Event()
+    put_records = kinesis.put_records
+    def slow(**kwargs):
+        started.set()
+        release.wait(5)
+        return put_records(**kwargs)
+    kinesis.put_records = slow
+    producer = producer_for(kinesis)
+    producer.put({'n': 1}, 'C1')
+    background = threading.Thread(target=producer.flush)
+    background.start()
+    started.wait(5)
+    finished = threading.Event()
+    waiter = threading.Thread(target=lambda: (producer.flush(), finished.set()))
+    waiter.start()
+    assert not finished.wait(0.1)
+    release.set()
+    background.join(5)
+    waiter.join(5)
+    assert finished.is_set() and len(delivered(kinesis)) == 1
+
+def test_aggregation_packs_records_per_partition_key():
+    kinesis = LocalKinesis()
+    producer = producer_for(kinesis, aggregate=True)
+    producer.put_many([{'customer_id': f"C{i % 2}", 'n': i} for i in range(10)])
+    producer.flush()
+    assert len(kinesis.records) == 2
+    by_key = {key: [record['n'] for record in split_records(data)] for _, key, data in kinesis.records}
+    assert by_key == {'C0': [0, 2, 4, 6, 8], 'C1': [1, 3, 5, 7, 9]}
@@ -0,0 +1,78 @@
+import asyncio
+import pytest
+from pipeline_common.ttl_cache import TTLCache
+
+def test_concurrent_misses_share_one_load():
+    cache = TTLCache()
+    loads = []
+    async def load():
+        loads.append(1)
+        await asyncio.sleep(0.01)
+        return 'profile'
+    async def main():
+        return await asyncio.gather(*(cache.get_or_load('C1', load) for _ in range(5)))
+    assert asyncio.run(main()) == ['profile'] * 5
+    assert len(loads) == 1 and cache.coalesced == 4 and cache.get('C1') == 'profile'
+
+def test_load_error_reaches_every_waiter_and_is_not_cached():
+    cache = TTLCache()
+    async def load():
+        await asyncio.sleep(0.01)
+        raise ConnectionError("snowflake down")
+    async def main():
+        return await asyncio.gather(*(cache.get_or_load('C1', load) for _ in range(3)), return_exceptions=True)
+    assert all(isinstance(result, ConnectionError) for result in asyncio.run(main()))
+    assert cache.get('C1') is None and cache.loading == {}
+
+def test_cancelled_leader_hands_the_load_to_a_waiter():
+    cache = TTLCache()
+    started = []
+    async def load():
+        started.append(1)
+        await asyncio.sleep(0.05)
+        return 'profile'
+    async def main():
+        leader = asyncio.create_task(cache.get_or_load('C1', load))
+        await asyncio.sleep(0.01)
+        waiter = asyncio.create_task(cache.get_or_load('C1', load))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return await asyncio.wait_for(waiter, 1.0)
+    assert asyncio.run(main()) == 'profile'
+    assert len(started) == 2 and cache.get('C1') == 'profile'
+
+def test_cancelled_waiter_does_not_cancel_the_load():
+    cache = TTLCache()
+    async def load():
+        await asyncio.sleep(0.03)
+        return 'profile'
+    async def main():
+        leader = asyncio.create_task(cache.get_or_load('C1', load))
+        await asyncio.sleep(0.01)
+        waiter = asyncio.create_task(cache.get_or_load('C1', load))
+        await asyncio.sleep(0.01)
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        return await leader
+    assert asyncio.run(main()) == 'profile'
+
+def test_lookup_reports_hits_per_request_under_concurrency():
+    cache = TTLCache()
+    cache.put('C2', 'cached')
+    async def load():
+        await asyncio.sleep(0.02)
+        return 'profile'
+    async def main():
+        leader = asyncio.create_task(cache.lookup('C1', load))
+        await asyncio.sleep(0)
+        # A hit on another key while the miss is in flight
+        assert await cache.lookup('C2', load) == ('cached', True)
+        return await leader, await cache.lookup('C1', load)
+    assert asyncio.run(main()) == (('profile', False), ('profile', True))
+    async def coalesced():
+        cache.invalidate('C1')
+        return await asyncio.gather(cache.lookup('C1', load), cache.lookup('C1', load))
+    assert asyncio.run(coalesced()) == [('profile', False), ('profile', False)]
@@ -0,0 +1,128 @@
+import time
+import asyncio
+import threading
+from collections import OrderedDict
+
+MISSING = object()
+
+# Bounded LRU cache whose entries also expire ttl_seconds after they were stored
+class TTLCache:
+    def __init__(self, max_entries=1024, ttl_seconds=5.0):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.coalesced = 0
+        # Loads in flight for get_or_load(); version changes on every write so a
+        # load that raced an invalidation does not cache what it read
+        self.loading = {}
+        self.version = 0
+
+    def get(self, key, default=None):
+        with self.lock:
+            entry = self.entries.get(key, MISSING)
+            if entry is not MISSING and entry[0] > time.monotonic():
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            if entry is not MISSING:
+                del self.entries[key]
+            self.misses += 1
+            return default
+
+    def put(self, key, value, ttl_seconds=None):
+        expires = time.monotonic() + (self.ttl_seconds if ttl_seconds is None else ttl_seconds)
+        with self.lock:
+            self.entries[key] = (expires, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    # Apply fn to a cached value in place of dropping it; returns False if not cached
+    def patch(self, key, fn):
+        with self.lock:
+            entry = self.entries.get(key, MISSING)
+            self.version += 1
+            if entry is MISSING or entry[0] <= time.monotonic():
+                return False
+            self.entries[key] = (entry[0], fn(entry[1]))
+            return True
+
+    def invalidate(self, key):
+        with self.lock:
+            self.version += 1
+            if self.entries.pop(key, MISSING) is not MISSING:
+                self.invalidations += 1
+
+    def clear(self):
+        with self.lock:
+            self.version += 1
+            self.invalidations += len(self.entries)
+            self.entries.clear()
+
+    # Async read-through: concurrent misses for one key share a single load().
+    # None results are returned but not cached. If the leading load is
+    # cancelled (its client went away), a waiting request takes the load over.
+    async def get_or_load(self, key, load):
+        value, _ = await self.lookup(key, load)
+        return value
+
+    # get_or_load() that returns (value, hit): hit is True when the value came
+    # straight from the cache, False when this request waited on a load (its own
+    # or a coalesced one). Shared counters cannot tell, since other requests move them.
+    async def lookup(self, key, load):
+        while True:
+            value = self.get(key, MISSING)
+            if value is not MISSING:
+                return value, True
+            pending = self.loading.get(key)
+            if pending is None:
+                return await self.load_once(key, load), False
+            self.coalesced += 1
+            try:
+                return await asyncio.shield(pending), False
+            except asyncio.CancelledError:
+                if not pending.cancelled() or asyncio.current_task().cancelling():
+                    raise
+
+    async def load_once(self, key, load):
+        pending = asyncio.get_running_loop().create_future()
+        self.loading[key] = pending
+        version = self.version
+        try:
+            value = await load()
+        except Exception as e:
+            pending.set_exception(e)
+            # Mark the exception retrieved in case no other request was waiting
+            pending.exception()
+            raise
+        except BaseException:
+            # Cancelled or interrupted: release the waiters rather than leave them hanging
+            pending.cancel()
+            raise
+        finally:
+            del self.loading[key]
+        if value is not None and version == self.version:
+            self.put(key, value)
+        pending.set_result(value)
+        return value
+
+    def __len__(self):
+        return len(self.entries)
+
+    def metrics(self):
+        lookups = self.hits + self.misses
+        return {
+            'entries': len(self.entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups, 4) if lookups else None,
+            'evictions': self.evictions,
+            'invalidations': self.invalidations,
+            'coalesced': self.coalesced
+        }
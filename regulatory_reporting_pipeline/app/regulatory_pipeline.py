@@ -1,25 +1,32 @@
 import json
-import boto3
-import pandas as pd
+import os
+import sys
+import tempfile
 from datetime import datetime
 import logging
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
-import streamlit as st
-import requests
-from great_expectations.dataset import PandasDataset
-from awsglue.context import GlueContext
-from pyspark.sql import SparkSession
-import xml.etree.ElementTree as ET
-
-# Configure logging for audit trail (GDPR/CCPA compliance)
-logging.basicConfig(filename='regulatory_audit.log', level=logging.INFO)
-
-# AWS clients
-kinesis_client = boto3.client('kinesis')
-s3_client = boto3.client('s3')
-glue_client = boto3.client('glue')
-redshift_data = boto3.client('redshift-data')
-sns_client = boto3.client('sns')
+
+# Shared pipeline utilities live at the repository root
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+from pipeline_common.kinesis_producer import shared_producer
+from pipeline_common.redshift_executor import RedshiftStatementExecutor, run_sync
+from pipeline_common.clients import aws_client
+from pipeline_common.raw_zone import RawZoneWriter
+from xbrl_report import write_xbrl_report
+
+# Audit trail (GDPR/CCPA compliance), configured by the entry points rather than on import
+AUDIT_LOG_FILE = 'regulatory_audit.log'
+
+def configure_audit_log():
+    logging.basicConfig(filename=AUDIT_LOG_FILE, level=logging.INFO)
+
+# AWS clients, created on first use and shared across the process
+kinesis_client = aws_client('kinesis')
+s3_client = aws_client('s3')
+glue_client = aws_client('glue')
+redshift_data = aws_client('redshift-data')
+sns_client = aws_client('sns')
 
 # Configuration
 KINESIS_STREAM = 'regulatory-stream'
@@ -28,9 +35,20 @@ REDSHIFT_CLUSTER = 'regulatory-cluster'
 REDSHIFT_DB = 'regulatory_db'
 REDSHIFT_USER = 'admin'
 SNS_TOPIC_ARN = 'arn:aws:sns:us-east-1:YOUR_ACCOUNT:regulatory-alerts'
+# Raw zone files: gzip NDJSON under raw/<source>/dt=YYYY-MM-DD/, rolled at this compressed size
+RAW_MAX_FILE_BYTES = int(os.environ.get('RAW_MAX_FILE_BYTES', str(128 * 1024 * 1024)))
+
+# Async Redshift Data API executor: waits for statements and pages through results
+statement_executor = RedshiftStatementExecutor(redshift_data, REDSHIFT_CLUSTER, REDSHIFT_DB, REDSHIFT_USER)
+
+# The API server configures the audit log as it starts
+@asynccontextmanager
+async def lifespan(app):
+    configure_audit_log()
+    yield
 
 # FastAPI for report access
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 
 # Mock data
 mock_transactions = [
@@ -42,31 +60,30 @@ mock_crm_data = [
     {"customer_id": "C002", "name": "John Smith", "kyc_status": "verified"}
 ]
 
-# Ingest data to Kinesis
+# Ingest data to Kinesis (batched put_records through the shared producer)
 def ingest_to_kinesis(data, stream_name=KINESIS_STREAM):
-    for record in data:
-        kinesis_client.put_record(
-            StreamName=stream_name,
-            Data=json.dumps(record),
-            PartitionKey=record['customer_id']
-        )
-        logging.info(f"Ingested transaction: {record['customer_id']}")
+    producer = shared_producer(kinesis_client, stream_name)
+    producer.put_many(data)
+    producer.flush()
+    logging.info(f"Ingested {len(data)} transactions")
     print("Transactions sent to Kinesis")
 
 # Lambda handler for batch ingestion to S3
 def batch_ingest_lambda(event, context):
+    configure_audit_log()
     data = event.get('data', mock_crm_data)
-    s3_key = f"raw/crm/{datetime.now().strftime('%Y%m%d%H%M%S')}.json"
-    s3_client.put_object(
-        Bucket=S3_BUCKET,
-        Key=s3_key,
-        Body=json.dumps(data)
-    )
-    logging.info(f"Ingested batch data to S3: {s3_key}")
-    return {"status": "success", "s3_key": s3_key}
+    writer = RawZoneWriter(s3_client, S3_BUCKET, 'crm', max_file_bytes=RAW_MAX_FILE_BYTES)
+    records = writer.write_many(data)
+    s3_keys = writer.close()
+    logging.info(f"Ingested {records} records to S3: {', '.join(s3_keys)}")
+    # s3_key is the first file written, as before; a batch spanning several partitions or files lists them all in s3_keys
+    return {"status": "success", "s3_key": s3_keys[0] if s3_keys else None, "s3_keys": s3_keys, "records": records}
 
-# AWS Glue ETL and validation job
+# AWS Glue ETL and validation job (Spark, Glue and Great Expectations are only loaded here)
 def run_glue_etl():
+    from great_expectations.dataset import PandasDataset
+    from awsglue.context import GlueContext
+    from pyspark.sql import SparkSession
     spark = SparkSession.builder.appName("RegulatoryReporting").getOrCreate()
     glue_context = GlueContext(spark.sparkContext)
     
@@ -77,8 +94,9 @@ def run_glue_etl():
         format="json",
         connection_options={"paths": [f"s3://{S3_BUCKET}/raw/transactions/"], "recurse": True}
     )
+    # CRM batches are NDJSON (older files hold one JSON array on a single line); both parse line by line
     crm_df = glue_context.create_dynamic_frame.from_options(
-        format_options={"json": {"multiline": True}},
+        format_options={"json": {"multiline": False}},
         connection_type="s3",
         format="json",
         connection_options={"paths": [f"s3://{S3_BUCKET}/raw/crm/"], "recurse": True}
@@ -133,43 +151,13 @@ def run_glue_etl():
 
 # Lambda handler for report generation
 def generate_report_lambda(event, context):
-    # Fetch data from Redshift
-    query = """
-    SELECT customer_id, name, kyc_status, total_spend, product_types
-    FROM regulatory_data
-    """
-    response = redshift_data.execute_statement(
-        ClusterIdentifier=REDSHIFT_CLUSTER,
-        Database=REDSHIFT_DB,
-        DbUser=REDSHIFT_USER,
-        Sql=query
-    )
-    result = redshift_data.get_statement_result(Id=response['Id'])
-    data = [
-        {
-            'customer_id': r[0]['stringValue'],
-            'name': r[1]['stringValue'],
-            'kyc_status': r[2]['stringValue'],
-            'total_spend': r[3]['doubleValue'],
-            'product_types': r[4]['stringValue']
-        } for r in result['Records']
-    ]
-    
-    # Generate XBRL report (simplified example)
-    xbrl_root = ET.Element("xbrl")
-    for record in data:
-        item = ET.SubElement(xbrl_root, "report")
-        ET.SubElement(item, "customer_id").text = record['customer_id']
-        ET.SubElement(item, "total_spend").text = str(record['total_spend'])
-        ET.SubElement(item, "kyc_status").text = record['kyc_status']
-    
-    xbrl_str = ET.tostring(xbrl_root, encoding='unicode')
+    configure_audit_log()
+    # Generate XBRL report (simplified example) without holding the result set in memory
     s3_key = f"reports/sec_report_{datetime.now().strftime('%Y%m%d%H%M%S')}.xml"
-    s3_client.put_object(
-        Bucket=S3_BUCKET,
-        Key=s3_key,
-        Body=xbrl_str
-    )
+    with tempfile.TemporaryFile() as report_file:
+        run_sync(write_xbrl_report(statement_executor, report_file))
+        report_file.seek(0)
+        s3_client.upload_fileobj(report_file, S3_BUCKET, s3_key)
     
     # Notify stakeholders
     sns_client.publish(
@@ -192,6 +180,10 @@ async def get_report(report_id: str):
 
 # Streamlit UI for demo
 def run_streamlit():
+    import pandas as pd
+    import requests
+    import streamlit as st
+    configure_audit_log()
     st.title("Regulatory Reporting Automation Pipeline")
     st.write("Generate and View Regulatory Reports")
     if st.button("Generate Sample SEC Report"):
@@ -217,6 +209,7 @@ def run_streamlit():
 
 # Main execution
 if __name__ == "__main__":
+    configure_audit_log()
     # Ingest mock data
     ingest_to_kinesis(mock_transactions)
     batch_ingest_lambda({'data': mock_crm_data}, None)
@@ -0,0 +1,24 @@
+import xml.etree.ElementTree as ET
+
+REPORT_QUERY = """
+SELECT customer_id, name, kyc_status, total_spend, product_types
+FROM regulatory_data
+"""
+
+# NULL columns become empty elements rather than the text "None"
+def element_text(value):
+    return None if value is None else str(value)
+
+# Stream report rows from Redshift into an XBRL file one page at a time, so
+# memory holds one result page however large the report. statement_executor is
+# a pipeline_common.redshift_executor.RedshiftStatementExecutor; report_file is
+# any binary file object.
+async def write_xbrl_report(statement_executor, report_file, query=REPORT_QUERY):
+    report_file.write(b"<xbrl>")
+    async for record in statement_executor.stream_rows(query):
+        item = ET.Element("report")
+        ET.SubElement(item, "customer_id").text = element_text(record['customer_id'])
+        ET.SubElement(item, "total_spend").text = element_text(record['total_spend'])
+        ET.SubElement(item, "kyc_status").text = element_text(record['kyc_status'])
+        report_file.write(ET.tostring(item))
+    report_file.write(b"</xbrl>")
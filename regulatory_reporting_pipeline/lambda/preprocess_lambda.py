@@ -13,8 +13,8 @@ def handler(event, context):
     for record in records:
         payload = record['kinesis']['data']
         decoded_payload = base64.b64decode(payload)
-        transaction = json.loads(decoded_payload)
-        transactions.append(transaction)
+        # A record may carry several newline-delimited transactions when the producer aggregates
+        transactions.extend(json.loads(line) for line in decoded_payload.decode('utf-8').splitlines() if line.strip())
 
     df = pd.DataFrame(transactions)
     # Clean and normalize
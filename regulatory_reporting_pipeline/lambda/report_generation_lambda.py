@@ -1,9 +1,19 @@
+import os
+import sys
 import json
 import boto3
 import logging
-import xml.etree.ElementTree as ET
+import tempfile
 from datetime import datetime
 
+# Shared modules sit beside this handler in the deployment zip (built with
+# pipeline_common/lambda_package.py); in a checkout they are found in app/ and
+# at the repository root
+LAMBDA_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.extend([os.path.join(LAMBDA_DIR, '..', 'app'), os.path.join(LAMBDA_DIR, '..', '..')])
+from pipeline_common.redshift_executor import RedshiftStatementExecutor, run_sync
+from xbrl_report import write_xbrl_report
+
 s3_client = boto3.client('s3')
 redshift_data = boto3.client('redshift-data')
 sns_client = boto3.client('sns')
@@ -14,47 +24,20 @@ REDSHIFT_DB = 'regulatory_db'
 REDSHIFT_USER = 'admin'
 SNS_TOPIC_ARN = 'arn:aws:sns:us-east-1:YOUR_ACCOUNT:regulatory-alerts'  # Update accordingly
 
+# Waits for the statement and pages through its results (NextToken)
+statement_executor = RedshiftStatementExecutor(redshift_data, REDSHIFT_CLUSTER, REDSHIFT_DB, REDSHIFT_USER)
+
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
 def handler(event, context):
-    # Fetch data from Redshift
-    query = """
-    SELECT customer_id, name, kyc_status, total_spend, product_types
-    FROM regulatory_data
-    """
-    response = redshift_data.execute_statement(
-        ClusterIdentifier=REDSHIFT_CLUSTER,
-        Database=REDSHIFT_DB,
-        DbUser=REDSHIFT_USER,
-        Sql=query
-    )
-    result = redshift_data.get_statement_result(Id=response['Id'])
-    data = [
-        {
-            'customer_id': r[0]['stringValue'],
-            'name': r[1]['stringValue'],
-            'kyc_status': r[2]['stringValue'],
-            'total_spend': r[3]['doubleValue'],
-            'product_types': r[4]['stringValue']
-        } for r in result['Records']
-    ]
-    
-    # Generate XBRL report (simplified example)
-    xbrl_root = ET.Element("xbrl")
-    for record in data:
-        item = ET.SubElement(xbrl_root, "report")
-        ET.SubElement(item, "customer_id").text = record['customer_id']
-        ET.SubElement(item, "total_spend").text = str(record['total_spend'])
-        ET.SubElement(item, "kyc_status").text = record['kyc_status']
-    
-    xbrl_str = ET.tostring(xbrl_root, encoding='unicode')
+    # Generate XBRL report (simplified example), streamed page by page into a
+    # temporary file so the result set is never held in memory
     s3_key = f"reports/sec_report_{datetime.now().strftime('%Y%m%d%H%M%S')}.xml"
-    s3_client.put_object(
-        Bucket=S3_BUCKET,
-        Key=s3_key,
-        Body=xbrl_str
-    )
+    with tempfile.TemporaryFile() as report_file:
+        run_sync(write_xbrl_report(statement_executor, report_file))
+        report_file.seek(0)
+        s3_client.upload_fileobj(report_file, S3_BUCKET, s3_key)
     
     # Notify stakeholders
     sns_client.publish(
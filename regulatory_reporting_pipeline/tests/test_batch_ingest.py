@@ -0,0 +1,16 @@
+from pipeline_common.local_aws import LocalS3
+from pipeline_common.raw_zone import read_records
+
+def test_batch_ingest_writes_partitioned_raw_files_and_keeps_s3_key(monkeypatch):
+    monkeypatch.setenv('AWS_DEFAULT_REGION', 'us-east-1')
+    import regulatory_pipeline as pipeline
+    s3 = LocalS3()
+    monkeypatch.setattr(pipeline, 's3_client', s3)
+    monkeypatch.setattr(pipeline, 'configure_audit_log', lambda: None)
+    first = pipeline.batch_ingest_lambda({'data': pipeline.mock_crm_data}, None)
+    second = pipeline.batch_ingest_lambda({'data': pipeline.mock_crm_data}, None)
+    assert first['status'] == 'success' and first['records'] == 2
+    assert first['s3_key'] == first['s3_keys'][0] and first['s3_key'].startswith('raw/crm/dt=')
+    # Batches ingested in the same second no longer overwrite each other
+    assert first['s3_key'] != second['s3_key'] and len(s3.objects) == 2
+    assert read_records(s3, pipeline.S3_BUCKET, first['s3_key']) == pipeline.mock_crm_data
@@ -0,0 +1,23 @@
+import json
+import xml.etree.ElementTree as ET
+from pipeline_common.local_aws import LocalRedshiftData, LocalS3, LocalSNS
+
+def test_lambda_streams_every_page_and_writes_nulls_as_empty(monkeypatch):
+    monkeypatch.setenv('AWS_DEFAULT_REGION', 'us-east-1')
+    import report_generation_lambda as report_lambda
+    redshift, s3 = LocalRedshiftData(page_size=2), LocalS3()
+    redshift.conn.execute("CREATE TABLE regulatory_data (customer_id VARCHAR, name VARCHAR, kyc_status VARCHAR, "
+                          "total_spend DOUBLE PRECISION, product_types VARCHAR)")
+    redshift.conn.executemany("INSERT INTO regulatory_data VALUES (?, ?, ?, ?, ?)",
+                              [(f"C{i:03d}", 'Name', 'verified', 10.0 * i, 'loan') for i in range(4)]
+                              + [('C004', None, None, None, None)])
+    monkeypatch.setattr(report_lambda.statement_executor, 'redshift_data', redshift)
+    monkeypatch.setattr(report_lambda, 's3_client', s3)
+    monkeypatch.setattr(report_lambda, 'sns_client', LocalSNS())
+    response = report_lambda.handler({}, None)
+    s3_key = json.loads(response['body'])['s3_key']
+    report = ET.fromstring(s3.objects[(report_lambda.S3_BUCKET, s3_key)])
+    rows = [{child.tag: child.text for child in item} for item in report]
+    assert [row['customer_id'] for row in rows] == ['C000', 'C001', 'C002', 'C003', 'C004']
+    assert rows[3]['total_spend'] == '30.0'
+    assert rows[4] == {'customer_id': 'C004', 'total_spend': None, 'kyc_status': None}
@@ -0,0 +1,193 @@
+import os
+import time
+import uuid
+import asyncio
+import logging
+import threading
+import numpy as np
+from pipeline_common.metrics import LatencyTracker
+
+SNAPSHOT_COLUMNS = ['customer_id', 'name', 'age', 'income', 'total_spend', 'product_types']
+SNAPSHOT_QUERY = f"SELECT {', '.join(SNAPSHOT_COLUMNS)} FROM enriched_data ORDER BY customer_id"
+# Pointer file naming the snapshot readers should serve; replaced atomically
+CURRENT_FILE = 'CURRENT'
+SNAPSHOT_SUFFIX = '.arrow'
+
+# One immutable snapshot of enriched_data: an Arrow IPC file sorted by
+# customer_id and memory-mapped, so opening it costs no copy and processes
+# serving the same file share its pages. Point lookups binary-search a sorted
+# key array; scans slice the table from a key onwards.
+class AnalyticsSnapshot:
+    def __init__(self, path):
+        import pyarrow as pa
+        self.path = path
+        self.version = os.path.basename(path)[:-len(SNAPSHOT_SUFFIX)]
+        self.source = pa.memory_map(path, 'r')
+        self.table = pa.ipc.open_file(self.source).read_all()
+        self.keys = np.array(self.table.column('customer_id').to_pylist(), dtype=np.str_)
+        self.columns = [(name, self.table.column(name)) for name in self.table.column_names]
+        self.rows = self.table.num_rows
+        # Requests using the snapshot, and whether a newer one has replaced it
+        self.readers = 0
+        self.retired = False
+
+    def lookup(self, customer_id):
+        index = int(np.searchsorted(self.keys, customer_id))
+        if index == self.rows or self.keys[index] != customer_id:
+            return None
+        return {name: column[index].as_py() for name, column in self.columns}
+
+    # Up to limit rows in customer_id order, starting after the given key
+    def scan(self, after=None, limit=100):
+        start = int(np.searchsorted(self.keys, after, side='right')) if after else 0
+        return self.table.slice(start, limit).to_pylist()
+
+    # The mapping is released once the table's buffers are dropped too
+    def close(self):
+        self.source.close()
+        self.table = self.keys = self.columns = None
+
+# Local serving copy of enriched_data. refresh() pages the table out of
+# Redshift through a RedshiftStatementExecutor, writes a new sorted snapshot
+# beside the old ones and then swaps it in: first the CURRENT pointer file
+# (os.replace, so other processes see either the old or the new name), then
+# the in-memory reference. Requests already holding the old snapshot finish
+# on it, and the last one out closes it; the newest keep_snapshots files are
+# kept on disk. refresh() writes the snapshot on a worker thread, so lookups
+# keep being served while it runs. Needs pyarrow.
+class AnalyticsSnapshotStore:
+    def __init__(self, directory, keep_snapshots=2):
+        self.directory = directory
+        self.keep_snapshots = keep_snapshots
+        self.current = None
+        self.swap_lock = threading.Lock()
+        self.refreshes = 0
+        self.failed_refreshes = 0
+        self.last_refresh = None
+        self.refresh_seconds = None
+        self.lookup_latency = LatencyTracker()
+
+    def pointer_path(self):
+        return os.path.join(self.directory, CURRENT_FILE)
+
+    # Open whatever snapshot CURRENT names, if it is not the one already served
+    def reload(self):
+        try:
+            with open(self.pointer_path()) as f:
+                name = f.read().strip()
+        except FileNotFoundError:
+            return False
+        if self.current is not None and os.path.basename(self.current.path) == name:
+            return False
+        self.swap(AnalyticsSnapshot(os.path.join(self.directory, name)))
+        return True
+
+    def swap(self, snapshot):
+        with self.swap_lock:
+            previous, self.current = self.current, snapshot
+            if previous is not None:
+                previous.retired = True
+            idle = previous is not None and previous.readers == 0
+        if idle:
+            previous.close()
+        logging.info(f"Serving analytics snapshot {snapshot.version} ({snapshot.rows} customers)")
+        return previous
+
+    # The current snapshot, held open until release(); None if none is loaded
+    def acquire(self):
+        with self.swap_lock:
+            snapshot = self.current
+            if snapshot is not None:
+                snapshot.readers += 1
+        return snapshot
+
+    def release(self, snapshot):
+        with self.swap_lock:
+            snapshot.readers -= 1
+            idle = snapshot.retired and snapshot.readers == 0
+        if idle:
+            snapshot.close()
+
+    # Write a table (or {column: array} dict) as a new snapshot and serve it
+    def publish(self, data):
+        import pyarrow as pa
+        import pyarrow.compute as pc
+        table = data if isinstance(data, pa.Table) else pa.table(data)
+        table = table.take(pc.sort_indices(table, sort_keys=[('customer_id', 'ascending')]))
+        os.makedirs(self.directory, exist_ok=True)
+        name = f"{time.strftime('%Y%m%dT%H%M%S', time.gmtime())}-{uuid.uuid4().hex[:8]}{SNAPSHOT_SUFFIX}"
+        path = os.path.join(self.directory, name)
+        # Written under a temporary name and renamed, so a crash never leaves a truncated snapshot behind
+        with pa.OSFile(path + '.tmp', 'wb') as sink:
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table.combine_chunks())
+        os.replace(path + '.tmp', path)
+        with open(self.pointer_path() + '.tmp', 'w') as f:
+            f.write(name)
+        os.replace(self.pointer_path() + '.tmp', self.pointer_path())
+        self.swap(AnalyticsSnapshot(path))
+        self.remove_old_snapshots()
+        return name
+
+    def remove_old_snapshots(self):
+        paths = sorted((os.path.join(self.directory, name) for name in os.listdir(self.directory)
+                        if name.endswith(SNAPSHOT_SUFFIX)), key=lambda path: os.stat(path).st_mtime_ns)
+        # Unlinking is safe while a reader still maps the file; the pages stay valid until it is closed
+        for path in paths[:-self.keep_snapshots]:
+            if path != self.current.path:
+                os.remove(path)
+
+    async def refresh(self, statement_executor, query=SNAPSHOT_QUERY):
+        import pyarrow as pa
+        start = time.perf_counter()
+        try:
+            # from_pandas turns the NaN that NULL numbers decode to back into nulls
+            pages = [pa.table({name: pa.array(values, from_pandas=True) for name, values in page.items()})
+                     async for page in statement_executor.stream_columns(query)]
+            # Pages are typed on their own (an all-NULL page has null columns), so promote to a common schema
+            def build_and_publish():
+                table = (pa.concat_tables(pages, promote_options='permissive') if pages
+                         else pa.table({name: [] for name in SNAPSHOT_COLUMNS}))
+                return self.publish(table)
+            name = await asyncio.to_thread(build_and_publish)
+        except Exception:
+            self.failed_refreshes += 1
+            raise
+        self.refreshes += 1
+        self.last_refresh = time.time()
+        self.refresh_seconds = round(time.perf_counter() - start, 3)
+        return name
+
+    # None if the customer is not in the snapshot (check current for whether one is loaded)
+    def lookup(self, customer_id):
+        snapshot = self.acquire()
+        if snapshot is None:
+            return None
+        start = time.perf_counter()
+        try:
+            record = snapshot.lookup(customer_id)
+        finally:
+            self.release(snapshot)
+        self.lookup_latency.record(time.perf_counter() - start)
+        return record
+
+    def scan(self, after=None, limit=100):
+        snapshot = self.acquire()
+        if snapshot is None:
+            return None
+        try:
+            return snapshot.scan(after, limit)
+        finally:
+            self.release(snapshot)
+
+    def metrics(self):
+        snapshot = self.current
+        return {
+            'version': snapshot.version if snapshot else None,
+            'customers': snapshot.rows if snapshot else 0,
+            'age_seconds': round(time.time() - self.last_refresh, 1) if self.last_refresh else None,
+            'refreshes': self.refreshes,
+            'failed_refreshes': self.failed_refreshes,
+            'refresh_seconds': self.refresh_seconds,
+            'lookup_latency': self.lookup_latency.summary()
+        }
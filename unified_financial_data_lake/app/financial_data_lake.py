@@ -1,20 +1,29 @@
-import json
-import boto3
-import pandas as pd
-from datetime import datetime
+import os
+import sys
+import asyncio
 import logging
-from fastapi import FastAPI
-import streamlit as st
-import requests
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Query
 
-# Configure logging for audit trail (GDPR/CCPA compliance)
-logging.basicConfig(filename='data_lake_audit.log', level=logging.INFO)
+# Shared pipeline utilities live at the repository root
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+from pipeline_common.kinesis_producer import shared_producer
+from pipeline_common.redshift_executor import RedshiftStatementExecutor
+from pipeline_common.clients import aws_client
+from pipeline_common.raw_zone import RawZoneWriter
+from analytics_snapshot import AnalyticsSnapshotStore
 
-# AWS clients
-kinesis_client = boto3.client('kinesis')
-s3_client = boto3.client('s3')
-glue_client = boto3.client('glue')
-redshift_data = boto3.client('redshift-data')
+# Audit trail (GDPR/CCPA compliance), configured by the entry points rather than on import
+AUDIT_LOG_FILE = 'data_lake_audit.log'
+
+def configure_audit_log():
+    logging.basicConfig(filename=AUDIT_LOG_FILE, level=logging.INFO)
+
+# AWS clients, created on first use and shared across the process
+kinesis_client = aws_client('kinesis')
+s3_client = aws_client('s3')
+glue_client = aws_client('glue')
+redshift_data = aws_client('redshift-data')
 
 # Configuration
 KINESIS_STREAM = 'financial-stream'
@@ -22,9 +31,54 @@ S3_BUCKET = 'financial-data-lake-bucket'
 REDSHIFT_CLUSTER = 'financial-cluster'
 REDSHIFT_DB = 'financial_db'
 REDSHIFT_USER = 'admin'
+# Raw zone files: gzip NDJSON (or parquet) under raw/<source>/dt=YYYY-MM-DD/, rolled at this compressed size
+RAW_FILE_FORMAT = os.environ.get('RAW_FILE_FORMAT', 'ndjson')
+RAW_MAX_FILE_BYTES = int(os.environ.get('RAW_MAX_FILE_BYTES', str(128 * 1024 * 1024)))
+
+# Async Redshift Data API executor: waits for statements and pages through results
+statement_executor = RedshiftStatementExecutor(redshift_data, REDSHIFT_CLUSTER, REDSHIFT_DB, REDSHIFT_USER)
+
+# Analytics serving mode: 'redshift' queries enriched_data per request; 'snapshot'
+# serves lookups in-process from a local columnar copy refreshed every
+# ANALYTICS_REFRESH_SECONDS (0 only picks up snapshots published by another process)
+ANALYTICS_SERVING_MODE = os.environ.get('ANALYTICS_SERVING_MODE', 'redshift')
+ANALYTICS_SNAPSHOT_DIR = os.environ.get('ANALYTICS_SNAPSHOT_DIR', '/tmp/analytics-snapshots')
+ANALYTICS_REFRESH_SECONDS = float(os.environ.get('ANALYTICS_REFRESH_SECONDS', '900'))
+analytics_store = AnalyticsSnapshotStore(ANALYTICS_SNAPSHOT_DIR)
+
+def serving_from_snapshot():
+    return ANALYTICS_SERVING_MODE == 'snapshot' and analytics_store.current is not None
+
+async def refresh_analytics_snapshot():
+    return await analytics_store.refresh(statement_executor)
+
+async def keep_snapshot_fresh():
+    while True:
+        try:
+            if ANALYTICS_REFRESH_SECONDS:
+                await refresh_analytics_snapshot()
+            else:
+                await asyncio.to_thread(analytics_store.reload)
+        except Exception as e:
+            # Keep serving the previous snapshot (or Redshift if there is none yet)
+            logging.error(f"Analytics snapshot refresh failed: {e}")
+        await asyncio.sleep(ANALYTICS_REFRESH_SECONDS or 30)
+
+# The API server configures the audit log as it starts, and in snapshot mode
+# opens the last published snapshot and keeps it refreshed
+@asynccontextmanager
+async def lifespan(app):
+    configure_audit_log()
+    refresher = None
+    if ANALYTICS_SERVING_MODE == 'snapshot':
+        await asyncio.to_thread(analytics_store.reload)
+        refresher = asyncio.create_task(keep_snapshot_fresh())
+    yield
+    if refresher is not None:
+        refresher.cancel()
 
 # FastAPI for API access
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 
 # Mock data
 mock_crm_data = [
@@ -36,57 +90,63 @@ mock_transactions = [
     {"customer_id": "C002", "amount": 2000, "type": "savings", "date": "2025-07-02"}
 ]
 
-# Ingest data to Kinesis
+# Ingest data to Kinesis (batched put_records through the shared producer)
 def ingest_to_kinesis(data, stream_name=KINESIS_STREAM):
-    for record in data:
-        kinesis_client.put_record(
-            StreamName=stream_name,
-            Data=json.dumps(record),
-            PartitionKey=record['customer_id']
-        )
-        logging.info(f"Ingested record: {record['customer_id']}")
+    producer = shared_producer(kinesis_client, stream_name)
+    producer.put_many(data)
+    producer.flush()
+    logging.info(f"Ingested {len(data)} records")
     print("Data sent to Kinesis")
 
-# Lambda handler for batch ingestion to S3
+# Lambda handler for batch ingestion to S3. Records are streamed into
+# compressed, date-partitioned raw files with collision-free keys.
 def batch_ingest_lambda(event, context):
+    configure_audit_log()
     data = event.get('data', mock_crm_data)  # Replace with actual source
-    s3_key = f"raw/crm/{datetime.now().strftime('%Y%m%d%H%M%S')}.json"
-    s3_client.put_object(
-        Bucket=S3_BUCKET,
-        Key=s3_key,
-        Body=json.dumps(data)
-    )
-    logging.info(f"Ingested batch data to S3: {s3_key}")
-    return {"status": "success", "s3_key": s3_key}
+    writer = RawZoneWriter(s3_client, S3_BUCKET, event.get('source', 'crm'), file_format=RAW_FILE_FORMAT,
+                           max_file_bytes=RAW_MAX_FILE_BYTES)
+    records = writer.write_many(data)
+    s3_keys = writer.close()
+    logging.info(f"Ingested {records} records to S3: {', '.join(s3_keys)}")
+    # s3_key is the first file written, as before; a batch spanning several partitions or files lists them all in s3_keys
+    return {"status": "success", "s3_key": s3_keys[0] if s3_keys else None, "s3_keys": s3_keys, "records": records}
 
 # FastAPI endpoint for analytics
 @app.get("/api/customer/{customer_id}")
 async def get_customer_analytics(customer_id: str):
+    if serving_from_snapshot():
+        record = analytics_store.lookup(customer_id)
+    else:
+        query = """
+        SELECT customer_id, name, age, income, total_spend, product_types
+        FROM enriched_data
+        WHERE customer_id = :customer_id
+        """
+        record = await statement_executor.fetch_one(query, {'customer_id': customer_id})
+    if record:
+        analytics = dict(record)
+        analytics['recommendation'] = recommend_service(record['income'], record['total_spend'])
+        return analytics
+    return {"error": "Customer not found"}
+
+# Page through customers in customer_id order, starting after the given id
+@app.get("/api/customers")
+async def list_customer_analytics(after: str = '', limit: int = Query(100, ge=1, le=1000)):
+    if serving_from_snapshot():
+        return analytics_store.scan(after or None, limit)
+    # limit is a validated int; Data API parameters are strings, which LIMIT does not accept
     query = f"""
     SELECT customer_id, name, age, income, total_spend, product_types
     FROM enriched_data
-    WHERE customer_id = '{customer_id}'
+    WHERE customer_id > :after
+    ORDER BY customer_id
+    LIMIT {limit}
     """
-    response = redshift_data.execute_statement(
-        ClusterIdentifier=REDSHIFT_CLUSTER,
-        Database=REDSHIFT_DB,
-        DbUser=REDSHIFT_USER,
-        Sql=query
-    )
-    result = redshift_data.get_statement_result(Id=response['Id'])
-    if result['Records']:
-        record = result['Records'][0]
-        analytics = {
-            'customer_id': record[0]['stringValue'],
-            'name': record[1]['stringValue'],
-            'age': record[2]['longValue'],
-            'income': record[3]['doubleValue'],
-            'total_spend': record[4]['doubleValue'],
-            'product_types': record[5]['stringValue'],
-            'recommendation': recommend_service(record[3]['doubleValue'], record[4]['doubleValue'])
-        }
-        return analytics
-    return {"error": "Customer not found"}
+    return await statement_executor.fetch_rows(query, {'after': after})
+
+@app.get("/api/customers/serving/metrics")
+async def analytics_serving_metrics():
+    return dict(analytics_store.metrics(), mode=ANALYTICS_SERVING_MODE, serving_from_snapshot=serving_from_snapshot())
 
 # Recommendation engine
 def recommend_service(income, total_spend):
@@ -99,6 +159,10 @@ def recommend_service(income, total_spend):
 
 # Streamlit UI for demo
 def run_streamlit():
+    import pandas as pd
+    import requests
+    import streamlit as st
+    configure_audit_log()
     st.title("Unified Financial Data Lake")
     st.write("Cross-Product Analytics Demo")
     customer_id = st.text_input("Enter Customer ID (e.g., C001)")
@@ -122,6 +186,7 @@ def run_streamlit():
 
 # Main execution
 if __name__ == "__main__":
+    configure_audit_log()
     # Ingest mock data
     ingest_to_kinesis(mock_transactions)
     batch_ingest_lambda({'data': mock_crm_data}, None)
@@ -0,0 +1,115 @@
+import os
+import sys
+import time
+import random
+import asyncio
+import argparse
+import tempfile
+import threading
+
+# Customer analytics lookups through the Redshift Data API path (execute,
+# poll describe_statement, fetch) against the in-process snapshot served by
+# AnalyticsSnapshotStore. enriched_data lives in the SQLite-backed Data API
+# stand-in, whose statements report STARTED for --redshift-latency-ms before
+# finishing. Also reports the snapshot refresh time and checks that lookups
+# running during a refresh never miss while the snapshot is swapped.
+#   python benchmarks/serving_benchmark.py --customers 1000000
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path[:0] = [os.path.join(BENCHMARK_DIR, '..', 'app'), os.path.join(BENCHMARK_DIR, '..', '..')]
+
+from pipeline_common.local_aws import LocalRedshiftData
+from pipeline_common.metrics import percentile
+from pipeline_common.redshift_executor import RedshiftStatementExecutor
+from analytics_snapshot import AnalyticsSnapshotStore, SNAPSHOT_COLUMNS
+
+PRODUCTS = ['savings', 'investment', 'loan', 'credit_card', 'mortgage']
+LOOKUP_SQL = f"SELECT {', '.join(SNAPSHOT_COLUMNS)} FROM enriched_data WHERE customer_id = :customer_id"
+
+def customer_id(i):
+    return f"C{i:08d}"
+
+def load_enriched_data(redshift, customers, seed):
+    rng = random.Random(seed)
+    redshift.conn.execute("CREATE TABLE enriched_data (customer_id VARCHAR PRIMARY KEY, name VARCHAR, age BIGINT, "
+                          "income DOUBLE PRECISION, total_spend DOUBLE PRECISION, product_types VARCHAR)")
+    # Inserted in shuffled order; the snapshot has to sort it
+    order = list(range(customers))
+    rng.shuffle(order)
+    redshift.conn.executemany("INSERT INTO enriched_data VALUES (?, ?, ?, ?, ?, ?)", (
+        (customer_id(i), f"Customer {i}", rng.randint(18, 90), round(rng.lognormvariate(11, 0.6), 2),
+         round(rng.lognormvariate(8, 1.2), 2), ','.join(sorted(rng.sample(PRODUCTS, rng.randint(1, 3)))))
+        for i in order))
+    redshift.conn.commit()
+
+def summary(samples):
+    samples = sorted(samples)
+    return f"p50 {percentile(samples, 0.50) * 1000:9.3f} ms  p99 {percentile(samples, 0.99) * 1000:9.3f} ms"
+
+async def redshift_lookups(executor, ids):
+    samples = []
+    for key in ids:
+        start = time.perf_counter()
+        await executor.fetch_one(LOOKUP_SQL, {'customer_id': key})
+        samples.append(time.perf_counter() - start)
+    return samples
+
+def timed(fn, args_list):
+    samples = []
+    for args in args_list:
+        start = time.perf_counter()
+        fn(*args)
+        samples.append(time.perf_counter() - start)
+    return samples
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--customers', type=int, default=200000)
+    parser.add_argument('--redshift-lookups', type=int, default=50)
+    parser.add_argument('--snapshot-lookups', type=int, default=100000)
+    parser.add_argument('--redshift-latency-ms', type=float, default=300, help='time each statement stays STARTED')
+    parser.add_argument('--page-size', type=int, default=1000, help='Data API result page size')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+    rng = random.Random(args.seed + 1)
+
+    with tempfile.TemporaryDirectory(prefix='serving-benchmark-') as directory:
+        redshift = LocalRedshiftData(os.path.join(directory, 'redshift.db'), page_size=args.page_size)
+        load_enriched_data(redshift, args.customers, args.seed)
+        executor = RedshiftStatementExecutor(redshift, 'cluster', 'db', 'user')
+        store = AnalyticsSnapshotStore(os.path.join(directory, 'snapshots'))
+
+        start = time.perf_counter()
+        asyncio.run(store.refresh(executor))
+        size = os.path.getsize(store.current.path)
+        print(f"snapshot refresh: {time.perf_counter() - start:.2f} s for {store.current.rows} customers "
+              f"({size / 2 ** 20:.1f} MiB)")
+
+        redshift.execution_seconds = args.redshift_latency_ms / 1000
+        ids = [customer_id(rng.randrange(args.customers)) for _ in range(args.redshift_lookups)]
+        print(f"redshift lookup:  {summary(asyncio.run(redshift_lookups(executor, ids)))}")
+        redshift.execution_seconds = 0.0
+
+        ids = [(customer_id(rng.randrange(args.customers)),) for _ in range(args.snapshot_lookups)]
+        print(f"snapshot lookup:  {summary(timed(store.lookup, ids))}")
+        scans = [(customer_id(rng.randrange(args.customers)), 100) for _ in range(args.snapshot_lookups // 100)]
+        print(f"snapshot scan:    {summary(timed(store.scan, scans))}  (100 rows)")
+
+        # Lookups keep running while a refresh writes and swaps in the next snapshot
+        stop, misses, served = threading.Event(), [0], [0]
+        def look_up():
+            while not stop.is_set():
+                if store.lookup(customer_id(rng.randrange(args.customers))) is None:
+                    misses[0] += 1
+                served[0] += 1
+        reader = threading.Thread(target=look_up)
+        reader.start()
+        previous = store.current.version
+        asyncio.run(store.refresh(executor))
+        stop.set()
+        reader.join()
+        print(f"during refresh:   {served[0]} lookups, {misses[0]} misses, "
+              f"swapped {previous} -> {store.current.version}")
+
+if __name__ == "__main__":
+    main()
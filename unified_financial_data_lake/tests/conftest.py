@@ -0,0 +1,5 @@
+import os
+import sys
+
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path[:0] = [os.path.join(TESTS_DIR, '..', 'app'), os.path.join(TESTS_DIR, '..', '..')]
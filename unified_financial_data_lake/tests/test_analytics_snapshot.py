@@ -0,0 +1,48 @@
+import time
+import asyncio
+from analytics_snapshot import AnalyticsSnapshotStore, SNAPSHOT_COLUMNS
+
+def customers(count, spend=1.0):
+    ids = [f"C{i:06d}" for i in range(count)]
+    return {'customer_id': ids, 'name': ids, 'age': [30] * count, 'income': [1.0] * count,
+            'total_spend': [spend] * count, 'product_types': ['loan'] * count}
+
+class OnePageExecutor:
+    def __init__(self, data):
+        self.data = data
+
+    async def stream_columns(self, query):
+        yield self.data
+
+def test_swap_closes_previous_snapshot_after_its_last_reader(tmp_path):
+    store = AnalyticsSnapshotStore(str(tmp_path))
+    store.publish(customers(10))
+    first = store.acquire()
+    store.publish(customers(10, spend=2.0))
+    # Still held by a reader: stays open until released
+    assert first.lookup('C000003')['total_spend'] == 1.0
+    assert store.lookup('C000003')['total_spend'] == 2.0
+    store.release(first)
+    assert first.source.closed and first.table is None
+    second = store.current
+    store.publish(customers(10, spend=3.0))
+    assert second.source.closed
+
+def test_refresh_publishes_off_the_event_loop(tmp_path, monkeypatch):
+    store = AnalyticsSnapshotStore(str(tmp_path))
+    publish = store.publish
+    def slow_publish(data):
+        time.sleep(0.3)
+        return publish(data)
+    monkeypatch.setattr(store, 'publish', slow_publish)
+    async def run():
+        ticks = 0
+        refresh = asyncio.create_task(store.refresh(OnePageExecutor(customers(5))))
+        while not refresh.done():
+            await asyncio.sleep(0.01)
+            ticks += 1
+        await refresh
+        return ticks
+    assert asyncio.run(run()) > 10
+    assert store.lookup('C000004')['customer_id'] == 'C000004'
+    assert list(store.current.table.column_names) == SNAPSHOT_COLUMNS
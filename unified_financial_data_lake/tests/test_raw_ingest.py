@@ -0,0 +1,36 @@
+import os
+import pytest
+from pipeline_common import clients
+from pipeline_common.local_aws import LocalS3
+from pipeline_common.raw_zone import RawZoneWriter, MIN_PART_BYTES
+
+def test_batch_ingest_keeps_s3_key(tmp_path, monkeypatch):
+    monkeypatch.setenv('AWS_DEFAULT_REGION', 'us-east-1')
+    monkeypatch.chdir(tmp_path)
+    s3 = LocalS3()
+    clients.register('s3', s3)
+    import financial_data_lake
+    try:
+        response = financial_data_lake.batch_ingest_lambda({'data': [{'customer_id': 'C001'}]}, None)
+    finally:
+        clients.reset('s3')
+    assert response['status'] == 'success'
+    assert response['s3_keys'] == [response['s3_key']] and ('financial-data-lake-bucket', response['s3_key']) in s3.objects
+    assert response['records'] == 1
+
+def test_failed_multipart_completion_is_aborted(monkeypatch):
+    s3 = LocalS3()
+    def fail(**kwargs):
+        raise RuntimeError("s3 down")
+    monkeypatch.setattr(s3, 'complete_multipart_upload', fail)
+    writer = RawZoneWriter(s3, 'bucket', 'crm', partition_field='date', part_bytes=MIN_PART_BYTES,
+                           max_file_age_seconds=0, compresslevel=1)
+    # Random hex barely compresses, so this day goes up as a multipart upload
+    writer.write_many({'date': '2025-07-01', 'blob': os.urandom(4096).hex()} for _ in range(2048))
+    writer.write({'date': '2025-07-02', 'blob': 'small'})
+    with pytest.raises(RuntimeError):
+        writer.flush()
+    assert s3.list_multipart_uploads(Bucket='bucket')['Uploads'] == []
+    assert writer.metrics()['failed_files'] == 1 and writer.metrics()['open_files'] == 0
+    # The other day's file was still completed and is reported by the next flush
+    assert [key.split('/')[2] for key in writer.flush()] == ['dt=2025-07-02']